@@ -1,10 +1,12 @@
 """Api module init file."""
 
-
 from fastapi import APIRouter
 
+from api.admin.router import admin_router
 from api.auth.router import auth_router
 from api.home import home_router
+from api.live.router import live_router
+from api.metrics import metrics_router
 from api.quiz.router import quiz_router
 from api.user.router import user_router
 
@@ -14,5 +16,8 @@ router.include_router(home_router)
 router.include_router(user_router)
 router.include_router(auth_router)
 router.include_router(quiz_router)
+router.include_router(metrics_router)
+router.include_router(admin_router)
+router.include_router(live_router)
 
 __all__ = ["router"]
@@ -0,0 +1,56 @@
+# pylint: disable=no-name-in-module
+# pylint: disable=no-self-argument
+# pylint: disable=R0903
+
+"""Admin module models."""
+
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from pydantic.main import BaseModel
+
+
+class ExplainSummary(BaseModel):
+    """Explain (executionStats) summary of a query shape."""
+
+    stages: List[Optional[str]] = []
+    n_returned: Optional[int]
+    keys_examined: Optional[int]
+    docs_examined: Optional[int]
+    execution_time_ms: Optional[int]
+    error: Optional[str]
+
+
+class SlowQuery(BaseModel):
+    """Slow query log entry."""
+
+    timestamp: datetime
+    collection: str
+    command: str
+    duration_ms: float
+    route: Optional[str]
+    shape: Dict[str, Any]
+    error: Optional[str]
+    explain: Optional[ExplainSummary]
+
+
+class LoopStall(BaseModel):
+    """Event loop stall: the loop was blocked longer than LOOP_STALL_MS."""
+
+    timestamp: datetime
+    route: str
+    duration_ms: Optional[float]
+    stack: List[str] = []
+
+
+class TraceSpan(BaseModel):
+    """Span of a request trace."""
+
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    name: str
+    timestamp: datetime
+    duration_ms: Optional[float]
+    status: str
+    attributes: Dict[str, Any] = {}
@@ -0,0 +1,133 @@
+"""Admin routing: diagnostics endpoints, admin users only."""
+
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from api.admin.model import LoopStall, SlowQuery, TraceSpan
+from api.auth.main import get_current_admin_user
+from api.quiz.activity import GLOBAL_QUIZ, activity_series
+from api.quiz.model import ActivitySeries, RegradeReport, Resolution
+from api.quiz.regrade import regrade_job
+from core.config import get_config
+from core.looplag import loop_monitor
+from core.tracing import MemoryExporter, get_exporter
+from database.repository import RepositoryFactory, get_repository
+from database.slowlog import slow_query_log
+
+admin_router = APIRouter(
+    prefix="/admin", tags=["Admin"], dependencies=[Depends(get_current_admin_user)]
+)
+
+
+@admin_router.get("/slow-queries", response_model=List[SlowQuery])
+def read_slow_queries(limit: int = Query(50, ge=1, le=1000)):
+    """Slow query log endpoint: recent mongo commands slower than
+    SLOW_QUERY_MS (newest first), with the route that issued them and
+    explain of their query shape.
+    :param limit: maximum number of entries
+    :return: slow query log entries"""
+
+    return slow_query_log.entries(limit)
+
+
+@admin_router.delete("/slow-queries")
+def clear_slow_queries():
+    """Clears slow query log.
+    :return: 200 if OK"""
+
+    slow_query_log.clear()
+    return {"is_cleared": True}
+
+
+@admin_router.get("/loop-stalls", response_model=List[LoopStall])
+def read_loop_stalls(limit: int = Query(50, ge=1, le=1000)):
+    """Event loop stalls endpoint: recent stalls longer than LOOP_STALL_MS
+    (newest first) with the route that was running and, in debug mode,
+    stack of the blocking call.
+    :param limit: maximum number of stalls
+    :return: event loop stalls"""
+
+    return loop_monitor.stalls(limit)
+
+
+@admin_router.delete("/loop-stalls")
+def clear_loop_stalls():
+    """Clears event loop stalls.
+    :return: 200 if OK"""
+
+    loop_monitor.clear()
+    return {"is_cleared": True}
+
+
+@admin_router.get("/traces", response_model=List[TraceSpan])
+def read_traces(trace_id: str = None, limit: int = Query(200, ge=1, le=10000)):
+    """Traces endpoint: spans of recent sampled requests (newest first),
+    available with the in-memory trace exporter.
+    :param trace_id: spans of this trace only
+    :param limit: maximum number of spans
+    :return: trace spans"""
+
+    exporter = get_exporter()
+    if not isinstance(exporter, MemoryExporter):
+        raise HTTPException(status_code=404, detail="In-memory trace exporter not used")
+    return exporter.spans(trace_id, limit)
+
+
+@admin_router.get("/activity", response_model=ActivitySeries)
+def read_activity(
+    resolution: Resolution = Resolution.minute,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Submission activity endpoint: submissions to all quizzes per
+    minute, hour or day, read from rollup buckets.
+    :param resolution: bucket resolution
+    :param start: range start (UTC), defaults to 60 buckets before end
+    :param end: range end (UTC), defaults to now
+    :param repo: repository factory
+    :return: submission counts by bucket"""
+
+    try:
+        return activity_series(repo, GLOBAL_QUIZ, resolution, start, end)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@admin_router.post("/regrade", response_model=RegradeReport, status_code=202)
+def start_regrade(
+    quiz_id: Optional[List[int]] = Query(None),
+    restart: bool = False,
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Re-grade endpoint: recomputes scores of stored solutions (of given
+    quizzes, all if omitted) in the background, i.e. after an answer key
+    fix. Interrupted re-grades resume unless restart is set.
+    :param quiz_id: quizzes to re-grade (repeatable)
+    :param restart: ignore checkpoints and re-grade all solutions
+    :param repo: repository factory
+    :return: re-grade progress, 409 if a re-grade is running"""
+
+    config = get_config()
+    started = regrade_job.start(
+        repo,
+        quiz_ids=quiz_id or None,
+        workers=config.REGRADE_WORKERS,
+        batch_size=config.EXPORT_BATCH_SIZE,
+        rate=config.REGRADE_RATE,
+        restart=restart,
+    )
+    if not started:
+        raise HTTPException(status_code=409, detail="Re-grade is already running")
+    return regrade_job.report()
+
+
+@admin_router.get("/regrade", response_model=RegradeReport)
+def read_regrade():
+    """Re-grade progress endpoint: progress of the running re-grade or
+    report of the last one.
+    :return: re-grade report"""
+
+    return regrade_job.report()
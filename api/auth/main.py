@@ -4,12 +4,13 @@ needed methods for token based authorization."""
 from datetime import datetime, timedelta
 from typing import Optional
 
-from fastapi import Depends
+from fastapi import Depends, HTTPException
 from jose import ExpiredSignatureError, JWTError, jwt
 from jose.exceptions import JWTClaimsError
 
 from api.auth import credentials_exception, oauth2_scheme, pwd_context
 from core.config import get_config
+from core.tracing import span, traced
 from database.repository import RepositoryFactory, get_repository
 from model import User
 
@@ -67,6 +68,7 @@ def get_username_from_access_token(
         raise exc
 
 
+@traced("auth.get_user_from_token")
 def get_user_from_token(
     *,
     token: str = Depends(oauth2_scheme),
@@ -78,11 +80,12 @@ def get_user_from_token(
     :return: Current user"""
 
     token_info = get_config().TOKEN_INFO
-    username = get_username_from_access_token(
-        token=token,
-        secret_key=token_info.jwt_signature,
-        algorithm=token_info.jwt_algorithm,
-    )
+    with span("auth.decode_token"):
+        username = get_username_from_access_token(
+            token=token,
+            secret_key=token_info.jwt_signature,
+            algorithm=token_info.jwt_algorithm,
+        )
     user: Optional[User] = repo.user.get(username)
     return user
 
@@ -97,3 +100,15 @@ def get_current_active_user(
     if not current_user or not current_user.active:
         raise credentials_exception
     return current_user
+
+
+def get_current_admin_user(
+    current_user: User = Depends(get_current_active_user),
+) -> User:
+    """Extracts current active user with admin rights.
+    :param current_user: current and active user
+    :return: Current admin user"""
+
+    if not current_user.is_admin:
+        raise HTTPException(status_code=403, detail="Admin rights required")
+    return current_user
@@ -0,0 +1,15 @@
+# pylint: disable=no-name-in-module
+# pylint: disable=no-self-argument
+# pylint: disable=R0903
+
+"""Live quiz module models."""
+
+from pydantic.main import BaseModel
+
+
+class LiveSession(BaseModel):
+    """Live quiz session players join with its code."""
+
+    code: str
+    quiz_id: int
+    questions: int
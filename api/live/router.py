@@ -0,0 +1,240 @@
+"""Live quiz module routing and handling logic. The host creates a
+session of a published quiz and drives it over a websocket, players
+join it over another websocket with the session code. Websockets
+authenticate with the access token in the token query parameter."""
+
+import json
+from typing import Optional, Tuple
+
+from fastapi import APIRouter, Depends, HTTPException, WebSocket
+from jose import JOSEError
+from starlette.websockets import WebSocketDisconnect
+
+from api.auth.main import (get_current_active_user,
+                           get_username_from_access_token)
+from api.live import model
+from api.live.session import Connection, LiveSession, Player, live_sessions
+from core.config import get_config
+from core.serialization import dumps
+from database.repository import RepositoryFactory, get_repository
+from model import Quiz, User
+
+# websocket close codes
+CLOSE_UNAUTHORIZED = 4401
+CLOSE_FORBIDDEN = 4403
+CLOSE_NOT_FOUND = 4404
+CLOSE_CONFLICT = 4409
+
+live_router = APIRouter(prefix="/live", tags=["Live"])
+
+
+@live_router.post("/{quiz_id}", response_model=model.LiveSession)
+async def create_live_session(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Creates live session of a published quiz hosted by its owner.
+    :param quiz_id: quiz id
+    :param current_user: current user
+    :param repo: repository factory
+    :return: Live session code"""
+
+    quiz: Quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401, detail="Not allowed to host quiz")
+    if not quiz.is_published:
+        raise HTTPException(status_code=400, detail="Quiz must be published")
+
+    session = live_sessions.create(quiz, current_user.email, repo)
+    return model.LiveSession(
+        code=session.code, quiz_id=quiz_id, questions=len(quiz.questions)
+    )
+
+
+def token_user(repo: RepositoryFactory, token: str) -> Optional[str]:
+    """Gets active user of an access token, None if it is not valid."""
+
+    token_info = get_config().TOKEN_INFO
+    try:
+        username = get_username_from_access_token(
+            token, token_info.jwt_signature, token_info.jwt_algorithm
+        )
+    except (HTTPException, JOSEError):
+        return None
+    user = repo.user.get(username)
+    return username if user is not None and user.active else None
+
+
+async def open_session(
+    websocket: WebSocket, repo: RepositoryFactory, code: str, token: str
+) -> Optional[tuple]:
+    """Authenticates a websocket of a live session.
+    :return: session and user, None if the websocket was rejected"""
+
+    session = live_sessions.get(code)
+    if session is None or session.finished:
+        await websocket.close(CLOSE_NOT_FOUND)
+        return None
+    username = token_user(repo, token)
+    if username is None:
+        await websocket.close(CLOSE_UNAUTHORIZED)
+        return None
+    return session, username
+
+
+async def receive_message(websocket: WebSocket) -> Optional[dict]:
+    """Receives a JSON object message, None if the message is not one.
+    :raises WebSocketDisconnect: if the websocket is closed"""
+
+    try:
+        message = await websocket.receive_json()
+    except json.JSONDecodeError:
+        return None
+    except RuntimeError as exc:
+        # the session closed the websocket
+        raise WebSocketDisconnect() from exc
+    return message if isinstance(message, dict) else None
+
+
+def error_frame(message: str) -> bytes:
+    return dumps({"type": "error", "message": message})
+
+
+async def run_host(session: LiveSession, connection: Connection, repo):
+    while True:
+        message = await receive_message(connection.websocket)
+        session.host_seen()
+        action = message.get("action") if message else None
+        if action == "next":
+            if not session.next_question():
+                await session.finish(repo)
+        elif action == "reveal":
+            session.reveal()
+        elif action == "end":
+            await session.finish(repo)
+        else:
+            connection.push(error_frame("Unknown action"))
+        if session.finished:
+            live_sessions.remove(session.code)
+            return
+
+
+@live_router.websocket("/{code}/host")
+async def host_live_session(
+    websocket: WebSocket,
+    code: str,
+    token: str = "",
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Host websocket of a live session. The host sends actions
+    {"action": "next" | "reveal" | "end"} and receives all broadcasts.
+    :param websocket: websocket
+    :param code: session code
+    :param token: access token
+    :param repo: repository factory"""
+
+    opened = await open_session(websocket, repo, code, token)
+    if opened is None:
+        return
+    session, username = opened
+    if username != session.host:
+        await websocket.close(CLOSE_FORBIDDEN)
+        return
+
+    await websocket.accept()
+    previous, session.host_connection = session.host_connection, Connection(
+        websocket, session.queue_size
+    )
+    connection = session.host_connection
+    session.host_seen()
+    if previous is not None:
+        await previous.close(CLOSE_CONFLICT)
+    connection.start()
+    connection.push(dumps({"type": "hosting", "code": code}))
+    try:
+        await run_host(session, connection, repo)
+    except WebSocketDisconnect:
+        # the session keeps running, the host may reconnect
+        pass
+    finally:
+        if session.host_connection is connection:
+            session.host_connection = None
+        session.host_seen()
+        connection.stop()
+
+
+async def join_player(
+    websocket: WebSocket, session: LiveSession, username: str, nickname: str
+) -> Optional[Tuple[Player, Connection]]:
+    """Adds the user of a websocket to the players and sends the joined
+    frame (with the open question to late joiners).
+    :return: player and its connection, None if the websocket was rejected"""
+
+    connection = Connection(websocket, session.queue_size)
+    try:
+        player, previous = session.join(username, connection, nickname)
+    except ValueError:
+        await websocket.close(CLOSE_CONFLICT)
+        return None
+    await websocket.accept()
+    if previous is not None:
+        await previous.close(CLOSE_CONFLICT)
+    connection.start()
+    joined = {"type": "joined", "player": player.alias, "score": player.score}
+    if session.accepting:
+        joined["question"] = session.question_message()
+    connection.push(dumps(joined))
+    return player, connection
+
+
+async def run_player(session: LiveSession, player: Player, connection: Connection):
+    while True:
+        message = await receive_message(connection.websocket)
+        if message is None:
+            connection.push(error_frame("Answer must be a JSON object"))
+            continue
+        reply = session.answer(
+            player, message.get("question"), message.get("answers") or []
+        )
+        connection.push(dumps(reply))
+
+
+@live_router.websocket("/{code}/play")
+async def play_live_session(
+    websocket: WebSocket,
+    code: str,
+    token: str = "",
+    nickname: str = "",
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Player websocket of a live session. The player sends answers
+    {"question": question id, "answers": [answer ids]} and receives all
+    broadcasts plus its own replies and scores.
+    :param websocket: websocket
+    :param code: session code
+    :param token: access token
+    :param nickname: name shown to other players, unique in the session
+    :param repo: repository factory"""
+
+    opened = await open_session(websocket, repo, code, token)
+    if opened is None:
+        return
+    session, username = opened
+    if username == session.host:
+        await websocket.close(CLOSE_FORBIDDEN)
+        return
+
+    joined = await join_player(websocket, session, username, nickname)
+    if joined is None:
+        return
+    player, connection = joined
+    try:
+        await run_player(session, player, connection)
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.leave(player, connection)
+        connection.stop()
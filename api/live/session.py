@@ -0,0 +1,511 @@
+"""Live quiz session module. A host drives a published quiz question by
+question while players connected over websockets answer in real time.
+Every broadcast is encoded once and the same bytes are queued for all
+connections; each connection has a bounded queue drained by its own
+writer task, so a slow player never blocks the others: when its queue is
+full the oldest frame is dropped. Answers are scored in memory with the
+quiz scoring rules, a leaderboard is published at most once per
+LIVE_LEADERBOARD_MS and only when it changed, and results are stored
+with a single bulk insert when the session ends. Players appear in
+frames under the nickname chosen when joining (or a "Player N" alias),
+never under their email. A session whose host is absent or idle for
+LIVE_IDLE_SECONDS ends. Sessions live in the worker that created
+them."""
+
+import asyncio
+import logging
+import secrets
+import time
+from datetime import datetime
+from functools import partial
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from api.quiz import model
+from api.quiz.leaderboard import leaderboard_hub
+from api.quiz.main import get_total, is_single, score_multi, score_single
+from api.quiz.stats import record_journaled
+from core.config import get_config
+from core.leaderboard import Leaderboard
+from core.metrics import REGISTRY
+from core.serialization import document_to_dict, dumps
+from database.repository import RepositoryFactory
+from model import Question, Quiz, QuizSolution
+
+CODE_BYTES = 4
+CLOSE_TIMEOUT = 1.0
+MAX_NICKNAME = 32
+
+LIVE_PLAYERS = REGISTRY.gauge("live_players", "Players connected to live quizzes.")
+LIVE_FRAMES_DROPPED = REGISTRY.counter(
+    "live_frames_dropped_total", "Live quiz frames dropped for slow players."
+)
+
+
+class Connection:
+    """Outgoing frames of a websocket, sent by a writer task from a
+    bounded queue."""
+
+    def __init__(self, websocket, size: int):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(size)
+        self.dropped = 0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._write())
+
+    def push(self, frame: Optional[bytes]):
+        """Queues a frame, dropping the oldest one of a slow consumer
+        (None stops the writer)."""
+
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+            LIVE_FRAMES_DROPPED.inc()
+        self.queue.put_nowait(frame)
+
+    async def close(self, code: int = 1000):
+        """Sends queued frames and closes the websocket."""
+
+        self.push(None)
+        if self._task is not None:
+            try:
+                await asyncio.wait_for(self._task, CLOSE_TIMEOUT)
+            except asyncio.TimeoutError:
+                pass
+        try:
+            await self.websocket.close(code)
+        except RuntimeError:
+            pass
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+
+    async def _write(self):
+        try:
+            while True:
+                frame = await self.queue.get()
+                if frame is None:
+                    return
+                await self.websocket.send_bytes(frame)
+        except Exception:  # pylint: disable=W0703
+            # the reader of the connection handles the disconnect
+            return
+
+
+class Player:
+    """Live quiz player: connection, answers and score. The name (user
+    email) is kept for storing results, frames show the alias."""
+
+    def __init__(self, name: str, alias: str, connection: Connection):
+        self.name = name
+        self.alias = alias
+        self.connection: Optional[Connection] = connection
+        self.score = 0.0
+        self.elapsed = 0.0
+        self.answers: Dict[int, List[int]] = {}
+        self.points: Dict[int, float] = {}
+
+
+def score_answer(question: Question, chosen: List[int]) -> float:
+    """Scores chosen answers of a question like a submitted quiz."""
+
+    answers = sorted(question.answers, key=lambda answer: answer.identifier)
+    correct = [answer.is_correct for answer in answers]
+    submitted = [answer.identifier in chosen for answer in answers]
+    if is_single(question):
+        return score_single(correct, submitted)
+    return score_multi(correct, submitted)
+
+
+def stored_documents(repo: RepositoryFactory, documents: List[dict]) -> List[dict]:
+    """Gets solution documents found in the database by their ids."""
+
+    keys = [doc["_id"] for doc in documents]
+    stored = {
+        doc["_id"]
+        for doc in repo.quiz_solution.filter(
+            pk__in=keys, only=["identifier"], as_dict=True, limit=len(keys)
+        )
+    }
+    return [doc for doc in documents if doc["_id"] in stored]
+
+
+class LiveSession:
+    """Live quiz session of a host and its players."""
+
+    def __init__(self, code: str, quiz: Quiz, host: str):
+        settings = get_config().LIVE_INFO
+        self.code = code
+        self.quiz = quiz
+        self.host = host
+        self.queue_size = settings.live_player_queue
+        self.interval = settings.live_leaderboard_ms / 1000
+        self.leaderboard_size = settings.live_leaderboard_size
+        self.max_players = settings.live_max_players
+        self.idle_seconds = settings.live_idle_seconds
+        self.players: Dict[str, Player] = {}
+        self.aliases: Set[str] = set()
+        self.host_connection: Optional[Connection] = None
+        self.leaderboard = Leaderboard()
+        self.index = -1
+        self.accepting = False
+        self.answered = 0
+        self.finished = False
+        self._asked_at = 0.0
+        self._published = -1
+        self._host_seen = time.monotonic()
+        self._ticker: Optional[asyncio.Task] = None
+
+    @property
+    def question(self) -> Optional[Question]:
+        if 0 <= self.index < len(self.quiz.questions):
+            return self.quiz.questions[self.index]
+        return None
+
+    def connected(self) -> int:
+        return sum(player.connection is not None for player in self.players.values())
+
+    # broadcasting
+    ###############################################
+
+    def broadcast(self, message: dict) -> bytes:
+        """Sends a message to the host and all players, encoded once."""
+
+        frame = dumps(message)
+        if self.host_connection is not None:
+            self.host_connection.push(frame)
+        for player in self.players.values():
+            if player.connection is not None:
+                player.connection.push(frame)
+        return frame
+
+    def question_message(self) -> dict:
+        question = self.question
+        return {
+            "type": "question",
+            "index": self.index,
+            "count": len(self.quiz.questions),
+            "single": is_single(question),
+            "question": document_to_dict(question, model.TakerQuestion),
+        }
+
+    def publish(self) -> bool:
+        """Broadcasts the leaderboard if it changed since the last one."""
+
+        version = self.leaderboard.version
+        if version == self._published:
+            return False
+        self._published = version
+        self.broadcast(
+            {
+                "type": "leaderboard",
+                "players": len(self.players),
+                "answered": self.answered,
+                "top": self.leaderboard.top(self.leaderboard_size),
+            }
+        )
+        return True
+
+    async def _publish_loop(self, on_idle: Callable[[], Awaitable]):
+        while not self.finished:
+            await asyncio.sleep(self.interval)
+            if self.host_idle():
+                await on_idle()
+                return
+            self.publish()
+
+    def start(self, on_idle: Callable[[], Awaitable]):
+        """Starts publishing the leaderboard on the running event loop.
+        :param on_idle: called once the host is absent or idle for
+        LIVE_IDLE_SECONDS"""
+
+        self._ticker = asyncio.get_running_loop().create_task(
+            self._publish_loop(on_idle)
+        )
+
+    # host
+    ###############################################
+
+    def host_seen(self):
+        """Records host activity (connecting, an action, disconnecting)."""
+
+        self._host_seen = time.monotonic()
+
+    def host_idle(self) -> bool:
+        """Checks whether the host is absent or idle for LIVE_IDLE_SECONDS
+        (0 never ends a session)."""
+
+        idle = time.monotonic() - self._host_seen
+        return 0 < self.idle_seconds < idle
+
+    # players
+    ###############################################
+
+    def join(
+        self, name: str, connection: Connection, nickname: str = ""
+    ) -> Tuple[Player, Optional[Connection]]:
+        """Adds a player, a player joining again keeps the score and alias.
+        :param name: user joining
+        :param connection: connection of the player
+        :param nickname: alias shown to others, defaults to "Player N"
+        :return: player and its previous connection
+        :raises ValueError: if the session is full or the nickname taken"""
+
+        player = self.players.get(name)
+        if player is None:
+            if len(self.players) >= self.max_players:
+                raise ValueError("Live quiz is full")
+            alias = self.alias(nickname)
+            player = self.players[name] = Player(name, alias, connection)
+            self.aliases.add(alias)
+            self.leaderboard.update(alias, 0.0)
+            return player, None
+        previous, player.connection = player.connection, connection
+        return player, previous
+
+    def alias(self, nickname: str) -> str:
+        """Gets alias of a new player.
+        :raises ValueError: if another player has the nickname"""
+
+        nickname = " ".join(nickname.split())[:MAX_NICKNAME]
+        if nickname:
+            if nickname in self.aliases:
+                raise ValueError("Nickname is taken")
+            return nickname
+        number = len(self.players) + 1
+        while f"Player {number}" in self.aliases:
+            number += 1
+        return f"Player {number}"
+
+    def leave(self, player: Player, connection: Connection):
+        if player.connection is connection:
+            player.connection = None
+
+    def answer(self, player: Player, question_id, chosen) -> dict:
+        """Scores answer of a player to the open question.
+        :param player: player
+        :param question_id: question id
+        :param chosen: chosen answer ids
+        :return: reply to the player"""
+
+        question = self.question
+        if not self.accepting or question.identifier != question_id:
+            return {"type": "error", "message": "Question is not open"}
+        if question_id in player.answers:
+            return {"type": "error", "message": "Question already answered"}
+        try:
+            chosen = sorted({int(answer_id) for answer_id in chosen})
+            points = score_answer(question, chosen)
+        except (TypeError, ValueError):
+            return {"type": "error", "message": "Answers must be answer ids"}
+        except HTTPException as exc:
+            return {"type": "error", "message": exc.detail}
+
+        player.answers[question_id] = chosen
+        player.points[question_id] = points
+        player.score += points
+        player.elapsed += time.monotonic() - self._asked_at
+        self.leaderboard.update(player.alias, player.score, round(player.elapsed, 3))
+        self.answered += 1
+        return {"type": "answered", "question": question_id}
+
+    # host actions
+    ###############################################
+
+    def next_question(self) -> bool:
+        """Closes the open question and asks the next one.
+        :return: False if there are no more questions"""
+
+        self.reveal()
+        if self.index + 1 >= len(self.quiz.questions):
+            return False
+        self.index += 1
+        self.accepting = True
+        self.answered = 0
+        self._asked_at = time.monotonic()
+        self.broadcast(self.question_message())
+        return True
+
+    def reveal(self):
+        """Closes the open question: broadcasts its correct answers and
+        sends every player its points and rank."""
+
+        if not self.accepting:
+            return
+        self.accepting = False
+        question = self.question
+        self.broadcast(
+            {
+                "type": "reveal",
+                "question": question.identifier,
+                "correct": [
+                    answer.identifier
+                    for answer in question.answers
+                    if answer.is_correct
+                ],
+                "answered": self.answered,
+                "top": self.leaderboard.top(self.leaderboard_size),
+            }
+        )
+        for player in self.players.values():
+            if player.connection is None:
+                continue
+            player.connection.push(
+                dumps(
+                    {
+                        "type": "score",
+                        "question": question.identifier,
+                        "points": player.points.get(question.identifier, 0.0),
+                        "score": player.score,
+                        "rank": self.leaderboard.rank(player.alias),
+                    }
+                )
+            )
+
+    async def finish(self, repo: RepositoryFactory) -> int:
+        """Ends the session: stores results, broadcasts the final
+        leaderboard and closes all connections.
+        :return: number of stored solutions"""
+
+        if self.finished:
+            return 0
+        self.reveal()
+        self.finished = True
+        if self._ticker is not None and self._ticker is not asyncio.current_task():
+            self._ticker.cancel()
+        try:
+            stored = await run_in_threadpool(self.store_results, repo)
+        except Exception:  # pylint: disable=W0703
+            logging.exception("Storing live quiz %s results failed", self.code)
+            stored = 0
+        self.broadcast(
+            {
+                "type": "end",
+                "players": len(self.players),
+                "stored": stored,
+                "top": self.leaderboard.top(self.leaderboard_size),
+            }
+        )
+        connections = [self.host_connection] + [
+            player.connection for player in self.players.values()
+        ]
+        await asyncio.gather(
+            *(connection.close() for connection in connections if connection)
+        )
+        return stored
+
+    def solution(self, player: Player, submitted_at: datetime) -> QuizSolution:
+        questions = [
+            {
+                "identifier": question.identifier,
+                "title": question.title,
+                "answers": [
+                    {
+                        "identifier": answer.identifier,
+                        "is_correct": answer.identifier
+                        in player.answers.get(question.identifier, ()),
+                    }
+                    for answer in question.answers
+                ],
+            }
+            for question in self.quiz.questions
+        ]
+        return QuizSolution(
+            quiz=self.quiz.identifier,
+            owner=player.name,
+            title=self.quiz.title,
+            description=self.quiz.description,
+            questions=questions,
+            total_points=get_total(self.quiz.questions),
+            scored_points=player.score,
+            submitted_at=submitted_at,
+        )
+
+    def store_results(self, repo: RepositoryFactory) -> int:
+        """Stores solutions of all players with one bulk insert, except
+        players who already solved the quiz.
+        :return: number of stored solutions"""
+
+        names = list(self.players)
+        if not names:
+            return 0
+        solved = {
+            doc["owner"]
+            for doc in repo.quiz_solution.filter(
+                owner__in=names,
+                quiz=self.quiz.identifier,
+                only=["owner"],
+                as_dict=True,
+                limit=len(names),
+            )
+        }
+        players = [
+            player for name, player in self.players.items() if name not in solved
+        ]
+        if not players:
+            return 0
+
+        submitted_at = datetime.utcnow()
+        documents = []
+        for player, identifier in zip(
+            players, repo.quiz_solution.reserve_ids(len(players))
+        ):
+            solution = self.solution(player, submitted_at)
+            solution.identifier = identifier
+            solution.validate()
+            documents.append(solution.to_mongo().to_dict())
+        if repo.quiz_solution.bulk_insert(documents) < len(documents):
+            # players who submitted since the solved query are skipped
+            documents = stored_documents(repo, documents)
+        record_journaled(repo, documents)
+        for doc in documents:
+            leaderboard_hub.record(
+                doc["quiz"], doc["owner"], doc["scored_points"], doc["submitted_at"]
+            )
+        return len(documents)
+
+
+class LiveSessions:
+    """Live sessions of the worker by join code."""
+
+    def __init__(self):
+        self._sessions: Dict[str, LiveSession] = {}
+
+    def create(self, quiz: Quiz, host: str, repo: RepositoryFactory) -> LiveSession:
+        """Creates and starts a session (on the running event loop).
+        :param quiz: published quiz
+        :param host: quiz owner
+        :param repo: repository factory results of an idle session are
+        stored to"""
+
+        code = secrets.token_hex(CODE_BYTES).upper()
+        while code in self._sessions:
+            code = secrets.token_hex(CODE_BYTES).upper()
+        session = self._sessions[code] = LiveSession(code, quiz, host)
+        session.start(partial(self.end_idle, session, repo))
+        LIVE_PLAYERS.set_function(self.connected)
+        return session
+
+    def get(self, code: str) -> Optional[LiveSession]:
+        return self._sessions.get(code)
+
+    def remove(self, code: str):
+        self._sessions.pop(code, None)
+
+    async def end_idle(self, session: LiveSession, repo: RepositoryFactory):
+        """Ends a session whose host is absent or idle."""
+
+        logging.info("Ending live quiz %s, its host is idle", session.code)
+        await session.finish(repo)
+        self.remove(session.code)
+
+    def connected(self) -> int:
+        return sum(session.connected() for session in list(self._sessions.values()))
+
+
+live_sessions = LiveSessions()
@@ -0,0 +1,16 @@
+"""Metrics routing: Prometheus scrape endpoint."""
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from core.metrics import CONTENT_TYPE, REGISTRY
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Metrics endpoint (Prometheus text format).
+    :return: metrics of this worker process"""
+
+    return PlainTextResponse(REGISTRY.render(), media_type=CONTENT_TYPE)
@@ -0,0 +1,39 @@
+# pylint: disable=no-name-in-module
+# pylint: disable=no-self-argument
+# pylint: disable=R0903
+
+"""Api models shared by api modules."""
+
+from typing import List
+
+from pydantic.main import BaseModel
+
+
+class RowError(BaseModel):
+    """Error of a single input row of a bulk operation."""
+
+    row: int
+    message: str
+
+
+class BulkReport(BaseModel):
+    """Bulk operation report with throughput statistics."""
+
+    read: int = 0
+    rejected: int = 0
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+    errors: List[RowError] = []
+
+    def add_error(self, row: int, message: str, max_errors: int = 1000):
+        """Records rejected row, keeping at most max_errors messages."""
+
+        self.rejected += 1
+        if len(self.errors) < max_errors:
+            self.errors.append(RowError(row=row, message=message))
+
+    def finish(self, elapsed_seconds: float):
+        """Records elapsed time and computes throughput."""
+
+        self.elapsed_seconds = round(elapsed_seconds, 3)
+        self.rows_per_second = round(self.read / max(elapsed_seconds, 1e-9), 1)
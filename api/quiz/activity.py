@@ -0,0 +1,224 @@
+"""Submission activity module. Every submitted solution is counted into
+minute, hour and day buckets of its quiz and of all quizzes (quiz 0) with
+one bulk upsert, so activity charts read a bounded number of rollup
+documents and never scan solutions. Compaction folds minute buckets past
+their retention into hour buckets, and hour buckets into day buckets,
+and removes them."""
+
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from api.quiz import model
+from core.config import get_config
+from database.repository import RepositoryFactory
+
+GLOBAL_QUIZ = 0
+STEPS = {
+    model.Resolution.minute: timedelta(minutes=1),
+    model.Resolution.hour: timedelta(hours=1),
+    model.Resolution.day: timedelta(days=1),
+}
+COARSER = {
+    model.Resolution.minute: model.Resolution.hour,
+    model.Resolution.hour: model.Resolution.day,
+}
+DEFAULT_BUCKETS = 60
+
+
+def to_utc(timestamp: datetime) -> datetime:
+    """Converts a timestamp with a UTC offset into naive UTC, as stored;
+    naive timestamps are UTC already."""
+
+    if timestamp.tzinfo is None:
+        return timestamp
+    return timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def bucket_start(timestamp: datetime, resolution: model.Resolution) -> datetime:
+    """Gets start of the bucket holding a timestamp."""
+
+    timestamp = timestamp.replace(second=0, microsecond=0)
+    if resolution == model.Resolution.minute:
+        return timestamp
+    timestamp = timestamp.replace(minute=0)
+    if resolution == model.Resolution.hour:
+        return timestamp
+    return timestamp.replace(hour=0)
+
+
+def rollup_update(
+    quiz_id: int,
+    resolution: model.Resolution,
+    start: datetime,
+    count: int = 1,
+    operator: str = "inc",
+) -> Tuple[str, Dict]:
+    """Builds rollup bucket upsert.
+    :param quiz_id: quiz id, GLOBAL_QUIZ for all quizzes
+    :param resolution: bucket resolution
+    :param start: bucket start
+    :param count: submission count
+    :param operator: count update operator (inc or max)
+    :return: bucket key and update operations"""
+
+    key = f"{quiz_id}:{resolution.value}:{start.isoformat()}"
+    return key, {
+        "set__quiz": quiz_id,
+        "set__resolution": resolution.value,
+        "set__start": start,
+        f"{operator}__count": count,
+    }
+
+
+def record_submission(repo: RepositoryFactory, quiz_id: int, submitted_at: datetime):
+    """Counts a submitted solution into the rollup buckets of its quiz
+    and of all quizzes.
+    :param repo: repository factory
+    :param quiz_id: quiz id
+    :param submitted_at: submission time (UTC)"""
+
+    record_submissions(repo, [(quiz_id, submitted_at)])
+
+
+def record_submissions(
+    repo: RepositoryFactory, submissions: Iterable[Tuple[int, datetime]]
+):
+    """Counts many submitted solutions into the rollup buckets, with one
+    upsert per bucket.
+    :param repo: repository factory
+    :param submissions: (quiz id, submission time) pairs"""
+
+    counts: Dict[Tuple, int] = defaultdict(int)
+    for quiz_id, submitted_at in submissions:
+        for resolution in STEPS:
+            start = bucket_start(submitted_at, resolution)
+            counts[(quiz_id, resolution, start)] += 1
+            counts[(GLOBAL_QUIZ, resolution, start)] += 1
+    updates = [rollup_update(*bucket, count) for bucket, count in counts.items()]
+    if updates:
+        repo.activity_rollup.bulk_update(updates, upsert=True)
+
+
+def activity_series(
+    repo: RepositoryFactory,
+    quiz_id: int,
+    resolution: model.Resolution,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+) -> model.ActivitySeries:
+    """Reads submission counts of a time range from the rollup buckets;
+    buckets without submissions (or past their retention) count 0.
+    :param repo: repository factory
+    :param quiz_id: quiz id, GLOBAL_QUIZ for all quizzes
+    :param resolution: bucket resolution
+    :param start: range start (naive UTC or with an offset), defaults to
+    DEFAULT_BUCKETS buckets before the end
+    :param end: range end (naive UTC or with an offset, exclusive,
+    rounded up to a bucket), defaults to the end of the current bucket
+    :return: submission counts by bucket"""
+
+    step = STEPS[resolution]
+    if end is None:
+        end = bucket_start(datetime.utcnow(), resolution) + step
+    end = to_utc(end)
+    if bucket_start(end, resolution) != end:
+        end = bucket_start(end, resolution) + step
+    start = (
+        bucket_start(to_utc(start), resolution)
+        if start
+        else end - DEFAULT_BUCKETS * step
+    )
+    buckets = (end - start) // step
+    max_buckets = get_config().ACTIVITY_INFO.activity_max_buckets
+    if buckets <= 0 or buckets > max_buckets:
+        raise ValueError(f"Range must span 1 to {max_buckets} buckets")
+
+    rows = repo.activity_rollup.filter(
+        quiz=quiz_id,
+        resolution=resolution.value,
+        start__gte=start,
+        start__lt=end,
+        limit=buckets,
+        only=["start", "count"],
+        as_dict=True,
+    )
+    counts = {row["start"]: row["count"] for row in rows}
+    series = [
+        model.ActivityBucket(start=bucket, count=counts.get(bucket, 0))
+        for bucket in (start + index * step for index in range(buckets))
+    ]
+    return model.ActivitySeries(
+        quiz_id=quiz_id,
+        resolution=resolution,
+        start=start,
+        end=end,
+        total=sum(bucket.count for bucket in series),
+        buckets=series,
+    )
+
+
+def compact_resolution(
+    repo: RepositoryFactory,
+    resolution: model.Resolution,
+    cutoff: datetime,
+    batch_size: int,
+) -> int:
+    """Folds buckets starting before the cutoff into the coarser buckets
+    and removes them. Coarser buckets are maintained on submission too,
+    so folding takes the larger count and only fills in missing ones."""
+
+    coarser = COARSER[resolution]
+    cutoff = bucket_start(cutoff, coarser)
+    totals: Dict[Tuple[int, datetime], int] = defaultdict(int)
+    batches = repo.activity_rollup.stream(
+        batch_size,
+        resolution=resolution.value,
+        start__lt=cutoff,
+        only=["quiz", "start", "count"],
+    )
+    for batch in batches:
+        for row in batch:
+            totals[(row["quiz"], bucket_start(row["start"], coarser))] += row["count"]
+
+    updates: List[Tuple[str, Dict]] = [
+        rollup_update(quiz_id, coarser, start, count, "max")
+        for (quiz_id, start), count in totals.items()
+    ]
+    for index in range(0, len(updates), batch_size):
+        end = index + batch_size
+        repo.activity_rollup.bulk_update(updates[index:end], upsert=True)
+    return repo.activity_rollup.delete_many(
+        resolution=resolution.value, start__lt=cutoff
+    )
+
+
+def compact_activity(
+    repo: RepositoryFactory, now: Optional[datetime] = None, batch_size: int = 1000
+) -> model.ActivityCompactionReport:
+    """Applies the retention policy: minute buckets older than
+    ACTIVITY_MINUTE_RETENTION_HOURS are compacted into hour buckets, hour
+    buckets older than ACTIVITY_HOUR_RETENTION_DAYS into day buckets
+    (0 keeps them). Day buckets are kept.
+    :param repo: repository factory
+    :param now: current time (UTC)
+    :param batch_size: number of buckets per batch
+    :return: compaction report"""
+
+    started = time.perf_counter()
+    settings = get_config().ACTIVITY_INFO
+    now = now or datetime.utcnow()
+    report = model.ActivityCompactionReport()
+    if settings.activity_minute_retention_hours > 0:
+        cutoff = now - timedelta(hours=settings.activity_minute_retention_hours)
+        report.minute_buckets = compact_resolution(
+            repo, model.Resolution.minute, cutoff, batch_size
+        )
+    if settings.activity_hour_retention_days > 0:
+        cutoff = now - timedelta(days=settings.activity_hour_retention_days)
+        report.hour_buckets = compact_resolution(
+            repo, model.Resolution.hour, cutoff, batch_size
+        )
+    report.duration_seconds = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,234 @@
+"""Quiz item analysis module: difficulty (proportion of solutions
+answering a question correctly), discrimination (corrected point-biserial
+correlation between answering a question correctly and the score of the
+other questions) and answer option counts per question.
+
+Solutions are streamed in batches; each batch becomes a response matrix
+(solutions x answer options) and only running sums of the derived
+vectors are kept, so memory use does not depend on the number of
+solutions. Results are cached until the solution count of the quiz
+(from its running statistics) changes."""
+
+import math
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from api.quiz import model
+from core.cache import LRUCache
+from core.config import get_config
+from database.repository import RepositoryFactory
+from model import Quiz
+
+analysis_cache = LRUCache(get_config().CACHE_INFO.analysis_cache_size)
+
+
+def by_identifier(item) -> int:
+    return (item.get("identifier") if isinstance(item, dict) else item.identifier) or 0
+
+
+def safe_divide(numerator, denominator) -> np.ndarray:
+    """Element-wise division, 0 where the denominator is 0."""
+
+    numerator, denominator = np.broadcast_arrays(numerator, denominator)
+    result = np.zeros(numerator.shape, dtype=np.float64)
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
+
+
+def correlation(
+    count: int, sum_x, sum_y, sum_xx, sum_yy, sum_xy
+) -> List[Optional[float]]:
+    """Pearson correlation of paired samples from their sums (None where
+    a variable is constant)."""
+
+    covariance = count * sum_xy - sum_x * sum_y
+    variance = (count * sum_xx - sum_x**2) * (count * sum_yy - sum_y**2)
+    return [
+        float(cov / math.sqrt(var)) if var > 1e-12 else None
+        for cov, var in zip(covariance, variance)
+    ]
+
+
+class ItemAnalyzer:
+    """Accumulates item statistics of a quiz from solution batches.
+    Questions are matched by identifier, answers by position in
+    identifier order (as in scoring)."""
+
+    def __init__(self, quiz: Quiz):
+        """Constructor
+        :param quiz: analyzed quiz"""
+
+        self.questions = sorted(quiz.questions, key=by_identifier)
+        self.answers = [sorted(q.answers, key=by_identifier) for q in self.questions]
+        self.index = {q.identifier: i for i, q in enumerate(self.questions)}
+        sizes = [len(answers) for answers in self.answers]
+        self.sizes = np.array(sizes, dtype=np.int64)
+        self.offsets = np.concatenate(([0], np.cumsum(sizes)[:-1])).astype(np.int64)
+
+        options, questions = int(self.sizes.sum()), len(self.questions)
+        # answer option -> question membership (options x questions)
+        self.membership = np.zeros((options, questions))
+        self.membership[np.arange(options), np.repeat(np.arange(questions), sizes)] = 1
+        self.key = np.array(
+            [answer.is_correct for answers in self.answers for answer in answers],
+            dtype=np.float64,
+        )
+        self.key_counts = self.key @ self.membership
+
+        self.count = 0
+        self.sums: Dict[str, np.ndarray] = {
+            name: np.zeros(questions)
+            for name in ("x", "s", "ss", "xt", "st", "xs", "answered")
+        }
+        self.sums["t"], self.sums["tt"] = 0.0, 0.0
+        self.option_counts = np.zeros(options)
+
+    def response_matrix(self, solutions: List[dict]):
+        """Builds response matrix (chosen answer options) and answered
+        matrix (questions present) of raw solutions."""
+
+        chosen = np.zeros((len(solutions), len(self.key)))
+        answered = np.zeros((len(solutions), len(self.questions)))
+        rows, columns, answered_rows, answered_columns = [], [], [], []
+        for row, solution in enumerate(solutions):
+            for question in solution.get("questions", []):
+                index = self.index.get(question.get("identifier"))
+                if index is None:
+                    continue
+                answered_rows.append(row)
+                answered_columns.append(index)
+                answers = sorted(question.get("answers", []), key=by_identifier)
+                offset = self.offsets[index]
+                for position, answer in enumerate(answers[: self.sizes[index]]):
+                    if answer.get("is_correct"):
+                        rows.append(row)
+                        columns.append(offset + position)
+        chosen[rows, columns] = 1
+        answered[answered_rows, answered_columns] = 1
+        return chosen, answered
+
+    def item_scores(self, chosen: np.ndarray):
+        """Scores questions of all solutions at once, as scoring does.
+        :param chosen: response matrix
+        :return: correctly answered (0/1) and score matrices
+        (solutions x questions)"""
+
+        chosen_counts = chosen @ self.membership
+        correct_counts = (chosen * self.key) @ self.membership
+        key_counts, sizes = self.key_counts, self.sizes
+        correct = (correct_counts == key_counts) & (chosen_counts == correct_counts)
+
+        single = np.where(correct_counts == 1, 1.0, -1.0)
+        # multi answer: chosen correct answers earn 1 / chosen, missed ones
+        # lose 1 / not chosen
+        multi = safe_divide(correct_counts, chosen_counts) - safe_divide(
+            key_counts - correct_counts, sizes - chosen_counts
+        )
+        scores = np.where(key_counts == 1, single, multi)
+        scores[chosen_counts == 0] = 0.0
+        return correct.astype(np.float64), scores
+
+    def add(self, solutions: List[dict]):
+        """Adds a batch of raw solutions."""
+
+        if not solutions:
+            return
+        chosen, answered = self.response_matrix(solutions)
+        correct, scores = self.item_scores(chosen)
+        totals = scores.sum(axis=1)
+
+        sums = self.sums
+        self.count += len(solutions)
+        sums["x"] += correct.sum(axis=0)
+        sums["s"] += scores.sum(axis=0)
+        sums["ss"] += (scores**2).sum(axis=0)
+        sums["xt"] += correct.T @ totals
+        sums["st"] += scores.T @ totals
+        sums["xs"] += (correct * scores).sum(axis=0)
+        sums["answered"] += answered.sum(axis=0)
+        sums["t"] += totals.sum()
+        sums["tt"] += (totals**2).sum()
+        self.option_counts += chosen.sum(axis=0)
+
+    def result(self, quiz_id: int) -> model.QuizAnalysis:
+        """Gets item analysis of the added solutions."""
+
+        count, sums = self.count, self.sums
+        # rest score: total score without the question itself
+        sum_rest = sums["t"] - sums["s"]
+        sum_rest_sq = sums["tt"] - 2 * sums["st"] + sums["ss"]
+        sum_correct_rest = sums["xt"] - sums["xs"]
+        discrimination = correlation(
+            count, sums["x"], sum_rest, sums["x"], sum_rest_sq, sum_correct_rest
+        )
+
+        items = []
+        for index, question in enumerate(self.questions):
+            offset = int(self.offsets[index])
+            options = [
+                model.OptionStats(
+                    identifier=answer.identifier,
+                    answer_text=answer.answer_text,
+                    is_correct=bool(answer.is_correct),
+                    chosen=int(self.option_counts[offset + position]),
+                    chosen_ratio=(
+                        float(self.option_counts[offset + position] / count)
+                        if count
+                        else None
+                    ),
+                )
+                for position, answer in enumerate(self.answers[index])
+            ]
+            items.append(
+                model.ItemAnalysis(
+                    identifier=question.identifier,
+                    title=question.title,
+                    responses=int(sums["answered"][index]),
+                    difficulty=float(sums["x"][index] / count) if count else None,
+                    discrimination=discrimination[index] if count else None,
+                    mean_score=float(sums["s"][index] / count) if count else None,
+                    options=options,
+                )
+            )
+        return model.QuizAnalysis(quiz_id=quiz_id, solutions=count, questions=items)
+
+
+def analyze_quiz(
+    quiz: Quiz, repo: RepositoryFactory, batch_size: int = 1000
+) -> model.QuizAnalysis:
+    """Computes item analysis of a quiz from all its solutions.
+    :param quiz: quiz document
+    :param repo: repository factory
+    :param batch_size: number of solutions per batch
+    :return: quiz item analysis"""
+
+    analyzer = ItemAnalyzer(quiz)
+    batches = repo.quiz_solution.stream(
+        batch_size, quiz=quiz.identifier, only=["questions"]
+    )
+    for batch in batches:
+        analyzer.add(batch)
+    return analyzer.result(quiz.identifier)
+
+
+def get_quiz_analysis(
+    quiz: Quiz, repo: RepositoryFactory, batch_size: int = 1000
+) -> model.QuizAnalysis:
+    """Gets item analysis of a quiz, cached until its solution count
+    changes.
+    :param quiz: quiz document
+    :param repo: repository factory
+    :param batch_size: number of solutions per batch
+    :return: quiz item analysis"""
+
+    stats = repo.quiz_stats.get(quiz.identifier)
+    solution_count = stats.count if stats is not None else 0
+    key = (quiz.identifier, quiz.revision)
+    cached = analysis_cache.get(key)
+    if cached is not None and cached[0] == solution_count:
+        return cached[1]
+
+    analysis = analyze_quiz(quiz, repo, batch_size)
+    analysis_cache.put(key, (solution_count, analysis))
+    return analysis
@@ -0,0 +1,286 @@
+"""Timed quiz attempt module. Starting a timed quiz opens an attempt
+with a deadline (start + quiz time limit); draft answers are saved on
+the attempt and submissions are accepted until the deadline plus
+ATTEMPT_GRACE_SECONDS. Open attempts are kept in a hierarchical timing
+wheel of the worker that started them (and of every worker started
+later), which fires them at the deadline without polling the database:
+the saved draft is auto-submitted, questions without a draft answer
+score 0. Expiring claims the attempt by deleting it, so an attempt is
+submitted once even when several workers track it."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from api.quiz import model
+from api.quiz.main import validate
+from api.quiz.submission import is_taken, store_solution
+from core.config import get_config
+from core.metrics import REGISTRY
+from core.timingwheel import TimingWheel
+from database.repository import RepositoryFactory
+from model import AnswerSubmit, QuestionSubmit, Quiz, QuizAttempt
+
+EXPIRE_BATCH = 500
+
+OPEN_ATTEMPTS = REGISTRY.gauge(
+    "quiz_attempts_open", "Open timed quiz attempts tracked by the worker."
+)
+EXPIRED_ATTEMPTS = REGISTRY.counter(
+    "quiz_attempts_expired_total", "Timed quiz attempts past deadline.", ("outcome",)
+)
+
+
+def attempt_key(quiz_id: int, owner: str) -> str:
+    return f"{quiz_id}:{owner}"
+
+
+def timestamp(value: datetime) -> float:
+    """Converts naive UTC datetime to unix time."""
+
+    return value.replace(tzinfo=timezone.utc).timestamp()
+
+
+def draft_questions(answers: model.AttemptAnswers) -> List[QuestionSubmit]:
+    return [
+        QuestionSubmit(
+            identifier=question.identifier,
+            title=question.title,
+            answers=[AnswerSubmit(**answer.dict()) for answer in question.answers],
+        )
+        for question in answers.questions
+    ]
+
+
+def complete_submission(
+    quiz: Quiz, questions: List[model.QuestionSubmit]
+) -> model.QuizSubmit:
+    """Builds submission answering every question of a quiz, questions
+    missing in the answers are left unanswered.
+    :param quiz: quiz
+    :param questions: answered questions
+    :return: quiz submission"""
+
+    answered = {question.identifier: question for question in questions}
+    submitted = []
+    for question in quiz.questions:
+        answer = answered.get(question.identifier)
+        if answer is None:
+            answer = model.QuestionSubmit(
+                identifier=question.identifier,
+                answers=[
+                    model.AnswerSubmit(identifier=item.identifier, is_correct=False)
+                    for item in question.answers
+                ],
+            )
+        submitted.append(answer)
+    return model.QuizSubmit(identifier=quiz.identifier, questions=submitted)
+
+
+def attempt_view(attempt: QuizAttempt) -> model.QuizAttempt:
+    remaining = (attempt.deadline - datetime.utcnow()).total_seconds()
+    return model.QuizAttempt(
+        quiz_id=attempt.quiz,
+        started_at=attempt.started_at,
+        deadline=attempt.deadline,
+        remaining_seconds=round(max(remaining, 0.0), 3),
+        questions=[
+            model.QuestionSubmit.parse_obj(question.to_mongo().to_dict())
+            for question in attempt.questions
+        ],
+    )
+
+
+def is_open(attempt: QuizAttempt) -> bool:
+    """Checks whether answers of an attempt are still accepted."""
+
+    grace = timedelta(seconds=get_config().ATTEMPT_INFO.attempt_grace_seconds)
+    return datetime.utcnow() <= attempt.deadline + grace
+
+
+class AttemptScheduler:
+    """Timing wheel of open attempts auto-submitting them at their
+    deadline."""
+
+    def __init__(self, tick_ms: float = None, grace_seconds: float = None):
+        """Constructor
+        :param tick_ms: wheel resolution, defaults to ATTEMPT_TICK_MS setting
+        :param grace_seconds: time after the deadline answers are still
+        accepted, defaults to ATTEMPT_GRACE_SECONDS setting"""
+
+        settings = get_config().ATTEMPT_INFO
+        self.tick = (settings.attempt_tick_ms if tick_ms is None else tick_ms) / 1000
+        self.grace = (
+            settings.attempt_grace_seconds if grace_seconds is None else grace_seconds
+        )
+        self.wheel = TimingWheel(self.tick, start=time.time())
+        self._task: Optional[asyncio.Task] = None
+
+    def schedule(self, attempt: QuizAttempt):
+        self.wheel.schedule(attempt.key, timestamp(attempt.deadline) + self.grace)
+
+    def cancel(self, key: str):
+        self.wheel.cancel(key)
+
+    def load(self, repo: RepositoryFactory, batch_size: int = 1000) -> int:
+        """Schedules attempts stored in the database, i.e. attempts opened
+        before a restart or by other workers.
+        :return: number of scheduled attempts"""
+
+        loaded = 0
+        for batch in repo.quiz_attempt.stream(batch_size, only=["deadline"]):
+            for doc in batch:
+                deadline = timestamp(doc["deadline"]) + self.grace
+                self.wheel.schedule(doc["_id"], deadline)
+                loaded += 1
+        return loaded
+
+    def start(self, repo: RepositoryFactory):
+        """Loads open attempts and starts expiring them on the running
+        event loop."""
+
+        self.load(repo)
+        OPEN_ATTEMPTS.set_function(lambda: len(self.wheel))
+        self._task = asyncio.get_running_loop().create_task(self._run(repo))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self, repo: RepositoryFactory):
+        while True:
+            await asyncio.sleep(self.tick)
+            try:
+                await self.expire_due(repo)
+            except Exception:  # pylint: disable=W0703
+                logging.exception("Expiring quiz attempts failed")
+
+    async def expire_due(self, repo: RepositoryFactory, now: float = None) -> int:
+        """Expires attempts whose deadline (plus grace) passed, yielding
+        to other tasks between batches.
+        :param repo: repository factory
+        :param now: current time (unix time)
+        :return: number of auto-submitted attempts"""
+
+        keys = self.wheel.advance(time.time() if now is None else now)
+        submitted = 0
+        for index in range(0, len(keys), EXPIRE_BATCH):
+            end = index + EXPIRE_BATCH
+            batch = keys[index:end]
+            submitted += await self.expire(repo, batch, now)
+            await asyncio.sleep(0)
+        return submitted
+
+    async def expire(
+        self, repo: RepositoryFactory, keys: List[str], now: float = None
+    ) -> int:
+        """Auto-submits drafts of expired attempts and removes them; the
+        database work runs in the threadpool.
+        :return: number of auto-submitted attempts"""
+
+        now = time.time() if now is None else now
+        claimed, early = await run_in_threadpool(self.claim, repo, keys, now)
+        for attempt in early:
+            # deadline not reached yet (clocks of workers differ)
+            self.schedule(attempt)
+        outcomes = [await expire_attempt(repo, attempt) for attempt in claimed]
+        return outcomes.count("auto_submitted")
+
+    def claim(
+        self, repo: RepositoryFactory, keys: List[str], now: float
+    ) -> Tuple[List[QuizAttempt], List[QuizAttempt]]:
+        """Removes attempts past deadline (the attempt is submitted by
+        whoever removes it).
+        :return: removed attempts and attempts not past deadline yet"""
+
+        claimed, early = [], []
+        for attempt in repo.quiz_attempt.filter(pk__in=keys, limit=len(keys)):
+            if timestamp(attempt.deadline) + self.grace > now:
+                early.append(attempt)
+            elif repo.quiz_attempt.delete_many(pk=attempt.key):
+                claimed.append(attempt)
+        return claimed, early
+
+
+def draft_submission(
+    repo: RepositoryFactory, attempt: QuizAttempt
+) -> Optional[Tuple[Quiz, model.QuizSubmit, model.QuizValidationResult]]:
+    """Scores draft answers of an expired attempt.
+    :return: quiz, submission and its score, None if the quiz was deleted
+    or already solved"""
+
+    quiz = repo.quiz.get(attempt.quiz)
+    if quiz is None or is_taken(repo, attempt.owner, attempt.quiz):
+        return None
+
+    draft = [
+        model.QuestionSubmit.parse_obj(question.to_mongo().to_dict())
+        for question in attempt.questions
+    ]
+    submission = complete_submission(quiz, draft)
+    result = validate(quiz, submission)
+    if result is None:
+        # a draft that cannot be scored counts as unanswered
+        submission = complete_submission(quiz, [])
+        result = validate(quiz, submission)
+    return quiz, submission, result
+
+
+async def auto_submit(repo: RepositoryFactory, attempt: QuizAttempt) -> bool:
+    """Submits draft answers of an expired attempt.
+    :return: False if the quiz was deleted or already solved"""
+
+    scored = await run_in_threadpool(draft_submission, repo, attempt)
+    if scored is None:
+        return False
+    quiz, submission, result = scored
+    return await store_solution(
+        repo, quiz, attempt.owner, submission, result, attempt.deadline
+    )
+
+
+async def expire_attempt(repo: RepositoryFactory, attempt: QuizAttempt) -> str:
+    """Auto-submits a claimed attempt; a failure is logged and counted, so
+    other attempts of the batch are still submitted.
+    :return: outcome, auto_submitted, expired or failed"""
+
+    try:
+        outcome = "auto_submitted" if await auto_submit(repo, attempt) else "expired"
+    except Exception:  # pylint: disable=W0703
+        logging.exception("Auto-submitting quiz attempt %s failed", attempt.key)
+        outcome = "failed"
+    EXPIRED_ATTEMPTS.inc((outcome,))
+    return outcome
+
+
+def open_attempt(repo: RepositoryFactory, quiz: Quiz, owner: str) -> QuizAttempt:
+    """Opens attempt of a timed quiz (a started attempt keeps its
+    deadline) and schedules its expiry.
+    :param repo: repository factory
+    :param quiz: timed quiz
+    :param owner: user taking the quiz
+    :return: open attempt"""
+
+    started_at = datetime.utcnow()
+    attempt = repo.quiz_attempt.update(
+        attempt_key(quiz.identifier, owner),
+        upsert=True,
+        set__quiz=quiz.identifier,
+        set__owner=owner,
+        min__started_at=started_at,
+        min__deadline=started_at + timedelta(seconds=quiz.time_limit),
+    )
+    attempt_scheduler.schedule(attempt)
+    return attempt
+
+
+attempt_scheduler = AttemptScheduler()
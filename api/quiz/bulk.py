@@ -0,0 +1,251 @@
+"""Bulk quiz import module. Quiz files (json or newline delimited json)
+are read as a stream, validated against NewQuiz in a process pool and
+inserted with batched bulk writes. Identifiers are reserved in blocks and
+progress is checkpointed after every batch, so an interrupted import can
+be resumed. Identifiers of a batch are checkpointed before it is
+inserted: a resumed batch reuses them and already inserted quizzes are
+skipped instead of duplicated."""
+
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import Executor, ProcessPoolExecutor
+from itertools import count, islice
+from typing import (Callable, Dict, Iterable, Iterator, List, Optional,
+                    Sequence, Tuple)
+
+from pydantic import ValidationError
+
+from api.quiz.model import NewQuiz, QuizImportReport
+from database.repository import RepositoryFactory
+from model import Answer, Question
+from util import chunked
+
+NDJSON_SUFFIXES = (".ndjson", ".jsonl")
+
+ValidationResult = Tuple[Optional[dict], Optional[str]]
+
+
+def read_records(paths: Sequence[str]) -> Iterator:
+    """Reads quiz records from files. Newline delimited json files are
+    read line by line and yielded unparsed (parsing happens in worker
+    processes); json files may hold a single quiz or a list of quizzes.
+    :param paths: quiz file paths
+    :return: generator of records (json strings or dicts)"""
+
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as file_handle:
+            if path.endswith(NDJSON_SUFFIXES):
+                yield from (line for line in file_handle if line.strip())
+            else:
+                data = json.load(file_handle)
+                yield from data if isinstance(data, list) else [data]
+
+
+def validate_records(records: List) -> List[ValidationResult]:
+    """Validates quiz records against NewQuiz. Runs in worker processes.
+    :param records: records (json strings or dicts)
+    :return: list of (quiz data, None) or (None, error message)"""
+
+    results = []
+    for record in records:
+        try:
+            data = json.loads(record) if isinstance(record, str) else record
+            results.append((NewQuiz(**data).dict(), None))
+        except (ValueError, TypeError, ValidationError) as exc:
+            results.append((None, " ".join(str(exc).split())))
+    return results
+
+
+def bounded_map(
+    executor: Executor, func: Callable, chunks: Iterable, window: int
+) -> Iterator:
+    """Like Executor.map, but keeps at most window tasks in flight, so
+    input is consumed lazily and results are yielded in order.
+    :param executor: executor running the tasks
+    :param func: task function
+    :param chunks: task inputs
+    :param window: maximum number of tasks in flight
+    :return: generator of task results"""
+
+    pending = deque()
+    for chunk in chunks:
+        pending.append(executor.submit(func, chunk))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def reserve_batch_ids(quizzes: List[dict], repo: RepositoryFactory) -> Dict[str, int]:
+    """Reserves quiz, question and answer identifiers of a batch in one
+    round trip each.
+    :param quizzes: validated quiz data (NewQuiz dicts)
+    :param repo: repository factory
+    :return: first reserved identifier by kind"""
+
+    questions = [que for quiz in quizzes for que in quiz["questions"]]
+    counts = {
+        "quiz": (len(quizzes), None),
+        "question": (len(questions), Question),
+        "answer": (sum(len(que["answers"]) for que in questions), Answer),
+    }
+    return {
+        kind: repo.quiz.reserve_ids(size, model).start if size else 0
+        for kind, (size, model) in counts.items()
+    }
+
+
+def batch_ids(
+    quizzes: List[dict],
+    records: int,
+    repo: RepositoryFactory,
+    pending: Optional[Dict[str, int]],
+) -> Dict[str, int]:
+    """Gets identifiers of a batch: the ones checkpointed for it by an
+    interrupted import, or newly reserved ones.
+    :param quizzes: validated quiz data of the batch
+    :param records: number of records in the batch
+    :param repo: repository factory
+    :param pending: identifiers from the checkpoint
+    :return: first identifier by kind"""
+
+    if pending is not None and pending.get("records") == records:
+        return pending
+    return {"records": records, **reserve_batch_ids(quizzes, repo)}
+
+
+def to_documents(
+    quizzes: List[dict], owner: str, first_ids: Dict[str, int]
+) -> List[dict]:
+    """Converts validated quiz data into raw quiz documents.
+    :param quizzes: validated quiz data (NewQuiz dicts)
+    :param owner: quiz owner email
+    :param first_ids: first reserved identifier by kind
+    :return: raw quiz documents"""
+
+    quiz_ids = count(first_ids["quiz"])
+    question_ids = count(first_ids["question"])
+    answer_ids = count(first_ids["answer"])
+
+    return [
+        {
+            "_id": next(quiz_ids),
+            "title": quiz["title"],
+            "description": quiz["description"],
+            "questions": [
+                {
+                    "_id": next(question_ids),
+                    "title": que["title"],
+                    "answers": [
+                        {
+                            "_id": next(answer_ids),
+                            "answer_text": ans["answer_text"],
+                            "is_correct": ans["is_correct"],
+                        }
+                        for ans in que["answers"]
+                    ],
+                }
+                for que in quiz["questions"]
+            ],
+            "is_published": quiz["is_published"],
+            "revision": 1,
+            "owner": owner,
+        }
+        for quiz in quizzes
+    ]
+
+
+def load_checkpoint(
+    checkpoint_path: Optional[str], paths: Sequence[str]
+) -> Tuple[int, Optional[Dict[str, int]]]:
+    """Loads import checkpoint.
+    :param checkpoint_path: checkpoint file path
+    :param paths: quiz file paths of the import
+    :return: number of records already processed and identifiers
+    reserved for the batch that was being inserted"""
+
+    if not checkpoint_path or not os.path.exists(checkpoint_path):
+        return 0, None
+
+    with open(checkpoint_path, "r", encoding="utf-8") as file_handle:
+        state = json.load(file_handle)
+    if state.get("paths") != list(paths):
+        raise ValueError("Checkpoint was created for different input files")
+    return state["done"], state.get("pending")
+
+
+def save_checkpoint(
+    checkpoint_path: Optional[str],
+    paths: Sequence[str],
+    done: int,
+    pending: Dict[str, int] = None,
+):
+    """Atomically saves import checkpoint.
+    :param checkpoint_path: checkpoint file path
+    :param paths: quiz file paths of the import
+    :param done: number of records processed
+    :param pending: identifiers reserved for the batch being inserted"""
+
+    if not checkpoint_path:
+        return
+
+    state = {"paths": list(paths), "done": done, "pending": pending}
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file_handle:
+        json.dump(state, file_handle)
+    os.replace(tmp_path, checkpoint_path)
+
+
+def import_quizzes(
+    paths: Sequence[str],
+    owner: str,
+    repo: RepositoryFactory,
+    workers: int = 4,
+    batch_size: int = 1000,
+    checkpoint_path: str = None,
+    progress: Callable[[QuizImportReport], None] = None,
+) -> QuizImportReport:
+    """Imports quizzes from files.
+    :param paths: quiz file paths
+    :param owner: email of the user owning imported quizzes
+    :param repo: repository factory
+    :param workers: number of validation processes
+    :param batch_size: number of records per validation task and bulk write
+    :param checkpoint_path: checkpoint file, enables resuming the import
+    :param progress: callback invoked with the report after every batch
+    :return: import report"""
+
+    started = time.perf_counter()
+    done, pending = load_checkpoint(checkpoint_path, paths)
+    report = QuizImportReport(skipped=done)
+
+    records = islice(read_records(paths), done, None)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        chunks = chunked(records, batch_size)
+        for results in bounded_map(pool, validate_records, chunks, workers * 2):
+            quizzes = []
+            for row, (data, error) in enumerate(results, start=done + 1):
+                if error is None:
+                    quizzes.append(data)
+                else:
+                    report.add_error(row, error)
+
+            # the batch keeps its identifiers if the import is resumed
+            # after a crash, so inserted quizzes are not imported again
+            first_ids = batch_ids(quizzes, len(results), repo, pending)
+            pending = None
+            save_checkpoint(checkpoint_path, paths, done, first_ids)
+            documents = to_documents(quizzes, owner, first_ids)
+            report.imported += repo.quiz.bulk_insert(documents)
+            report.read += len(results)
+            done += len(results)
+            save_checkpoint(checkpoint_path, paths, done)
+
+            if progress is not None:
+                report.finish(time.perf_counter() - started)
+                progress(report)
+
+    report.finish(time.perf_counter() - started)
+    return report
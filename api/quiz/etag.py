@@ -0,0 +1,103 @@
+"""Quiz HTTP caching module providing ETag and Cache-Control
+helpers used by conditional quiz reads."""
+
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+from starlette import status
+
+from core.config import get_config
+from model import Quiz
+
+NO_CACHE = "no-cache"
+
+
+def quiz_etag(quiz: Quiz) -> str:
+    """Strong ETag derived from quiz identifier and revision.
+    :param quiz: quiz document
+    :return: quoted strong ETag"""
+
+    return revision_etag(quiz.identifier, quiz.revision)
+
+
+def revision_etag(quiz_id: int, revision: Optional[int], view: str = None) -> str:
+    """Strong ETag for a given quiz revision.
+    :param quiz_id: quiz id
+    :param revision: quiz revision
+    :param view: optional quiz view name (default view has no suffix)
+    :return: quoted strong ETag"""
+
+    suffix = f"-{view}" if view else ""
+    return f'"q{quiz_id}-r{revision or 1}{suffix}"'
+
+
+def weak_etag(body: bytes) -> str:
+    """Weak ETag derived from an encoded response payload.
+    :param body: encoded response payload
+    :return: quoted weak ETag"""
+
+    digest = hashlib.sha1(body).hexdigest()  # nosec
+    return f'W/"{digest[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Checks If-None-Match header against an ETag using weak
+    comparison as required for conditional GET requests.
+    :param if_none_match: If-None-Match header value
+    :param etag: current ETag
+    :return: True if the client copy is still fresh"""
+
+    if not if_none_match:
+        return False
+
+    opaque_tag = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return True
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque_tag:
+            return True
+    return False
+
+
+def quiz_cache_control(quiz: Quiz) -> str:
+    """Cache-Control header value for a quiz. Published quizzes
+    may be cached by browsers and CDNs, others must be revalidated.
+    :param quiz: quiz document
+    :return: Cache-Control header value"""
+
+    if quiz.is_published:
+        return published_cache_control()
+    return NO_CACHE
+
+
+def published_cache_control() -> str:
+    """Cache-Control header value for published quizzes."""
+
+    max_age = get_config().CACHE_INFO.quiz_max_age
+    return f"public, max-age={max_age}, immutable"
+
+
+def set_cache_headers(response: Response, etag: str, cache_control: str):
+    """Sets caching headers on a response.
+    :param response: response object
+    :param etag: ETag header value
+    :param cache_control: Cache-Control header value
+    :return: the response"""
+
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return response
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """Creates 304 Not Modified response.
+    :param etag: ETag header value
+    :param cache_control: Cache-Control header value
+    :return: empty 304 response"""
+
+    response = Response(status_code=status.HTTP_304_NOT_MODIFIED)
+    return set_cache_headers(response, etag, cache_control)
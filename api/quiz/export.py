@@ -0,0 +1,84 @@
+"""Quiz solution export module. Solutions are read from a database
+cursor in fixed size batches and encoded batch by batch, so an export
+keeps memory use flat regardless of the number of solutions."""
+
+import csv
+import io
+from typing import Iterator
+
+from api.quiz import model
+from core.serialization import documents_to_list, dumps
+from database.repository import RepositoryFactory
+
+CSV_COLUMNS = (
+    "identifier",
+    "quiz",
+    "owner",
+    "title",
+    "total_points",
+    "scored_points",
+    "submitted_at",
+)
+
+MEDIA_TYPES = {
+    model.ExportFormat.ndjson: "application/x-ndjson",
+    model.ExportFormat.csv: "text/csv",
+}
+
+
+def stream_solutions(
+    quiz_id: int, repo: RepositoryFactory, batch_size: int
+) -> Iterator[list]:
+    """Streams quiz solutions of a quiz in response model shape.
+    :param quiz_id: quiz id
+    :param repo: repository factory
+    :param batch_size: number of solutions per batch
+    :return: generator of solution batches"""
+
+    for batch in repo.quiz_solution.stream(batch_size=batch_size, quiz=quiz_id):
+        yield documents_to_list(batch, model.QuizSolutionExport)
+
+
+def export_ndjson(solution_batches: Iterator[list]) -> Iterator[bytes]:
+    """Encodes solution batches as newline delimited json.
+    :param solution_batches: solution batches
+    :return: generator of encoded chunks, one chunk per batch"""
+
+    for batch in solution_batches:
+        yield b"".join(dumps(solution) + b"\n" for solution in batch)
+
+
+def export_csv(solution_batches: Iterator[list]) -> Iterator[str]:
+    """Encodes solution batches as csv (answers are not included).
+    :param solution_batches: solution batches
+    :return: generator of encoded chunks, one chunk per batch"""
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=CSV_COLUMNS, extrasaction="ignore")
+    writer.writeheader()
+    yield buffer.getvalue()
+
+    for batch in solution_batches:
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(batch)
+        yield buffer.getvalue()
+
+
+def export_solutions(
+    quiz_id: int,
+    repo: RepositoryFactory,
+    export_format: model.ExportFormat,
+    batch_size: int,
+) -> Iterator:
+    """Exports quiz solutions in a given format.
+    :param quiz_id: quiz id
+    :param repo: repository factory
+    :param export_format: export format
+    :param batch_size: number of solutions per batch
+    :return: generator of encoded chunks"""
+
+    solution_batches = stream_solutions(quiz_id, repo, batch_size)
+    if export_format == model.ExportFormat.csv:
+        return export_csv(solution_batches)
+    return export_ndjson(solution_batches)
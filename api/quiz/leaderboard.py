@@ -0,0 +1,241 @@
+"""Quiz leaderboard stream module. Watched quizzes keep their best
+LEADERBOARD_SIZE solutions in memory: the best solutions are queried
+from the database (in the threadpool) when the first subscriber arrives
+and the board is updated as solutions are stored, instead of every
+dashboard polling the solutions. Once per LEADERBOARD_STREAM_MS a
+changed board is encoded into one server-sent event frame that is handed
+to all subscribers; a subscriber that has not sent its previous frame
+yet gets only the newest one. Boards are per worker and reload the best
+solutions every LEADERBOARD_REFRESH_SECONDS to pick up solutions stored
+by other workers; reloads are merged into the board, so solutions
+recorded meanwhile are kept. A board is dropped when its last subscriber
+leaves. Only the quiz owner watches the stream, so players are shown by
+email as in the solution export."""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Dict, List, Optional, Set
+
+from starlette.concurrency import run_in_threadpool
+
+from core.config import get_config
+from core.leaderboard import Leaderboard
+from core.metrics import REGISTRY
+from core.serialization import dumps
+from database.repository import RepositoryFactory
+
+SSE_MEDIA_TYPE = "text/event-stream"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+KEEPALIVE = b": keepalive\n\n"
+
+STREAM_SUBSCRIBERS = REGISTRY.gauge(
+    "leaderboard_stream_subscribers", "Subscribers of quiz leaderboard streams."
+)
+STREAM_FRAMES = REGISTRY.counter(
+    "leaderboard_stream_frames_total",
+    "Leaderboard frames encoded (each shared by all subscribers of a quiz).",
+)
+
+
+def sse_frame(event: str, event_id: int, data: dict) -> bytes:
+    return b"event: %s\nid: %d\ndata: %s\n\n" % (event.encode(), event_id, dumps(data))
+
+
+def offer(queue: asyncio.Queue, frame: bytes):
+    """Replaces a frame the subscriber has not taken yet."""
+
+    if queue.full():
+        queue.get_nowait()
+    queue.put_nowait(frame)
+
+
+class QuizBoard:
+    """Best solutions of a watched quiz and its subscribers."""
+
+    def __init__(self, quiz_id: int, size: int):
+        self.quiz_id = quiz_id
+        self.size = size
+        self.leaderboard = Leaderboard(size)
+        self.subscribers: Set[asyncio.Queue] = set()
+        self.frame: Optional[bytes] = None
+        self.frames = 0
+        self.loaded_at = 0.0
+        self.loaded = asyncio.Event()
+        self._published = -1
+        self.task: Optional[asyncio.Task] = None
+
+    def record(self, owner: str, points: float, submitted_at: datetime):
+        """Ranks a solution, earlier solutions rank first among equal
+        scores."""
+
+        submitted = submitted_at.replace(tzinfo=timezone.utc).timestamp()
+        self.leaderboard.update(owner, points, submitted)
+
+    def best_solutions(self, repo: RepositoryFactory) -> List[dict]:
+        """Gets the best stored solutions of the quiz."""
+
+        return list(
+            repo.quiz_solution.filter(
+                quiz=self.quiz_id,
+                order_by=["-scored_points", "submitted_at"],
+                only=["owner", "scored_points", "submitted_at"],
+                as_dict=True,
+                limit=self.size,
+            )
+        )
+
+    async def load(self, repo: RepositoryFactory):
+        """Ranks the best stored solutions of the quiz into the board."""
+
+        solutions = await run_in_threadpool(self.best_solutions, repo)
+        for doc in solutions:
+            self.record(doc["owner"], doc["scored_points"], doc["submitted_at"])
+        self.loaded_at = time.monotonic()
+
+    def publish(self) -> bool:
+        """Encodes the board if it changed and hands the frame to all
+        subscribers.
+        :return: False if the board did not change"""
+
+        version = self.leaderboard.version
+        if version == self._published:
+            return False
+        self._published = version
+        top = [
+            {
+                "rank": entry["rank"],
+                "player": entry["player"],
+                "score": entry["score"],
+                "submitted_at": datetime.utcfromtimestamp(entry["elapsed"]),
+            }
+            for entry in self.leaderboard.top(self.size)
+        ]
+        self.frames += 1
+        self.frame = sse_frame(
+            "leaderboard", self.frames, {"quiz_id": self.quiz_id, "top": top}
+        )
+        STREAM_FRAMES.inc()
+        for queue in self.subscribers:
+            offer(queue, self.frame)
+        return True
+
+
+class LeaderboardHub:
+    """Leaderboards of the quizzes watched on the worker."""
+
+    def __init__(
+        self,
+        interval_ms: float = None,
+        size: int = None,
+        keepalive_seconds: float = None,
+        refresh_seconds: float = None,
+    ):
+        """Constructor, arguments default to the settings
+        :param interval_ms: time between frames of a quiz
+        :param size: number of best solutions of a quiz
+        :param keepalive_seconds: time between keepalives of an idle stream
+        :param refresh_seconds: time between reloads of a board, 0 is off"""
+
+        settings = get_config().LEADERBOARD_INFO
+        interval_ms = (
+            settings.leaderboard_stream_ms if interval_ms is None else interval_ms
+        )
+        self.interval = interval_ms / 1000
+        self.size = settings.leaderboard_size if size is None else size
+        self.keepalive = (
+            settings.leaderboard_keepalive_seconds
+            if keepalive_seconds is None
+            else keepalive_seconds
+        )
+        self.refresh = (
+            settings.leaderboard_refresh_seconds
+            if refresh_seconds is None
+            else refresh_seconds
+        )
+        self._boards: Dict[int, QuizBoard] = {}
+        STREAM_SUBSCRIBERS.set_function(self.subscribers)
+
+    def subscribers(self) -> int:
+        return sum(len(board.subscribers) for board in list(self._boards.values()))
+
+    def record(self, quiz_id: int, owner: str, points: float, submitted_at: datetime):
+        """Ranks a stored solution if its quiz is watched."""
+
+        board = self._boards.get(quiz_id)
+        if board is not None:
+            board.record(owner, points, submitted_at)
+
+    async def subscribe(self, repo: RepositoryFactory, quiz_id: int) -> asyncio.Queue:
+        """Subscribes to the leaderboard frames of a quiz, starting with
+        the current one once the board is loaded.
+        :return: queue of frames"""
+
+        board = self._boards.get(quiz_id)
+        if board is None:
+            board = self._boards[quiz_id] = QuizBoard(quiz_id, self.size)
+            loop = asyncio.get_running_loop()
+            board.task = loop.create_task(self._run(repo, board))
+
+        queue: asyncio.Queue = asyncio.Queue(1)
+        board.subscribers.add(queue)
+        try:
+            await board.loaded.wait()
+        except asyncio.CancelledError:
+            self.unsubscribe(quiz_id, queue)
+            raise
+        if board.frame is None:
+            board.publish()
+        else:
+            # the next change comes with the next frame of the board
+            offer(queue, board.frame)
+        return queue
+
+    def unsubscribe(self, quiz_id: int, queue: asyncio.Queue):
+        board = self._boards.get(quiz_id)
+        if board is None:
+            return
+        board.subscribers.discard(queue)
+        if not board.subscribers:
+            del self._boards[quiz_id]
+            board.task.cancel()
+
+    async def stream(
+        self, repo: RepositoryFactory, quiz_id: int
+    ) -> AsyncIterator[bytes]:
+        """Server-sent event frames of a quiz leaderboard, with keepalive
+        comments while the board does not change."""
+
+        queue = await self.subscribe(repo, quiz_id)
+        try:
+            while True:
+                try:
+                    yield await asyncio.wait_for(queue.get(), self.keepalive)
+                except asyncio.TimeoutError:
+                    yield KEEPALIVE
+        finally:
+            self.unsubscribe(quiz_id, queue)
+
+    async def _run(self, repo: RepositoryFactory, board: QuizBoard):
+        await self._load(repo, board)
+        while True:
+            await asyncio.sleep(self.interval)
+            if 0 < self.refresh <= time.monotonic() - board.loaded_at:
+                await self._load(repo, board)
+            board.publish()
+
+    @staticmethod
+    async def _load(repo: RepositoryFactory, board: QuizBoard):
+        """Loads a board, a board failing to load stays as it is until
+        the next refresh."""
+
+        try:
+            await board.load(repo)
+        except Exception:  # pylint: disable=W0703
+            logging.exception("Loading quiz %s leaderboard failed", board.quiz_id)
+            board.loaded_at = time.monotonic()
+        board.loaded.set()
+
+
+leaderboard_hub = LeaderboardHub()
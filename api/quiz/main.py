@@ -7,9 +7,11 @@ from typing import List
 from fastapi import HTTPException
 
 from api.quiz import model
+from core.tracing import traced
 from model import Quiz
 
 
+@traced("quiz.validate")
 def validate(
     quiz: Quiz, quiz_submit: model.QuizSubmit
 ) -> [model.QuizValidationResult, None]:
@@ -21,7 +23,7 @@ def validate(
     qvr = model.QuizValidationResult
     try:
         points = 0.0
-        for que, ques in zip(get_questions(quiz, quiz_submit)):
+        for que, ques in zip(*get_questions(quiz, quiz_submit)):
             points = score_question(points, que, ques)
 
         total_points = get_total(quiz.questions)
@@ -85,7 +87,7 @@ def is_single(question):
     :param question: quiz question
     :return: True single answer question and False otherwise"""
 
-    return sum(question.answers) == 1
+    return sum(answer.is_correct for answer in question.answers) == 1
 
 
 def score_single(quiz_answers: List[bool], submitted_answers: List[bool]):
@@ -120,17 +122,9 @@ def score_multi(quiz_answers: List[bool], submitted_answers: List[bool]):
     right = sum_correct
     wrong = len(submitted_answers) - right
 
-    right, wrong = 1 / right, -1 / wrong
+    right, wrong = 1 / right, -1 / wrong if wrong else 0
     total_score = sum(
         q and right or wrong for q, a in zip(submitted_answers, quiz_answers) if a
     )
 
     return total_score
-
-
-def get_quiz_solution(quiz_solution_data):
-    """Helper method to create quiz solution object."""
-
-    quiz_solution = model.QuizSolution(**quiz_solution_data)
-    quiz_solution.identifier = quiz_solution_data["_id"]
-    return quiz_solution
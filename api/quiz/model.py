@@ -5,11 +5,14 @@
 
 """Quiz module models."""
 
+from datetime import datetime
+from enum import Enum
 from typing import List, Optional
 
-from pydantic import ValidationError, validator
+from pydantic import validator
 from pydantic.main import BaseModel
 
+from api.model import BulkReport
 from core.config import get_config
 
 
@@ -51,15 +54,11 @@ class NewQuestion(BaseQuestion):
 
         max_answers = get_config().MAX_ANSWERS_PER_QUESTION
         if len(answers) > max_answers:
-            raise ValidationError(
-                f"Number of answers must be less then:{max_answers}", NewQuestion
-            )
+            raise ValueError(f"Number of answers must be less then:{max_answers}")
 
         correct_answer_ct = sum(1 for a in answers if a.is_correct)
         if correct_answer_ct == 0:
-            raise ValidationError(
-                "At least one correct answer is required", NewQuestion
-            )
+            raise ValueError("At least one correct answer is required")
         return answers
 
 
@@ -76,6 +75,7 @@ class BaseQuiz(BaseModel):
 
     title: str
     description: str
+    time_limit: Optional[int]
 
 
 class NewQuiz(BaseQuiz):
@@ -84,6 +84,18 @@ class NewQuiz(BaseQuiz):
     is_published: bool = False
     questions: List[NewQuestion] = []
 
+    @validator("time_limit")
+    def time_limit_validator(cls, time_limit: Optional[int]):
+        """Pydantic Validation checks time limit (seconds) of a timed
+        quiz is positive and at most MAX_TIME_LIMIT_MINUTES.
+        :param time_limit: time limit in seconds, None for untimed quiz
+        :return: Returns the validated time limit"""
+
+        max_seconds = get_config().ATTEMPT_INFO.max_time_limit_minutes * 60
+        if time_limit is not None and not 0 < time_limit <= max_seconds:
+            raise ValueError(f"Time limit must be 1 to {max_seconds} seconds")
+        return time_limit
+
     @validator("questions", each_item=False)
     def questions_validator(cls, questions: List[NewQuestion]):
         """Pydantic Validation checks if at least one question is
@@ -93,11 +105,9 @@ class NewQuiz(BaseQuiz):
 
         max_questions = get_config().MAX_QUESTIONS
         if len(questions) > max_questions:
-            raise ValidationError(
-                f"Number of questions must be less then:{max_questions}", NewQuiz
-            )
+            raise ValueError(f"Number of questions must be less then:{max_questions}")
         if len(questions) == 0:
-            raise ValidationError("Please specify at least one question", NewQuiz)
+            raise ValueError("Please specify at least one question")
         return questions
 
 
@@ -110,6 +120,36 @@ class Quiz(BaseQuiz):
     owner: str
 
 
+class QuizView(str, Enum):
+    """Quiz representation: full view includes correct answers,
+    taker view is the one presented to quiz takers."""
+
+    full = "full"
+    taker = "taker"
+
+
+class TakerAnswer(BaseModel):
+    """Answer model presented to quiz takers (no correctness flag)."""
+
+    identifier: Optional[int]
+    answer_text: str
+
+
+class TakerQuestion(BaseQuestion):
+    """Question model presented to quiz takers."""
+
+    identifier: Optional[int]
+    answers: List[TakerAnswer]
+
+
+class TakerQuiz(BaseQuiz):
+    """Quiz model presented to quiz takers."""
+
+    identifier: Optional[int]
+    questions: List[TakerQuestion] = []
+    owner: str
+
+
 class QuizPublish(BaseModel):
     """Quiz publish model: used to publish a given quiz."""
 
@@ -147,8 +187,166 @@ class QuizSolution(QuizSubmit):
     scored_points: float
 
 
+class QuizSolutionExport(QuizSolution):
+    """Quiz solution model used for solution export."""
+
+    quiz: int
+    owner: str
+    submitted_at: Optional[datetime]
+    title: Optional[str]
+
+
+class ExportFormat(str, Enum):
+    """Quiz solution export format."""
+
+    ndjson = "ndjson"
+    csv = "csv"
+
+
 class QuizValidationResult(BaseModel):
     """Quiz validation/score model."""
 
     total_points: int
     points: float
+
+
+class AttemptAnswers(BaseModel):
+    """Answers of a timed quiz attempt: saved as a draft or submitted."""
+
+    questions: List[QuestionSubmit] = []
+
+
+class QuizAttempt(AttemptAnswers):
+    """Open attempt of a timed quiz."""
+
+    quiz_id: int
+    started_at: datetime
+    deadline: datetime
+    remaining_seconds: float
+
+
+class ScoreBucket(BaseModel):
+    """Score histogram bucket: solutions scoring at least lower and less
+    than upper (the last bucket includes upper)."""
+
+    lower: float
+    upper: float
+    count: int = 0
+
+
+class QuizStats(BaseModel):
+    """Quiz score statistics; scores are scored/total points ratios."""
+
+    quiz_id: int
+    count: int = 0
+    mean: Optional[float]
+    stddev: Optional[float]
+    min_score: Optional[float]
+    max_score: Optional[float]
+    histogram: List[ScoreBucket] = []
+
+
+class StatsRebuildReport(BaseModel):
+    """Quiz statistics rebuild report."""
+
+    quizzes: int = 0
+    solutions: int = 0
+    removed: int = 0
+    duration_seconds: float = 0.0
+
+
+class OptionStats(BaseModel):
+    """Answer option choice counts."""
+
+    identifier: Optional[int]
+    answer_text: str
+    is_correct: bool
+    chosen: int = 0
+    chosen_ratio: Optional[float]
+
+
+class ItemAnalysis(BaseModel):
+    """Question item analysis: difficulty is the proportion of solutions
+    answering it correctly, discrimination the point-biserial correlation
+    of answering it correctly with the score of the other questions."""
+
+    identifier: int
+    title: str
+    responses: int = 0
+    difficulty: Optional[float]
+    discrimination: Optional[float]
+    mean_score: Optional[float]
+    options: List[OptionStats] = []
+
+
+class QuizAnalysis(BaseModel):
+    """Quiz item analysis."""
+
+    quiz_id: int
+    solutions: int = 0
+    questions: List[ItemAnalysis] = []
+
+
+class Resolution(str, Enum):
+    """Submission activity bucket resolution."""
+
+    minute = "minute"
+    hour = "hour"
+    day = "day"
+
+
+class ActivityBucket(BaseModel):
+    """Submission count of a time bucket."""
+
+    start: datetime
+    count: int = 0
+
+
+class ActivitySeries(BaseModel):
+    """Submission counts of a time range (start inclusive, end
+    exclusive, UTC); quiz 0 holds all quizzes."""
+
+    quiz_id: int
+    resolution: Resolution
+    start: datetime
+    end: datetime
+    total: int = 0
+    buckets: List[ActivityBucket] = []
+
+
+class ActivityCompactionReport(BaseModel):
+    """Activity rollup compaction report: numbers of removed buckets."""
+
+    minute_buckets: int = 0
+    hour_buckets: int = 0
+    duration_seconds: float = 0.0
+
+
+class QuizRegrade(BaseModel):
+    """Re-grade progress of a quiz."""
+
+    quiz_id: int
+    revision: Optional[int]
+    processed: int = 0
+    changed: int = 0
+    resumed: bool = False
+    finished: bool = False
+    error: Optional[str]
+
+
+class RegradeReport(BaseModel):
+    """Re-grade report."""
+
+    running: bool = False
+    quizzes: int = 0
+    solutions: int = 0
+    changed: int = 0
+    duration_seconds: float = 0.0
+    progress: List[QuizRegrade] = []
+
+
+class QuizImportReport(BulkReport):
+    """Bulk quiz import report."""
+
+    imported: int = 0
+    skipped: int = 0
@@ -0,0 +1,255 @@
+"""Quiz re-grading module. After an answer key fix (or a scoring rule
+change) stored solution scores are recomputed: solutions of a quiz are
+streamed from a cursor in primary key order, scored a batch at a time
+with the vectorized scoring of item analysis and only changed scores are
+written back, with one bulk update per batch. Quizzes are re-graded in
+parallel by a thread pool; all workers share a throttle (REGRADE_RATE
+solutions per second) so re-grading does not starve request traffic.
+A checkpoint per quiz lets an interrupted re-grade resume; quiz
+statistics of changed quizzes are rebuilt at the end."""
+
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, List, Optional
+
+from api.quiz import model
+from api.quiz.analysis import ItemAnalyzer
+from api.quiz.main import get_total
+from api.quiz.stats import rebuild_stats
+from database.repository import RepositoryFactory
+
+SCORE_TOLERANCE = 1e-9
+SOLUTION_FIELDS = ["questions", "total_points", "scored_points"]
+
+
+class Throttle:
+    """Paces work of many threads to a shared rate of items per second."""
+
+    def __init__(self, rate: float):
+        """Constructor
+        :param rate: items per second, 0 for no limit"""
+
+        self.rate = rate
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self, items: int):
+        """Blocks until items may be processed."""
+
+        if self.rate <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + items / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+def regrade_batch(analyzer: ItemAnalyzer, total: int, solutions: List[dict]) -> List:
+    """Re-scores raw solutions of a quiz.
+    :param analyzer: item analyzer of the quiz (scores responses)
+    :param total: total points of the quiz
+    :param solutions: raw solutions
+    :return: bulk updates of the solutions whose score changed"""
+
+    chosen, _ = analyzer.response_matrix(solutions)
+    _, scores = analyzer.item_scores(chosen)
+    updates = []
+    for solution, points in zip(solutions, scores.sum(axis=1)):
+        points = float(points)
+        stale = abs(solution.get("scored_points", 0.0) - points) > SCORE_TOLERANCE
+        if stale or solution.get("total_points") != total:
+            updates.append(
+                (
+                    solution["_id"],
+                    {"set__scored_points": points, "set__total_points": total},
+                )
+            )
+    return updates
+
+
+def regrade_quiz(
+    repo: RepositoryFactory,
+    quiz_id: int,
+    batch_size: int = 1000,
+    throttle: Optional[Throttle] = None,
+    restart: bool = False,
+    progress: Optional[Callable[[model.QuizRegrade], None]] = None,
+) -> model.QuizRegrade:
+    """Re-grades all solutions of a quiz, resuming an interrupted
+    re-grade of the same quiz revision.
+    :param repo: repository factory
+    :param quiz_id: quiz id
+    :param batch_size: number of solutions per batch
+    :param throttle: shared throttle
+    :param restart: ignore the checkpoint and re-grade all solutions
+    :param progress: called with the progress after every batch
+    :return: re-grade progress"""
+
+    result = model.QuizRegrade(quiz_id=quiz_id)
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        result.error = "Quiz does not exist"
+        return result
+
+    result.revision = quiz.revision
+    checkpoint = None if restart else repo.regrade_checkpoint.get(quiz_id)
+    resumable = checkpoint is not None and checkpoint.revision == quiz.revision
+    resumable = resumable and not checkpoint.finished
+    filters = {"quiz": quiz_id}
+    if resumable and checkpoint.last_solution is not None:
+        filters["pk__gt"] = checkpoint.last_solution
+        result.processed, result.changed = checkpoint.processed, checkpoint.changed
+        result.resumed = True
+
+    analyzer, total = ItemAnalyzer(quiz), get_total(quiz.questions)
+    throttle = throttle or Throttle(0)
+    batches = repo.quiz_solution.stream(batch_size, only=SOLUTION_FIELDS, **filters)
+    for batch in batches:
+        throttle.wait(len(batch))
+        updates = regrade_batch(analyzer, total, batch)
+        repo.quiz_solution.bulk_update(updates)
+        result.processed += len(batch)
+        result.changed += len(updates)
+        repo.regrade_checkpoint.update(
+            quiz_id,
+            upsert=True,
+            set__revision=quiz.revision,
+            set__last_solution=batch[-1]["_id"],
+            set__processed=result.processed,
+            set__changed=result.changed,
+            set__finished=False,
+        )
+        if progress is not None:
+            progress(result.copy())
+
+    result.finished = True
+    repo.regrade_checkpoint.update(
+        quiz_id,
+        upsert=True,
+        set__revision=quiz.revision,
+        set__processed=result.processed,
+        set__changed=result.changed,
+        set__finished=True,
+    )
+    if progress is not None:
+        progress(result.copy())
+    return result
+
+
+def regrade(
+    repo: RepositoryFactory,
+    quiz_ids: Iterable[int] = None,
+    workers: int = 4,
+    batch_size: int = 1000,
+    rate: float = 0.0,
+    restart: bool = False,
+    progress: Optional[Callable[[model.QuizRegrade], None]] = None,
+) -> model.RegradeReport:
+    """Re-grades solutions of quizzes in parallel and rebuilds statistics
+    of the quizzes with changed scores.
+    :param repo: repository factory
+    :param quiz_ids: quizzes to re-grade, all if omitted
+    :param workers: number of quizzes re-graded at once
+    :param batch_size: number of solutions per batch
+    :param rate: solutions per second of all workers, 0 for no limit
+    :param restart: ignore checkpoints and re-grade all solutions
+    :param progress: called with the progress of a quiz after every batch
+    :return: re-grade report"""
+
+    started = time.perf_counter()
+    if quiz_ids is None:
+        quiz_ids = [
+            doc["_id"]
+            for batch in repo.quiz.stream(batch_size, only=["identifier"])
+            for doc in batch
+        ]
+    throttle = Throttle(rate)
+
+    def run(quiz_id: int) -> model.QuizRegrade:
+        try:
+            return regrade_quiz(repo, quiz_id, batch_size, throttle, restart, progress)
+        except Exception as exc:  # pylint: disable=W0703
+            logging.exception("Re-grade of quiz %s failed", quiz_id)
+            return model.QuizRegrade(quiz_id=quiz_id, error=str(exc))
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1)) as executor:
+        results = list(executor.map(run, quiz_ids))
+
+    changed = [result.quiz_id for result in results if result.changed]
+    if changed:
+        rebuild_stats(repo, changed, batch_size)
+    return model.RegradeReport(
+        quizzes=len(results),
+        solutions=sum(result.processed for result in results),
+        changed=sum(result.changed for result in results),
+        duration_seconds=round(time.perf_counter() - started, 3),
+        progress=results,
+    )
+
+
+class RegradeJob:
+    """Runs one re-grade at a time in a background thread and tracks its
+    progress."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._progress: Dict[int, model.QuizRegrade] = {}
+        self._report = model.RegradeReport()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, repo: RepositoryFactory, **kwargs) -> bool:
+        """Starts a re-grade (arguments as in regrade).
+        :return: False if a re-grade is already running"""
+
+        with self._lock:
+            if self.running:
+                return False
+            self._progress = {}
+            self._report = model.RegradeReport(running=True)
+            self._thread = threading.Thread(
+                target=self._run, args=(repo,), kwargs=kwargs, name="regrade"
+            )
+            self._thread.start()
+        return True
+
+    def join(self, timeout: float = None):
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+
+    def report(self) -> model.RegradeReport:
+        """Gets report of the last re-grade, with progress so far while
+        it runs."""
+
+        with self._lock:
+            report = self._report.copy()
+            if report.running:
+                report.progress = list(self._progress.values())
+                report.solutions = sum(item.processed for item in report.progress)
+                report.changed = sum(item.changed for item in report.progress)
+            return report
+
+    def _update(self, progress: model.QuizRegrade):
+        with self._lock:
+            self._progress[progress.quiz_id] = progress
+
+    def _run(self, repo: RepositoryFactory, **kwargs):
+        try:
+            report = regrade(repo, progress=self._update, **kwargs)
+        except Exception:  # pylint: disable=W0703
+            logging.exception("Re-grade failed")
+            report = self.report()
+            report.running = False
+        with self._lock:
+            self._report = report
+
+
+regrade_job = RegradeJob()
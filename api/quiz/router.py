@@ -1,17 +1,35 @@
 """Quiz module routing and handling logic."""
 
-import json
-from typing import List
+from datetime import datetime
+from typing import List, Optional, Union
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, Header, HTTPException, Query
+from fastapi.responses import StreamingResponse
 
 from api.auth.main import get_current_active_user
 from api.quiz import model
-from api.quiz.main import get_quiz_solution, validate
+from api.quiz.activity import activity_series
+from api.quiz.analysis import get_quiz_analysis
+from api.quiz.attempt import (attempt_key, attempt_scheduler, attempt_view,
+                              complete_submission, draft_questions, is_open,
+                              open_attempt)
+from api.quiz.etag import (NO_CACHE, etag_matches, not_modified,
+                           quiz_cache_control, revision_etag,
+                           set_cache_headers, weak_etag)
+from api.quiz.export import MEDIA_TYPES, export_solutions
+from api.quiz.leaderboard import SSE_HEADERS, SSE_MEDIA_TYPE, leaderboard_hub
+from api.quiz.main import validate
+from api.quiz.snapshot import (drop_snapshot, get_snapshot, publish_snapshot,
+                               render_quiz, snapshot_cache, snapshot_response)
+from api.quiz.stats import stats_summary
+from api.quiz.submission import is_taken, store_solution
+from core.config import get_config
 from core.exception import NotFoundError, UnauthorizedError
+from core.serialization import (document_to_dict, documents_to_list, dumps,
+                                json_response)
 from database.repository import RepositoryFactory, get_repository
-from model import Quiz, QuizSolution, User
-from util import first_item, get_query_params
+from model import Quiz, User
+from util import get_query_params
 
 quiz_router = APIRouter(prefix="/quiz", tags=["Quiz"])
 
@@ -21,6 +39,7 @@ def read_quizzes(
     title: str = None,
     description: str = None,
     owner_email: str = None,
+    if_none_match: Optional[str] = Header(None),
     repo: RepositoryFactory = Depends(get_repository),
 ):
     """Quiz query endpoint. For each parameter the query returns
@@ -31,13 +50,19 @@ def read_quizzes(
     :param title: quiz title
     :param description: quiz description
     :param owner_email: quiz owner email
+    :param if_none_match: If-None-Match header
     :param repo: repository factory
     :return: List of quizzes"""
 
     query_params = get_query_params(title, description, owner_email)
-    result = repo.quiz.filter(**query_params)
-    result = json.loads(result.to_json())
-    return result
+    result = repo.quiz.filter(**query_params, as_dict=True)
+    body = dumps(documents_to_list(result, model.Quiz))
+
+    etag = weak_etag(body)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, NO_CACHE)
+
+    return set_cache_headers(json_response(body), etag, NO_CACHE)
 
 
 @quiz_router.get("/solutions", response_model=List[model.QuizSolution])
@@ -45,6 +70,7 @@ def read_solutions(
     title: str = None,
     description: str = None,
     owner_email: str = None,
+    if_none_match: Optional[str] = Header(None),
     repo: RepositoryFactory = Depends(get_repository),
 ):
     """Quiz solutions endpoint. For each parameter the query returns
@@ -55,30 +81,205 @@ def read_solutions(
     :param title: quiz title
     :param description: quiz description
     :param owner_email: quiz owner email
+    :param if_none_match: If-None-Match header
     :param repo: repository factory
     :return: List of quiz solution"""
 
     query_params = get_query_params(title, description, owner_email)
-    query_result = repo.quiz_solution.filter(**query_params)
-    quiz_solution_list = json.loads(query_result.to_json())
-    response = [get_quiz_solution(item) for item in quiz_solution_list]
-    return response
+    query_result = repo.quiz_solution.filter(**query_params, as_dict=True)
+    body = dumps(documents_to_list(query_result, model.QuizSolution))
+
+    etag = weak_etag(body)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, NO_CACHE)
 
+    return set_cache_headers(json_response(body), etag, NO_CACHE)
 
-@quiz_router.get("/{quiz_id}", response_model=model.Quiz)
-async def get_quiz(quiz_id: int, repo: RepositoryFactory = Depends(get_repository)):
-    """Read/get quiz endpoint.
+
+@quiz_router.get("/{quiz_id}", response_model=Union[model.Quiz, model.TakerQuiz])
+async def get_quiz(
+    quiz_id: int,
+    view: model.QuizView = model.QuizView.full,
+    if_none_match: Optional[str] = Header(None),
+    accept_encoding: Optional[str] = Header(None),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Read/get quiz endpoint. Published quizzes are served from their
+    pre-rendered snapshot (cached in-process for SNAPSHOT_CACHE_SECONDS),
+    so neither the database nor json encoding is involved. Supports
+    conditional requests: if the client copy is fresh 304 is returned.
     :param quiz_id: Quiz ID
+    :param view: full quiz or taker view (without correct answers)
+    :param if_none_match: If-None-Match header
+    :param accept_encoding: Accept-Encoding header
     :param repo: repository factory
     :return: Quiz object"""
 
+    snapshot = snapshot_cache.get(quiz_id)
+    if snapshot is not None:
+        return snapshot_response(snapshot, view, accept_encoding, if_none_match)
+
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+
+    if quiz.is_published:
+        snapshot = get_snapshot(quiz, repo)
+        return snapshot_response(snapshot, view, accept_encoding, if_none_match)
+
+    is_taker = view == model.QuizView.taker
+    etag = revision_etag(quiz.identifier, quiz.revision, is_taker and view.value)
+    cache_control = quiz_cache_control(quiz)
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+
+    response = json_response(render_quiz(quiz, view))
+    return set_cache_headers(response, etag, cache_control)
+
+
+@quiz_router.get(
+    "/{quiz_id}/solutions/export",
+    response_class=StreamingResponse,
+    responses={200: {"content": {media: {} for media in MEDIA_TYPES.values()}}},
+)
+def export_quiz_solutions(
+    quiz_id: int,
+    export_format: model.ExportFormat = Query(
+        model.ExportFormat.ndjson, alias="format"
+    ),
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Quiz solutions export endpoint. Streams all solutions of a quiz
+    as newline delimited json (or csv), reading them from a database
+    cursor in batches. Only the quiz owner may export solutions.
+    :param quiz_id: Quiz ID
+    :param export_format: ndjson or csv
+    :param current_user: Current user
+    :param repo: repository factory
+    :return: Streaming response"""
+
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401)
+
+    batch_size = get_config().EXPORT_BATCH_SIZE
+    content = export_solutions(quiz_id, repo, export_format, batch_size)
+    file_name = f"quiz_{quiz_id}_solutions.{export_format.value}"
+    headers = {"Content-Disposition": f'attachment; filename="{file_name}"'}
+    media_type = MEDIA_TYPES[export_format]
+    return StreamingResponse(content, media_type=media_type, headers=headers)
+
+
+@quiz_router.get("/{quiz_id}/stats", response_model=model.QuizStats)
+def read_quiz_stats(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Quiz statistics endpoint: score statistics of all solutions of a
+    quiz, maintained as solutions are submitted. Only the quiz owner may
+    read them.
+    :param quiz_id: Quiz ID
+    :param current_user: Current user
+    :param repo: repository factory
+    :return: Quiz statistics"""
+
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401)
+
+    return stats_summary(quiz_id, repo.quiz_stats.get(quiz_id))
+
+
+@quiz_router.get(
+    "/{quiz_id}/leaderboard/stream",
+    response_class=StreamingResponse,
+    responses={200: {"content": {SSE_MEDIA_TYPE: {}}}},
+)
+async def stream_quiz_leaderboard(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Quiz leaderboard stream endpoint: server-sent "leaderboard" events
+    with the best solutions of a quiz, sent when they change (at most once
+    per LEADERBOARD_STREAM_MS). Only the quiz owner may watch them.
+    :param quiz_id: Quiz ID
+    :param current_user: Current user
+    :param repo: repository factory
+    :return: Event stream"""
+
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401)
+
+    return StreamingResponse(
+        leaderboard_hub.stream(repo, quiz_id),
+        media_type=SSE_MEDIA_TYPE,
+        headers=SSE_HEADERS,
+    )
+
+
+@quiz_router.get("/{quiz_id}/activity", response_model=model.ActivitySeries)
+def read_quiz_activity(
+    quiz_id: int,
+    resolution: model.Resolution = model.Resolution.minute,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Quiz activity endpoint: submissions of a quiz per minute, hour or
+    day, read from rollup buckets. Only the quiz owner may read it.
+    :param quiz_id: Quiz ID
+    :param resolution: bucket resolution
+    :param start: range start (UTC), defaults to 60 buckets before end
+    :param end: range end (UTC), defaults to now
+    :param current_user: Current user
+    :param repo: repository factory
+    :return: Submission counts by bucket"""
+
+    quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401)
+
+    try:
+        return activity_series(repo, quiz_id, resolution, start, end)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@quiz_router.get("/{quiz_id}/analysis", response_model=model.QuizAnalysis)
+def read_quiz_analysis(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Quiz item analysis endpoint: difficulty, discrimination and answer
+    option counts of every question, computed from all solutions of a
+    quiz and cached until a solution is submitted. Only the quiz owner
+    may read it.
+    :param quiz_id: Quiz ID
+    :param current_user: Current user
+    :param repo: repository factory
+    :return: Quiz item analysis"""
+
     quiz = repo.quiz.get(quiz_id)
     if quiz is None:
         raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email != current_user.email:
+        raise HTTPException(status_code=401)
 
-    kwargs = {"use_db_field": False}
-    json_quiz = json.loads(quiz.to_json(**kwargs))
-    return model.Quiz(**json_quiz)
+    return get_quiz_analysis(quiz, repo, get_config().EXPORT_BATCH_SIZE)
 
 
 @quiz_router.post("/", response_model=model.Quiz)
@@ -99,9 +300,7 @@ async def create_quiz(
     )
 
     quiz_created = repo.quiz.persist(quiz_to_create)
-    kwargs = {"use_db_field": False}
-    json_quiz = json.loads(quiz_created.to_json(**kwargs))
-    return model.Quiz(**json_quiz)
+    return document_to_dict(quiz_created, model.Quiz)
 
 
 @quiz_router.put("/publish/{quiz_id}", response_model=model.QuizPublish)
@@ -126,7 +325,12 @@ async def publish_quiz(
     if quiz_to_publish.owner.email != current_user.email:
         raise HTTPException(status_code=401)
 
-    quiz_to_publish.is_published = True
+    if not quiz_to_publish.is_published:
+        quiz_to_publish.is_published = True
+        quiz_to_publish.revision = (quiz_to_publish.revision or 1) + 1
+        repo.quiz.persist(quiz_to_publish)
+
+    publish_snapshot(quiz_to_publish, repo)
     return model.QuizPublish(**{"identifier": quiz_id, "is_published": True})
 
 
@@ -156,13 +360,41 @@ async def update_quiz(
     updated_quiz = Quiz(
         **quiz_update_data.dict(exclude={"identifier"}),
         identifier=quiz_id,
+        revision=(quiz_to_update.revision or 1) + 1,
         owner=current_user.email,
     )
 
     repo.quiz.persist(updated_quiz)
-    kwargs = {"use_db_field": False}
-    json_quiz = json.loads(updated_quiz.to_json(**kwargs))
-    return model.Quiz(**json_quiz)
+    return document_to_dict(updated_quiz, model.Quiz)
+
+
+def get_takeable_quiz(
+    repo: RepositoryFactory, quiz_id: int, user: User, timed: bool
+) -> Quiz:
+    """Gets published quiz a user may take.
+    :param repo: repository factory
+    :param quiz_id: quiz id
+    :param user: user taking the quiz
+    :param timed: whether the quiz must have a time limit (taken with an
+    attempt) or must not have one
+    :return: quiz"""
+
+    quiz: Quiz = repo.quiz.get(quiz_id)
+    if quiz is None:
+        raise HTTPException(status_code=404, detail="Quiz does not exist")
+    if quiz.owner.email == user.email:
+        raise HTTPException(status_code=403, detail="Not allowed to take his own quiz")
+    if not quiz.is_published:
+        raise HTTPException(
+            status_code=401, detail="Not allowed to take unpublished quiz"
+        )
+    if timed and not quiz.time_limit:
+        raise HTTPException(status_code=400, detail="Quiz is not timed")
+    if not timed and quiz.time_limit:
+        raise HTTPException(
+            status_code=400, detail="Timed quiz must be taken with an attempt"
+        )
+    return quiz
 
 
 @quiz_router.post("/validate", response_model=model.QuizValidationResult)
@@ -177,44 +409,151 @@ async def validate_quiz(
     :param repo: repository factory
     :return: Quiz validation result"""
 
-    quiz_to_take: Quiz = repo.quiz.get(quiz_submit.identifier)
-    if quiz_to_take is None:
-        raise HTTPException(status_code=404, detail="Quiz does not exist")
-
-    if quiz_to_take.owner.email == current_user.email:
-        raise HTTPException(status_code=403, detail="Not allowed to take his own quiz")
-
-    if not quiz_to_take.is_published:
+    quiz_to_take = get_takeable_quiz(
+        repo, quiz_submit.identifier, current_user, timed=False
+    )
+    if is_taken(repo, current_user.email, quiz_submit.identifier):
         raise HTTPException(
-            status_code=401, detail="Not allowed to take unpublished quiz"
+            status_code=401, detail="Not allowed to take same quiz more then once"
         )
 
-    query_params = {"owner": current_user.email, "quiz": quiz_submit.identifier}
+    validation_result = validate(quiz_to_take, quiz_submit)
+    if validation_result is None:
+        raise HTTPException(status_code=400)
 
-    quiz_already_taken = repo.quiz_solution.filter(**query_params)
-    if first_item(quiz_already_taken) is not None:
+    stored = await store_solution(
+        repo, quiz_to_take, current_user.email, quiz_submit, validation_result
+    )
+    if not stored:
         raise HTTPException(
             status_code=401, detail="Not allowed to take same quiz more then once"
         )
+    return validation_result
 
-    validation_result = validate(quiz_to_take, quiz_submit)
-    if validation_result is None:
+
+def get_open_attempt(repo: RepositoryFactory, quiz_id: int, user: User):
+    """Gets attempt of a user still accepting answers."""
+
+    attempt = repo.quiz_attempt.get(attempt_key(quiz_id, user.email))
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="Attempt does not exist")
+    if not is_open(attempt):
+        raise HTTPException(status_code=403, detail="Attempt deadline passed")
+    return attempt
+
+
+@quiz_router.post("/{quiz_id}/attempt", response_model=model.QuizAttempt)
+async def start_attempt(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Timed quiz attempt start endpoint. The deadline is set when the
+    attempt starts, starting it again returns the open attempt.
+    :param quiz_id: Quiz ID
+    :param current_user: current authorized user
+    :param repo: repository factory
+    :return: Open attempt"""
+
+    quiz = get_takeable_quiz(repo, quiz_id, current_user, timed=True)
+    attempt = repo.quiz_attempt.get(attempt_key(quiz_id, current_user.email))
+    if attempt is None:
+        if is_taken(repo, current_user.email, quiz_id):
+            raise HTTPException(
+                status_code=401, detail="Not allowed to take same quiz more then once"
+            )
+        attempt = open_attempt(repo, quiz, current_user.email)
+    return attempt_view(attempt)
+
+
+@quiz_router.get("/{quiz_id}/attempt", response_model=model.QuizAttempt)
+async def read_attempt(
+    quiz_id: int,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Timed quiz attempt endpoint: deadline, remaining time and saved
+    draft answers.
+    :param quiz_id: Quiz ID
+    :param current_user: current authorized user
+    :param repo: repository factory
+    :return: Open attempt"""
+
+    attempt = repo.quiz_attempt.get(attempt_key(quiz_id, current_user.email))
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="Attempt does not exist")
+    return attempt_view(attempt)
+
+
+@quiz_router.put("/{quiz_id}/attempt", response_model=model.QuizAttempt)
+async def save_attempt_draft(
+    quiz_id: int,
+    answers: model.AttemptAnswers,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Timed quiz attempt draft endpoint. Saved answers are submitted
+    when the deadline passes.
+    :param quiz_id: Quiz ID
+    :param answers: Draft answers (replace the saved ones)
+    :param current_user: current authorized user
+    :param repo: repository factory
+    :return: Open attempt"""
+
+    quiz = get_takeable_quiz(repo, quiz_id, current_user, timed=True)
+    attempt = get_open_attempt(repo, quiz_id, current_user)
+    if validate(quiz, complete_submission(quiz, answers.questions)) is None:
         raise HTTPException(status_code=400)
 
-    quiz_solution: QuizSolution = QuizSolution(
-        **quiz_submit.dict(exclude={"identifier"}),
-        quiz=quiz_to_take.identifier,
-        owner=current_user.email,
-        title=quiz_to_take.title,
-        description=quiz_to_take.description,
-        total_points=validation_result.total_points,
-        scored_points=validation_result.points,
+    attempt = repo.quiz_attempt.update(
+        attempt.key, set__questions=draft_questions(answers)
     )
+    if attempt is None:
+        raise HTTPException(status_code=404, detail="Attempt does not exist")
+    return attempt_view(attempt)
+
+
+@quiz_router.post(
+    "/{quiz_id}/attempt/submit", response_model=model.QuizValidationResult
+)
+async def submit_attempt(
+    quiz_id: int,
+    answers: model.AttemptAnswers,
+    current_user: User = Depends(get_current_active_user),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Timed quiz attempt submit endpoint, answers are accepted until the
+    deadline (plus a grace period).
+    :param quiz_id: Quiz ID
+    :param answers: Submitted answers, unanswered questions score 0
+    :param current_user: current authorized user
+    :param repo: repository factory
+    :return: Quiz validation result"""
 
-    result = repo.quiz_solution.persist(quiz_solution)
-    if result is None:
-        raise HTTPException(status_code=500, detail="Unable to persist quiz solution")
+    quiz = get_takeable_quiz(repo, quiz_id, current_user, timed=True)
+    attempt = get_open_attempt(repo, quiz_id, current_user)
+    quiz_submit = complete_submission(quiz, answers.questions)
+    validation_result = validate(quiz, quiz_submit)
+    if validation_result is None:
+        raise HTTPException(status_code=400)
 
+    # claims the attempt, it may be expiring concurrently
+    if not repo.quiz_attempt.delete_many(pk=attempt.key):
+        raise HTTPException(status_code=404, detail="Attempt does not exist")
+    attempt_scheduler.cancel(attempt.key)
+    try:
+        stored = await store_solution(
+            repo, quiz, current_user.email, quiz_submit, validation_result
+        )
+    except Exception:
+        # the attempt stays open, so the answers can be submitted again
+        repo.quiz_attempt.persist(attempt)
+        attempt_scheduler.schedule(attempt)
+        raise
+    if not stored:
+        raise HTTPException(
+            status_code=401, detail="Not allowed to take same quiz more then once"
+        )
     return validation_result
 
 
@@ -237,4 +576,5 @@ async def delete_quiz(
         raise UnauthorizedError()
 
     repo.quiz.delete(quiz_to_delete)
+    drop_snapshot(quiz_id, repo)
     return {"quiz_id": quiz_id, "is_deleted": True}
@@ -0,0 +1,142 @@
+"""Quiz snapshot module. Published quizzes are immutable, so on publish
+they are rendered once into json (full and taker view) plus gzip
+variants and stored; reads then serve the stored bytes as they are."""
+
+import gzip
+import hashlib
+from typing import Optional
+
+from fastapi import Response
+
+from api.quiz import model
+from api.quiz.etag import (etag_matches, not_modified, published_cache_control,
+                           revision_etag, set_cache_headers)
+from core.cache import LRUCache
+from core.config import get_config
+from core.serialization import JSON_MEDIA_TYPE, document_to_dict, dumps
+from database.repository import RepositoryFactory
+from model import Quiz, QuizSnapshot
+
+snapshot_cache = LRUCache(
+    get_config().CACHE_INFO.snapshot_cache_size,
+    get_config().CACHE_INFO.snapshot_cache_seconds,
+)
+
+
+def render_quiz(quiz: Quiz, view: model.QuizView = model.QuizView.full) -> bytes:
+    """Renders quiz into json bytes.
+    :param quiz: quiz document
+    :param view: quiz view to render
+    :return: encoded json"""
+
+    quiz_model = model.Quiz if view == model.QuizView.full else model.TakerQuiz
+    return dumps(document_to_dict(quiz, quiz_model))
+
+
+def create_snapshot(quiz: Quiz) -> QuizSnapshot:
+    """Creates snapshot of a quiz.
+    :param quiz: quiz document
+    :return: quiz snapshot"""
+
+    body = render_quiz(quiz, model.QuizView.full)
+    taker_body = render_quiz(quiz, model.QuizView.taker)
+    return QuizSnapshot(
+        quiz=quiz.identifier,
+        revision=quiz.revision or 1,
+        digest=hashlib.sha256(body).hexdigest(),
+        body=body,
+        body_gzip=gzip.compress(body, mtime=0),
+        taker_body=taker_body,
+        taker_body_gzip=gzip.compress(taker_body, mtime=0),
+    )
+
+
+def publish_snapshot(quiz: Quiz, repo: RepositoryFactory) -> QuizSnapshot:
+    """Creates, stores and caches snapshot of a published quiz.
+    :param quiz: published quiz document
+    :param repo: repository factory
+    :return: quiz snapshot"""
+
+    snapshot = create_snapshot(quiz)
+    repo.quiz_snapshot.persist(snapshot)
+    snapshot_cache.put(snapshot.quiz, snapshot)
+    return snapshot
+
+
+def get_snapshot(quiz: Quiz, repo: RepositoryFactory) -> QuizSnapshot:
+    """Gets snapshot of a published quiz from the store and caches it.
+    A missing or outdated snapshot (quiz published before snapshots
+    existed) is created.
+    :param quiz: published quiz document
+    :param repo: repository factory
+    :return: quiz snapshot"""
+
+    snapshot = repo.quiz_snapshot.get(quiz.identifier)
+    if snapshot is None or snapshot.revision != (quiz.revision or 1):
+        return publish_snapshot(quiz, repo)
+    snapshot_cache.put(quiz.identifier, snapshot)
+    return snapshot
+
+
+def drop_snapshot(quiz_id: int, repo: RepositoryFactory) -> None:
+    """Removes quiz snapshot from store and cache. Other workers drop
+    their cached copy when it expires (SNAPSHOT_CACHE_SECONDS).
+    :param quiz_id: quiz id
+    :param repo: repository factory"""
+
+    snapshot_cache.pop(quiz_id)
+    snapshot = repo.quiz_snapshot.get(quiz_id)
+    if snapshot is not None:
+        repo.quiz_snapshot.delete(snapshot)
+
+
+def snapshot_etag(snapshot: QuizSnapshot, view: model.QuizView) -> str:
+    """ETag of a snapshot view.
+    :param snapshot: quiz snapshot
+    :param view: quiz view
+    :return: quoted strong ETag"""
+
+    suffix = None if view == model.QuizView.full else view.value
+    return revision_etag(snapshot.quiz, snapshot.revision, suffix)
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Checks if client accepts gzip content coding.
+    :param accept_encoding: Accept-Encoding header value
+    :return: True if gzip is accepted"""
+
+    for coding in (accept_encoding or "").split(","):
+        name, _, params = coding.strip().partition(";")
+        if name.strip().lower() in ("gzip", "*"):
+            return params.replace(" ", "") not in ("q=0", "q=0.0", "q=0.00")
+    return False
+
+
+def snapshot_response(
+    snapshot: QuizSnapshot,
+    view: model.QuizView,
+    accept_encoding: Optional[str] = None,
+    if_none_match: Optional[str] = None,
+) -> Response:
+    """Creates response serving snapshot bytes as they are.
+    :param snapshot: quiz snapshot
+    :param view: quiz view
+    :param accept_encoding: Accept-Encoding header value
+    :param if_none_match: If-None-Match header value
+    :return: response"""
+
+    etag, cache_control = snapshot_etag(snapshot, view), published_cache_control()
+    if etag_matches(if_none_match, etag):
+        return not_modified(etag, cache_control)
+
+    is_full = view == model.QuizView.full
+    if accepts_gzip(accept_encoding):
+        body = snapshot.body_gzip if is_full else snapshot.taker_body_gzip
+        headers = {"Content-Encoding": "gzip"}
+    else:
+        body = snapshot.body if is_full else snapshot.taker_body
+        headers = {}
+
+    headers["Vary"] = "Accept-Encoding"
+    response = Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+    return set_cache_headers(response, etag, cache_control)
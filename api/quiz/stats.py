@@ -0,0 +1,192 @@
+"""Quiz statistics module. Running score statistics (count, sum, sum of
+squares, min, max and a fixed bucket histogram of scored/total points
+ratios) are updated atomically, in place, whenever a solution is
+submitted, so reading them does not depend on the number of solutions.
+A rebuild recomputes them from all solutions."""
+
+import math
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional
+
+from api.quiz import model
+from api.quiz.activity import record_submissions
+from database.repository import RepositoryFactory
+from model import QuizStats
+
+STATS_BUCKETS = 10
+
+
+def score_ratio(scored_points: float, total_points: float) -> float:
+    return scored_points / total_points if total_points else 0.0
+
+
+def bucket_index(score: float) -> int:
+    """Gets histogram bucket of a score (scores out of 0..1 go to the
+    first or the last bucket)."""
+
+    return min(max(int(score * STATS_BUCKETS), 0), STATS_BUCKETS - 1)
+
+
+def record_solution(
+    repo: RepositoryFactory, quiz_id: int, scored_points: float, total_points: float
+) -> QuizStats:
+    """Adds score of a submitted solution to the quiz statistics.
+    :param repo: repository factory
+    :param quiz_id: quiz id
+    :param scored_points: scored points of the solution
+    :param total_points: total points of the quiz
+    :return: updated statistics"""
+
+    score = score_ratio(scored_points, total_points)
+    bucket = {f"inc__histogram__{bucket_index(score)}": 1}
+    return repo.quiz_stats.update(
+        quiz_id,
+        upsert=True,
+        inc__count=1,
+        inc__score_sum=score,
+        inc__score_sum_sq=score * score,
+        min__min_score=score,
+        max__max_score=score,
+        **bucket,
+    )
+
+
+def record_solutions(repo: RepositoryFactory, solutions: Iterable[dict]) -> int:
+    """Adds scores of many raw solutions to the quiz statistics, with one
+    update per quiz.
+    :param repo: repository factory
+    :param solutions: raw solution documents
+    :return: number of solutions"""
+
+    accumulators = defaultdict(lambda: QuizStats(histogram={}))
+    count = accumulate(solutions, accumulators)
+    for quiz_id, stats in accumulators.items():
+        buckets = {
+            f"inc__histogram__{key}": value for key, value in stats.histogram.items()
+        }
+        repo.quiz_stats.update(
+            quiz_id,
+            upsert=True,
+            inc__count=stats.count,
+            inc__score_sum=stats.score_sum,
+            inc__score_sum_sq=stats.score_sum_sq,
+            min__min_score=stats.min_score,
+            max__max_score=stats.max_score,
+            **buckets,
+        )
+    return count
+
+
+def record_journaled(repo: RepositoryFactory, solutions: List[dict]):
+    """Records solutions flushed from the solution journal in the quiz
+    statistics and submission activity.
+    :param repo: repository factory
+    :param solutions: raw solution documents"""
+
+    record_solutions(repo, solutions)
+    record_submissions(
+        repo, ((solution["quiz"], solution["submitted_at"]) for solution in solutions)
+    )
+
+
+def stats_summary(quiz_id: int, stats: Optional[QuizStats]) -> model.QuizStats:
+    """Computes statistics summary (mean, standard deviation, histogram).
+    :param quiz_id: quiz id
+    :param stats: running statistics, None if there are no solutions
+    :return: statistics summary"""
+
+    width = 1 / STATS_BUCKETS
+    histogram = stats.histogram if stats is not None else {}
+    buckets = [
+        model.ScoreBucket(
+            lower=round(index * width, 6),
+            upper=round((index + 1) * width, 6),
+            count=histogram.get(str(index), 0),
+        )
+        for index in range(STATS_BUCKETS)
+    ]
+    if stats is None or not stats.count:
+        return model.QuizStats(quiz_id=quiz_id, histogram=buckets)
+
+    mean = stats.score_sum / stats.count
+    variance = max(stats.score_sum_sq / stats.count - mean * mean, 0.0)
+    return model.QuizStats(
+        quiz_id=quiz_id,
+        count=stats.count,
+        mean=mean,
+        stddev=math.sqrt(variance),
+        min_score=stats.min_score,
+        max_score=stats.max_score,
+        histogram=buckets,
+    )
+
+
+def accumulate(solutions: Iterable[dict], accumulators: Dict[int, QuizStats]) -> int:
+    """Adds scores of raw solutions to statistics by quiz.
+    :param solutions: raw solution documents
+    :param accumulators: statistics by quiz id, changed in place
+    :return: number of solutions"""
+
+    count = 0
+    for solution in solutions:
+        stats = accumulators[solution["quiz"]]
+        score = score_ratio(
+            solution.get("scored_points", 0.0), solution.get("total_points", 0)
+        )
+        stats.count += 1
+        stats.score_sum += score
+        stats.score_sum_sq += score * score
+        stats.min_score = (
+            score if stats.min_score is None else min(stats.min_score, score)
+        )
+        stats.max_score = (
+            score if stats.max_score is None else max(stats.max_score, score)
+        )
+        key = str(bucket_index(score))
+        stats.histogram[key] = stats.histogram.get(key, 0) + 1
+        count += 1
+    return count
+
+
+def rebuild_stats(
+    repo: RepositoryFactory, quiz_ids: Iterable[int] = None, batch_size: int = 1000
+) -> model.StatsRebuildReport:
+    """Recomputes quiz statistics from solutions. Solutions submitted
+    while the rebuild runs may be counted twice or missed; rebuild when
+    submissions are paused.
+    :param repo: repository factory
+    :param quiz_ids: quizzes to rebuild, all if omitted
+    :param batch_size: number of solutions read per batch
+    :return: rebuild report"""
+
+    started = time.perf_counter()
+    report = model.StatsRebuildReport()
+    accumulators = defaultdict(lambda: QuizStats(histogram={}))
+    fields = ["quiz", "total_points", "scored_points"]
+    filters = [{}] if quiz_ids is None else [{"quiz": key} for key in quiz_ids]
+    for query in filters:
+        for batch in repo.quiz_solution.stream(batch_size, only=fields, **query):
+            report.solutions += accumulate(batch, accumulators)
+
+    for quiz_id, stats in accumulators.items():
+        stats.quiz = quiz_id
+        repo.quiz_stats.persist(stats)
+    report.quizzes = len(accumulators)
+
+    if quiz_ids is None:
+        stale = (
+            doc["_id"]
+            for batch in repo.quiz_stats.stream(batch_size, only=["quiz"])
+            for doc in batch
+        )
+    else:
+        stale = quiz_ids
+    for quiz_id in [key for key in stale if key not in accumulators]:
+        stats = repo.quiz_stats.get(quiz_id)
+        if stats is not None:
+            repo.quiz_stats.delete(stats)
+            report.removed += 1
+
+    report.duration_seconds = round(time.perf_counter() - started, 3)
+    return report
@@ -0,0 +1,81 @@
+"""Quiz solution submission module: storing scored solutions, shared by
+quiz validation and timed attempts."""
+
+from datetime import datetime
+
+from fastapi import HTTPException
+from mongoengine import NotUniqueError
+
+from api.quiz import model
+from api.quiz.activity import record_submission
+from api.quiz.leaderboard import leaderboard_hub
+from api.quiz.stats import record_solution
+from database.journal import get_journal
+from database.repository import RepositoryFactory
+from model import Quiz, QuizSolution
+from util import first_item
+
+
+def is_taken(repo: RepositoryFactory, owner: str, quiz_id: int) -> bool:
+    """Checks whether a user already submitted a solution of a quiz
+    (stored or still pending in the solution journal)."""
+
+    solutions = repo.quiz_solution.filter(owner=owner, quiz=quiz_id)
+    if first_item(solutions) is not None:
+        return True
+    journal = get_journal()
+    return journal is not None and journal.is_pending(owner, quiz_id)
+
+
+async def store_solution(
+    repo: RepositoryFactory,
+    quiz: Quiz,
+    owner: str,
+    quiz_submit: model.QuizSubmit,
+    result: model.QuizValidationResult,
+    submitted_at: datetime = None,
+) -> bool:
+    """Stores scored solution and records it in the quiz statistics and
+    activity; with the solution journal on, the solution is acknowledged
+    once durable in the journal and flushed in the background. Watched
+    quiz leaderboards are updated right away.
+    :param repo: repository factory
+    :param quiz: solved quiz
+    :param owner: user submitting the solution
+    :param quiz_submit: submitted answers
+    :param result: score of the answers
+    :param submitted_at: submission time (UTC), defaults to now
+    :return: False if a solution of the user is pending in the journal
+    or was stored concurrently"""
+
+    solution = QuizSolution(
+        **quiz_submit.dict(exclude={"identifier"}),
+        quiz=quiz.identifier,
+        owner=owner,
+        title=quiz.title,
+        description=quiz.description,
+        total_points=result.total_points,
+        scored_points=result.points,
+        submitted_at=submitted_at or datetime.utcnow(),
+    )
+
+    journal = get_journal()
+    if journal is not None:
+        solution.identifier = journal.reserve_id()
+        solution.validate()
+        if not await journal.append(solution.to_mongo().to_dict()):
+            return False
+    else:
+        try:
+            persisted = repo.quiz_solution.persist(solution)
+        except NotUniqueError:
+            # unique (owner, quiz) index: another worker stored it first
+            return False
+        if persisted is None:
+            raise HTTPException(
+                status_code=500, detail="Unable to persist quiz solution"
+            )
+        record_solution(repo, quiz.identifier, result.points, result.total_points)
+        record_submission(repo, quiz.identifier, solution.submitted_at)
+    leaderboard_hub.record(quiz.identifier, owner, result.points, solution.submitted_at)
+    return True
@@ -0,0 +1,217 @@
+"""Bulk user provisioning module. User lists (csv or newline delimited
+json) are processed in batches: existing emails are looked up with a
+single query per batch, passwords are hashed in a process pool and new
+users are inserted with bulk writes. Requests share one process pool per
+worker (HASH_WORKERS processes), the command line creates its own."""
+
+import csv
+import json
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from threading import Lock
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from mongoengine import ValidationError as DocumentValidationError
+from pydantic import ValidationError
+
+from api.auth.main import get_password_hash
+from api.user.model import NewUser, UserListFormat, UserProvisionReport
+from core.config import get_config
+from database.repository import RepositoryFactory
+from model import User
+from util import chunked
+
+# (row number, parsed record or None, parse error or None)
+UserRow = Tuple[int, Optional[dict], Optional[str]]
+
+_hash_pool: Optional[ProcessPoolExecutor] = None
+_hash_pool_lock = Lock()
+
+
+def get_hash_pool() -> ProcessPoolExecutor:
+    """Gets password hashing process pool of the worker, created on
+    first use."""
+
+    global _hash_pool  # pylint: disable=W0603
+
+    with _hash_pool_lock:
+        if _hash_pool is None:
+            _hash_pool = ProcessPoolExecutor(max_workers=get_config().HASH_WORKERS)
+        return _hash_pool
+
+
+def close_hash_pool():
+    """Shuts down password hashing process pool of the worker."""
+
+    global _hash_pool  # pylint: disable=W0603
+
+    with _hash_pool_lock:
+        pool, _hash_pool = _hash_pool, None
+    if pool is not None:
+        pool.shutdown()
+
+
+def read_user_rows(
+    lines: Iterable[str], list_format: UserListFormat
+) -> Iterator[UserRow]:
+    """Reads user records. Csv lists need a header with email,
+    first_name, last_name and password columns.
+    :param lines: user list lines
+    :param list_format: user list format
+    :return: generator of user rows"""
+
+    if list_format == UserListFormat.csv:
+        for row, record in enumerate(csv.DictReader(lines), start=1):
+            yield row, record, None
+        return
+
+    for row, line in enumerate((line for line in lines if line.strip()), start=1):
+        try:
+            yield row, json.loads(line), None
+        except ValueError as exc:
+            yield row, None, f"Invalid json: {exc}"
+
+
+def to_user(record: dict) -> Tuple[User, str]:
+    """Validates user record.
+    :param record: user record
+    :return: user (without password hash) and plain text password"""
+
+    new_user = NewUser(**record)
+    user = User(
+        email=new_user.email,
+        first_name=new_user.first_name,
+        last_name=new_user.last_name,
+        password_hash="-",
+        active=True,
+    )
+    user.validate()
+    return user, new_user.password
+
+
+def existing_emails(repo: RepositoryFactory, emails: List[str]) -> Set[str]:
+    """Gets emails of already existing users with a single query.
+    :param repo: repository factory
+    :param emails: emails to check
+    :return: set of existing emails"""
+
+    if not emails:
+        return set()
+
+    rows = repo.user.filter(
+        email__in=emails, only=["email"], as_dict=True, limit=len(emails)
+    )
+    return {row["_id"] for row in rows}
+
+
+def validate_batch(
+    batch: List[UserRow], report: UserProvisionReport
+) -> List[Tuple[int, User, str]]:
+    """Validates a batch of user rows, recording invalid rows and
+    emails repeated within the batch as errors.
+    :param batch: user rows
+    :param report: provisioning report
+    :return: list of (row number, user, plain text password)"""
+
+    candidates, emails = [], set()
+    for row, record, error in batch:
+        if error is None:
+            try:
+                user, password = to_user(record)
+                if user.email in emails:
+                    raise ValueError(f"Duplicate email {user.email}")
+                emails.add(user.email)
+                candidates.append((row, user, password))
+                continue
+            except ValidationError as exc:
+                error = "; ".join(err["msg"] for err in exc.errors())
+            except (ValueError, TypeError, DocumentValidationError) as exc:
+                error = str(exc)
+        report.add_error(row, error)
+    return candidates
+
+
+def lost_emails(repo: RepositoryFactory, documents: List[dict]) -> Set[str]:
+    """Gets emails of users created concurrently instead of the inserted
+    documents (their stored password hash differs, hashes are salted).
+    :param repo: repository factory
+    :param documents: inserted user documents
+    :return: set of emails not created by the insert"""
+
+    emails = [document["_id"] for document in documents]
+    rows = repo.user.filter(
+        email__in=emails, only=["password_hash"], as_dict=True, limit=len(emails)
+    )
+    stored = {row["_id"]: row.get("password_hash") for row in rows}
+    return {
+        document["_id"]
+        for document in documents
+        if stored.get(document["_id"]) != document["password_hash"]
+    }
+
+
+def store_users(
+    repo: RepositoryFactory,
+    new_users: List[Tuple[int, User, str]],
+    report: UserProvisionReport,
+):
+    """Inserts hashed users, reporting rows of users created concurrently
+    after the existence check as existing."""
+
+    documents = [user.to_mongo() for _, user, _ in new_users]
+    created = repo.user.bulk_insert(documents)
+    report.created += created
+    if created == len(documents):
+        return
+    lost = lost_emails(repo, documents)
+    for row, user, _ in new_users:
+        if user.email in lost:
+            report.existing += 1
+            report.add_error(row, "User already exists")
+
+
+def provision_users(
+    rows: Iterable[UserRow],
+    repo: RepositoryFactory,
+    workers: int = 4,
+    batch_size: int = 500,
+    pool: Executor = None,
+) -> UserProvisionReport:
+    """Creates users in bulk.
+    :param rows: user rows
+    :param repo: repository factory
+    :param workers: number of password hashing processes
+    :param batch_size: number of users per batch
+    :param pool: password hashing pool, a process pool of workers
+    processes is created for the call if omitted
+    :return: provisioning report"""
+
+    if pool is None:
+        with ProcessPoolExecutor(max_workers=workers) as own_pool:
+            return provision_users(rows, repo, workers, batch_size, own_pool)
+
+    started = time.perf_counter()
+    report = UserProvisionReport()
+
+    for batch in chunked(rows, batch_size):
+        report.read += len(batch)
+        candidates = validate_batch(batch, report)
+
+        existing = existing_emails(repo, [user.email for _, user, _ in candidates])
+        new_users = []
+        for row, user, password in candidates:
+            if user.email in existing:
+                report.existing += 1
+                report.add_error(row, "User already exists")
+            else:
+                new_users.append((row, user, password))
+
+        passwords = [password for _, _, password in new_users]
+        chunk_size = max(1, len(passwords) // (workers * 4))
+        hashes = pool.map(get_password_hash, passwords, chunksize=chunk_size)
+        for (_, user, _), password_hash in zip(new_users, hashes):
+            user.password_hash = password_hash
+        store_users(repo, new_users, report)
+
+    report.finish(time.perf_counter() - started)
+    return report
@@ -4,9 +4,12 @@
 
 """Auth module models."""
 
+from enum import Enum
 
 from pydantic.main import BaseModel
 
+from api.model import BulkReport
+
 
 class BaseUser(BaseModel):
     """Base user model."""
@@ -20,3 +23,17 @@ class NewUser(BaseUser):
     """New user model: used for user signup."""
 
     password: str
+
+
+class UserListFormat(str, Enum):
+    """User list format used for bulk provisioning."""
+
+    csv = "csv"
+    ndjson = "ndjson"
+
+
+class UserProvisionReport(BulkReport):
+    """Bulk user provisioning report."""
+
+    created: int = 0
+    existing: int = 0
@@ -1,10 +1,16 @@
 """User routing and endpoint handling logic."""
 
-from fastapi import APIRouter, Depends, HTTPException
+import io
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
 
 from api.auth import pwd_context
-from api.auth.main import get_current_active_user
-from api.user.model import BaseUser, NewUser
+from api.auth.main import get_current_active_user, get_current_admin_user
+from api.user.bulk import get_hash_pool, provision_users, read_user_rows
+from api.user.model import (BaseUser, NewUser, UserListFormat,
+                            UserProvisionReport)
+from core.config import get_config
 from database.repository import RepositoryFactory, get_repository
 from model import User
 
@@ -45,3 +51,33 @@ def get_current_user(current_user: User = Depends(get_current_active_user)):
         first_name=current_user.first_name,
         last_name=current_user.last_name,
     )
+
+
+@user_router.post(
+    "/bulk",
+    response_model=UserProvisionReport,
+    dependencies=[Depends(get_current_admin_user)],
+)
+def provision(
+    users_file: UploadFile = File(...),
+    list_format: Optional[UserListFormat] = Query(None, alias="format"),
+    repo: RepositoryFactory = Depends(get_repository),
+):
+    """Bulk user provisioning endpoint (admin only). Existing users are
+    reported and left unchanged.
+    :param users_file: csv (email,first_name,last_name,password header)
+    or newline delimited json user list
+    :param list_format: user list format, inferred from file name if omitted
+    :param repo: repository factory
+    :return: provisioning report"""
+
+    if list_format is None:
+        filename = (users_file.filename or "").lower()
+        list_format = (
+            UserListFormat.csv if filename.endswith(".csv") else UserListFormat.ndjson
+        )
+
+    lines = io.TextIOWrapper(users_file.file, encoding="utf-8", newline="")
+    rows = read_user_rows(lines, list_format)
+    workers = get_config().HASH_WORKERS
+    return provision_users(rows, repo, workers=workers, pool=get_hash_pool())
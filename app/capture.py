@@ -0,0 +1,329 @@
+"""Traffic capture middleware. A sample of requests (CAPTURE_SAMPLE_RATE)
+is recorded with its timing, redacted credentials and a digest of the
+response, so it can be replayed later against another build (python
+cli.py replay). Records are written by a background thread into gzip
+compressed NDJSON segments under CAPTURE_DIR; the oldest segments are
+deleted once the directory exceeds CAPTURE_MAX_MB."""
+
+import base64
+import gzip
+import hashlib
+import json
+import logging
+import os
+import queue
+import random
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode
+
+from jose import jwt
+from jose.exceptions import JOSEError
+
+from core.config import get_config
+from core.context import route_template
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+QUEUE_SIZE = 10000
+
+# request headers worth replaying, all others (cookies, api keys, ...) are dropped
+REPLAYED_HEADERS = frozenset(
+    {"accept", "accept-encoding", "content-type", "if-match", "if-none-match"}
+)
+# fields replaced with REDACTED_PASSWORD in query strings, json and form bodies
+SENSITIVE_FIELDS = frozenset(
+    {"password", "new_password", "access_token", "refresh_token", "token", "secret"}
+)
+# valid password, so replayed signups and logins of replayed signups succeed
+REDACTED_PASSWORD = "Replay_pass1"
+FORM_TYPE = "application/x-www-form-urlencoded"
+
+
+def redact_value(value):
+    """Redacts sensitive fields of a json value."""
+
+    if isinstance(value, dict):
+        return {
+            key: REDACTED_PASSWORD if key in SENSITIVE_FIELDS else redact_value(val)
+            for key, val in value.items()
+        }
+    if isinstance(value, list):
+        return [redact_value(val) for val in value]
+    return value
+
+
+def redact_pairs(pairs: List[Tuple[str, str]]) -> List[Tuple[str, str]]:
+    return [
+        (key, REDACTED_PASSWORD if key in SENSITIVE_FIELDS else value)
+        for key, value in pairs
+    ]
+
+
+def redact_body(content_type: str, body: bytes) -> Tuple[Optional[str], str]:
+    """Redacts request body; only json and form bodies are kept (uploads
+    may hold credentials).
+    :param content_type: request content type
+    :param body: request body
+    :return: redacted body (None if omitted) and its encoding"""
+
+    if not body:
+        return "", "text"
+    if content_type.startswith(FORM_TYPE):
+        pairs = parse_qsl(body.decode("latin-1"), keep_blank_values=True)
+        return urlencode(redact_pairs(pairs)), "text"
+    if "json" in content_type:
+        try:
+            return json.dumps(redact_value(json.loads(body))), "text"
+        except ValueError:
+            return base64.b64encode(body).decode("ascii"), "base64"
+    return None, "omitted"
+
+
+def bearer_user(authorization: str) -> Tuple[Optional[str], bool]:
+    """Gets subject of a bearer token (not verified, it is only used to
+    mint a token of the same user on replay).
+    :param authorization: Authorization header value
+    :return: user and whether the request was authenticated"""
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None, bool(authorization)
+    try:
+        return jwt.get_unverified_claims(token).get("sub"), True
+    except JOSEError:
+        return None, True
+
+
+def capture_record(scope, started: float, body: bytes, truncated: bool) -> Dict:
+    """Creates capture record of a request (response fields are added
+    when it completes)."""
+
+    headers = {
+        key.decode("latin-1").lower(): value.decode("latin-1")
+        for key, value in scope["headers"]
+    }
+    user, authenticated = bearer_user(headers.get("authorization", ""))
+    query = urlencode(
+        redact_pairs(parse_qsl(scope["query_string"].decode("latin-1"), True))
+    )
+    record = {
+        "ts": started,
+        "method": scope["method"],
+        "path": scope["path"],
+        "query": query,
+        "headers": {
+            key: value for key, value in headers.items() if key in REPLAYED_HEADERS
+        },
+        "authenticated": authenticated,
+        "user": user,
+        "body": None,
+        "body_encoding": "truncated",
+    }
+    if not truncated:
+        content_type = headers.get("content-type", "")
+        record["body"], record["body_encoding"] = redact_body(content_type, body)
+    return record
+
+
+class CaptureWriter:
+    """Writes capture records into rotated gzip NDJSON segments in a
+    background thread."""
+
+    def __init__(
+        self, directory: str = None, segment_mb: float = None, max_mb: float = None
+    ):
+        """Constructor
+        :param directory: capture directory, defaults to CAPTURE_DIR setting
+        :param segment_mb: segment size (uncompressed) in megabytes
+        :param max_mb: disk space (compressed) of all segments in megabytes"""
+
+        settings = get_config().MONITORING_INFO
+        self.directory = directory or settings.capture_dir
+        segment_mb = settings.capture_segment_mb if segment_mb is None else segment_mb
+        max_mb = settings.capture_max_mb if max_mb is None else max_mb
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.dropped = 0
+        self._queue = queue.Queue(QUEUE_SIZE)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._segment = None
+        self._segment_size = 0
+
+    def write(self, record: Dict):
+        """Queues record; records are dropped while the queue is full."""
+
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._run, name="capture", daemon=True
+                    )
+                    self._thread.start()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        """Writes queued records and closes the current segment."""
+
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def segments(self) -> List[str]:
+        """Gets segment paths, oldest first."""
+
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(
+            name for name in os.listdir(self.directory) if name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _run(self):
+        while True:
+            record = self._queue.get()
+            if record is None:
+                break
+            try:
+                self._write(record)
+            except OSError as exc:
+                logging.warning("Traffic capture write failed: %s", exc)
+        self._close_segment()
+
+    def _write(self, record: Dict):
+        line = (json.dumps(record, separators=(",", ":")) + "\n").encode("utf-8")
+        if self._segment is None:
+            os.makedirs(self.directory, exist_ok=True)
+            name = f"capture-{time.time_ns()}-{os.getpid()}{SEGMENT_SUFFIX}"
+            self._segment = gzip.open(os.path.join(self.directory, name), "wb")
+            self._segment_size = 0
+        self._segment.write(line)
+        self._segment_size += len(line)
+        if self._segment_size >= self.segment_bytes:
+            self._close_segment()
+
+    def _close_segment(self):
+        if self._segment is None:
+            return
+        self._segment.close()
+        self._segment = None
+        self._enforce_limit()
+
+    def _enforce_limit(self):
+        """Deletes oldest segments while all of them exceed the limit."""
+
+        segments = self.segments()
+        sizes = [os.path.getsize(path) for path in segments]
+        total = sum(sizes)
+        for path, size in zip(segments, sizes):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+_writer: Optional[CaptureWriter] = None
+
+
+def get_capture_writer() -> CaptureWriter:
+    """Gets capture writer, created from the settings on first use."""
+
+    global _writer  # pylint: disable=W0603
+
+    if _writer is None:
+        _writer = CaptureWriter()
+    return _writer
+
+
+def set_capture_writer(writer: Optional[CaptureWriter]) -> Optional[CaptureWriter]:
+    """Sets capture writer.
+    :param writer: capture writer, None to create one from the settings
+    :return: previous capture writer"""
+
+    global _writer  # pylint: disable=W0603
+
+    previous, _writer = _writer, writer
+    return previous
+
+
+class CapturedExchange:
+    """Request body and response summary of a captured request."""
+
+    def __init__(self, max_body: int):
+        """Constructor
+        :param max_body: request body bytes kept, longer bodies are
+        truncated (dropped)"""
+
+        self.max_body = max_body
+        self.chunks: List[bytes] = []
+        self.received = 0
+        self.truncated = False
+        self.status = 500
+        self.size = 0
+        self.digest = hashlib.sha256()
+
+    def request_message(self, message: dict):
+        if message["type"] != "http.request" or self.truncated:
+            return
+        body = message.get("body", b"")
+        self.received += len(body)
+        self.truncated = self.received > self.max_body
+        if self.truncated:
+            self.chunks.clear()
+        else:
+            self.chunks.append(body)
+
+    def response_message(self, message: dict):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+        elif message["type"] == "http.response.body":
+            body = message.get("body", b"")
+            self.size += len(body)
+            self.digest.update(body)
+
+
+class CaptureMiddleware:
+    """ASGI middleware recording a sample of requests."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        settings = get_config().MONITORING_INFO
+        rate = settings.capture_sample_rate
+        if scope["type"] != "http" or rate <= 0 or random.random() >= rate:
+            await self.app(scope, receive, send)
+            return
+
+        exchange = CapturedExchange(settings.capture_max_body_kb * 1024)
+
+        async def receive_wrapper():
+            message = await receive()
+            exchange.request_message(message)
+            return message
+
+        async def send_wrapper(message):
+            exchange.response_message(message)
+            await send(message)
+
+        started = time.time()
+        timer = time.perf_counter()
+        try:
+            await self.app(scope, receive_wrapper, send_wrapper)
+        finally:
+            body = b"".join(exchange.chunks)
+            record = capture_record(scope, started, body, exchange.truncated)
+            record.update(
+                route=route_template(scope),
+                status=exchange.status,
+                response_size=exchange.size,
+                response_digest=exchange.digest.hexdigest(),
+                duration_ms=round((time.perf_counter() - timer) * 1000, 3),
+            )
+            get_capture_writer().write(record)
@@ -0,0 +1,22 @@
+"""Request context middleware."""
+
+from core.context import request_scope
+
+
+class RequestContextMiddleware:
+    """ASGI middleware publishing the request scope in a context
+    variable for the duration of the request."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        token = request_scope.set(scope)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_scope.reset(token)
@@ -0,0 +1,287 @@
+"""Idempotency key middleware. Quiz creation and submission requests
+carrying an Idempotency-Key header are executed once per user and key:
+the response is stored for IDEMPOTENCY_TTL_HOURS (a TTL index expires
+it) and returned again, with Idempotent-Replayed header, when the client
+retries. Before running, a request claims its key with an "in progress"
+record inserted only if the key is absent, so one worker runs it:
+retries arriving meanwhile, on any worker, wait for its response (for
+at most IDEMPOTENCY_LEASE_SECONDS, then get 409), and a claim older than
+the lease is taken to be abandoned by a stopped worker and replaced.
+Reusing a key for a different request is rejected with 422; server
+errors are not stored, so a retry after them runs the request again."""
+
+import asyncio
+import hashlib
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from jose.exceptions import JOSEError
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from api.auth.main import get_username_from_access_token
+from core.config import get_config
+from database.repository import RepositoryFactory, get_repository
+from model import IdempotencyRecord
+
+IDEMPOTENT_ROUTES = frozenset({("POST", "/quiz/"), ("POST", "/quiz/validate")})
+MAX_KEY_LENGTH = 255
+REPLAYED_HEADER = ["idempotent-replayed", "true"]
+# status of a claimed key whose request still runs
+IN_PROGRESS = 0
+POLL_SECONDS = 0.05
+
+# status, headers and body of a response
+StoredResponse = Tuple[int, List[List[str]], bytes]
+
+
+def digest(*parts) -> str:
+    sha = hashlib.sha256()
+    for part in parts:
+        sha.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        sha.update(b"\n")
+    return sha.hexdigest()
+
+
+def request_user(authorization: str) -> Optional[str]:
+    """Gets user of a verified bearer token.
+    :param authorization: Authorization header value
+    :return: user, None if the token is missing or invalid"""
+
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    token_info = get_config().TOKEN_INFO
+    try:
+        return get_username_from_access_token(
+            token, token_info.jwt_signature, token_info.jwt_algorithm
+        )
+    except (HTTPException, JOSEError):
+        return None
+
+
+async def read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body", False):
+            return b"".join(chunks)
+
+
+def error_response(status_code: int, message: str) -> JSONResponse:
+    return JSONResponse(
+        status_code=status_code,
+        content={"error_code": "IDEMPOTENCY_KEY_ERROR", "message": message},
+    )
+
+
+async def replay(send, response: StoredResponse):
+    status, headers, body = response
+    await send(
+        {
+            "type": "http.response.start",
+            "status": status,
+            "headers": [
+                (name.encode("latin-1"), value.encode("latin-1"))
+                for name, value in headers + [REPLAYED_HEADER]
+            ],
+        }
+    )
+    await send({"type": "http.response.body", "body": body})
+
+
+def claim_key(
+    repo: RepositoryFactory, key: str, fingerprint: str
+) -> Tuple[bool, Optional[IdempotencyRecord]]:
+    """Claims a key with an in progress record, unless it holds a live
+    record; expired records and abandoned claims are replaced.
+    :return: whether the key was claimed and its current record"""
+
+    now = datetime.utcnow()
+    record = repo.idempotency_record.get(key)
+    if record is not None:
+        ttl = timedelta(hours=get_config().IDEMPOTENCY_TTL_HOURS)
+        if record.status == IN_PROGRESS:
+            ttl = timedelta(seconds=get_config().IDEMPOTENCY_LEASE_SECONDS)
+        # mongo removes expired records periodically, not at expiry
+        if record.created_at + ttl > now:
+            return False, record
+        repo.idempotency_record.delete_many(pk=key, created_at=record.created_at)
+
+    claim = IdempotencyRecord(
+        key=key, fingerprint=fingerprint, status=IN_PROGRESS, created_at=now
+    )
+    if repo.idempotency_record.bulk_insert([claim.to_mongo().to_dict()]):
+        return True, claim
+    return False, repo.idempotency_record.get(key)
+
+
+def store_response(
+    repo: RepositoryFactory, key: str, fingerprint: str, response: StoredResponse
+):
+    """Stores the response of a claimed key."""
+
+    status, headers, body = response
+    repo.idempotency_record.update(
+        key,
+        upsert=True,
+        set__fingerprint=fingerprint,
+        set__status=status,
+        set__headers=headers,
+        set__body=body,
+        set__created_at=datetime.utcnow(),
+    )
+
+
+class RecordedExchange:
+    """Request replaying an already read body and recording its
+    response while forwarding it."""
+
+    def __init__(self, body: bytes, receive, send):
+        """Constructor
+        :param body: request body read before the request runs
+        :param receive: ASGI receive channel, used once the body is replayed
+        :param send: ASGI send channel responses are forwarded to"""
+
+        self.body = body
+        self.received = False
+        self.downstream_receive = receive
+        self.downstream_send = send
+        self.status = 500
+        self.headers: List[List[str]] = []
+        self.chunks: List[bytes] = []
+
+    async def receive(self) -> dict:
+        if self.received:
+            return await self.downstream_receive()
+        self.received = True
+        return {"type": "http.request", "body": self.body, "more_body": False}
+
+    async def send(self, message: dict):
+        if message["type"] == "http.response.start":
+            self.status = message["status"]
+            self.headers = [
+                [name.decode("latin-1"), value.decode("latin-1")]
+                for name, value in message.get("headers", [])
+            ]
+        elif message["type"] == "http.response.body":
+            self.chunks.append(message.get("body", b""))
+        await self.downstream_send(message)
+
+    def response(self) -> StoredResponse:
+        return self.status, self.headers, b"".join(self.chunks)
+
+
+class IdempotencyMiddleware:
+    """ASGI middleware executing requests with an Idempotency-Key header
+    once and replaying their responses."""
+
+    def __init__(self, app):
+        self.app = app
+        # requests in flight in this worker: key -> (fingerprint, response)
+        self._inflight: Dict[str, Tuple[str, asyncio.Future]] = {}
+
+    async def __call__(self, scope, receive, send):
+        route = scope.get("method"), scope["path"]
+        if scope["type"] != "http" or route not in IDEMPOTENT_ROUTES:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        client_key = headers.get(b"idempotency-key")
+        user = request_user(headers.get(b"authorization", b"").decode("latin-1"))
+        # unauthenticated requests are rejected by the endpoint
+        if client_key is None or user is None:
+            await self.app(scope, receive, send)
+            return
+        client_key = client_key.decode("latin-1")
+        if not client_key or len(client_key) > MAX_KEY_LENGTH:
+            response = error_response(
+                400, f"Idempotency-Key must have 1 to {MAX_KEY_LENGTH} characters"
+            )
+            await response(scope, receive, send)
+            return
+
+        body = await read_body(receive)
+        key = digest(user, scope["method"], scope["path"], client_key)
+        fingerprint = digest(
+            scope["method"], scope["path"], scope["query_string"], body
+        )
+        stored = await self._previous(scope, key, fingerprint)
+        if isinstance(stored, JSONResponse):
+            await stored(scope, receive, send)
+        elif stored is not None:
+            await replay(send, stored)
+        else:
+            await self._execute(scope, body, receive, send, key, fingerprint)
+
+    async def _previous(self, scope, key: str, fingerprint: str):
+        """Gets response of a previous request with the same key, waiting
+        for it while it runs, or claims the key.
+        :return: stored response, error response if the key was used for
+        another request, None if the key is claimed for this request"""
+
+        inflight = self._inflight.get(key)
+        if inflight is None:
+            return await self._claim(self._repository(scope), key, fingerprint)
+        if inflight[0] != fingerprint:
+            return error_response(422, "Idempotency-Key was used for another request")
+        response = await asyncio.shield(inflight[1])
+        if response is None:
+            return error_response(409, "Request with the same Idempotency-Key failed")
+        return response
+
+    async def _claim(self, repo: RepositoryFactory, key: str, fingerprint: str):
+        """Claims a key in the shared store, polling a key claimed by
+        another worker until its response is stored."""
+
+        deadline = time.monotonic() + get_config().IDEMPOTENCY_LEASE_SECONDS
+        while True:
+            claimed, record = await run_in_threadpool(claim_key, repo, key, fingerprint)
+            if claimed:
+                return None
+            if record is not None and record.fingerprint != fingerprint:
+                return error_response(
+                    422, "Idempotency-Key was used for another request"
+                )
+            if record is not None and record.status != IN_PROGRESS:
+                return record.status, record.headers, record.body
+            if time.monotonic() >= deadline:
+                return error_response(
+                    409, "Request with the same Idempotency-Key is in progress"
+                )
+            await asyncio.sleep(POLL_SECONDS)
+
+    async def _execute(self, scope, body: bytes, receive, send, key, fingerprint):
+        """Runs the request, forwarding and recording its response; the
+        claim is released if the response is not stored."""
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = (fingerprint, future)
+        exchange = RecordedExchange(body, receive, send)
+        repo = self._repository(scope)
+        response = None
+        try:
+            await self.app(scope, exchange.receive, exchange.send)
+            if exchange.status < 500:
+                response = exchange.response()
+                await run_in_threadpool(
+                    store_response, repo, key, fingerprint, response
+                )
+        finally:
+            del self._inflight[key]
+            future.set_result(response)
+            if response is None:
+                await run_in_threadpool(
+                    repo.idempotency_record.delete_many, pk=key, status=IN_PROGRESS
+                )
+
+    @staticmethod
+    def _repository(scope):
+        """Gets repository factory, honouring dependency overrides."""
+
+        overrides = getattr(scope.get("app"), "dependency_overrides", {})
+        return overrides.get(get_repository, get_repository)()
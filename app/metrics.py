@@ -0,0 +1,56 @@
+"""HTTP metrics middleware. A pure ASGI middleware (no request/response
+objects are created) recording request counts, latency and response
+size per route template plus in-flight requests."""
+
+import time
+
+from core.context import route_template
+from core.metrics import REGISTRY, SIZE_BUCKETS
+
+REQUESTS = REGISTRY.counter(
+    "http_requests_total", "HTTP requests.", ("method", "route", "status")
+)
+LATENCY = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency.", ("method", "route")
+)
+RESPONSE_SIZE = REGISTRY.histogram(
+    "http_response_size_bytes",
+    "HTTP response body size.",
+    ("method", "route"),
+    buckets=SIZE_BUCKETS,
+)
+IN_FLIGHT = REGISTRY.gauge("http_requests_in_flight", "HTTP requests in progress.")
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording HTTP metrics."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status, size = 500, 0
+
+        async def send_wrapper(message):
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+            await send(message)
+
+        IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            IN_FLIGHT.dec()
+            labels = (scope["method"], route_template(scope))
+            REQUESTS.inc(labels + (str(status),))
+            LATENCY.observe(elapsed, labels)
+            RESPONSE_SIZE.observe(size, labels)
@@ -0,0 +1,173 @@
+"""Request profiling middleware. A request is run under the sampling
+profiler if an admin user asks for it (X-Profile header or profile query
+parameter, value 1, speedscope or collapsed) or if it is picked by
+PROFILE_SAMPLE_RATE. Profiles are written to PROFILE_DIR and the file
+name is returned in X-Profile-Output header. Requests not profiled cost
+a header lookup; the admin check of a token is cached."""
+
+import os
+import random
+import re
+import threading
+import uuid
+from datetime import datetime
+from typing import Optional, Tuple
+from urllib.parse import parse_qs
+
+from starlette.concurrency import run_in_threadpool
+
+from api.auth.main import get_username_from_access_token
+from core.cache import LRUCache
+from core.config import get_config
+from core.context import route_template
+from core.profiler import FILE_SUFFIXES, PROFILE_FORMATS, SamplingProfiler
+from database.repository import get_repository
+
+PROFILE_HEADER = b"x-profile"
+OUTPUT_HEADER = b"x-profile-output"
+ADMIN_CACHE_SIZE = 1024
+ADMIN_CACHE_SECONDS = 60
+
+# sampled (not explicitly requested) profiles do not overlap
+sampled_profile = threading.Lock()
+# bearer token -> is the token of an admin user
+admin_cache = LRUCache(ADMIN_CACHE_SIZE, ADMIN_CACHE_SECONDS)
+
+
+def requested_format(scope) -> Optional[str]:
+    """Gets profile format requested by the X-Profile header or profile
+    query parameter (None if profiling is not requested)."""
+
+    value = None
+    for name, header_value in scope["headers"]:
+        if name == PROFILE_HEADER:
+            value = header_value.decode("latin-1")
+            break
+    if value is None and b"profile=" in scope.get("query_string", b""):
+        query = parse_qs(scope["query_string"].decode("latin-1"))
+        value = query.get("profile", [None])[0]
+
+    if value is None or value.lower() in ("", "0", "false"):
+        return None
+    value = value.lower()
+    return (
+        value
+        if value in PROFILE_FORMATS
+        else get_config().MONITORING_INFO.profile_format
+    )
+
+
+def bearer_token(scope) -> Optional[str]:
+    """Gets the bearer token of a request (None if there is none)."""
+
+    authorization = ""
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            authorization = value.decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    return token if scheme.lower() == "bearer" and token else None
+
+
+def token_is_admin(app, token: str) -> bool:
+    """Checks a bearer token belongs to an active admin user. The
+    repository is resolved through app dependency overrides, as endpoints
+    resolve it."""
+
+    token_info = get_config().TOKEN_INFO
+    try:
+        username = get_username_from_access_token(
+            token, token_info.jwt_signature, token_info.jwt_algorithm
+        )
+    except Exception:  # pylint: disable=broad-except
+        return False
+
+    repo = app.dependency_overrides.get(get_repository, get_repository)()
+    user = repo.user.get(username)
+    return bool(user is not None and user.active and user.is_admin)
+
+
+async def is_admin(scope) -> bool:
+    """Checks the request bearer token belongs to an active admin user,
+    caching the answer per token for ADMIN_CACHE_SECONDS."""
+
+    token = bearer_token(scope)
+    if token is None:
+        return False
+    admin = admin_cache.get(token)
+    if admin is None:
+        admin = await run_in_threadpool(token_is_admin, scope["app"], token)
+        admin_cache.put(token, admin)
+    return admin
+
+
+async def profile_decision(scope) -> Tuple[Optional[str], bool]:
+    """Decides if a request is profiled: requested by an admin user or
+    picked by the sample rate.
+    :return: profile format (None if not profiled) and if the request
+    holds the sampled profile lock"""
+
+    settings = get_config().MONITORING_INFO
+    profile_format = requested_format(scope)
+    if profile_format is not None:
+        return (profile_format if await is_admin(scope) else None), False
+
+    sample_rate = settings.profile_sample_rate
+    if sample_rate and random.random() < sample_rate:
+        if sampled_profile.acquire(blocking=False):
+            return settings.profile_format, True
+    return None, False
+
+
+def profile_path(scope, profile_format: str) -> str:
+    settings = get_config().MONITORING_INFO
+    route = re.sub(r"[^A-Za-z0-9]+", "_", route_template(scope)).strip("_") or "root"
+    timestamp = datetime.utcnow().strftime("%Y%m%dT%H%M%S")
+    name = f"{timestamp}-{scope['method']}-{route}-{uuid.uuid4().hex[:6]}"
+    return os.path.join(settings.profile_dir, f"{name}.{FILE_SUFFIXES[profile_format]}")
+
+
+class ProfilingMiddleware:
+    """ASGI middleware running requests under the sampling profiler."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        profile_format, sampled = await profile_decision(scope)
+        if profile_format is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self._profile(scope, receive, send, profile_format)
+        finally:
+            if sampled:
+                sampled_profile.release()
+
+    async def _profile(self, scope, receive, send, profile_format: str):
+        path = None
+
+        async def send_wrapper(message):
+            nonlocal path
+            if message["type"] == "http.response.start":
+                path = profile_path(scope, profile_format)
+                headers = list(message.get("headers", []))
+                headers.append((OUTPUT_HEADER, os.path.basename(path).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        interval = get_config().MONITORING_INFO.profile_interval_ms / 1000
+        profiler = SamplingProfiler(interval)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            if path is None:
+                path = profile_path(scope, profile_format)
+            name = f"{scope['method']} {scope['path']}"
+            await run_in_threadpool(profiler.write, path, profile_format, name)
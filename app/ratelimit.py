@@ -0,0 +1,335 @@
+"""Rate limiting and load shedding middleware. Every request takes a
+token from the buckets of its client address, of its user (verified
+bearer token) and, for expensive routes, of its route per user (or
+address); a request is rejected with 429 and Retry-After when any bucket
+is empty. Buckets live in worker memory (RATE_LIMIT_BACKEND=memory) or
+in a sqlite file shared by the workers of a host (sqlite). Independently
+of the limits, requests are shed with 503 while the worker has more than
+SHED_MAX_IN_FLIGHT requests in progress or its event loop lags more than
+SHED_LOOP_LAG_MS. With the default RATE_LIMIT_BACKEND=none no limits
+apply."""
+
+import logging
+import math
+import sqlite3
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import JSONResponse
+
+from app.idempotency import request_user
+from core.config import get_config
+from core.looplag import loop_monitor
+from core.metrics import REGISTRY
+
+# routes that are never shed, so the worker stays observable
+SHED_EXEMPT_PATHS = ("/metrics", "/admin/")
+STREAM_PATH_SUFFIX = "/stream"
+MAX_MEMORY_BUCKETS = 100000
+# busy wait for other workers, a busy store fails open
+SQLITE_TIMEOUT = 0.005
+SQLITE_CLEANUP_EVERY = 10000
+IDLE_SECONDS = 3600
+
+RATE_LIMITED = REGISTRY.counter(
+    "rate_limited_requests_total", "Requests rejected by rate limits.", ("limit",)
+)
+SHED = REGISTRY.counter(
+    "shed_requests_total", "Requests rejected by load shedding.", ("reason",)
+)
+
+
+class Limit(NamedTuple):
+    """Token bucket refilled with rate tokens per second up to burst."""
+
+    rate: float
+    burst: float
+
+
+def parse_limit(value: str) -> Optional[Limit]:
+    """Parses rate/burst limit (burst defaults to the rate).
+    :param value: limit i.e. 10/40
+    :return: limit, None if disabled"""
+
+    rate, _, burst = value.strip().partition("/")
+    limit = Limit(float(rate), float(burst or rate))
+    return limit if limit.rate > 0 and limit.burst >= 1 else None
+
+
+def parse_routes(value: str) -> Dict[Tuple[str, str], Limit]:
+    """Parses route limits.
+    :param value: comma separated limits i.e. POST /token=1/5,GET /quiz/=2/10
+    :return: limits by (method, path)"""
+
+    limits = {}
+    for item in filter(None, (part.strip() for part in value.split(","))):
+        route, _, limit = item.rpartition("=")
+        method, _, path = route.strip().partition(" ")
+        parsed = parse_limit(limit)
+        if parsed is not None:
+            limits[(method.upper(), path.strip())] = parsed
+    return limits
+
+
+def refill(tokens: float, updated: float, limit: Limit, now: float) -> float:
+    return min(limit.burst, tokens + max(0.0, now - updated) * limit.rate)
+
+
+def take(
+    states: List[Optional[Tuple[float, float]]], limits: List[Limit], now: float
+) -> Tuple[List[float], List[float]]:
+    """Takes a token from every bucket, or from none if one is empty.
+    :param states: (tokens, updated) of the buckets, None for new buckets
+    :param limits: limits of the buckets
+    :param now: current time
+    :return: seconds until each bucket has a token (all 0 if taken) and
+    the new token counts"""
+
+    tokens = [
+        limit.burst if state is None else refill(*state, limit, now)
+        for state, limit in zip(states, limits)
+    ]
+    waits = [max(0.0, (1 - count) / limit.rate) for count, limit in zip(tokens, limits)]
+    if any(waits):
+        return waits, tokens
+    return waits, [count - 1 for count in tokens]
+
+
+class MemoryBuckets:
+    """Token buckets of a worker."""
+
+    blocking = False
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._lock = threading.Lock()
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._limits: Dict[str, Limit] = {}
+
+    def acquire(self, buckets: List[Tuple[str, Limit]]) -> List[float]:
+        """Takes a token from every bucket.
+        :param buckets: bucket keys and limits
+        :return: seconds to wait for each bucket, all 0 if taken"""
+
+        now = time.time()
+        keys = [key for key, _ in buckets]
+        limits = [limit for _, limit in buckets]
+        with self._lock:
+            states = [self._buckets.get(key) for key in keys]
+            waits, tokens = take(states, limits, now)
+            for key, limit, count in zip(keys, limits, tokens):
+                self._buckets[key] = (count, now)
+                self._limits[key] = limit
+            if len(self._buckets) > self.max_buckets:
+                self._evict(now)
+        return waits
+
+    def _evict(self, now: float):
+        """Drops full buckets (a new bucket is full too)."""
+
+        for key, state in list(self._buckets.items()):
+            limit = self._limits[key]
+            if refill(*state, limit, now) >= limit.burst:
+                del self._buckets[key]
+                del self._limits[key]
+
+
+class SqliteBuckets:
+    """Token buckets in a sqlite file shared by the workers of a host
+    (acquired off the event loop, as sqlite calls block)."""
+
+    blocking = True
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._acquired = 0
+        self._connection = sqlite3.connect(
+            path, timeout=SQLITE_TIMEOUT, isolation_level=None, check_same_thread=False
+        )
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS buckets "
+            "(key TEXT PRIMARY KEY, tokens REAL, updated REAL)"
+        )
+
+    def acquire(self, buckets: List[Tuple[str, Limit]]) -> List[float]:
+        """Takes a token from every bucket in one transaction; fails open
+        when the database is busy.
+        :param buckets: bucket keys and limits
+        :return: seconds to wait for each bucket, all 0 if taken"""
+
+        keys = [key for key, _ in buckets]
+        limits = [limit for _, limit in buckets]
+        with self._lock:
+            try:
+                return self._acquire(keys, limits)
+            except sqlite3.Error as exc:
+                logging.warning("Rate limit store unavailable: %s", exc)
+                return [0.0] * len(keys)
+
+    def _acquire(self, keys: List[str], limits: List[Limit]) -> List[float]:
+        cursor = self._connection.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            rows = cursor.execute(
+                "SELECT key, tokens, updated FROM buckets WHERE key IN "
+                f"({','.join('?' * len(keys))})",
+                keys,
+            ).fetchall()
+            stored = {key: (tokens, updated) for key, tokens, updated in rows}
+            waits, tokens = take([stored.get(key) for key in keys], limits, now)
+            cursor.executemany(
+                "INSERT OR REPLACE INTO buckets (key, tokens, updated) VALUES (?, ?, ?)",
+                [(key, count, now) for key, count in zip(keys, tokens)],
+            )
+            self._acquired += 1
+            if self._acquired % SQLITE_CLEANUP_EVERY == 0:
+                cursor.execute(
+                    "DELETE FROM buckets WHERE updated < ?", (now - IDLE_SECONDS,)
+                )
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            raise
+        return waits
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
+
+
+def create_buckets(backend: str = None):
+    """Creates bucket store.
+    :param backend: none, memory or sqlite, defaults to RATE_LIMIT_BACKEND
+    setting
+    :return: bucket store, None if rate limiting is off"""
+
+    settings = get_config().RATE_LIMIT_INFO
+    backend = backend or settings.rate_limit_backend
+    if backend == "memory":
+        return MemoryBuckets()
+    if backend == "sqlite":
+        return SqliteBuckets(settings.rate_limit_sqlite_path)
+    return None
+
+
+def error_response(status_code: int, error_code: str, retry_after: float):
+    seconds = max(1, math.ceil(retry_after))
+    return JSONResponse(
+        status_code=status_code,
+        content={"error_code": error_code, "message": f"Retry in {seconds}s"},
+        headers={"Retry-After": str(seconds)},
+    )
+
+
+class RateLimitMiddleware:
+    """ASGI middleware applying token bucket limits and shedding load."""
+
+    def __init__(
+        self,
+        app,
+        buckets=None,
+        user_limit: Optional[Limit] = None,
+        ip_limit: Optional[Limit] = None,
+        route_limits: Dict[Tuple[str, str], Limit] = None,
+        max_in_flight: int = None,
+        loop_lag_ms: float = None,
+    ):
+        """Constructor, limits default to the settings
+        :param app: ASGI application
+        :param buckets: bucket store, defaults to RATE_LIMIT_BACKEND store
+        :param user_limit: limit per user
+        :param ip_limit: limit per client address
+        :param route_limits: limits per route and user (or address)
+        :param max_in_flight: requests in progress before shedding, 0 is off
+        :param loop_lag_ms: event loop lag before shedding, 0 is off"""
+
+        settings = get_config().RATE_LIMIT_INFO
+        self.app = app
+        self.buckets = create_buckets() if buckets is None else buckets
+        self.user_limit = user_limit or parse_limit(settings.rate_limit_user)
+        self.ip_limit = ip_limit or parse_limit(settings.rate_limit_ip)
+        self.route_limits = (
+            parse_routes(settings.rate_limit_routes)
+            if route_limits is None
+            else route_limits
+        )
+        self.max_in_flight = (
+            settings.shed_max_in_flight if max_in_flight is None else max_in_flight
+        )
+        loop_lag_ms = settings.shed_loop_lag_ms if loop_lag_ms is None else loop_lag_ms
+        self.max_loop_lag = loop_lag_ms / 1000
+        self.in_flight = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        response = self._shed(scope) or await self._limit(scope)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+        if scope["path"].endswith(STREAM_PATH_SUFFIX):
+            # long-lived streams are not requests in progress
+            await self.app(scope, receive, send)
+            return
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
+
+    def _shed(self, scope) -> Optional[JSONResponse]:
+        if scope["path"].startswith(SHED_EXEMPT_PATHS):
+            return None
+        if 0 < self.max_in_flight <= self.in_flight:
+            SHED.inc(("in_flight",))
+            return error_response(503, "SERVICE_UNAVAILABLE", 1)
+        lag = loop_monitor.lag
+        if 0 < self.max_loop_lag <= lag:
+            SHED.inc(("loop_lag",))
+            return error_response(503, "SERVICE_UNAVAILABLE", lag)
+        return None
+
+    async def _limit(self, scope) -> Optional[JSONResponse]:
+        if self.buckets is None:
+            return None
+        buckets = self._request_buckets(scope)
+        if not buckets:
+            return None
+
+        waits = await self._acquire([(key, limit) for key, limit, _ in buckets])
+        wait = max(waits)
+        if wait <= 0:
+            return None
+        RATE_LIMITED.inc((buckets[waits.index(wait)][2],))
+        return error_response(429, "TOO_MANY_REQUESTS", wait)
+
+    def _request_buckets(self, scope) -> List[Tuple[str, Limit, str]]:
+        """Gets key, limit and kind of the buckets a request takes from."""
+
+        client = (scope.get("client") or ("unknown",))[0]
+        headers = dict(scope["headers"])
+        user = request_user(headers.get(b"authorization", b"").decode("latin-1"))
+        buckets = []
+        if self.ip_limit is not None:
+            buckets.append((f"ip:{client}", self.ip_limit, "ip"))
+        if self.user_limit is not None and user is not None:
+            buckets.append((f"user:{user}", self.user_limit, "user"))
+        route = scope["method"], scope["path"]
+        route_limit = self.route_limits.get(route)
+        if route_limit is not None:
+            key = f"route:{' '.join(route)}:{user or client}"
+            buckets.append((key, route_limit, "route"))
+        return buckets
+
+    async def _acquire(self, buckets: List[Tuple[str, Limit]]) -> List[float]:
+        if self.buckets.blocking:
+            return await run_in_threadpool(self.buckets.acquire, buckets)
+        return self.buckets.acquire(buckets)
@@ -1,16 +1,114 @@
 """Server module."""
 
+from functools import partial
+
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
 
 from api import router
+from api.quiz.attempt import attempt_scheduler
+from api.quiz.stats import record_journaled
+from api.user.bulk import close_hash_pool
+from app.capture import CaptureMiddleware, get_capture_writer
+from app.context import RequestContextMiddleware
+from app.idempotency import IdempotencyMiddleware
+from app.metrics import MetricsMiddleware
+from app.profiling import ProfilingMiddleware
+from app.ratelimit import RateLimitMiddleware
+from app.tracing import TracingMiddleware
+from core.config import get_config
+from core.context import endpoint_codes
 from core.exception import CustomError
+from core.looplag import loop_monitor
+from core.serialization import FastJSONResponse, use_backend
+from database.journal import SubmissionJournal, set_journal
+from database.repository import get_memory_repository, get_repository
+
+
+def register_loop_monitor(the_app: FastAPI) -> None:
+    """Monitors event loop lag while the app runs."""
+
+    @the_app.on_event("startup")
+    async def start_loop_monitor():
+        """Starts event loop lag monitor."""
+
+        loop_monitor.start(endpoint_codes(the_app))
+
+    @the_app.on_event("shutdown")
+    async def stop_loop_monitor():
+        await loop_monitor.stop()
+
+
+def register_attempt_scheduler(the_app: FastAPI) -> None:
+    """Expires timed quiz attempts while the app runs."""
+
+    @the_app.on_event("startup")
+    async def start_attempt_scheduler():
+        """Schedules open timed quiz attempts and starts expiring them."""
+
+        attempt_scheduler.start(get_repository())
+
+    @the_app.on_event("shutdown")
+    async def stop_attempt_scheduler():
+        await attempt_scheduler.stop()
+
+
+def register_journal(the_app: FastAPI) -> None:
+    """Journals solutions while the app runs, if SOLUTION_JOURNAL is on."""
+
+    if not get_config().STORAGE_INFO.solution_journal:
+        return
+
+    @the_app.on_event("startup")
+    def start_journal():
+        """Replays the solution journal and starts flushing it."""
+
+        repo = get_repository()
+        journal = SubmissionJournal(repo, partial(record_journaled, repo))
+        journal.start()
+        set_journal(journal)
+
+    @the_app.on_event("shutdown")
+    def close_journal():
+        """Flushes journaled solutions."""
+
+        journal = set_journal(None)
+        if journal is not None:
+            journal.close()
+
+
+def register_memory_snapshot(the_app: FastAPI) -> None:
+    """Saves in-memory repositories on shutdown, if a snapshot path is
+    set."""
+
+    storage = get_config().STORAGE_INFO
+    if storage.repository_backend != "memory" or not storage.memory_snapshot_path:
+        return
+
+    @the_app.on_event("shutdown")
+    def save_memory_snapshot():
+        """Saves in-memory repositories to the snapshot file."""
+
+        get_memory_repository().save_snapshot()
+
+
+def close_capture():
+    """Writes captured requests still queued."""
+
+    get_capture_writer().close()
 
 
 def init(the_app: FastAPI) -> None:
     """Initialize resources."""
 
     the_app.include_router(router=router)
+    the_app.add_middleware(IdempotencyMiddleware)
+    the_app.add_middleware(ProfilingMiddleware)
+    the_app.add_middleware(RequestContextMiddleware)
+    the_app.add_middleware(TracingMiddleware)
+    the_app.add_middleware(RateLimitMiddleware)
+    the_app.add_middleware(MetricsMiddleware)
+    the_app.add_middleware(CaptureMiddleware)
 
     @the_app.exception_handler(CustomError)
     async def custom_exception_handler(request: Request, exc: CustomError):
@@ -21,6 +119,13 @@ def init(the_app: FastAPI) -> None:
             content={"error_code": exc.error_code, "message": exc.message},
         )
 
+    register_loop_monitor(the_app)
+    register_attempt_scheduler(the_app)
+    register_journal(the_app)
+    the_app.add_event_handler("shutdown", close_hash_pool)
+    the_app.add_event_handler("shutdown", close_capture)
+    register_memory_snapshot(the_app)
+
 
 def on_auth_error(request: Request, exc: Exception):
     status_code, error_code, message = 401, None, str(exc)
@@ -35,12 +140,16 @@ def on_auth_error(request: Request, exc: Exception):
     )
 
 
-def create_app() -> FastAPI:
-    """Create application."""
+def create_app(json_backend: str = None) -> FastAPI:
+    """Create application.
+    :param json_backend: json encoding backend, orjson or std (standard
+    library json); defaults to JSON_BACKEND setting"""
 
+    use_backend(json_backend or get_config().JSON_BACKEND)
     the_app = FastAPI(
         description="Quiz builder API",
         version="1.0.0",
+        default_response_class=FastJSONResponse,
     )
 
     init(the_app)
@@ -0,0 +1,41 @@
+"""Tracing middleware: runs every request as the root span of a trace
+(continuing the trace of an incoming W3C traceparent header) and returns
+traceparent of sampled requests in the response."""
+
+from core.context import route_template
+from core.tracing import start_trace
+
+
+class TracingMiddleware:
+    """ASGI tracing middleware."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope["headers"])
+        traceparent = headers.get(b"traceparent", b"").decode("latin-1")
+        with start_trace(scope["method"], traceparent) as root:
+            if root is None:
+                await self.app(scope, receive, send)
+                return
+
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    root.attributes["http.status_code"] = message["status"]
+                    message["headers"] = list(message.get("headers", [])) + [
+                        (b"traceparent", root.traceparent().encode("latin-1"))
+                    ]
+                await send(message)
+
+            root.attributes["http.method"] = scope["method"]
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = route_template(scope)
+                root.name = f"{scope['method']} {route}"
+                root.attributes["http.route"] = route
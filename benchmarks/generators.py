@@ -0,0 +1,154 @@
+"""Synthetic data generators used by benchmarks. Generated quizzes
+honour MAX_QUESTIONS and MAX_ANSWERS_PER_QUESTION settings and mix
+single and multiple correct answer questions. Generators are seeded,
+so every run measures the same data."""
+
+import random
+from typing import List, Optional
+
+from api.quiz import model
+from core.config import get_config
+from model import (Answer, AnswerSubmit, Question, QuestionSubmit, Quiz,
+                   QuizSolution)
+
+
+def check_size(questions: Optional[int], answers: Optional[int]):
+    """Gets quiz size, defaults to (and bounded by) the configured limits.
+    :param questions: number of questions per quiz
+    :param answers: number of answers per question
+    :return: number of questions and answers"""
+
+    config = get_config()
+    questions = config.MAX_QUESTIONS if questions is None else questions
+    answers = config.MAX_ANSWERS_PER_QUESTION if answers is None else answers
+    if not 0 < questions <= config.MAX_QUESTIONS:
+        raise ValueError(f"Number of questions must be 1..{config.MAX_QUESTIONS}")
+    if not 1 < answers <= config.MAX_ANSWERS_PER_QUESTION:
+        raise ValueError(
+            f"Number of answers must be 2..{config.MAX_ANSWERS_PER_QUESTION}"
+        )
+    return questions, answers
+
+
+def make_answers(rng: random.Random, start: int, answers: int) -> List[Answer]:
+    """Builds answers with one (odd questions: several) correct answers."""
+
+    correct = {rng.randrange(answers)}
+    if start % 2:
+        correct |= set(rng.sample(range(answers), rng.randint(1, answers - 1)))
+    return [
+        Answer(
+            identifier=start + ans_id,
+            answer_text=f"Answer {start + ans_id}",
+            is_correct=ans_id in correct,
+        )
+        for ans_id in range(answers)
+    ]
+
+
+def make_quiz(
+    quiz_id: int,
+    questions: int = None,
+    answers: int = None,
+    seed: int = 0,
+) -> Quiz:
+    """Builds quiz document (not persisted) with identifiers assigned.
+    :param quiz_id: quiz identifier
+    :param questions: number of questions, defaults to MAX_QUESTIONS
+    :param answers: answers per question, defaults to MAX_ANSWERS_PER_QUESTION
+    :param seed: random seed
+    :return: quiz document"""
+
+    questions, answers = check_size(questions, answers)
+    rng = random.Random(seed * 7919 + quiz_id)
+    return Quiz(
+        identifier=quiz_id,
+        title=f"Synthetic quiz {quiz_id}",
+        description="Synthetic quiz used by benchmarks",
+        is_published=True,
+        owner=f"owner{quiz_id % 10}@example.com",
+        questions=[
+            Question(
+                identifier=que_id,
+                title=f"Question number {que_id}",
+                answers=make_answers(rng, que_id * answers, answers),
+            )
+            for que_id in range(1, questions + 1)
+        ],
+    )
+
+
+def make_quizzes(
+    count: int, questions: int = None, answers: int = None, seed: int = 0
+) -> List[Quiz]:
+    """Builds quiz documents (not persisted) with identifiers assigned."""
+
+    return [make_quiz(quiz_id, questions, answers, seed) for quiz_id in range(count)]
+
+
+def make_submission(
+    quiz: Quiz, correct_ratio: float = 0.7, seed: int = 0
+) -> model.QuizSubmit:
+    """Builds quiz submission, a given ratio of questions is answered
+    correctly, the rest is answered at random (single answer questions
+    get at most one answer).
+    :param quiz: quiz to submit
+    :param correct_ratio: ratio of correctly answered questions
+    :param seed: random seed
+    :return: quiz submission"""
+
+    rng = random.Random(seed * 7919 + (quiz.identifier or 0))
+    questions = []
+    for question in quiz.questions:
+        correct = [answer.is_correct for answer in question.answers]
+        if rng.random() < correct_ratio:
+            chosen = correct
+        elif sum(correct) == 1:
+            pick = rng.randrange(len(correct))
+            chosen = [ans_id == pick for ans_id in range(len(correct))]
+        else:
+            chosen = [rng.random() < 0.5 for _ in correct]
+        questions.append(
+            model.QuestionSubmit(
+                identifier=question.identifier,
+                answers=[
+                    model.AnswerSubmit(identifier=answer.identifier, is_correct=value)
+                    for answer, value in zip(question.answers, chosen)
+                ],
+            )
+        )
+    return model.QuizSubmit(identifier=quiz.identifier, questions=questions)
+
+
+def make_solutions(
+    count: int, questions: int = None, answers: int = None, seed: int = 0
+) -> List[QuizSolution]:
+    """Builds quiz solution documents (not persisted) of a single quiz."""
+
+    quiz = make_quiz(1, questions, answers, seed)
+    solutions = []
+    for solution_id in range(count):
+        submit = make_submission(quiz, seed=seed + solution_id)
+        solutions.append(
+            QuizSolution(
+                identifier=solution_id,
+                title=quiz.title,
+                quiz=quiz.identifier,
+                owner=f"taker{solution_id}@example.com",
+                total_points=len(quiz.questions),
+                scored_points=float(solution_id % len(quiz.questions)),
+                questions=[
+                    QuestionSubmit(
+                        identifier=que.identifier,
+                        answers=[
+                            AnswerSubmit(
+                                identifier=ans.identifier, is_correct=ans.is_correct
+                            )
+                            for ans in que.answers
+                        ],
+                    )
+                    for que in submit.questions
+                ],
+            )
+        )
+    return solutions
@@ -0,0 +1,347 @@
+"""End-to-end load test harness simulating an exam day: a quiz author
+signs up, logs in, creates and publishes a quiz, then takers (provisioned
+directly in the repository, their tokens minted locally) concurrently
+read the quiz and submit their solutions. Runs in-process against the
+ASGI app or over HTTP against a running server and reports throughput
+and latency percentiles per endpoint. A saturation sweep repeats the
+exam phase at growing concurrency to find the throughput peak of one
+worker and estimate the number of workers an exam needs.
+
+Run: python cli.py load-test --takers 1000 --concurrency 50"""
+
+import asyncio
+import math
+import time
+import uuid
+from collections import defaultdict
+from typing import Dict, List, Optional, Sequence
+
+import httpx
+from pydantic.main import BaseModel
+
+from api.auth.main import create_access_token, get_password_hash
+from api.quiz import model
+from benchmarks.generators import make_quiz, make_submission
+from core.config import get_config
+from model import User
+
+TAKER_PASSWORD = "LoadTest_1"
+REQUESTS_PER_TAKER = 2
+
+
+class EndpointStats(BaseModel):
+    """Load test statistics of an endpoint."""
+
+    endpoint: str
+    requests: int
+    errors: int
+    requests_per_second: float
+    p50_ms: float
+    p95_ms: float
+    p99_ms: float
+    max_ms: float
+
+
+class LoadTestReport(BaseModel):
+    """Load test report of an exam run."""
+
+    takers: int
+    concurrency: int
+    duration_seconds: float
+    requests_per_second: float
+    endpoints: List[EndpointStats] = []
+
+
+class SweepReport(BaseModel):
+    """Saturation sweep report."""
+
+    levels: List[LoadTestReport] = []
+    saturation_concurrency: int = 0
+    peak_requests_per_second: float = 0.0
+    exam_takers: int = 0
+    exam_window_seconds: float = 0.0
+    recommended_workers: int = 0
+
+
+def percentile(values: Sequence[float], fraction: float) -> float:
+    """Nearest rank percentile of sorted values."""
+
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(values)))
+    return values[rank - 1]
+
+
+class Recorder:
+    """Collects request latencies per endpoint."""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    async def request(
+        self, client: httpx.AsyncClient, endpoint: str, method: str, url: str, **kwargs
+    ) -> Optional[httpx.Response]:
+        """Sends request and records its latency.
+        :param client: http client
+        :param endpoint: endpoint (route template) the request is reported under
+        :param method: http method
+        :param url: request url
+        :return: response or None if the request failed"""
+
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, url, **kwargs)
+        except httpx.HTTPError:
+            response = None
+        self.latencies[endpoint].append((time.perf_counter() - started) * 1000)
+        if response is None or response.status_code >= 400:
+            self.errors[endpoint] += 1
+        return response
+
+    def report(self, takers: int, concurrency: int, duration: float) -> LoadTestReport:
+        endpoints = []
+        for endpoint, latencies in sorted(self.latencies.items()):
+            latencies.sort()
+            endpoints.append(
+                EndpointStats(
+                    endpoint=endpoint,
+                    requests=len(latencies),
+                    errors=self.errors[endpoint],
+                    requests_per_second=round(len(latencies) / duration, 1),
+                    p50_ms=round(percentile(latencies, 0.50), 2),
+                    p95_ms=round(percentile(latencies, 0.95), 2),
+                    p99_ms=round(percentile(latencies, 0.99), 2),
+                    max_ms=round(latencies[-1], 2),
+                )
+            )
+        total = sum(stats.requests for stats in endpoints)
+        return LoadTestReport(
+            takers=takers,
+            concurrency=concurrency,
+            duration_seconds=round(duration, 3),
+            requests_per_second=round(total / duration, 1),
+            endpoints=endpoints,
+        )
+
+
+def create_client(
+    app=None, url: str = None, concurrency: int = 100
+) -> httpx.AsyncClient:
+    """Creates http client, in-process (ASGI transport) if app is given.
+    :param app: ASGI application
+    :param url: server url i.e. http://127.0.0.1:8888
+    :param concurrency: maximum number of connections
+    :return: http client"""
+
+    if app is not None:
+        transport = httpx.ASGITransport(app=app)
+        return httpx.AsyncClient(transport=transport, base_url="http://loadtest")
+
+    limits = httpx.Limits(max_connections=concurrency)
+    return httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+
+
+def auth_header(token: str) -> Dict[str, str]:
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def login(
+    client: httpx.AsyncClient, recorder: Recorder, email: str, password: str
+) -> str:
+    """Logs in through the token endpoint.
+    :return: access token"""
+
+    response = await recorder.request(
+        client,
+        "POST /token",
+        "POST",
+        "/token",
+        data={"username": email, "password": password},
+    )
+    if response is None or response.status_code != 200:
+        raise RuntimeError(f"Login of {email} failed")
+    return response.json()["access_token"]
+
+
+async def prepare_exam(
+    client: httpx.AsyncClient, recorder: Recorder, run_id: str
+) -> model.Quiz:
+    """Signs up quiz author, logs in, creates and publishes a quiz.
+    :param client: http client
+    :param recorder: latency recorder
+    :param run_id: unique id of the run
+    :return: created quiz"""
+
+    email = f"author-{run_id}@loadtest.example.com"
+    new_user = {
+        "email": email,
+        "first_name": "Load",
+        "last_name": "Tester",
+        "password": TAKER_PASSWORD,
+    }
+    response = await recorder.request(
+        client, "POST /user/signup", "POST", "/user/signup", json=new_user
+    )
+    if response is None or response.status_code != 200:
+        raise RuntimeError("Author signup failed")
+
+    headers = auth_header(await login(client, recorder, email, TAKER_PASSWORD))
+    new_quiz = model.NewQuiz(**make_quiz(0).to_mongo().to_dict())
+    response = await recorder.request(
+        client, "POST /quiz/", "POST", "/quiz/", json=new_quiz.dict(), headers=headers
+    )
+    if response is None or response.status_code != 200:
+        raise RuntimeError("Quiz creation failed")
+    quiz = model.Quiz(**response.json())
+
+    await recorder.request(
+        client,
+        "PUT /quiz/publish/{quiz_id}",
+        "PUT",
+        f"/quiz/publish/{quiz.identifier}",
+        headers=headers,
+    )
+    return quiz
+
+
+def provision_takers(repo, run_id: str, takers: int) -> List[str]:
+    """Creates takers directly in the repository (one password hash is
+    shared, so provisioning does not dominate the run).
+    :param repo: repository factory
+    :param run_id: unique id of the run
+    :param takers: number of takers
+    :return: taker emails"""
+
+    password_hash = get_password_hash(TAKER_PASSWORD)
+    emails = [f"taker-{run_id}-{taker}@loadtest.example.com" for taker in range(takers)]
+    repo.user.bulk_insert(
+        [
+            User(
+                email=email,
+                first_name="Load",
+                last_name="Taker",
+                password_hash=password_hash,
+                active=True,
+            ).to_mongo()
+            for email in emails
+        ]
+    )
+    return emails
+
+
+def mint_token(email: str) -> str:
+    token_info = get_config().TOKEN_INFO
+    return create_access_token(
+        data={"sub": email},
+        secret_key=token_info.jwt_signature,
+        algorithm=token_info.jwt_algorithm,
+    )
+
+
+async def take_exam(
+    client: httpx.AsyncClient,
+    recorder: Recorder,
+    quiz: model.Quiz,
+    taker: int,
+    token: str,
+):
+    """Single taker flow: read quiz (taker view) and submit solution."""
+
+    headers = auth_header(token)
+    await recorder.request(
+        client,
+        "GET /quiz/{quiz_id}",
+        "GET",
+        f"/quiz/{quiz.identifier}",
+        params={"view": "taker"},
+        headers=headers,
+    )
+    submission = make_submission(quiz, seed=taker)
+    await recorder.request(
+        client,
+        "POST /quiz/validate",
+        "POST",
+        "/quiz/validate",
+        json=submission.dict(),
+        headers=headers,
+    )
+
+
+async def run_exam(
+    client: httpx.AsyncClient,
+    repo,
+    takers: int,
+    concurrency: int,
+    logins: int = 0,
+) -> LoadTestReport:
+    """Runs exam scenario.
+    :param client: http client
+    :param repo: repository factory used to provision takers
+    :param takers: number of takers
+    :param concurrency: number of concurrently active takers
+    :param logins: number of takers logging in through the token endpoint
+    (password hashing is expensive), others use locally minted tokens
+    :return: load test report of the exam phase"""
+
+    run_id = uuid.uuid4().hex[:8]
+    quiz = await prepare_exam(client, Recorder(), run_id)
+    emails = provision_takers(repo, run_id, takers)
+    tokens = [mint_token(email) for email in emails[logins:]]
+
+    recorder = Recorder()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def taker_flow(taker: int):
+        async with semaphore:
+            if taker < logins:
+                token = await login(client, recorder, emails[taker], TAKER_PASSWORD)
+            else:
+                token = tokens[taker - logins]
+            await take_exam(client, recorder, quiz, taker, token)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(taker_flow(taker) for taker in range(takers)))
+    return recorder.report(takers, concurrency, time.perf_counter() - started)
+
+
+async def run_sweep(
+    client: httpx.AsyncClient,
+    repo,
+    takers: int,
+    max_concurrency: int,
+    exam_takers: int,
+    exam_window: float,
+    slo_ms: float = 500.0,
+) -> SweepReport:
+    """Runs exam scenario at doubling concurrency until throughput stops
+    growing (less than 10%) or p99 latency exceeds the SLO.
+    :param client: http client
+    :param repo: repository factory used to provision takers
+    :param takers: number of takers per level
+    :param max_concurrency: highest concurrency level
+    :param exam_takers: expected number of exam takers
+    :param exam_window: seconds in which all exam takers submit
+    :param slo_ms: p99 latency objective in milliseconds
+    :return: sweep report"""
+
+    sweep = SweepReport(exam_takers=exam_takers, exam_window_seconds=exam_window)
+    concurrency = 1
+    while concurrency <= max_concurrency:
+        report = await run_exam(client, repo, takers, concurrency)
+        sweep.levels.append(report)
+        p99 = max((stats.p99_ms for stats in report.endpoints), default=0.0)
+        peak = sweep.peak_requests_per_second
+        if p99 > slo_ms or report.requests_per_second < peak * 1.1:
+            break
+        sweep.saturation_concurrency = concurrency
+        sweep.peak_requests_per_second = report.requests_per_second
+        concurrency *= 2
+
+    if not sweep.saturation_concurrency:
+        first = sweep.levels[0]
+        sweep.saturation_concurrency = first.concurrency
+        sweep.peak_requests_per_second = first.requests_per_second
+    required = exam_takers * REQUESTS_PER_TAKER / exam_window
+    sweep.recommended_workers = math.ceil(required / sweep.peak_requests_per_second)
+    return sweep
@@ -0,0 +1,265 @@
+"""Replay of captured traffic (see app.capture) against the in-process
+app (in-memory or mongo repository) or a running server. Requests are
+sent with their captured timing, scaled by a speed factor, or as fast
+as possible; tokens of authenticated requests are minted for the
+captured users. The report compares status codes, response digests and
+latency per route with the capture, or with a previous replay report.
+
+Run: python cli.py replay --speed 0 captures/"""
+
+import asyncio
+import base64
+import gzip
+import hashlib
+import heapq
+import json
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import httpx
+from pydantic.main import BaseModel
+
+from app.capture import SEGMENT_SUFFIX
+from benchmarks.loadtest import auth_header, mint_token, percentile
+
+INVALID_TOKEN = "invalid"
+
+
+class RouteDiff(BaseModel):
+    """Replay statistics of a route compared with the reference (the
+    capture or a previous replay)."""
+
+    route: str
+    requests: int
+    errors: int = 0
+    status_mismatches: int = 0
+    body_mismatches: int = 0
+    reference_p50_ms: float = 0.0
+    replayed_p50_ms: float = 0.0
+    reference_p95_ms: float = 0.0
+    replayed_p95_ms: float = 0.0
+    p95_change: Optional[float]
+
+
+class ReplayReport(BaseModel):
+    """Replay report."""
+
+    reference: str = "capture"
+    requests: int = 0
+    skipped: int = 0
+    speed: float = 0.0
+    duration_seconds: float = 0.0
+    routes: List[RouteDiff] = []
+
+
+def read_segment(path: str) -> Iterator[dict]:
+    """Reads records of a capture segment (a segment cut short by a
+    crash is read up to the damage)."""
+
+    with gzip.open(path, "rt", encoding="utf-8") as file_handle:
+        try:
+            for line in file_handle:
+                if line.strip():
+                    yield json.loads(line)
+        except (EOFError, OSError, ValueError):
+            return
+
+
+def read_capture(paths: Iterable[str]) -> Iterator[dict]:
+    """Reads capture records of segment files and directories in the
+    order they were received (segments of all workers are merged).
+    :param paths: segment files or capture directories
+    :return: capture records"""
+
+    segments = []
+    for path in paths:
+        if os.path.isdir(path):
+            segments.extend(
+                os.path.join(path, name)
+                for name in sorted(os.listdir(path))
+                if name.endswith(SEGMENT_SUFFIX)
+            )
+        else:
+            segments.append(path)
+    return heapq.merge(
+        *(read_segment(path) for path in segments), key=lambda record: record["ts"]
+    )
+
+
+def request_kwargs(record: dict, tokens: Dict[str, str]) -> Optional[dict]:
+    """Builds request of a capture record.
+    :param record: capture record
+    :param tokens: minted tokens by user
+    :return: httpx request arguments, None if the request can not be
+    replayed (body omitted or truncated)"""
+
+    encoding = record["body_encoding"]
+    if encoding not in ("text", "base64"):
+        return None
+    content = record["body"] or ""
+    content = (
+        base64.b64decode(content) if encoding == "base64" else content.encode("utf-8")
+    )
+
+    headers = dict(record["headers"])
+    if record["authenticated"]:
+        user = record["user"]
+        if user is not None and user not in tokens:
+            tokens[user] = mint_token(user)
+        headers.update(auth_header(tokens.get(user, INVALID_TOKEN)))
+    url = record["path"] + (f"?{record['query']}" if record["query"] else "")
+    return {
+        "method": record["method"],
+        "url": url,
+        "content": content,
+        "headers": headers,
+    }
+
+
+class Pacer:
+    """Delays replayed requests to the captured pace scaled by speed."""
+
+    def __init__(self, speed: float):
+        """Constructor
+        :param speed: time scale, 0 does not delay requests"""
+
+        self.speed = speed
+        self.first_ts = None
+        self.started = time.perf_counter()
+
+    async def wait(self, record: dict):
+        """Waits until a record is due."""
+
+        if self.speed <= 0:
+            return
+        if self.first_ts is None:
+            self.first_ts = record["ts"]
+        due = (record["ts"] - self.first_ts) / self.speed
+        delay = due - (time.perf_counter() - self.started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+async def replay(
+    client: httpx.AsyncClient,
+    records: Iterable[dict],
+    speed: float = 0.0,
+    concurrency: int = 50,
+) -> Dict[str, List[dict]]:
+    """Replays captured requests.
+    :param client: http client
+    :param records: capture records in capture order
+    :param speed: time scale (1 replays at captured pace, 2 twice as
+    fast); 0 sends requests as fast as possible
+    :param concurrency: maximum number of requests in flight
+    :return: results (record, replayed status, digest, latency) by route"""
+
+    semaphore = asyncio.Semaphore(concurrency)
+    results, tokens, tasks = defaultdict(list), {}, set()
+
+    async def send(record: dict, kwargs: dict):
+        started = time.perf_counter()
+        try:
+            response = await client.request(**kwargs)
+            status = response.status_code
+            digest = hashlib.sha256(response.content).hexdigest()
+        except httpx.HTTPError:
+            status, digest = None, None
+        finally:
+            semaphore.release()
+        results[record["route"]].append(
+            {
+                "record": record,
+                "status": status,
+                "digest": digest,
+                "duration_ms": (time.perf_counter() - started) * 1000,
+            }
+        )
+
+    pacer = Pacer(speed)
+    for record in records:
+        kwargs = request_kwargs(record, tokens)
+        if kwargs is None:
+            results[None].append({"record": record})
+            continue
+        await pacer.wait(record)
+        # bounds tasks (and memory) of as fast as possible replays
+        await semaphore.acquire()
+        task = asyncio.create_task(send(record, kwargs))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+    await asyncio.gather(*tasks)
+    return results
+
+
+def route_diff(route: str, results: List[dict], reference: dict = None) -> RouteDiff:
+    """Compares replayed requests of a route with the reference.
+    :param route: route template
+    :param results: replay results of the route
+    :param reference: route statistics of a previous replay report,
+    captured latencies are the reference if omitted
+    :return: route statistics"""
+
+    replayed = sorted(result["duration_ms"] for result in results)
+    compared = [result for result in results if result["status"] is not None]
+    diff = RouteDiff(
+        route=route,
+        requests=len(results),
+        errors=len(results) - len(compared),
+        status_mismatches=sum(
+            result["status"] != result["record"]["status"] for result in compared
+        ),
+        body_mismatches=sum(
+            result["digest"] != result["record"]["response_digest"]
+            for result in compared
+        ),
+        replayed_p50_ms=round(percentile(replayed, 0.50), 2),
+        replayed_p95_ms=round(percentile(replayed, 0.95), 2),
+    )
+    if reference is None:
+        captured = sorted(result["record"]["duration_ms"] for result in results)
+        diff.reference_p50_ms = round(percentile(captured, 0.50), 2)
+        diff.reference_p95_ms = round(percentile(captured, 0.95), 2)
+    else:
+        diff.reference_p50_ms = reference["replayed_p50_ms"]
+        diff.reference_p95_ms = reference["replayed_p95_ms"]
+    if diff.reference_p95_ms:
+        diff.p95_change = round(diff.replayed_p95_ms / diff.reference_p95_ms - 1, 3)
+    return diff
+
+
+def replay_report(
+    results: Dict[str, List[dict]],
+    speed: float,
+    duration: float,
+    baseline: Optional[dict] = None,
+    baseline_name: str = "capture",
+) -> ReplayReport:
+    """Creates replay report.
+    :param results: replay results by route (None holds skipped requests)
+    :param speed: replay speed
+    :param duration: replay duration in seconds
+    :param baseline: previous replay report (dict), compared instead of
+    the capture (routes missing in it are compared with the capture)
+    :param baseline_name: name of the reference
+    :return: replay report"""
+
+    references = {}
+    if baseline is not None:
+        references = {route["route"]: route for route in baseline["routes"]}
+    routes = [
+        route_diff(route, route_results, references.get(route))
+        for route, route_results in sorted(
+            item for item in results.items() if item[0] is not None
+        )
+    ]
+    return ReplayReport(
+        reference=baseline_name,
+        requests=sum(route.requests for route in routes),
+        skipped=len(results.get(None, [])),
+        speed=speed,
+        duration_seconds=round(duration, 3),
+        routes=routes,
+    )
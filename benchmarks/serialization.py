@@ -0,0 +1,91 @@
+"""Serialization benchmark comparing per endpoint response encoding
+cost of the default FastAPI path (to_json, json.loads, pydantic,
+jsonable_encoder, json) with the compiled serializer path.
+
+Run: python -m benchmarks.serialization --items 500"""
+
+import json
+import timeit
+from typing import Callable, Dict
+
+import click
+from bson import json_util
+from fastapi.encoders import jsonable_encoder
+
+from api.quiz import model
+from benchmarks.generators import make_quizzes, make_solutions
+from core.serialization import (JSON_BACKENDS, documents_to_list, dumps,
+                                use_backend)
+
+
+def default_path(documents, response_model) -> Callable[[], bytes]:
+    """FastAPI default path as used by the routers before compiled
+    serializers: raw documents -> json -> dicts -> pydantic -> json."""
+
+    def run():
+        data = json.loads(json_util.dumps(documents))
+        for item in data:
+            item["identifier"] = item.pop("_id")
+        content = jsonable_encoder([response_model(**item) for item in data])
+        return json.dumps(content).encode("utf-8")
+
+    return run
+
+
+def fast_path(documents, response_model) -> Callable[[], bytes]:
+    """Compiled serializer path: raw documents -> json."""
+
+    def run():
+        return dumps(documents_to_list(documents, response_model))
+
+    return run
+
+
+def measure(func: Callable, repeat: int = 5) -> float:
+    """Best time of a single call in milliseconds."""
+
+    number, _ = timeit.Timer(func).autorange()
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1000
+
+
+def run_benchmark(items: int, backend: str) -> Dict[str, Dict[str, float]]:
+    """Measures serialization cost per endpoint.
+    :param items: number of documents per list response
+    :param backend: json backend of the fast path
+    :return: timings in milliseconds per endpoint"""
+
+    use_backend(backend)
+    # raw documents, as returned by mongo (QuerySet.as_pymongo)
+    quizzes = [doc.to_mongo() for doc in make_quizzes(items)]
+    solutions = [doc.to_mongo() for doc in make_solutions(items)]
+    endpoints = {
+        "GET /quiz/": (quizzes, model.Quiz),
+        "GET /quiz/solutions": (solutions, model.QuizSolution),
+        "GET /quiz/{quiz_id}": (quizzes[:1], model.Quiz),
+    }
+
+    results = {}
+    for endpoint, (documents, response_model) in endpoints.items():
+        default_ms = measure(default_path(documents, response_model))
+        fast_ms = measure(fast_path(documents, response_model))
+        results[endpoint] = {"default_ms": default_ms, "fast_ms": fast_ms}
+    return results
+
+
+@click.command()
+@click.option("--items", type=int, default=500, help="Documents per response.")
+@click.option("--backend", type=click.Choice(JSON_BACKENDS), default="orjson")
+def main(items: int, backend: str):
+    """Runs serialization benchmark and prints the report."""
+
+    results = run_benchmark(items, backend)
+    click.echo(f"{'endpoint':<22}{'default ms':>12}{'fast ms':>12}{'speedup':>10}")
+    for endpoint, timing in results.items():
+        default_ms, fast_ms = timing["default_ms"], timing["fast_ms"]
+        speedup = default_ms / fast_ms
+        click.echo(f"{endpoint:<22}{default_ms:>12.3f}{fast_ms:>12.3f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,295 @@
+"""Micro-benchmark suite of scoring, auth, serialization and repository
+hot paths. Each benchmark is measured at several sizes; results (best
+time of a call in microseconds) are compared with the baseline stored
+in benchmarks/baseline.json and the run fails if any benchmark is
+slower than the baseline by more than the regression threshold. Every
+run also measures a calibration case (plain interpreter work) and the
+baseline is scaled by its ratio, so a baseline recorded on one machine
+holds on faster or slower ones. Refresh the baseline with --save after
+intended changes.
+
+Run: python -m benchmarks.suite --threshold 0.5
+     python -m benchmarks.suite --save"""
+
+import fnmatch
+import json
+import os
+import timeit
+from datetime import timedelta
+from typing import Callable, Dict, List, NamedTuple
+
+import click
+
+from api.auth.main import create_access_token, get_user_from_token
+from api.quiz.main import score_multi, validate
+from api.quiz.model import Quiz as QuizResponse
+from benchmarks.generators import make_quiz, make_quizzes, make_submission
+from core.config import get_config
+from core.serialization import document_to_dict, use_backend
+from database.memory import MemoryRepositoryFactory
+from model import User
+
+BASELINE_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "baseline.json"
+)
+CALIBRATION = "calibration[1]"
+DEFAULT_THRESHOLD = 0.5
+
+# benchmark name -> (sizes, setup); setup(size) returns the measured callable
+BENCHMARKS: Dict[str, tuple] = {}
+
+
+class Regression(NamedTuple):
+    """Benchmark slower than its baseline."""
+
+    case: str
+    baseline_us: float
+    current_us: float
+
+    @property
+    def ratio(self) -> float:
+        return self.current_us / self.baseline_us
+
+
+def benchmark(name: str, sizes: Callable[[], List[int]]):
+    """Registers benchmark setup function.
+    :param name: benchmark name
+    :param sizes: function returning sizes to measure"""
+
+    def register(setup: Callable[[int], Callable]):
+        BENCHMARKS[name] = (sizes, setup)
+        return setup
+
+    return register
+
+
+def question_sizes() -> List[int]:
+    max_questions = get_config().MAX_QUESTIONS
+    return sorted({1, max(1, max_questions // 2), max_questions})
+
+
+def answer_sizes() -> List[int]:
+    return sorted({2, get_config().MAX_ANSWERS_PER_QUESTION})
+
+
+@benchmark("calibration", lambda: [1])
+def bench_calibration(_) -> Callable:
+    """Interpreter work scaling the baseline to the running machine."""
+
+    numbers = list(range(500))
+    return lambda: sorted(numbers, key=str)
+
+
+@benchmark("validate", question_sizes)
+def bench_validate(questions: int) -> Callable:
+    quiz = make_quiz(1, questions=questions)
+    submission = make_submission(quiz)
+    return lambda: validate(quiz, submission)
+
+
+@benchmark("score_multi", answer_sizes)
+def bench_score_multi(answers: int) -> Callable:
+    quiz_answers = [ans_id % 2 == 0 for ans_id in range(answers)]
+    submitted = [ans_id % 3 == 0 for ans_id in range(answers)]
+    return lambda: score_multi(quiz_answers, submitted)
+
+
+@benchmark("create_access_token", lambda: [1])
+def bench_create_access_token(_) -> Callable:
+    token_info = get_config().TOKEN_INFO
+    return lambda: create_access_token(
+        data={"sub": "taker@example.com"},
+        secret_key=token_info.jwt_signature,
+        algorithm=token_info.jwt_algorithm,
+        delta=timedelta(minutes=30),
+    )
+
+
+@benchmark("get_user_from_token", lambda: [1])
+def bench_get_user_from_token(_) -> Callable:
+    token_info = get_config().TOKEN_INFO
+    repo = MemoryRepositoryFactory()
+    repo.user.bulk_insert(
+        [
+            User(
+                email="taker@example.com",
+                first_name="Taker",
+                last_name="Example",
+                password_hash="-",
+                active=True,
+            ).to_mongo()
+        ]
+    )
+    token = create_access_token(
+        data={"sub": "taker@example.com"},
+        secret_key=token_info.jwt_signature,
+        algorithm=token_info.jwt_algorithm,
+    )
+    return lambda: get_user_from_token(token=token, repo=repo)
+
+
+@benchmark("quiz_to_json_loads", question_sizes)
+def bench_quiz_to_json_loads(questions: int) -> Callable:
+    """Router conversion used before compiled serializers."""
+
+    quiz = make_quiz(1, questions=questions)
+    return lambda: QuizResponse(**json.loads(quiz.to_json(use_db_field=False)))
+
+
+@benchmark("quiz_document_to_dict", question_sizes)
+def bench_quiz_document_to_dict(questions: int) -> Callable:
+    quiz = make_quiz(1, questions=questions)
+    return lambda: document_to_dict(quiz, QuizResponse)
+
+
+def memory_repository(quizzes: int) -> MemoryRepositoryFactory:
+    repo = MemoryRepositoryFactory()
+    repo.quiz.bulk_insert([quiz.to_mongo() for quiz in make_quizzes(quizzes, 2, 2)])
+    return repo
+
+
+@benchmark("repository_get", lambda: [1000, 10000])
+def bench_repository_get(quizzes: int) -> Callable:
+    repo = memory_repository(quizzes)
+    return lambda: repo.quiz.get(quizzes // 2)
+
+
+@benchmark("repository_filter_owner", lambda: [1000, 10000])
+def bench_repository_filter_owner(quizzes: int) -> Callable:
+    repo = memory_repository(quizzes)
+    return lambda: repo.quiz.filter(owner="owner3@example.com", as_dict=True)
+
+
+@benchmark("repository_filter_icontains", lambda: [1000, 10000])
+def bench_repository_filter_icontains(quizzes: int) -> Callable:
+    repo = memory_repository(quizzes)
+    return lambda: repo.quiz.filter(title__icontains="quiz 77", as_dict=True)
+
+
+def measure(func: Callable, repeat: int = 5) -> float:
+    """Best time of a single call in microseconds."""
+
+    number, _ = timeit.Timer(func).autorange()
+    best = min(timeit.repeat(func, number=number, repeat=repeat))
+    return best / number * 1_000_000
+
+
+def run_suite(pattern: str = "*") -> Dict[str, float]:
+    """Runs benchmarks.
+    :param pattern: benchmark case name or pattern i.e. validate*, the
+    calibration case always runs
+    :return: timings in microseconds per case (name[size])"""
+
+    use_backend(get_config().JSON_BACKEND)
+    results = {}
+    for name, (sizes, setup) in BENCHMARKS.items():
+        for size in sizes():
+            case = f"{name}[{size}]"
+            if case in (pattern, CALIBRATION) or fnmatch.fnmatch(case, pattern):
+                results[case] = measure(setup(size))
+    return results
+
+
+def scale_baseline(
+    results: Dict[str, float], baseline: Dict[str, float]
+) -> Dict[str, float]:
+    """Scales baseline timings by the calibration case ratio of results
+    and baseline (unscaled if either lacks it).
+    :param results: timings per case
+    :param baseline: baseline timings per case
+    :return: baseline timings expected on the running machine"""
+
+    scale = 1.0
+    if results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        scale = results[CALIBRATION] / baseline[CALIBRATION]
+    return {case: us * scale for case, us in baseline.items() if case != CALIBRATION}
+
+
+def compare(
+    results: Dict[str, float], baseline: Dict[str, float], threshold: float
+) -> List[Regression]:
+    """Compares results with the scaled baseline. Cases missing in
+    baseline are not compared.
+    :param results: timings per case
+    :param baseline: baseline timings per case
+    :param threshold: allowed slowdown i.e. 0.5 = 50%
+    :return: regressions"""
+
+    expected = scale_baseline(results, baseline)
+    return [
+        Regression(case, expected[case], current)
+        for case, current in results.items()
+        if case in expected and current > expected[case] * (1 + threshold)
+    ]
+
+
+def load_baseline(path: str) -> Dict[str, float]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as file_handle:
+        return json.load(file_handle)
+
+
+def save_baseline(path: str, results: Dict[str, float]):
+    baseline = {**load_baseline(path), **results}
+    with open(path, "w", encoding="utf-8") as file_handle:
+        json.dump(
+            {case: round(us, 3) for case, us in sorted(baseline.items())},
+            file_handle,
+            indent=2,
+        )
+        file_handle.write("\n")
+
+
+@click.command()
+@click.option("--only", "pattern", default="*", help="Case name pattern.")
+@click.option(
+    "--baseline",
+    "baseline_path",
+    type=click.Path(dir_okay=False),
+    default=BASELINE_PATH,
+    show_default=True,
+    help="Baseline file to compare with (or to save with --save).",
+)
+@click.option(
+    "--threshold",
+    type=float,
+    default=DEFAULT_THRESHOLD,
+    envvar="BENCHMARK_THRESHOLD",
+    show_default=True,
+    help="Allowed slowdown against the scaled baseline (0.5 = 50%).",
+)
+@click.option("--save", is_flag=True, help="Store results as the new baseline.")
+def main(pattern: str, baseline_path: str, threshold: float, save: bool):
+    """Runs benchmark suite and compares it with the baseline."""
+
+    results = run_suite(pattern)
+    baseline = load_baseline(baseline_path)
+    expected = scale_baseline(results, baseline)
+
+    click.echo(f"{'case':<36}{'baseline us':>14}{'current us':>14}{'ratio':>8}")
+    for case, current in results.items():
+        # the calibration ratio is the speed of this machine against the baseline
+        base = expected.get(case, baseline.get(case))
+        ratio = f"{current / base:>8.2f}" if base else f"{'-':>8}"
+        base = f"{base:>14.3f}" if base else f"{'-':>14}"
+        click.echo(f"{case:<36}{base}{current:>14.3f}{ratio}")
+
+    if save:
+        save_baseline(baseline_path, results)
+        click.echo(f"Baseline saved to {baseline_path}")
+        return
+
+    regressions = compare(results, baseline, threshold)
+    for regression in regressions:
+        click.echo(
+            f"REGRESSION {regression.case}: {regression.current_us:.3f}us vs "
+            f"{regression.baseline_us:.3f}us ({regression.ratio:.2f}x)",
+            err=True,
+        )
+    if regressions:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,324 @@
+"""Command line interface module providing maintenance commands
+i.e. bulk imports. Run: python cli.py --help"""
+
+import os
+
+import click
+
+
+@click.group()
+@click.option(
+    "--env",
+    type=click.Choice(["local", "dev", "prod"], case_sensitive=False),
+    default="local",
+)
+def cli(env: str = "local"):
+    """Quiz builder command line interface."""
+
+    # set before config (and database connection) is first used
+    os.environ["ENV"] = env
+
+
+@cli.command("import-quizzes")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--owner", required=True, help="Email of the quiz owner.")
+@click.option("--workers", type=int, default=os.cpu_count(), show_default=True)
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option(
+    "--checkpoint",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Checkpoint file; rerun with the same file to resume the import.",
+)
+def import_quizzes(paths, owner: str, workers: int, batch_size: int, checkpoint):
+    """Imports quizzes from json or ndjson (.ndjson, .jsonl) files."""
+
+    from api.quiz.bulk import import_quizzes as run_import
+    from database.repository import get_repository
+
+    repo = get_repository()
+    if repo.user.get(owner) is None:
+        raise click.BadParameter(f"User {owner} does not exist", param_hint="--owner")
+
+    def progress(report):
+        click.echo(
+            f"read={report.read} imported={report.imported} "
+            f"rejected={report.rejected} rate={report.rows_per_second}/s"
+        )
+
+    paths = [os.path.abspath(path) for path in paths]
+    report = run_import(paths, owner, repo, workers, batch_size, checkpoint, progress)
+    for error in report.errors:
+        click.echo(f"row {error.row}: {error.message}", err=True)
+    click.echo(report.json(exclude={"errors"}))
+
+
+@cli.command("provision-users")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--format",
+    "list_format",
+    type=click.Choice(["csv", "ndjson"]),
+    default=None,
+    help="User list format, inferred from the file suffix if omitted.",
+)
+@click.option("--workers", type=int, default=os.cpu_count(), show_default=True)
+@click.option("--batch-size", type=int, default=500, show_default=True)
+def provision_users(path: str, list_format: str, workers: int, batch_size: int):
+    """Creates users from a csv or ndjson user list."""
+
+    from api.user.bulk import provision_users as run_provision
+    from api.user.bulk import read_user_rows
+    from api.user.model import UserListFormat
+    from database.repository import get_repository
+
+    if list_format is None:
+        list_format = "csv" if path.lower().endswith(".csv") else "ndjson"
+
+    with open(path, "r", encoding="utf-8", newline="") as file_handle:
+        rows = read_user_rows(file_handle, UserListFormat(list_format))
+        report = run_provision(rows, get_repository(), workers, batch_size)
+    for error in report.errors:
+        click.echo(f"row {error.row}: {error.message}", err=True)
+    click.echo(report.json(exclude={"errors"}))
+
+
+@cli.command("grant-admin")
+@click.argument("email")
+@click.option("--revoke", is_flag=True, help="Revoke admin rights instead.")
+def grant_admin(email: str, revoke: bool):
+    """Grants an existing user admin rights (admin routes, bulk uploads)."""
+
+    from database.repository import get_repository
+
+    repo = get_repository()
+    if repo.user.get(email) is None:
+        raise click.BadParameter(f"User {email} does not exist", param_hint="EMAIL")
+    repo.user.update(email, set__is_admin=not revoke)
+    click.echo(f"{email}: is_admin={not revoke}")
+
+
+@cli.command("dedupe-solutions")
+@click.option("--dry-run", is_flag=True, help="Only count duplicate solutions.")
+def dedupe_solutions(dry_run: bool):
+    """Removes all but the earliest solution of every user and quiz, as
+    needed by the unique (owner, quiz) solution index."""
+
+    from core.config import get_config
+    from database.migrations import dedupe_solutions as run_dedupe
+
+    if get_config().STORAGE_INFO.repository_backend == "memory":
+        raise click.UsageError("Solutions are deduplicated in the mongo repository")
+    removed = run_dedupe(dry_run)
+    click.echo(f"{'duplicate' if dry_run else 'removed'} solutions: {removed}")
+    if removed and not dry_run:
+        click.echo("Run rebuild-stats to recompute quiz statistics.")
+
+
+@cli.command("rebuild-stats")
+@click.option(
+    "--quiz",
+    "quiz_ids",
+    type=int,
+    multiple=True,
+    help="Quiz to rebuild (repeatable); all quizzes if omitted.",
+)
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+def rebuild_stats(quiz_ids, batch_size: int):
+    """Recomputes quiz score statistics from all solutions."""
+
+    from api.quiz.stats import rebuild_stats as run_rebuild
+    from database.repository import get_repository
+
+    report = run_rebuild(get_repository(), quiz_ids or None, batch_size)
+    click.echo(report.json())
+
+
+@cli.command("regrade")
+@click.option(
+    "--quiz",
+    "quiz_ids",
+    type=int,
+    multiple=True,
+    help="Quiz to re-grade (repeatable); all quizzes if omitted.",
+)
+@click.option("--workers", type=int, default=None, help="Defaults to REGRADE_WORKERS.")
+@click.option("--rate", type=float, default=None, help="Solutions per second.")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+@click.option("--restart", is_flag=True, help="Ignore checkpoints of interrupted runs.")
+def regrade(quiz_ids, workers: int, rate: float, batch_size: int, restart: bool):
+    """Recomputes scores of stored solutions and rebuilds statistics."""
+
+    from api.quiz.regrade import regrade as run_regrade
+    from core.config import get_config
+    from database.repository import get_repository
+
+    def progress(quiz):
+        state = "done" if quiz.finished else "running"
+        click.echo(
+            f"quiz {quiz.quiz_id}: {quiz.processed} solutions, "
+            f"{quiz.changed} changed ({state})",
+            err=True,
+        )
+
+    config = get_config()
+    report = run_regrade(
+        get_repository(),
+        quiz_ids or None,
+        workers=config.REGRADE_WORKERS if workers is None else workers,
+        batch_size=batch_size,
+        rate=config.REGRADE_RATE if rate is None else rate,
+        restart=restart,
+        progress=progress,
+    )
+    click.echo(report.json(exclude={"progress"}))
+
+
+@cli.command("compact-activity")
+@click.option("--batch-size", type=int, default=1000, show_default=True)
+def compact_activity(batch_size: int):
+    """Compacts submission activity buckets past their retention."""
+
+    from api.quiz.activity import compact_activity as run_compaction
+    from database.repository import get_repository
+
+    report = run_compaction(get_repository(), batch_size=batch_size)
+    click.echo(report.json())
+
+
+@cli.command("load-test")
+@click.option("--url", default=None, help="Server url; runs in-process if omitted.")
+@click.option(
+    "--repository",
+    type=click.Choice(["memory", "mongo"]),
+    default="memory",
+    show_default=True,
+    help="Repository of the in-process app (a server uses its own).",
+)
+@click.option("--takers", type=int, default=1000, show_default=True)
+@click.option("--concurrency", type=int, default=50, show_default=True)
+@click.option("--logins", type=int, default=0, help="Takers using the token endpoint.")
+@click.option("--sweep", is_flag=True, help="Run saturation sweep up to --concurrency.")
+@click.option("--exam-takers", type=int, default=10000, show_default=True)
+@click.option("--exam-window", type=float, default=300.0, show_default=True)
+@click.option("--slo-ms", type=float, default=500.0, show_default=True)
+def load_test(
+    url: str,
+    repository: str,
+    takers: int,
+    concurrency: int,
+    logins: int,
+    sweep: bool,
+    exam_takers: int,
+    exam_window: float,
+    slo_ms: float,
+):
+    """Runs exam day load test and prints the report."""
+
+    import asyncio
+
+    from benchmarks.loadtest import create_client, run_exam, run_sweep
+    from core.config import get_config
+    from database.repository import get_repository
+
+    app, repo = None, get_repository()
+    if url is None:
+        from app.server import app
+
+        if repository == "memory":
+            from database.memory import MemoryRepositoryFactory
+
+            repo = MemoryRepositoryFactory()
+            app.dependency_overrides[get_repository] = lambda: repo
+    elif get_config().STORAGE_INFO.repository_backend == "memory":
+        raise click.UsageError("Load testing a server needs a shared mongo repository")
+
+    async def run():
+        async with create_client(app, url, concurrency) as client:
+            if sweep:
+                return await run_sweep(
+                    client, repo, takers, concurrency, exam_takers, exam_window, slo_ms
+                )
+            return await run_exam(client, repo, takers, concurrency, logins)
+
+    click.echo(asyncio.run(run()).json(indent=2))
+
+
+@cli.command("replay")
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--url", default=None, help="Server url; runs in-process if omitted.")
+@click.option(
+    "--repository",
+    type=click.Choice(["memory", "mongo"]),
+    default="memory",
+    show_default=True,
+    help="Repository of the in-process app (memory restores MEMORY_SNAPSHOT_PATH).",
+)
+@click.option(
+    "--speed",
+    type=float,
+    default=1.0,
+    show_default=True,
+    help="Time scale of the captured pace; 0 replays as fast as possible.",
+)
+@click.option("--concurrency", type=int, default=50, show_default=True)
+@click.option(
+    "--baseline",
+    type=click.Path(exists=True, dir_okay=False),
+    default=None,
+    help="Previous replay report to compare with instead of the capture.",
+)
+@click.option(
+    "--output", type=click.Path(dir_okay=False), default=None, help="Report file."
+)
+def replay(
+    paths,
+    url: str,
+    repository: str,
+    speed: float,
+    concurrency: int,
+    baseline: str,
+    output: str,
+):
+    """Replays captured traffic (segment files or capture directories)
+    and prints per-route differences."""
+
+    import asyncio
+    import json
+    import time
+
+    from benchmarks.loadtest import create_client
+    from benchmarks.replay import read_capture
+    from benchmarks.replay import replay as run_replay
+    from benchmarks.replay import replay_report
+    from database.repository import get_memory_repository, get_repository
+
+    app = None
+    if url is None:
+        from app.server import app
+
+        if repository == "memory":
+            app.dependency_overrides[get_repository] = get_memory_repository
+
+    async def run():
+        async with create_client(app, url, concurrency) as client:
+            return await run_replay(client, read_capture(paths), speed, concurrency)
+
+    reference = None
+    if baseline is not None:
+        with open(baseline, "r", encoding="utf-8") as file_handle:
+            reference = json.load(file_handle)
+
+    started = time.perf_counter()
+    results = asyncio.run(run())
+    report = replay_report(
+        results, speed, time.perf_counter() - started, reference, baseline or "capture"
+    )
+    if output is not None:
+        with open(output, "w", encoding="utf-8") as file_handle:
+            file_handle.write(report.json(indent=2))
+    click.echo(report.json(indent=2))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,79 @@
+"""Cache module providing simple in-process caching primitives."""
+
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Callable, Hashable
+
+
+class LRUCache:
+    """Bounded, thread safe least recently used cache. Sync endpoints
+    run in a thread pool so every access is guarded by a lock. Entries
+    may expire after a time to live, which bounds how long a worker keeps
+    a value invalidated by another worker."""
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        """Constructor
+        :param max_size: maximum number of cached entries
+        :param ttl: seconds an entry stays cached, 0 is forever
+        :param clock: time source of expiry, in seconds"""
+
+        self._max_size = max_size
+        self._ttl = ttl
+        self._clock = clock
+        self._data = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Gets a cached value and marks it as recently used.
+        :param key: cache key
+        :param default: value returned when key is not cached
+        :return: cached value or default"""
+
+        with self._lock:
+            if key not in self._data:
+                return default
+            expires_at, value = self._data[key]
+            if expires_at and expires_at <= self._clock():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Caches a value, evicting the least recently used entry
+        when the cache is full.
+        :param key: cache key
+        :param value: value to cache"""
+
+        expires_at = self._clock() + self._ttl if self._ttl else 0
+        with self._lock:
+            self._data[key] = expires_at, value
+            self._data.move_to_end(key)
+            while len(self._data) > self._max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Removes a cached value.
+        :param key: cache key
+        :param default: value returned when key is not cached
+        :return: removed value or default"""
+
+        with self._lock:
+            if key not in self._data:
+                return default
+            return self._data.pop(key)[1]
+
+    def clear(self) -> None:
+        """Removes all cached values."""
+
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -34,6 +34,135 @@ class AppSettings(BaseSettings):
     max_answers_per_question: int = int(
         os.getenv("MAX_ANSWERS_PER_QUESTION", default="5")
     )
+    json_backend: str = os.getenv("JSON_BACKEND", default="orjson")
+    export_batch_size: int = int(os.getenv("EXPORT_BATCH_SIZE", default="1000"))
+    regrade_workers: int = int(os.getenv("REGRADE_WORKERS", default="4"))
+    regrade_rate: float = float(os.getenv("REGRADE_RATE", default="5000"))
+    hash_workers: int = int(os.getenv("HASH_WORKERS", default="4"))
+    idempotency_ttl_hours: int = int(os.getenv("IDEMPOTENCY_TTL_HOURS", default="24"))
+    idempotency_lease_seconds: float = float(
+        os.getenv("IDEMPOTENCY_LEASE_SECONDS", default="30")
+    )
+
+
+class CacheSettings(BaseSettings):
+    """HTTP caching settings."""
+
+    quiz_max_age: int = int(os.getenv("QUIZ_CACHE_MAX_AGE", default="3600"))
+    snapshot_cache_size: int = int(os.getenv("SNAPSHOT_CACHE_SIZE", default="1000"))
+    snapshot_cache_seconds: float = float(
+        os.getenv("SNAPSHOT_CACHE_SECONDS", default="60")
+    )
+    analysis_cache_size: int = int(os.getenv("ANALYSIS_CACHE_SIZE", default="256"))
+
+
+class StorageSettings(BaseSettings):
+    """Storage settings: repository backend (mongo or memory), snapshot
+    file of the in-memory backend and write-behind solution journal."""
+
+    repository_backend: str = os.getenv("REPOSITORY_BACKEND", default="mongo")
+    memory_snapshot_path: str = os.getenv("MEMORY_SNAPSHOT_PATH", default="")
+    solution_journal: bool = os.getenv("SOLUTION_JOURNAL", default="0") == "1"
+    journal_dir: str = os.getenv("JOURNAL_DIR", default="journal")
+    journal_fsync_ms: float = float(os.getenv("JOURNAL_FSYNC_MS", default="2"))
+    journal_flush_ms: float = float(os.getenv("JOURNAL_FLUSH_MS", default="100"))
+    journal_flush_batch: int = int(os.getenv("JOURNAL_FLUSH_BATCH", default="1000"))
+    journal_segment_mb: float = float(os.getenv("JOURNAL_SEGMENT_MB", default="64"))
+
+
+class ActivitySettings(BaseSettings):
+    """Submission activity rollup settings (retention 0 keeps buckets)."""
+
+    activity_minute_retention_hours: int = int(
+        os.getenv("ACTIVITY_MINUTE_RETENTION_HOURS", default="48")
+    )
+    activity_hour_retention_days: int = int(
+        os.getenv("ACTIVITY_HOUR_RETENTION_DAYS", default="90")
+    )
+    activity_max_buckets: int = int(os.getenv("ACTIVITY_MAX_BUCKETS", default="1440"))
+
+
+class AttemptSettings(BaseSettings):
+    """Timed quiz attempt settings."""
+
+    attempt_grace_seconds: float = float(
+        os.getenv("ATTEMPT_GRACE_SECONDS", default="5")
+    )
+    attempt_tick_ms: float = float(os.getenv("ATTEMPT_TICK_MS", default="1000"))
+    attempt_retention_hours: int = int(
+        os.getenv("ATTEMPT_RETENTION_HOURS", default="24")
+    )
+    max_time_limit_minutes: int = int(
+        os.getenv("MAX_TIME_LIMIT_MINUTES", default="1440")
+    )
+
+
+class LiveSettings(BaseSettings):
+    """Live quiz settings (idle seconds 0 keeps sessions of an absent host)."""
+
+    live_player_queue: int = int(os.getenv("LIVE_PLAYER_QUEUE", default="16"))
+    live_leaderboard_ms: float = float(os.getenv("LIVE_LEADERBOARD_MS", default="500"))
+    live_leaderboard_size: int = int(os.getenv("LIVE_LEADERBOARD_SIZE", default="10"))
+    live_max_players: int = int(os.getenv("LIVE_MAX_PLAYERS", default="10000"))
+    live_idle_seconds: float = float(os.getenv("LIVE_IDLE_SECONDS", default="900"))
+
+
+class LeaderboardSettings(BaseSettings):
+    """Quiz leaderboard stream settings (refresh 0 never reloads)."""
+
+    leaderboard_stream_ms: float = float(
+        os.getenv("LEADERBOARD_STREAM_MS", default="1000")
+    )
+    leaderboard_size: int = int(os.getenv("LEADERBOARD_SIZE", default="10"))
+    leaderboard_keepalive_seconds: float = float(
+        os.getenv("LEADERBOARD_KEEPALIVE_SECONDS", default="15")
+    )
+    leaderboard_refresh_seconds: float = float(
+        os.getenv("LEADERBOARD_REFRESH_SECONDS", default="60")
+    )
+
+
+class RateLimitSettings(BaseSettings):
+    """Rate limiting and load shedding settings. Limits are given as
+    requests per second/burst, 0 disables a limit."""
+
+    rate_limit_backend: str = os.getenv("RATE_LIMIT_BACKEND", default="none")
+    rate_limit_sqlite_path: str = os.getenv(
+        "RATE_LIMIT_SQLITE_PATH", default="ratelimit.sqlite3"
+    )
+    rate_limit_user: str = os.getenv("RATE_LIMIT_USER", default="10/40")
+    rate_limit_ip: str = os.getenv("RATE_LIMIT_IP", default="20/80")
+    rate_limit_routes: str = os.getenv(
+        "RATE_LIMIT_ROUTES", default="POST /token=1/5,GET /quiz/=2/10"
+    )
+    shed_max_in_flight: int = int(os.getenv("SHED_MAX_IN_FLIGHT", default="0"))
+    shed_loop_lag_ms: float = float(os.getenv("SHED_LOOP_LAG_MS", default="0"))
+
+
+class MonitoringSettings(BaseSettings):
+    """Monitoring settings."""
+
+    slow_query_ms: float = float(os.getenv("SLOW_QUERY_MS", default="100"))
+    slow_query_log_size: int = int(os.getenv("SLOW_QUERY_LOG_SIZE", default="200"))
+    slow_query_explain: bool = os.getenv("SLOW_QUERY_EXPLAIN", default="1") == "1"
+    profile_dir: str = os.getenv("PROFILE_DIR", default="profiles")
+    profile_format: str = os.getenv("PROFILE_FORMAT", default="speedscope")
+    profile_interval_ms: float = float(os.getenv("PROFILE_INTERVAL_MS", default="1"))
+    profile_sample_rate: float = float(os.getenv("PROFILE_SAMPLE_RATE", default="0"))
+    loop_lag_interval_ms: float = float(
+        os.getenv("LOOP_LAG_INTERVAL_MS", default="100")
+    )
+    loop_stall_ms: float = float(os.getenv("LOOP_STALL_MS", default="200"))
+    loop_stall_log_size: int = int(os.getenv("LOOP_STALL_LOG_SIZE", default="100"))
+    trace_sample_rate: float = float(os.getenv("TRACE_SAMPLE_RATE", default="0"))
+    trace_exporter: str = os.getenv("TRACE_EXPORTER", default="memory")
+    trace_file: str = os.getenv("TRACE_FILE", default="traces/spans.ndjson")
+    trace_memory_size: int = int(os.getenv("TRACE_MEMORY_SIZE", default="10000"))
+    capture_sample_rate: float = float(os.getenv("CAPTURE_SAMPLE_RATE", default="0"))
+    capture_dir: str = os.getenv("CAPTURE_DIR", default="captures")
+    capture_segment_mb: float = float(os.getenv("CAPTURE_SEGMENT_MB", default="16"))
+    capture_max_mb: float = float(os.getenv("CAPTURE_MAX_MB", default="512"))
+    capture_max_body_kb: int = int(os.getenv("CAPTURE_MAX_BODY_KB", default="256"))
 
 
 class Config(BaseSettings):
@@ -45,8 +174,23 @@ class Config(BaseSettings):
     APP_PORT: int = AppSettings().app_port
     MAX_QUESTIONS: int = AppSettings().max_questions
     MAX_ANSWERS_PER_QUESTION: int = AppSettings().max_answers_per_question
+    JSON_BACKEND: str = AppSettings().json_backend
+    EXPORT_BATCH_SIZE: int = AppSettings().export_batch_size
+    HASH_WORKERS: int = AppSettings().hash_workers
+    REGRADE_WORKERS: int = AppSettings().regrade_workers
+    REGRADE_RATE: float = AppSettings().regrade_rate
+    IDEMPOTENCY_TTL_HOURS: int = AppSettings().idempotency_ttl_hours
+    IDEMPOTENCY_LEASE_SECONDS: float = AppSettings().idempotency_lease_seconds
     TOKEN_INFO = TokenSettings()
     API_INFO = ApiSettings()
+    CACHE_INFO = CacheSettings()
+    STORAGE_INFO = StorageSettings()
+    MONITORING_INFO = MonitoringSettings()
+    ACTIVITY_INFO = ActivitySettings()
+    RATE_LIMIT_INFO = RateLimitSettings()
+    ATTEMPT_INFO = AttemptSettings()
+    LIVE_INFO = LiveSettings()
+    LEADERBOARD_INFO = LeaderboardSettings()
 
     # Local mongo db
     MONGODB_CONN_STR = os.getenv(
@@ -0,0 +1,54 @@
+"""Request context module. The ASGI scope of the request being handled
+is kept in a context variable, so code without access to the request
+(i.e. database monitoring) can tell which route issued it."""
+
+from contextvars import ContextVar
+from typing import Optional
+
+UNMATCHED_ROUTE = "unmatched"
+
+request_scope: ContextVar[Optional[dict]] = ContextVar("request_scope", default=None)
+
+# endpoint function -> route template
+route_templates = {}
+
+
+def route_template(scope: Optional[dict]) -> str:
+    """Gets route template (i.e. /quiz/{quiz_id}) of a request, so
+    requests are not identified by raw paths.
+    :param scope: ASGI scope (the router stores matched endpoint in it)
+    :return: route template"""
+
+    if scope is None:
+        return UNMATCHED_ROUTE
+    endpoint, app = scope.get("endpoint"), scope.get("app")
+    if endpoint is None or app is None:
+        return UNMATCHED_ROUTE
+
+    template = route_templates.get(endpoint)
+    if template is None:
+        for route in app.routes:
+            route_templates.setdefault(getattr(route, "endpoint", None), route.path)
+        template = route_templates.get(endpoint, UNMATCHED_ROUTE)
+    return template
+
+
+def endpoint_codes(app) -> dict:
+    """Gets route templates by code objects of endpoint functions, so
+    stack frames can be attributed to routes.
+    :param app: application
+    :return: route templates by code objects"""
+
+    return {
+        route.endpoint.__code__: route.path
+        for route in app.routes
+        if hasattr(getattr(route, "endpoint", None), "__code__")
+    }
+
+
+def current_route() -> Optional[str]:
+    """Gets route template of the request being handled (None outside
+    of requests)."""
+
+    scope = request_scope.get()
+    return None if scope is None else route_template(scope)
@@ -0,0 +1,80 @@
+"""Leaderboard module. Entries are kept in a list sorted by rank (score
+descending, then elapsed time ascending, then name), so an update is a
+binary search plus a list move, ranks come from a binary search and the
+top K is a slice; nothing is re-sorted when scores change. A leaderboard
+with a capacity keeps only that many best entries."""
+
+import threading
+from bisect import bisect_left, insort
+from typing import Dict, List, Tuple
+
+RankKey = Tuple[float, float, str]
+
+
+def rank_key(name: str, score: float, elapsed: float) -> RankKey:
+    return -score, elapsed, name
+
+
+class Leaderboard:
+    """Ranked scores of players (one entry per player)."""
+
+    def __init__(self, capacity: int = 0):
+        """Constructor
+        :param capacity: number of best entries kept, 0 keeps all"""
+
+        self.capacity = capacity
+        self._lock = threading.Lock()
+        self._entries: Dict[str, RankKey] = {}
+        self._ranked: List[RankKey] = []
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def update(self, name: str, score: float, elapsed: float = 0.0):
+        """Sets score of a player.
+        :param name: player
+        :param score: score, higher ranks first
+        :param elapsed: time taken, lower ranks first among equal scores"""
+
+        key = rank_key(name, score, elapsed)
+        with self._lock:
+            previous = self._entries.get(name)
+            if previous == key:
+                return
+            if previous is not None:
+                del self._ranked[bisect_left(self._ranked, previous)]
+            self._entries[name] = key
+            insort(self._ranked, key)
+            if 0 < self.capacity < len(self._ranked):
+                last = self._ranked.pop()
+                del self._entries[last[2]]
+                if last == key and previous is None:
+                    return
+            self.version += 1
+
+    def remove(self, name: str):
+        with self._lock:
+            key = self._entries.pop(name, None)
+            if key is not None:
+                del self._ranked[bisect_left(self._ranked, key)]
+                self.version += 1
+
+    def rank(self, name: str) -> int:
+        """Gets rank of a player (1 is first, 0 if not ranked)."""
+
+        with self._lock:
+            key = self._entries.get(name)
+            return 0 if key is None else bisect_left(self._ranked, key) + 1
+
+    def top(self, size: int) -> List[dict]:
+        """Gets the best entries.
+        :param size: number of entries
+        :return: rank, player, score and elapsed time of the entries"""
+
+        with self._lock:
+            best = self._ranked[:size]
+        return [
+            {"rank": index, "player": name, "score": 0.0 - score, "elapsed": elapsed}
+            for index, (score, elapsed, name) in enumerate(best, start=1)
+        ]
@@ -0,0 +1,173 @@
+"""Event loop lag monitor module. A background task sleeps for a fixed
+interval and measures how late it wakes up (event loop lag). A watchdog
+thread inspects the event loop thread while it is blocked longer than a
+threshold and attributes the stall to the route whose endpoint is on its
+stack, so blocking calls in async endpoints become visible; in debug
+mode the stack itself is recorded too."""
+
+import asyncio
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from datetime import datetime
+from typing import Dict, List
+
+from core.config import get_config
+from core.metrics import REGISTRY
+
+MAX_STACK_FRAMES = 40
+UNKNOWN_ROUTE = "unknown"
+
+LOOP_LAG = REGISTRY.gauge("event_loop_lag_seconds", "Last measured event loop lag.")
+LOOP_LAG_HISTOGRAM = REGISTRY.histogram(
+    "event_loop_lag_histogram_seconds", "Event loop lag distribution."
+)
+LOOP_STALLS = REGISTRY.counter(
+    "event_loop_stalls_total", "Event loop stalls above threshold.", ("route",)
+)
+
+
+class LoopMonitor:
+    """Event loop lag monitor and blocking call detector."""
+
+    def __init__(
+        self,
+        interval_ms: float = None,
+        threshold_ms: float = None,
+        capture: bool = None,
+        size: int = None,
+    ):
+        """Constructor
+        :param interval_ms: lag measurement interval, defaults to
+        LOOP_LAG_INTERVAL_MS setting
+        :param threshold_ms: lag considered a stall, defaults to
+        LOOP_STALL_MS setting
+        :param capture: record stacks of stalls, defaults to debug mode
+        :param size: number of recent stalls kept"""
+
+        config = get_config()
+        settings = config.MONITORING_INFO
+        interval_ms = (
+            settings.loop_lag_interval_ms if interval_ms is None else interval_ms
+        )
+        threshold_ms = settings.loop_stall_ms if threshold_ms is None else threshold_ms
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.capture = bool(config.DEBUG) if capture is None else capture
+        self._stalls = deque(
+            maxlen=settings.loop_stall_log_size if size is None else size
+        )
+        self._lock = threading.Lock()
+        self._codes: Dict = {}
+        self._heartbeat = time.monotonic()
+        self.lag = 0.0
+        self._loop_thread = None
+        self._task = None
+        self._watchdog = None
+        self._stopped = threading.Event()
+        self._pending = None
+
+    def start(self, route_codes: Dict = None):
+        """Starts monitoring the running event loop.
+        :param route_codes: route templates by endpoint code objects, used
+        to attribute stalls"""
+
+        self._codes = route_codes or {}
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stopped.clear()
+        self._task = asyncio.get_running_loop().create_task(self._measure())
+        self._watchdog = threading.Thread(
+            target=self._watch, name="loop-watchdog", daemon=True
+        )
+        self._watchdog.start()
+
+    async def stop(self):
+        self._stopped.set()
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._watchdog is not None:
+            self._watchdog.join()
+            self._watchdog = None
+
+    async def _measure(self):
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag = max(0.0, now - started - self.interval)
+            self.lag = lag
+            LOOP_LAG.set(lag)
+            LOOP_LAG_HISTOGRAM.observe(lag)
+            if lag >= self.threshold:
+                self._stall_finished(lag)
+
+    def _stall_finished(self, lag: float):
+        with self._lock:
+            stall, self._pending = self._pending, None
+            if stall is None:
+                stall = self._new_stall(None)
+            stall["duration_ms"] = round(lag * 1000, 3)
+
+    def _new_stall(self, frame) -> dict:
+        """Records stall (the caller holds the lock)."""
+
+        stack = []
+        if frame is not None and self.capture:
+            stack = traceback.extract_stack(frame)[-MAX_STACK_FRAMES:]
+        route = self._route(frame)
+        stall = {
+            "timestamp": datetime.utcnow(),
+            "route": route,
+            "duration_ms": None,
+            "stack": [
+                f"{item.filename}:{item.lineno} in {item.name}" for item in stack
+            ],
+        }
+        self._stalls.append(stall)
+        LOOP_STALLS.inc((route,))
+        return stall
+
+    def _route(self, frame) -> str:
+        while frame is not None:
+            route = self._codes.get(frame.f_code)
+            if route is not None:
+                return route
+            frame = frame.f_back
+        return UNKNOWN_ROUTE
+
+    def _watch(self):
+        """Watchdog: captures stack of the loop thread once per stall."""
+
+        captured = None
+        while not self._stopped.wait(self.threshold / 4):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.interval + self.threshold:
+                continue
+            if heartbeat == captured:
+                continue
+            captured = heartbeat
+            frame = sys._current_frames().get(self._loop_thread)
+            with self._lock:
+                self._pending = self._new_stall(frame)
+
+    def stalls(self, limit: int = None) -> List[dict]:
+        """Gets recent stalls (newest first); duration is None while the
+        stall lasts."""
+
+        with self._lock:
+            return [dict(stall) for stall in list(self._stalls)[::-1][:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._stalls.clear()
+
+
+loop_monitor = LoopMonitor()
@@ -0,0 +1,265 @@
+"""Metrics module providing counters, gauges and histograms rendered in
+Prometheus text format. Updates go to per-thread shards (no locking on
+the hot path); shards are aggregated when metrics are scraped. Every
+worker process has its own registry, Prometheus scrapes (and sums)
+them per process."""
+
+import threading
+from bisect import bisect_left
+from collections import defaultdict
+from typing import Callable, Dict, List, Sequence, Tuple
+
+LATENCY_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[str, ...]
+
+
+def format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def format_labels(names: Sequence[str], values: Sequence) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = (
+            str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        )
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+class Shards:
+    """Per-thread metric shards."""
+
+    def __init__(self, factory: Callable):
+        self._factory = factory
+        self._local = threading.local()
+        self._shards = []
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Gets shard of the current thread."""
+
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._factory()
+            with self._lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def all(self) -> List:
+        """Gets shards of all threads."""
+
+        with self._lock:
+            return list(self._shards)
+
+
+class Metric:
+    """Base metric class."""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+
+    def header(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.type_name}",
+        ]
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(Metric):
+    """Monotonic counter."""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._shards = Shards(lambda: defaultdict(float))
+
+    def inc(self, labels: Labels = (), amount: float = 1.0):
+        """Increments counter.
+        :param labels: label values (in order of label names)
+        :param amount: increment"""
+
+        self._shards.get()[labels] += amount
+
+    def values(self) -> Dict[Labels, float]:
+        totals = defaultdict(float)
+        for shard in self._shards.all():
+            for labels, value in list(shard.items()):
+                totals[labels] += value
+        return totals
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        for labels, value in sorted(self.values().items()):
+            lines.append(
+                f"{self.name}{format_labels(self.label_names, labels)} {format_value(value)}"
+            )
+        return lines
+
+
+class Gauge(Counter):
+    """Gauge: value set directly, adjusted with inc/dec (per thread
+    deltas) or computed by a callback on scrape."""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+        self._functions = {}
+
+    def dec(self, labels: Labels = (), amount: float = 1.0):
+        self.inc(labels, -amount)
+
+    def set(self, value: float, labels: Labels = ()):
+        """Sets gauge value (inc/dec deltas are added to it, use either
+        set or inc/dec for a label set)."""
+
+        self._values[labels] = value
+
+    def set_function(self, function: Callable[[], float], labels: Labels = ()):
+        """Sets callback computing gauge value on scrape."""
+
+        self._functions[labels] = function
+
+    def values(self) -> Dict[Labels, float]:
+        totals = super().values()
+        for labels, value in list(self._values.items()):
+            totals[labels] += value
+        for labels, function in list(self._functions.items()):
+            totals[labels] += function()
+        return totals
+
+
+class Histogram(Metric):
+    """Histogram with fixed buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._shards = Shards(dict)
+
+    def observe(self, value: float, labels: Labels = ()):
+        """Records observation.
+        :param value: observed value i.e. duration in seconds
+        :param labels: label values (in order of label names)"""
+
+        shard = self._shards.get()
+        series = shard.get(labels)
+        if series is None:
+            # bucket counts (+Inf last), sum, count
+            series = shard[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def values(self) -> Dict[Labels, list]:
+        totals = {}
+        for shard in self._shards.all():
+            for labels, (counts, total, count) in list(shard.items()):
+                series = totals.setdefault(labels, [[0] * len(counts), 0.0, 0])
+                series[0] = [a + b for a, b in zip(series[0], counts)]
+                series[1] += total
+                series[2] += count
+        return totals
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        names = self.label_names + ("le",)
+        for labels, (counts, total, count) in sorted(self.values().items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(names, labels + (format_value(bound),))
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            label_text = format_labels(self.label_names, labels)
+            lines.append(f"{self.name}_sum{label_text} {format_value(total)}")
+            lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metrics registry."""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: Metric) -> Metric:
+        """Registers metric; registering the same name again returns the
+        already registered metric."""
+
+        with self._lock:
+            return self._metrics.setdefault(metric.name, metric)
+
+    def counter(
+        self, name: str, documentation: str, labels: Sequence[str] = ()
+    ) -> Counter:
+        return self.register(Counter(name, documentation, labels))
+
+    def gauge(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labels))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labels: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labels, buckets))
+
+    def render(self) -> str:
+        """Renders all metrics in Prometheus text format."""
+
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
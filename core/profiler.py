@@ -0,0 +1,153 @@
+"""Sampling profiler module. A background thread samples stacks of all
+(non idle) threads at a fixed interval; samples are written as collapsed
+stacks (flamegraph.pl, speedscope, inferno) or as speedscope json.
+Profiles cover the whole process while the profiler runs."""
+
+import json
+import os
+import sys
+import sysconfig
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Tuple
+
+# frame: (file name, function name, first line)
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+
+PROFILE_FORMATS = ("speedscope", "collapsed")
+FILE_SUFFIXES = {"speedscope": "speedscope.json", "collapsed": "collapsed"}
+
+# innermost frames of threads waiting for work
+IDLE_MODULES = ("threading.py", "queue.py", "selectors.py")
+
+STDLIB_DIR = sysconfig.get_paths()["stdlib"] + os.sep
+
+
+def is_idle(stack: Stack) -> bool:
+    return not stack or stack[-1][0].endswith(IDLE_MODULES)
+
+
+def short_path(file_name: str) -> str:
+    """Shortens file name to a path relative to site-packages, the
+    standard library or the working directory."""
+
+    marker = "site-packages" + os.sep
+    if marker in file_name:
+        return file_name.split(marker, 1)[1]
+    if file_name.startswith(STDLIB_DIR):
+        return file_name.removeprefix(STDLIB_DIR)
+    cwd = os.getcwd() + os.sep
+    return file_name.removeprefix(cwd)
+
+
+class SamplingProfiler:
+    """Sampling profiler."""
+
+    def __init__(self, interval: float = 0.001):
+        """Constructor
+        :param interval: sampling interval in seconds"""
+
+        self.interval = interval
+        self.samples: Dict[Tuple[str, Stack], int] = Counter()
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = None
+        self._started = 0.0
+        self._thread_names = {}
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="profiler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+
+    def _run(self):
+        own_id = threading.get_ident()
+        while not self._stop.wait(self.interval):
+            self._sample(own_id)
+
+    def _thread_name(self, thread_id: int) -> str:
+        name = self._thread_names.get(thread_id)
+        if name is None:
+            self._thread_names = {t.ident: t.name for t in threading.enumerate()}
+            name = self._thread_names.get(thread_id, str(thread_id))
+        return name
+
+    def _sample(self, own_id: int):
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_id:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_filename, code.co_name, code.co_firstlineno))
+                frame = frame.f_back
+            stack.reverse()
+            stack = tuple(stack)
+            if not is_idle(stack):
+                self.samples[(self._thread_name(thread_id), stack)] += 1
+
+    def collapsed(self) -> List[str]:
+        """Gets samples as collapsed stacks: thread;frame;frame count."""
+
+        lines = []
+        for (thread_name, stack), count in sorted(self.samples.items()):
+            frames = [f"{short_path(file)}:{func}:{line}" for file, func, line in stack]
+            lines.append(";".join([thread_name] + frames) + f" {count}")
+        return lines
+
+    def speedscope(self, name: str) -> dict:
+        """Gets samples as a speedscope (sampled profile per thread) file."""
+
+        frames, frame_index, profiles = [], {}, {}
+        for (thread_name, stack), count in sorted(self.samples.items()):
+            indexes = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    file_name, func, line = frame
+                    frames.append(
+                        {"name": func, "file": short_path(file_name), "line": line}
+                    )
+                indexes.append(frame_index[frame])
+            profile = profiles.setdefault(
+                thread_name,
+                {
+                    "type": "sampled",
+                    "name": thread_name,
+                    "unit": "milliseconds",
+                    "startValue": 0,
+                    "endValue": round(self.duration * 1000, 3),
+                    "samples": [],
+                    "weights": [],
+                },
+            )
+            profile["samples"].append(indexes)
+            profile["weights"].append(round(count * self.interval * 1000, 3))
+
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "quizbuilder",
+            "shared": {"frames": frames},
+            "profiles": list(profiles.values()),
+        }
+
+    def write(self, path: str, profile_format: str, name: str):
+        """Writes profile to a file.
+        :param path: file path
+        :param profile_format: speedscope or collapsed
+        :param name: profile name"""
+
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as file_handle:
+            if profile_format == "collapsed":
+                file_handle.write("\n".join(self.collapsed()) + "\n")
+            else:
+                json.dump(self.speedscope(name), file_handle)
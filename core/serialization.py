@@ -0,0 +1,178 @@
+"""Serialization module providing fast json encoding of response
+payloads. Response models are compiled once into plain functions that
+project database documents onto the model shape, so list endpoints skip
+pydantic validation and jsonable_encoder altogether."""
+
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Callable, Iterable, List, Mapping, Type
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+from pydantic.fields import SHAPE_LIST, SHAPE_SINGLETON
+
+from core.tracing import span
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional dependency
+    orjson = None
+
+JSON_BACKENDS = ("orjson", "std")
+JSON_MEDIA_TYPE = "application/json"
+
+# response model field name -> mongo field name
+DB_FIELD_ALIASES = {"identifier": "_id"}
+
+Serializer = Callable[[Mapping], dict]
+
+
+def _default(value):
+    """Stdlib json fallback for types json does not support."""
+
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _std_dumps(data) -> bytes:
+    return json.dumps(data, separators=(",", ":"), default=_default).encode("utf-8")
+
+
+def _orjson_dumps(data) -> bytes:
+    return orjson.dumps(data, option=orjson.OPT_NON_STR_KEYS)
+
+
+_dumps = _orjson_dumps if orjson is not None else _std_dumps
+
+
+def use_backend(backend: str) -> str:
+    """Selects json encoding backend. Falls back to the standard library
+    if orjson is requested but not installed.
+    :param backend: backend name, one of JSON_BACKENDS
+    :return: name of the backend in use"""
+
+    global _dumps  # pylint: disable=W0603
+
+    if backend not in JSON_BACKENDS:
+        raise ValueError(f"Unknown json backend: {backend}")
+
+    if backend == "orjson" and orjson is not None:
+        _dumps = _orjson_dumps
+        return "orjson"
+
+    _dumps = _std_dumps
+    return "std"
+
+
+def dumps(data) -> bytes:
+    """Encodes data into json bytes using selected backend.
+    :param data: json serializable data
+    :return: encoded json"""
+
+    with span("render"):
+        return _dumps(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """Json response rendered with the selected json backend."""
+
+    def render(self, content) -> bytes:
+        return dumps(content)
+
+
+def json_response(body: bytes, headers: Mapping = None) -> Response:
+    """Creates response from already encoded json.
+    :param body: encoded json
+    :param headers: response headers
+    :return: response"""
+
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=headers)
+
+
+def plan_field(model: Type[BaseModel], name: str, field) -> tuple:
+    """Plans serialization of a model field.
+    :param model: pydantic response model
+    :param name: field name
+    :param field: pydantic model field
+    :return: field name, db alias, is list, nested serializer, default"""
+
+    nested = None
+    if isinstance(field.type_, type) and issubclass(field.type_, BaseModel):
+        nested = compile_serializer(field.type_)
+    if field.shape not in (SHAPE_SINGLETON, SHAPE_LIST):
+        raise TypeError(f"Unsupported field shape: {model.__name__}.{name}")
+    return (
+        name,
+        DB_FIELD_ALIASES.get(name),
+        field.shape == SHAPE_LIST,
+        nested,
+        field.default,
+    )
+
+
+def serialize_field(source: Mapping, step: tuple):
+    """Serializes a planned field of a mapping.
+    :param source: raw mongo document
+    :param step: field plan
+    :return: field value"""
+
+    name, alias, is_list, nested, default = step
+    value = source.get(name)
+    if value is None and alias is not None:
+        value = source.get(alias)
+    if value is None:
+        return [] if is_list and default is not None else default
+    if nested is None:
+        return value
+    return [nested(x) for x in value] if is_list else nested(value)
+
+
+def compile_serializer(model: Type[BaseModel]) -> Serializer:
+    """Compiles a response model into a serializer function. The function
+    takes a mapping (a raw mongo document or a document converted with
+    to_mongo) and returns a dict holding exactly the model fields. Nested
+    models and lists of nested models are compiled recursively.
+    :param model: pydantic response model
+    :return: serializer function"""
+
+    plan = [plan_field(model, name, field) for name, field in model.__fields__.items()]
+
+    def serialize(source: Mapping) -> dict:
+        return {step[0]: serialize_field(source, step) for step in plan}
+
+    serialize.__name__ = f"serialize_{model.__name__}"
+    return serialize
+
+
+@lru_cache(maxsize=None)
+def get_serializer(model: Type[BaseModel]) -> Serializer:
+    """Gets compiled serializer for a response model.
+    :param model: pydantic response model
+    :return: serializer function"""
+
+    return compile_serializer(model)
+
+
+def document_to_dict(document, model: Type[BaseModel]) -> dict:
+    """Serializes a mongo document into response model shape.
+    :param document: mongoengine document
+    :param model: pydantic response model
+    :return: dict with response model fields"""
+
+    return get_serializer(model)(document.to_mongo(use_db_field=False))
+
+
+def documents_to_list(documents: Iterable, model: Type[BaseModel]) -> List[dict]:
+    """Serializes mongo documents into response model shape.
+    :param documents: mongoengine documents or raw mongo documents (dicts)
+    :param model: pydantic response model
+    :return: list of dicts with response model fields"""
+
+    serializer = get_serializer(model)
+    return [
+        serializer(doc if isinstance(doc, Mapping) else doc.to_mongo())
+        for doc in documents
+    ]
@@ -0,0 +1,125 @@
+"""Hierarchical timing wheel module. Timers are kept in wheels of slots:
+level 0 slots span one tick, every next level spans a whole rotation of
+the level below. A timer goes to the lowest level whose range covers its
+deadline; when a level rotates, the timers of its next slot cascade down
+to lower levels, so scheduling, cancelling and firing a timer are O(1)
+and advancing costs one slot per tick, however many timers are pending.
+Timers past the range of the top level wait in an overflow list that is
+re-placed once per top level rotation."""
+
+import math
+import threading
+from typing import Dict, Hashable, List, Optional, Tuple
+
+
+class TimingWheel:
+    """Hierarchical timing wheel firing keys at their deadlines (in
+    seconds, i.e. unix time)."""
+
+    def __init__(
+        self,
+        tick: float = 1.0,
+        slots: int = 64,
+        levels: int = 4,
+        start: Optional[float] = None,
+    ):
+        """Constructor
+        :param tick: resolution in seconds, timers fire within one tick
+        after their deadline
+        :param slots: slots per level
+        :param levels: number of levels
+        :param start: current time, defaults to 0"""
+
+        self.tick = tick
+        self.slots = slots
+        self.levels = levels
+        self._spans = [slots**level for level in range(levels + 1)]
+        self._current = math.floor((start or 0.0) / tick)
+        self._wheels: List[List[Dict[Hashable, int]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._overflow: Dict[Hashable, int] = {}
+        # key -> (deadline tick, level (-1 for overflow), slot)
+        self._timers: Dict[Hashable, Tuple[int, int, int]] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._timers)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._timers
+
+    def schedule(self, key: Hashable, deadline: float):
+        """Schedules (or reschedules) a timer.
+        :param key: timer key
+        :param deadline: time the key fires at"""
+
+        with self._lock:
+            self._remove(key)
+            # a timer due already fires on the next tick
+            self._place(key, max(math.ceil(deadline / self.tick), self._current + 1))
+
+    def cancel(self, key: Hashable) -> bool:
+        """Cancels a timer.
+        :return: False if the timer was not pending"""
+
+        with self._lock:
+            return self._remove(key)
+
+    def advance(self, now: float) -> List[Hashable]:
+        """Advances the wheel to the current time.
+        :param now: current time
+        :return: keys whose deadline passed, ordered by deadline tick"""
+
+        target = math.floor(now / self.tick)
+        fired = []
+        with self._lock:
+            while self._current < target:
+                self._current += 1
+                self._cascade()
+                slot = self._wheels[0][self._current % self.slots]
+                for key in slot:
+                    del self._timers[key]
+                fired.extend(slot)
+                slot.clear()
+        return fired
+
+    def _place(self, key: Hashable, deadline: int):
+        delta = deadline - self._current
+        for level in range(self.levels):
+            if delta < self._spans[level + 1]:
+                slot = (deadline // self._spans[level]) % self.slots
+                self._wheels[level][slot][key] = deadline
+                self._timers[key] = (deadline, level, slot)
+                return
+        self._overflow[key] = deadline
+        self._timers[key] = (deadline, -1, 0)
+
+    def _remove(self, key: Hashable) -> bool:
+        timer = self._timers.pop(key, None)
+        if timer is None:
+            return False
+        _, level, slot = timer
+        if level < 0:
+            del self._overflow[key]
+        else:
+            del self._wheels[level][slot][key]
+        return True
+
+    def _cascade(self):
+        """Moves timers of the slots starting now to lower levels."""
+
+        if self._current % self._spans[self.levels] == 0 and self._overflow:
+            overflow, self._overflow = self._overflow, {}
+            for key, deadline in overflow.items():
+                self._place(key, deadline)
+        for level in range(self.levels - 1, 0, -1):
+            if self._current % self._spans[level]:
+                continue
+            slot = self._wheels[level][
+                (self._current // self._spans[level]) % self.slots
+            ]
+            timers = list(slot.items())
+            slot.clear()
+            for key, deadline in timers:
+                self._place(key, deadline)
@@ -0,0 +1,312 @@
+"""Request tracing module. Spans (named, timed operations) of a request
+form a trace; the current span is kept in a context variable, so nested
+calls (also those run in the thread pool) become its children. Traces
+are sampled when they start (or follow the sampled flag of an incoming
+W3C traceparent header); code outside a sampled trace pays only for a
+context variable lookup. Finished traces go to a pluggable exporter:
+in-memory ring buffer, local NDJSON file or none."""
+
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from core.config import get_config
+
+TRACE_EXPORTERS = ("memory", "file", "none")
+TRACEPARENT_VERSION = "00"
+SAMPLED_FLAG = 0x01
+
+
+class Span:
+    """Span of a trace."""
+
+    __slots__ = (
+        "trace_id",
+        "span_id",
+        "parent_id",
+        "name",
+        "attributes",
+        "status",
+        "timestamp",
+        "duration_ms",
+        "_started",
+        "_finished",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        trace_id: str,
+        parent_id: Optional[str] = None,
+        attributes: Dict = None,
+        finished: List = None,
+    ):
+        """Constructor
+        :param name: span name
+        :param trace_id: trace id (32 hex digits)
+        :param parent_id: parent span id (16 hex digits)
+        :param attributes: span attributes
+        :param finished: finished spans of the trace (shared with the
+        local root span)"""
+
+        self.trace_id = trace_id
+        self.span_id = random_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.timestamp = datetime.utcnow()
+        self.duration_ms = None
+        self._started = time.perf_counter()
+        self._finished = [] if finished is None else finished
+
+    def child(self, name: str, attributes: Dict = None) -> "Span":
+        return Span(name, self.trace_id, self.span_id, attributes, self._finished)
+
+    def end(self):
+        self.duration_ms = round((time.perf_counter() - self._started) * 1000, 3)
+        self._finished.append(self)
+
+    def traceparent(self) -> str:
+        return (
+            f"{TRACEPARENT_VERSION}-{self.trace_id}-{self.span_id}-{SAMPLED_FLAG:02x}"
+        )
+
+    def to_dict(self) -> dict:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "timestamp": self.timestamp,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def random_id(size: int) -> str:
+    """Gets random non zero id of size bytes as hex digits."""
+
+    return f"{random.getrandbits(size * 8) or 1:0{size * 2}x}"
+
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """Parses W3C traceparent header.
+    :param header: header value i.e. 00-<trace id>-<parent id>-01
+    :return: trace id, parent span id and sampled flag, None if invalid"""
+
+    if not header:
+        return None
+    parts = header.strip().lower().split("-")
+    if len(parts) < 4 or len(parts[0]) != 2 or parts[0] == "ff":
+        return None
+    _, trace_id, parent_id, flags = parts[:4]
+    if len(trace_id) != 32 or len(parent_id) != 16 or len(flags) != 2:
+        return None
+    try:
+        is_valid = int(trace_id, 16) and int(parent_id, 16)
+        sampled = bool(int(flags, 16) & SAMPLED_FLAG)
+    except ValueError:
+        return None
+    return (trace_id, parent_id, sampled) if is_valid else None
+
+
+class SpanExporter:
+    """Base exporter: receives spans of finished traces."""
+
+    def export(self, spans: List[Span]):
+        raise NotImplementedError
+
+
+class NoopExporter(SpanExporter):
+    def export(self, spans: List[Span]):
+        pass
+
+
+class MemoryExporter(SpanExporter):
+    """Keeps spans of recent traces in memory."""
+
+    def __init__(self, size: int = 10000):
+        """Constructor
+        :param size: number of recent spans kept"""
+
+        self._spans = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        with self._lock:
+            self._spans.extend(spans)
+
+    def spans(self, trace_id: str = None, limit: int = None) -> List[dict]:
+        """Gets recent spans (newest first).
+        :param trace_id: spans of this trace only
+        :param limit: maximum number of spans
+        :return: spans as dicts"""
+
+        with self._lock:
+            spans = list(self._spans)[::-1]
+        if trace_id is not None:
+            spans = [span for span in spans if span.trace_id == trace_id]
+        return [span.to_dict() for span in spans[:limit]]
+
+    def clear(self):
+        with self._lock:
+            self._spans.clear()
+
+
+class FileExporter(SpanExporter):
+    """Appends spans to a local NDJSON file, one span per line."""
+
+    def __init__(self, path: str):
+        """Constructor
+        :param path: file path"""
+
+        self.path = path
+        self._lock = threading.Lock()
+
+    def export(self, spans: List[Span]):
+        lines = "".join(
+            json.dumps(span.to_dict(), default=str) + "\n" for span in spans
+        )
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as file_handle:
+                file_handle.write(lines)
+
+
+_exporter: Optional[SpanExporter] = None
+
+
+def create_exporter(name: str) -> SpanExporter:
+    """Creates exporter configured by settings.
+    :param name: memory, file or none
+    :return: exporter"""
+
+    settings = get_config().MONITORING_INFO
+    if name == "memory":
+        return MemoryExporter(settings.trace_memory_size)
+    if name == "file":
+        return FileExporter(settings.trace_file)
+    if name == "none":
+        return NoopExporter()
+    raise ValueError(f"Unknown trace exporter: {name}")
+
+
+def get_exporter() -> SpanExporter:
+    """Gets exporter in use, created from TRACE_EXPORTER setting."""
+
+    global _exporter  # pylint: disable=W0603
+
+    if _exporter is None:
+        _exporter = create_exporter(get_config().MONITORING_INFO.trace_exporter)
+    return _exporter
+
+
+def set_exporter(exporter: SpanExporter) -> SpanExporter:
+    """Sets exporter (i.e. one shipping spans to a tracing backend).
+    :param exporter: exporter
+    :return: previous exporter"""
+
+    global _exporter  # pylint: disable=W0603
+
+    previous, _exporter = _exporter, exporter
+    return previous
+
+
+def is_sampled(parent_sampled: Optional[bool], sample_rate: float = None) -> bool:
+    """Parent based sampler: follows the sampled flag of an incoming
+    traceparent, samples new traces with TRACE_SAMPLE_RATE probability."""
+
+    if parent_sampled is not None:
+        return parent_sampled
+    if sample_rate is None:
+        sample_rate = get_config().MONITORING_INFO.trace_sample_rate
+    return sample_rate > 0 and random.random() < sample_rate
+
+
+@contextmanager
+def start_trace(name: str, traceparent: str = None, attributes: Dict = None):
+    """Starts local root span of a trace, exported when it ends.
+    :param name: span name
+    :param traceparent: incoming W3C traceparent header
+    :param attributes: span attributes
+    :return: root span, None if the trace is not sampled"""
+
+    parent = parse_traceparent(traceparent)
+    trace_id, parent_id, parent_sampled = parent or (random_id(16), None, None)
+    if not is_sampled(parent_sampled):
+        yield None
+        return
+
+    root = Span(name, trace_id, parent_id, attributes)
+    token = current_span.set(root)
+    try:
+        yield root
+    except BaseException:
+        root.status = "error"
+        raise
+    finally:
+        current_span.reset(token)
+        root.end()
+        get_exporter().export(root._finished)
+
+
+@contextmanager
+def span(name: str, attributes: Dict = None):
+    """Runs a block as a child span of the current span (no-op outside
+    of sampled traces).
+    :param name: span name
+    :param attributes: span attributes
+    :return: span, None outside of sampled traces"""
+
+    parent = current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    child = parent.child(name, attributes)
+    token = current_span.set(child)
+    try:
+        yield child
+    except BaseException:
+        child.status = "error"
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def traced(name: str = None, attributes: Callable[..., Dict] = None):
+    """Decorator running a function as a child span of the current span.
+    Lazy results (querysets, generators) are timed only while created.
+    :param name: span name, defaults to qualified function name
+    :param attributes: function computing span attributes from the call
+    arguments
+    :return: decorator"""
+
+    def decorator(func):
+        span_name = name or func.__qualname__
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if current_span.get() is None:
+                return func(*args, **kwargs)
+            span_attributes = attributes(*args, **kwargs) if attributes else None
+            with span(span_name, span_attributes):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
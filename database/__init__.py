@@ -4,6 +4,10 @@ connection to a mongo database given connection string."""
 from mongoengine import connect
 
 from core.config import get_config
+from database.monitoring import register_listeners
+
+# listeners apply to clients created after registration
+register_listeners()
 
 # connect to mongo database
 connect(host=get_config().MONGODB_CONN_STR)
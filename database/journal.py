@@ -0,0 +1,367 @@
+"""Write-behind solution journal. Graded solutions are appended to a
+local append-only journal and acknowledged once it is fsynced; appends
+arriving within JOURNAL_FSYNC_MS share one fsync (group commit). A
+background flusher bulk inserts journaled solutions into the database
+every JOURNAL_FLUSH_MS, records them in the quiz statistics and advances
+a checkpoint; fully flushed journal segments are deleted. On start the
+journal replays solutions past the checkpoint. Inserts are idempotent:
+solution ids are reserved before journaling and solutions already in
+the database are skipped, so a replay never duplicates them. Pending
+(owner, quiz) pairs are kept in memory to keep one attempt per user
+while a solution is not flushed yet."""
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from bson import json_util
+
+from core.config import get_config
+from core.metrics import REGISTRY
+
+SEGMENT_PREFIX = "journal-"
+SEGMENT_SUFFIX = ".ndjson"
+CHECKPOINT_FILE = "checkpoint"
+ID_BLOCK = 1000
+RETRY_SECONDS = 1.0
+
+JOURNAL_LAG = REGISTRY.gauge(
+    "solution_journal_lag", "Journaled solutions not flushed to the database yet."
+)
+JOURNAL_LAG_SECONDS = REGISTRY.gauge(
+    "solution_journal_lag_seconds",
+    "Age of the oldest journaled solution not flushed to the database yet.",
+)
+JOURNAL_FLUSHED = REGISTRY.counter(
+    "solution_journal_flushed_total", "Solutions flushed from the journal."
+)
+
+
+def resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SubmissionJournal:
+    """Append-only solution journal with group commit and write-behind
+    flushing into the solution repository."""
+
+    def __init__(
+        self,
+        repo,
+        on_flush: Optional[Callable[[List[dict]], None]] = None,
+        directory: str = None,
+        fsync_ms: float = None,
+        flush_ms: float = None,
+        batch_size: int = None,
+        segment_mb: float = None,
+    ):
+        """Constructor
+        :param repo: repository factory solutions are flushed to
+        :param on_flush: called with every batch of inserted solutions
+        :param directory: journal directory, defaults to JOURNAL_DIR setting
+        :param fsync_ms: group commit window in milliseconds
+        :param flush_ms: flush interval in milliseconds
+        :param batch_size: maximum number of solutions per bulk insert
+        :param segment_mb: segment size in megabytes"""
+
+        settings = get_config().STORAGE_INFO
+        self.repo = repo
+        self.on_flush = on_flush
+        self.directory = directory or settings.journal_dir
+        self.fsync_seconds = (
+            settings.journal_fsync_ms if fsync_ms is None else fsync_ms
+        ) / 1000
+        self.flush_seconds = (
+            settings.journal_flush_ms if flush_ms is None else flush_ms
+        ) / 1000
+        self.batch_size = batch_size or settings.journal_flush_batch
+        segment_mb = settings.journal_segment_mb if segment_mb is None else segment_mb
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+
+        self._lock = threading.Lock()
+        self._appended = threading.Condition(self._lock)
+        self._stopped = threading.Event()
+        self._file = None
+        self._segment_size = 0
+        self._seq = 0
+        self._flushed = 0
+        self._waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Future]] = []
+        self._pending: Dict[int, Tuple[float, dict]] = {}
+        self._keys: Set[Tuple[str, int]] = set()
+        self._ids = iter(())
+        self._id_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    # lifecycle
+    ###############################################
+
+    def start(self):
+        """Replays journaled solutions past the checkpoint, opens a new
+        segment and starts the fsync and flush threads."""
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._flushed = self._read_checkpoint()
+        self._seq = self._flushed
+        for path in self.segments():
+            for record in self._read_segment(path):
+                self._seq = max(self._seq, record["seq"])
+                if record["seq"] > self._flushed:
+                    self._track(record["seq"], record["ts"], record["solution"])
+        self._open_segment()
+
+        JOURNAL_LAG.set_function(lambda: len(self._pending))
+        JOURNAL_LAG_SECONDS.set_function(self.lag_seconds)
+        self._stopped.clear()
+        self._threads = [
+            threading.Thread(target=self._sync_loop, name="journal-sync", daemon=True),
+            threading.Thread(
+                target=self._flush_loop, name="journal-flush", daemon=True
+            ),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def close(self):
+        """Stops the threads, flushes all journaled solutions and closes
+        the segment."""
+
+        self._stopped.set()
+        with self._lock:
+            self._appended.notify_all()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+        try:
+            while self._pending and self.flush():
+                pass
+        except Exception as exc:  # pylint: disable=W0703
+            logging.warning("Solution journal left for replay: %s", exc)
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    # appending
+    ###############################################
+
+    def reserve_id(self) -> int:
+        """Reserves solution id (ids are reserved from the database in
+        blocks)."""
+
+        with self._id_lock:
+            identifier = next(self._ids, None)
+            if identifier is None:
+                self._ids = iter(self.repo.quiz_solution.reserve_ids(ID_BLOCK))
+                identifier = next(self._ids)
+            return identifier
+
+    def is_pending(self, owner: str, quiz_id: int) -> bool:
+        """Checks whether a solution of a user is journaled but not
+        flushed yet."""
+
+        return (owner, quiz_id) in self._keys
+
+    async def append(self, solution: dict) -> bool:
+        """Appends solution and waits until it is durable.
+        :param solution: raw solution document with reserved _id
+        :return: False if a solution of the same owner and quiz is pending"""
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        body = json_util.dumps(solution)
+        with self._lock:
+            if (solution["owner"], solution["quiz"]) in self._keys:
+                return False
+            self._seq += 1
+            timestamp = time.time()
+            line = f'{{"seq": {self._seq}, "ts": {timestamp}, "solution": {body}}}\n'
+            line = line.encode("utf-8")
+            self._file.write(line)
+            self._segment_size += len(line)
+            self._track(self._seq, timestamp, solution)
+            self._waiters.append((loop, future))
+            self._appended.notify()
+        await future
+        return True
+
+    def lag_seconds(self) -> float:
+        """Gets age of the oldest solution not flushed yet."""
+
+        with self._lock:
+            oldest = next(iter(self._pending.values()), None)
+        return time.time() - oldest[0] if oldest is not None else 0.0
+
+    def _track(self, seq: int, timestamp: float, solution: dict):
+        self._pending[seq] = (timestamp, solution)
+        self._keys.add((solution["owner"], solution["quiz"]))
+
+    def _sync_loop(self):
+        """Fsyncs appended records in groups and acknowledges them."""
+
+        while True:
+            with self._lock:
+                while not self._waiters and not self._stopped.is_set():
+                    self._appended.wait()
+                if not self._waiters:
+                    return
+            # appends arriving meanwhile share the fsync
+            time.sleep(self.fsync_seconds)
+            with self._lock:
+                self._file.flush()
+                waiters, self._waiters = self._waiters, []
+                synced = self._file
+                # later appends go to the next segment, the full one is
+                # closed once the fsync below made its appends durable
+                rotated = self._segment_size >= self.segment_bytes
+                if rotated:
+                    self._open_segment()
+            os.fsync(synced.fileno())
+            if rotated:
+                synced.close()
+            for loop, future in waiters:
+                loop.call_soon_threadsafe(resolve, future)
+
+    # flushing
+    ###############################################
+
+    def flush(self) -> int:
+        """Inserts a batch of journaled solutions into the database.
+        :return: number of flushed solutions"""
+
+        with self._flush_lock:
+            with self._lock:
+                batch = list(islice(self._pending.items(), self.batch_size))
+            if not batch:
+                return 0
+
+            inserted = self._insert([solution for _, (_, solution) in batch])
+            if self.on_flush is not None and inserted:
+                self.on_flush(inserted)
+
+            with self._lock:
+                for seq, (_, solution) in batch:
+                    del self._pending[seq]
+                    self._keys.discard((solution["owner"], solution["quiz"]))
+                self._flushed = batch[-1][0]
+            self._write_checkpoint(self._flushed)
+            self._delete_flushed_segments()
+            JOURNAL_FLUSHED.inc(amount=len(batch))
+            return len(batch)
+
+    def _stored_ids(self, solutions: List[dict]) -> Set[int]:
+        keys = [solution["_id"] for solution in solutions]
+        return {
+            doc["_id"]
+            for doc in self.repo.quiz_solution.filter(
+                pk__in=keys, only=["identifier"], as_dict=True, limit=len(keys)
+            )
+        }
+
+    def _insert(self, solutions: List[dict]) -> List[dict]:
+        """Inserts solutions not stored yet (replayed ones may be).
+        :return: inserted solutions; solutions rejected by the unique
+        (owner, quiz) index are skipped by the insert and left out"""
+
+        existing = self._stored_ids(solutions)
+        candidates = [doc for doc in solutions if doc["_id"] not in existing]
+        inserted = self.repo.quiz_solution.bulk_insert(candidates)
+        if inserted == len(candidates):
+            return candidates
+        stored = self._stored_ids(candidates)
+        return [doc for doc in candidates if doc["_id"] in stored]
+
+    def _flush_loop(self):
+        while not self._stopped.wait(self.flush_seconds):
+            try:
+                while self.flush() == self.batch_size:
+                    pass
+            except Exception as exc:  # pylint: disable=W0703
+                logging.warning("Solution journal flush failed: %s", exc)
+                self._stopped.wait(RETRY_SECONDS)
+
+    # files
+    ###############################################
+
+    def segments(self) -> List[str]:
+        """Gets segment paths, oldest first."""
+
+        names = sorted(
+            name
+            for name in os.listdir(self.directory)
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+        )
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _open_segment(self):
+        name = f"{SEGMENT_PREFIX}{self._seq + 1:015d}{SEGMENT_SUFFIX}"
+        self._file = open(os.path.join(self.directory, name), "ab")
+        self._segment_size = 0
+
+    @staticmethod
+    def _first_seq(path: str) -> int:
+        name = os.path.basename(path)
+        return int(name.removeprefix(SEGMENT_PREFIX).removesuffix(SEGMENT_SUFFIX))
+
+    def _delete_flushed_segments(self):
+        """Deletes segments whose records are all flushed (a segment ends
+        where the next one starts, the last one is open)."""
+
+        segments = self.segments()
+        for path, following in zip(segments, segments[1:]):
+            if self._first_seq(following) - 1 > self._flushed:
+                break
+            os.remove(path)
+
+    @staticmethod
+    def _read_segment(path: str):
+        """Reads records of a segment up to a torn (partially written)
+        record."""
+
+        with open(path, "rb") as file_handle:
+            for line in file_handle:
+                try:
+                    yield json_util.loads(line)
+                except ValueError:
+                    return
+
+    def _read_checkpoint(self) -> int:
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        if not os.path.exists(path):
+            return 0
+        with open(path, "r", encoding="utf-8") as file_handle:
+            return int(file_handle.read().strip() or 0)
+
+    def _write_checkpoint(self, seq: int):
+        path = os.path.join(self.directory, CHECKPOINT_FILE)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write(str(seq))
+            file_handle.flush()
+            os.fsync(file_handle.fileno())
+        os.replace(tmp_path, path)
+
+
+_journal: Optional[SubmissionJournal] = None
+
+
+def get_journal() -> Optional[SubmissionJournal]:
+    """Gets the solution journal, None unless SOLUTION_JOURNAL is on."""
+
+    return _journal
+
+
+def set_journal(journal: Optional[SubmissionJournal]) -> Optional[SubmissionJournal]:
+    """Sets the solution journal.
+    :param journal: solution journal, None to persist solutions directly
+    :return: previous solution journal"""
+
+    global _journal  # pylint: disable=W0603
+
+    previous, _journal = _journal, journal
+    return previous
@@ -0,0 +1,603 @@
+# pylint: disable=no-name-in-module
+# pylint: disable=R0903
+
+"""In-memory repository module. Documents are kept as raw (mongo shaped)
+dicts and indexed in memory: hash indexes on the primary key and on
+selected fields, a sorted primary key index used for pagination and
+streaming, trigram indexes for substring (icontains) search and sorted
+indexes for prefix (istartswith) search. Repositories can be persisted
+to, and restored from, a local snapshot file. Serves single node
+deployments, benchmarks and tests without a mongo database."""
+
+import os
+import threading
+from bisect import bisect_left, insort
+from collections import defaultdict
+from operator import eq, ge, gt, le, lt
+from typing import (Callable, Dict, Iterable, List, Optional, Sequence, Set,
+                    Tuple)
+
+from bson import json_util
+from mongoengine import (Document, EmbeddedDocumentField, ListField,
+                         ReferenceField, SequenceField)
+from mongoengine.errors import InvalidQueryError
+from mongoengine.queryset import transform
+
+from core.tracing import traced
+from database.repository import IRepository, collection_attributes
+from model import (ActivityRollup, IdempotencyRecord, Quiz, QuizAttempt,
+                   QuizSnapshot, QuizSolution, QuizStats, RegradeCheckpoint,
+                   User)
+
+TRIGRAM_SIZE = 3
+UPDATE_OPERATORS = ("$set", "$inc", "$min", "$max")
+COMPARISONS = {"gt": gt, "gte": ge, "lt": lt, "lte": le}
+
+
+def present(compare: Callable) -> Callable:
+    """Comparison failing for missing (None) values, as in mongo."""
+
+    return lambda current, value: current is not None and compare(current, value)
+
+
+def text_matcher(match: Callable) -> Callable:
+    """Text match failing for values that are not strings; the value
+    is lower cased by the condition already."""
+
+    return lambda current, value: isinstance(current, str) and match(
+        current.lower(), value
+    )
+
+
+# filter operator -> match(document value, condition value)
+MATCHERS: Dict[str, Callable] = {
+    "": eq,
+    "in": lambda current, value: current in value,
+    "icontains": text_matcher(lambda current, value: value in current),
+    "istartswith": text_matcher(str.startswith),
+    **{operator: present(compare) for operator, compare in COMPARISONS.items()},
+}
+
+
+def sort_value(value) -> Tuple[bool, object]:
+    return value is not None, value
+
+
+def copy_raw(value):
+    """Copies raw (json like) document; faster than deepcopy.
+    :param value: raw document or value
+    :return: copy of a given value"""
+
+    if isinstance(value, dict):
+        return {key: copy_raw(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [copy_raw(val) for val in value]
+    return value
+
+
+def sequence_key(field: SequenceField) -> str:
+    """Gets sequence counter key (same as the mongo counter id)."""
+
+    return f"{field.get_sequence_name()}.{field.name}"
+
+
+def trigrams(text: str) -> Set[str]:
+    """Splits text into (lower case) trigrams."""
+
+    text = text.lower()
+    ends = range(TRIGRAM_SIZE, len(text) + 1)
+    return {text[start:end] for start, end in enumerate(ends)}
+
+
+def apply_update(document: dict, operator: str, path: str, value):
+    """Applies update operator to a (dotted path) field of a raw document.
+    :param document: raw document, changed in place
+    :param operator: $set, $inc, $min or $max
+    :param path: dotted field path i.e. histogram.3
+    :param value: operand"""
+
+    *parents, name = path.split(".")
+    for parent in parents:
+        document = document.setdefault(parent, {})
+    current = document.get(name)
+    if operator == "$inc":
+        document[name] = (current or 0) + value
+    elif operator == "$set" or current is None:
+        document[name] = value
+    elif operator == "$min":
+        document[name] = min(current, value)
+    else:
+        document[name] = max(current, value)
+
+
+class SequenceCounter:
+    """Thread safe replacement of mongoengine sequence counters."""
+
+    def __init__(self, values: Dict[str, int] = None):
+        self._values = dict(values or {})
+        self._lock = threading.Lock()
+
+    def reserve(self, key: str, count: int = 1) -> range:
+        """Reserves a block of sequence values.
+        :param key: sequence key
+        :param count: number of values to reserve
+        :return: range of reserved values"""
+
+        with self._lock:
+            last = self._values.get(key, 0) + count
+            self._values[key] = last
+        return range(last - count + 1, last + 1)
+
+    def observe(self, key: str, value):
+        """Moves sequence past an explicitly assigned value."""
+
+        if isinstance(value, int):
+            with self._lock:
+                if value > self._values.get(key, 0):
+                    self._values[key] = value
+
+    def values(self) -> Dict[str, int]:
+        """Gets current sequence values."""
+
+        with self._lock:
+            return dict(self._values)
+
+    def reset(self, values: Dict[str, int]):
+        """Replaces all sequence values."""
+
+        with self._lock:
+            self._values = dict(values)
+
+
+class TextIndex:
+    """Substring and prefix search index of a string field."""
+
+    def __init__(self):
+        self._trigrams = defaultdict(set)
+        self._sorted = []
+
+    def add(self, key, text: str):
+        for trigram in trigrams(text):
+            self._trigrams[trigram].add(key)
+        insort(self._sorted, (text.lower(), key))
+
+    def remove(self, key, text: str):
+        for trigram in trigrams(text):
+            keys = self._trigrams.get(trigram)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._trigrams[trigram]
+        position = bisect_left(self._sorted, (text.lower(), key))
+        if position < len(self._sorted) and self._sorted[position][1] == key:
+            del self._sorted[position]
+
+    def contains(self, text: str) -> Optional[Set]:
+        """Gets candidate keys of documents containing text; None if text
+        is too short to use the index (candidates must be verified)."""
+
+        grams = trigrams(text)
+        if not grams:
+            return None
+        keys = sorted((self._trigrams.get(gram, set()) for gram in grams), key=len)
+        return set.intersection(*keys) if keys[0] else set()
+
+    def prefix(self, text: str) -> Set:
+        """Gets keys of documents starting with text."""
+
+        text = text.lower()
+        keys = set()
+        for position in range(bisect_left(self._sorted, (text,)), len(self._sorted)):
+            value, key = self._sorted[position]
+            if not value.startswith(text):
+                break
+            keys.add(key)
+        return keys
+
+
+class MemoryRepository(IRepository):
+    """In-memory repository class.
+    Supported filters: field=value, field__in, field__icontains,
+    field__istartswith and field__gt/gte/lt/lte, plus limit, skip, only
+    and as_dict options.
+    Supported updates: set, inc, min and max."""
+
+    def __init__(
+        self,
+        model,
+        sequences: SequenceCounter,
+        registry: Dict,
+        indexes: Sequence[str] = (),
+        text_indexes: Sequence[str] = (),
+    ):
+        """Constructor
+        :param model: model to use in repository
+        :param sequences: sequence counters shared by repositories
+        :param registry: repositories by model, used to resolve references
+        :param indexes: fields with hash index
+        :param text_indexes: string fields with substring/prefix index"""
+
+        self._model = model
+        self._sequences = sequences
+        self._registry = registry
+        self._registry[model] = self
+        self._lock = threading.RLock()
+
+        self._documents = {}
+        self._keys = []
+        self._indexes = {self._db_field(name): defaultdict(set) for name in indexes}
+        self._text_indexes = {
+            self._db_field(name): TextIndex() for name in text_indexes
+        }
+        self._references = {
+            field.db_field: field.document_type
+            for field in model._fields.values()
+            if isinstance(field, ReferenceField)
+        }
+
+    def _db_field(self, name: str) -> str:
+        if name == "pk":
+            return "_id"
+        field = self._model._fields.get(name)
+        if field is None:
+            raise InvalidQueryError(f"Cannot resolve field {name}")
+        return field.db_field
+
+    # documents
+    ###############################################
+
+    def _add(self, document: dict):
+        key = document["_id"]
+        self._documents[key] = document
+        insort(self._keys, key)
+        for field, index in self._indexes.items():
+            if field in document:
+                index[document[field]].add(key)
+        for field, index in self._text_indexes.items():
+            if isinstance(document.get(field), str):
+                index.add(key, document[field])
+
+    def _remove(self, key) -> Optional[dict]:
+        document = self._documents.pop(key, None)
+        if document is None:
+            return None
+        del self._keys[bisect_left(self._keys, key)]
+        for field, index in self._indexes.items():
+            if field in document:
+                keys = index[document[field]]
+                keys.discard(key)
+                if not keys:
+                    del index[document[field]]
+        for field, index in self._text_indexes.items():
+            if isinstance(document.get(field), str):
+                index.remove(key, document[field])
+        return document
+
+    def _materialize(self, document: dict) -> Document:
+        item = self._model._from_son(copy_raw(document))
+        for field, model in self._references.items():
+            key = document.get(field)
+            repository = self._registry.get(model)
+            if key is not None and repository is not None:
+                name = self._model._reverse_db_field_map[field]
+                item._data[name] = repository.get(key)
+        return item
+
+    def _assign_sequences(self, item):
+        """Assigns sequence values of a document and its embedded
+        documents (mongoengine would fetch them from the database)."""
+
+        for name, field in item._fields.items():
+            value = item._data.get(name)
+            if isinstance(field, SequenceField):
+                if value is None:
+                    item._data[name] = self._sequences.reserve(sequence_key(field))[0]
+                else:
+                    self._sequences.observe(sequence_key(field), value)
+            elif isinstance(field, EmbeddedDocumentField) and value is not None:
+                self._assign_sequences(value)
+            elif isinstance(field, ListField) and isinstance(
+                field.field, EmbeddedDocumentField
+            ):
+                for embedded in value or []:
+                    self._assign_sequences(embedded)
+
+    # queries
+    ###############################################
+
+    def _condition(self, key: str, value):
+        name, _, operator = key.partition("__")
+        field = self._db_field(name)
+        if isinstance(value, Document):
+            value = value.pk
+        if operator == "in":
+            value = {val.pk if isinstance(val, Document) else val for val in value}
+        elif operator in ("icontains", "istartswith"):
+            value = value.lower()
+        elif operator not in MATCHERS:
+            raise InvalidQueryError(f"Unsupported operator {operator}")
+        return field, operator, value
+
+    def _candidates(self, field: str, operator: str, value) -> Optional[Set]:
+        """Gets keys matching a condition using indexes; None if the
+        condition is not indexed."""
+
+        if field == "_id" and operator in ("", "in"):
+            values = value if operator == "in" else [value]
+            return {val for val in values if val in self._documents}
+        if field in self._indexes and operator in ("", "in"):
+            index = self._indexes[field]
+            values = value if operator == "in" else [value]
+            return set().union(*(index.get(val, ()) for val in values))
+        if field in self._text_indexes and operator == "icontains":
+            return self._text_indexes[field].contains(value)
+        if field in self._text_indexes and operator == "istartswith":
+            return self._text_indexes[field].prefix(value)
+        return None
+
+    @staticmethod
+    def _matches(document: dict, conditions: Iterable) -> bool:
+        return all(
+            MATCHERS[operator](document.get(field), value)
+            for field, operator, value in conditions
+        )
+
+    def _query(self, kwargs: Dict) -> List:
+        """Gets primary keys (in order) of documents matching filters."""
+
+        conditions = [self._condition(key, value) for key, value in kwargs.items()]
+        candidates = None
+        for condition in conditions:
+            keys = self._candidates(*condition)
+            if keys is not None:
+                candidates = keys if candidates is None else candidates & keys
+
+        if candidates is None:
+            keys = self._keys
+        elif len(candidates) * 8 < len(self._keys):
+            keys = sorted(candidates)
+        else:
+            keys = [key for key in self._keys if key in candidates]
+
+        # indexed conditions are verified too (trigrams give candidates only)
+        documents = self._documents
+        return [key for key in keys if self._matches(documents[key], conditions)]
+
+    def _order(self, keys: List, order_by: Sequence[str]) -> List:
+        """Sorts primary keys by fields (- prefix sorts descending);
+        missing values sort first, ties keep primary key order."""
+
+        for name in reversed(order_by):
+            field = self._db_field(name.lstrip("-"))
+            values = {key: sort_value(self._documents[key].get(field)) for key in keys}
+            keys = sorted(keys, key=values.__getitem__, reverse=name.startswith("-"))
+        return keys
+
+    @staticmethod
+    def _project(document: dict, fields: Optional[Set[str]]) -> dict:
+        if fields is None:
+            return copy_raw(document)
+        return {key: copy_raw(val) for key, val in document.items() if key in fields}
+
+    # repository interface
+    ###############################################
+
+    @traced("repository.get", collection_attributes)
+    def get(self, key):
+        with self._lock:
+            document = self._documents.get(key)
+        return None if document is None else self._materialize(document)
+
+    @traced("repository.filter", collection_attributes)
+    def filter(self, **kwargs):
+        limit, skip, order_by, only, as_dict = (
+            kwargs.pop("limit", 50),
+            kwargs.pop("skip", 0),
+            kwargs.pop("order_by", None),
+            kwargs.pop("only", None),
+            kwargs.pop("as_dict", False),
+        )
+        end = skip + limit
+        with self._lock:
+            keys = self._query(kwargs)
+            if order_by:
+                keys = self._order(keys, order_by)
+            keys = keys[skip:end]
+            documents = [self._documents[key] for key in keys]
+
+        if not as_dict:
+            return [self._materialize(document) for document in documents]
+
+        fields = None
+        if only is not None:
+            fields = {"_id"} | {self._db_field(name) for name in only}
+        return [self._project(document, fields) for document in documents]
+
+    @traced("repository.persist", collection_attributes)
+    def persist(self, item: Document) -> Document:
+        self._assign_sequences(item)
+        item.validate()
+        document = copy_raw(item.to_mongo().to_dict())
+        with self._lock:
+            self._remove(document["_id"])
+            self._add(document)
+        return self.get(document["_id"])
+
+    @traced("repository.update", collection_attributes)
+    def update(self, key, upsert: bool = False, **kwargs):
+        changes = transform.update(self._model, **kwargs)
+        unsupported = set(changes) - set(UPDATE_OPERATORS)
+        if unsupported:
+            raise InvalidQueryError(f"Unsupported update operators {unsupported}")
+
+        with self._lock:
+            document = self._documents.get(key)
+            if document is None and not upsert:
+                return None
+            # changed copy replaces the document, so indexes are updated
+            document = {"_id": key} if document is None else copy_raw(document)
+            for operator, fields in changes.items():
+                for path, value in fields.items():
+                    apply_update(document, operator, path, value)
+            self._remove(key)
+            self._add(document)
+        return self.get(key)
+
+    @traced("repository.bulk_update", collection_attributes)
+    def bulk_update(self, updates: List[Tuple], upsert: bool = False) -> int:
+        with self._lock:
+            updated = [self.update(key, upsert, **kwargs) for key, kwargs in updates]
+        return sum(item is not None for item in updated)
+
+    @traced("repository.delete", collection_attributes)
+    def delete(self, item: Document):
+        with self._lock:
+            self._remove(item.pk)
+
+    @traced("repository.delete_many", collection_attributes)
+    def delete_many(self, **kwargs) -> int:
+        with self._lock:
+            keys = self._query(kwargs)
+            for key in keys:
+                self._remove(key)
+        return len(keys)
+
+    def stream(self, batch_size: int = 1000, **kwargs):
+        only = kwargs.pop("only", None)
+        fields = None
+        if only is not None:
+            fields = {"_id"} | {self._db_field(name) for name in only}
+        with self._lock:
+            keys = self._query(kwargs)
+
+        for start in range(0, len(keys), batch_size):
+            end = start + batch_size
+            with self._lock:
+                documents = [self._documents.get(key) for key in keys[start:end]]
+            batch = [self._project(doc, fields) for doc in documents if doc is not None]
+            if batch:
+                yield batch
+
+    @traced("repository.bulk_insert", collection_attributes)
+    def bulk_insert(self, documents: List[dict]) -> int:
+        inserted = 0
+        sequence = self._model._fields[self._model._meta["id_field"]]
+        with self._lock:
+            for document in documents:
+                if document["_id"] in self._documents:
+                    continue
+                if isinstance(sequence, SequenceField):
+                    self._sequences.observe(sequence_key(sequence), document["_id"])
+                self._add(copy_raw(dict(document)))
+                inserted += 1
+        return inserted
+
+    def reserve_ids(self, count: int, model=None) -> range:
+        sequence = (model or self._model)._fields["identifier"]
+        return self._sequences.reserve(sequence_key(sequence), count)
+
+    def dump(self) -> List[dict]:
+        """Gets all raw documents (used for snapshots)."""
+
+        with self._lock:
+            return [copy_raw(self._documents[key]) for key in self._keys]
+
+    def load(self, documents: Iterable[dict]):
+        """Replaces all documents with given raw documents."""
+
+        with self._lock:
+            for key in list(self._keys):
+                self._remove(key)
+            for document in documents:
+                self._add(document)
+
+
+class MemoryRepositoryFactory:
+    """In-memory repository factory. If snapshot path is given, the
+    repositories are restored from it and can be saved back to it."""
+
+    def __init__(self, snapshot_path: str = None):
+        """Constructor
+        :param snapshot_path: snapshot file path"""
+
+        self.snapshot_path = snapshot_path
+        self.sequences = SequenceCounter()
+        registry = {}
+
+        self.user = MemoryRepository(User, self.sequences, registry)
+        self.quiz = MemoryRepository(
+            Quiz,
+            self.sequences,
+            registry,
+            indexes=("owner", "is_published"),
+            text_indexes=("title", "description"),
+        )
+        self.quiz_solution = MemoryRepository(
+            QuizSolution,
+            self.sequences,
+            registry,
+            indexes=("owner", "quiz"),
+            text_indexes=("title", "description"),
+        )
+        self.quiz_snapshot = MemoryRepository(QuizSnapshot, self.sequences, registry)
+        self.quiz_stats = MemoryRepository(QuizStats, self.sequences, registry)
+        self.activity_rollup = MemoryRepository(
+            ActivityRollup, self.sequences, registry, indexes=("quiz",)
+        )
+        self.regrade_checkpoint = MemoryRepository(
+            RegradeCheckpoint, self.sequences, registry
+        )
+        self.idempotency_record = MemoryRepository(
+            IdempotencyRecord, self.sequences, registry
+        )
+        self.quiz_attempt = MemoryRepository(QuizAttempt, self.sequences, registry)
+
+        if snapshot_path and os.path.exists(snapshot_path):
+            self.load_snapshot()
+
+    def repositories(self) -> Dict[str, MemoryRepository]:
+        """Gets repositories by name."""
+
+        return {
+            "user": self.user,
+            "quiz": self.quiz,
+            "quiz_solution": self.quiz_solution,
+            "quiz_snapshot": self.quiz_snapshot,
+            "quiz_stats": self.quiz_stats,
+            "activity_rollup": self.activity_rollup,
+            "regrade_checkpoint": self.regrade_checkpoint,
+            "idempotency_record": self.idempotency_record,
+            "quiz_attempt": self.quiz_attempt,
+        }
+
+    def save_snapshot(self, snapshot_path: str = None):
+        """Atomically saves all documents and sequences to a file.
+        :param snapshot_path: snapshot file path, defaults to the one
+        given to constructor"""
+
+        snapshot_path = snapshot_path or self.snapshot_path
+        state = {
+            "sequences": self.sequences.values(),
+            "collections": {
+                name: repository.dump()
+                for name, repository in self.repositories().items()
+            },
+        }
+
+        tmp_path = f"{snapshot_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file_handle:
+            file_handle.write(json_util.dumps(state))
+        os.replace(tmp_path, snapshot_path)
+
+    def load_snapshot(self, snapshot_path: str = None):
+        """Restores all documents and sequences from a file.
+        :param snapshot_path: snapshot file path, defaults to the one
+        given to constructor"""
+
+        snapshot_path = snapshot_path or self.snapshot_path
+        with open(snapshot_path, "r", encoding="utf-8") as file_handle:
+            state = json_util.loads(file_handle.read())
+
+        self.sequences.reset(state["sequences"])
+        for name, repository in self.repositories().items():
+            repository.load(state["collections"].get(name, []))
@@ -0,0 +1,40 @@
+"""Database migrations module: one-off data fixes run from the command
+line before deploying a release that needs them. Migrations work on the
+raw collections, as the documents may build indexes the data does not
+satisfy yet."""
+
+from mongoengine.connection import get_db
+
+from model import QuizSolution
+
+
+def dedupe_solutions(dry_run: bool = False) -> int:
+    """Keeps the earliest solution of every (owner, quiz) pair and removes
+    the others, so the unique (owner, quiz) index of quiz solutions can
+    be built.
+    :param dry_run: only count the solutions to remove
+    :return: number of removed (or removable) solutions"""
+
+    collection = get_db()[QuizSolution._get_collection_name()]
+    duplicates = collection.aggregate(
+        [
+            {"$sort": {"submitted_at": 1, "_id": 1}},
+            {
+                "$group": {
+                    "_id": {"owner": "$owner", "quiz": "$quiz"},
+                    "ids": {"$push": "$_id"},
+                }
+            },
+            {"$match": {"ids.1": {"$exists": True}}},
+        ],
+        allowDiskUse=True,
+    )
+
+    removed = 0
+    for group in duplicates:
+        extra = group["ids"][1:]
+        if dry_run:
+            removed += len(extra)
+        else:
+            removed += collection.delete_many({"_id": {"$in": extra}}).deleted_count
+    return removed
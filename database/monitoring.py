@@ -0,0 +1,79 @@
+"""Mongo command monitoring module: a pymongo command listener
+recording command latency and failures by collection and command.
+Listeners must be registered before the client is created."""
+
+from pymongo import monitoring
+
+from core.metrics import REGISTRY
+from database.slowlog import slow_query_log
+
+# handshake, heartbeat and auth commands are not recorded
+IGNORED_COMMANDS = frozenset(
+    {
+        "hello",
+        "ismaster",
+        "isMaster",
+        "ping",
+        "saslStart",
+        "saslContinue",
+        "endSessions",
+    }
+)
+
+COMMAND_LATENCY = REGISTRY.histogram(
+    "mongo_command_duration_seconds",
+    "Mongo command latency.",
+    ("collection", "command"),
+)
+COMMAND_FAILURES = REGISTRY.counter(
+    "mongo_command_failures_total",
+    "Failed mongo commands.",
+    ("collection", "command"),
+)
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """Command listener recording command metrics."""
+
+    def __init__(self):
+        # (connection id, request id) -> collection of a started command
+        self._collections = {}
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name in IGNORED_COMMANDS:
+            return
+        collection = event.command.get(event.command_name)
+        if not isinstance(collection, str):
+            collection = ""
+        self._collections[self._key(event)] = collection
+
+    def _labels(self, event):
+        collection = self._collections.pop(self._key(event), None)
+        if collection is None:
+            return None
+        return collection, event.command_name
+
+    def succeeded(self, event):
+        labels = self._labels(event)
+        if labels is not None:
+            COMMAND_LATENCY.observe(event.duration_micros / 1_000_000, labels)
+
+    def failed(self, event):
+        labels = self._labels(event)
+        if labels is not None:
+            COMMAND_LATENCY.observe(event.duration_micros / 1_000_000, labels)
+            COMMAND_FAILURES.inc(labels)
+
+
+command_listener = CommandMetricsListener()
+
+
+def register_listeners():
+    """Registers command listeners (before the client is created)."""
+
+    monitoring.register(command_listener)
+    monitoring.register(slow_query_log)
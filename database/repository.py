@@ -5,10 +5,28 @@
 """Database repository module."""
 
 from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Tuple
 
 from mongoengine import Document
+from mongoengine.connection import get_db
+from mongoengine.queryset import transform
+from pymongo import ReturnDocument, UpdateOne
+from pymongo.errors import BulkWriteError
 
-from model import Quiz, QuizSolution, User
+from core.config import get_config
+from core.tracing import traced
+from model import (ActivityRollup, IdempotencyRecord, Quiz, QuizAttempt,
+                   QuizSnapshot, QuizSolution, QuizStats, RegradeCheckpoint,
+                   User)
+
+DUPLICATE_KEY_ERROR = 11000
+
+
+def collection_attributes(repo, *args, **kwargs) -> dict:
+    """Gets span attributes of a repository method call."""
+
+    return {"db.collection": repo._model._get_collection_name()}
 
 
 class IRepository(ABC):
@@ -23,7 +41,10 @@ class IRepository(ABC):
     @abstractmethod
     def filter(self, **kwargs):
         """Filters an entity.
-        :param kwargs: Filter operations
+        :param kwargs: Filter operations, plus limit, skip, order_by (fields
+        to sort by, - prefix sorts descending; primary key order if
+        omitted), only (fields to load) and as_dict (return raw documents
+        instead of entities)
         :return: List of entities"""
 
     @abstractmethod
@@ -32,12 +53,63 @@ class IRepository(ABC):
         :param item: Entity to save
         :return: The saved entity"""
 
+    @abstractmethod
+    def update(self, key, upsert: bool = False, **kwargs):
+        """Atomically updates an entity in place with update operators,
+        without reading it first.
+        :param key: Entity primary key
+        :param upsert: Create the entity if it does not exist
+        :param kwargs: Update operations: set__field, inc__field,
+        min__field and max__field (field may be a map field key path
+        i.e. inc__histogram__3)
+        :return: The updated entity, None if it does not exist"""
+
+    @abstractmethod
+    def bulk_update(self, updates: List[Tuple], upsert: bool = False) -> int:
+        """Applies in place updates to many entities in one round trip.
+        :param updates: (primary key, update operations) pairs, update
+        operations as in update
+        :param upsert: Create entities that do not exist
+        :return: Number of updated and created entities"""
+
+    @abstractmethod
+    def delete_many(self, **kwargs) -> int:
+        """Deletes filtered entities.
+        :param kwargs: Filter operations
+        :return: Number of deleted entities"""
+
     @abstractmethod
     def delete(self, item):
         """Deletes an entity.
         :param item: The entity that should be deleted
         :return: None"""
 
+    @abstractmethod
+    def stream(self, batch_size: int = 1000, **kwargs):
+        """Streams filtered entities as raw documents in primary key
+        order, batch by batch, so memory use does not depend on the number
+        of matching entities.
+        :param batch_size: Number of documents per batch
+        :param kwargs: Filter operations, plus only (fields to load)
+        :return: Generator of lists of raw documents (dicts)"""
+
+    @abstractmethod
+    def bulk_insert(self, documents: List[dict]) -> int:
+        """Inserts raw (already validated) documents in bulk. Documents
+        with an already existing primary key are skipped.
+        :param documents: Raw documents (dicts) keyed by db field names
+        :return: Number of inserted documents"""
+
+    @abstractmethod
+    def reserve_ids(self, count: int, model=None) -> range:
+        """Reserves a block of identifiers from the identifier sequence
+        of a model, so bulk inserted documents need no per document
+        round trip for their ids.
+        :param count: Number of identifiers to reserve
+        :param model: Model (document or embedded document) owning the
+        sequence, defaults to the repository model
+        :return: Range of reserved identifiers"""
+
 
 class MongoRepository(IRepository):
     """Mongo repository class."""
@@ -48,29 +120,103 @@ class MongoRepository(IRepository):
 
         self._model = model
 
+    @traced("repository.get", collection_attributes)
     def get(self, key):
         result = self._model.objects(pk=key).first()
         return result
 
+    @traced("repository.filter", collection_attributes)
     def filter(self, **kwargs):
-        limit, skip, only = (
+        limit, skip, order_by, only, as_dict = (
             kwargs.pop("limit", 50),
             kwargs.pop("skip", 0),
+            kwargs.pop("order_by", None),
             kwargs.pop("only", None),
+            kwargs.pop("as_dict", False),
         )
-        rows = self._model.objects(**kwargs).skip(skip).limit(limit)
+        rows = self._model.objects(**kwargs)
+        if order_by:
+            rows = rows.order_by(*order_by)
+        rows = rows.skip(skip).limit(limit)
         if only is not None:
-            rows.only(*only)
+            rows = rows.only(*only)
+        if as_dict:
+            rows = rows.as_pymongo()
         return rows
 
+    @traced("repository.persist", collection_attributes)
     def persist(self, item: Document) -> Document:
         item.save()
         item.reload()
         return item
 
+    @traced("repository.update", collection_attributes)
+    def update(self, key, upsert: bool = False, **kwargs):
+        return self._model.objects(pk=key).modify(upsert=upsert, new=True, **kwargs)
+
+    @traced("repository.bulk_update", collection_attributes)
+    def bulk_update(self, updates: List[Tuple], upsert: bool = False) -> int:
+        if not updates:
+            return 0
+        requests = [
+            UpdateOne({"_id": key}, transform.update(self._model, **kwargs), upsert)
+            for key, kwargs in updates
+        ]
+        result = self._model._get_collection().bulk_write(requests, ordered=False)
+        return result.matched_count + result.upserted_count
+
+    @traced("repository.delete", collection_attributes)
     def delete(self, item: Document):
         item.delete()
 
+    @traced("repository.delete_many", collection_attributes)
+    def delete_many(self, **kwargs) -> int:
+        return self._model.objects(**kwargs).delete()
+
+    @traced("repository.stream", collection_attributes)
+    def stream(self, batch_size: int = 1000, **kwargs):
+        only = kwargs.pop("only", None)
+        rows = self._model.objects(**kwargs).order_by("pk").no_cache()
+        if only is not None:
+            rows = rows.only(*only)
+
+        batch = []
+        for row in rows.batch_size(batch_size).as_pymongo():
+            batch.append(row)
+            if len(batch) == batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    @traced("repository.bulk_insert", collection_attributes)
+    def bulk_insert(self, documents: List[dict]) -> int:
+        if not documents:
+            return 0
+        collection = self._model._get_collection()
+        try:
+            result = collection.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            errors = exc.details["writeErrors"]
+            if any(error["code"] != DUPLICATE_KEY_ERROR for error in errors):
+                raise
+            return exc.details["nInserted"]
+        return len(result.inserted_ids)
+
+    @traced("repository.reserve_ids", collection_attributes)
+    def reserve_ids(self, count: int, model=None) -> range:
+        sequence = (model or self._model)._fields["identifier"]
+        sequence_id = f"{sequence.get_sequence_name()}.{sequence.name}"
+        collection = get_db(alias=sequence.db_alias)[sequence.collection_name]
+        counter = collection.find_one_and_update(
+            filter={"_id": sequence_id},
+            update={"$inc": {"next": count}},
+            return_document=ReturnDocument.AFTER,
+            upsert=True,
+        )
+        last = counter["next"]
+        return range(last - count + 1, last + 1)
+
 
 class UserRepository(MongoRepository):
     """User repository providing access to user objects."""
@@ -93,12 +239,66 @@ class QuizSolutionRepository(MongoRepository):
         super().__init__(model=QuizSolution)
 
 
+class QuizSnapshotRepository(MongoRepository):
+    """Quiz snapshot repository providing access to pre-rendered
+    published quizzes."""
+
+    def __init__(self):
+        super().__init__(model=QuizSnapshot)
+
+
+class QuizStatsRepository(MongoRepository):
+    """Quiz statistics repository providing access to running score
+    statistics of quizzes."""
+
+    def __init__(self):
+        super().__init__(model=QuizStats)
+
+
+class ActivityRollupRepository(MongoRepository):
+    """Activity rollup repository providing access to submission counts
+    by time bucket."""
+
+    def __init__(self):
+        super().__init__(model=ActivityRollup)
+
+
+class RegradeCheckpointRepository(MongoRepository):
+    """Re-grade checkpoint repository providing access to progress of
+    quiz re-grades."""
+
+    def __init__(self):
+        super().__init__(model=RegradeCheckpoint)
+
+
+class IdempotencyRecordRepository(MongoRepository):
+    """Idempotency record repository providing access to stored responses
+    of requests made with an Idempotency-Key."""
+
+    def __init__(self):
+        super().__init__(model=IdempotencyRecord)
+
+
+class QuizAttemptRepository(MongoRepository):
+    """Quiz attempt repository providing access to open attempts of
+    timed quizzes."""
+
+    def __init__(self):
+        super().__init__(model=QuizAttempt)
+
+
 class RepositoryFactory:
     """Repository factory."""
 
     __UserRepository = UserRepository()
     __QuizRepository = QuizRepository()
     __QuizSolutionRepository = QuizSolutionRepository()
+    __QuizSnapshotRepository = QuizSnapshotRepository()
+    __QuizStatsRepository = QuizStatsRepository()
+    __ActivityRollupRepository = ActivityRollupRepository()
+    __RegradeCheckpointRepository = RegradeCheckpointRepository()
+    __IdempotencyRecordRepository = IdempotencyRecordRepository()
+    __QuizAttemptRepository = QuizAttemptRepository()
 
     def __init__(self):
         """Constructor."""
@@ -106,10 +306,29 @@ class RepositoryFactory:
         self.user = RepositoryFactory.__UserRepository
         self.quiz = RepositoryFactory.__QuizRepository
         self.quiz_solution = RepositoryFactory.__QuizSolutionRepository
+        self.quiz_snapshot = RepositoryFactory.__QuizSnapshotRepository
+        self.quiz_stats = RepositoryFactory.__QuizStatsRepository
+        self.activity_rollup = RepositoryFactory.__ActivityRollupRepository
+        self.regrade_checkpoint = RepositoryFactory.__RegradeCheckpointRepository
+        self.idempotency_record = RepositoryFactory.__IdempotencyRecordRepository
+        self.quiz_attempt = RepositoryFactory.__QuizAttemptRepository
+
+
+@lru_cache
+def get_memory_repository():
+    """Gets in-memory repository factory (created once, restored from
+    MEMORY_SNAPSHOT_PATH if set)."""
+
+    from database.memory import MemoryRepositoryFactory
+
+    snapshot_path = get_config().STORAGE_INFO.memory_snapshot_path
+    return MemoryRepositoryFactory(snapshot_path or None)
 
 
 def get_repository():
-    """Return repository factory. Useful for dependency
-    injection."""
+    """Return repository factory, mongo or in-memory one depending on
+    REPOSITORY_BACKEND setting. Useful for dependency injection."""
 
+    if get_config().STORAGE_INFO.repository_backend == "memory":
+        return get_memory_repository()
     return RepositoryFactory()
@@ -0,0 +1,219 @@
+"""Slow query log module: a pymongo command listener recording commands
+slower than a threshold together with their redacted filter shape and
+the route that issued them. The first time a query shape is seen, its
+explain (executionStats) is captured in a background daemon thread, so
+an unreachable server never delays the process exit. Recent entries are
+kept in a ring buffer."""
+
+import json
+import logging
+import queue
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from mongoengine.connection import get_connection
+from pymongo import monitoring
+
+from core.config import get_config
+from core.context import current_route
+
+# commands with a filter/pipeline worth recording and explaining
+QUERY_COMMANDS = frozenset(
+    {"find", "aggregate", "count", "distinct", "delete", "update", "findAndModify"}
+)
+# keys added by the driver, not part of the query itself
+DRIVER_KEYS = frozenset(
+    {
+        "lsid",
+        "txnNumber",
+        "autocommit",
+        "startTransaction",
+        "$db",
+        "$clusterTime",
+        "$readPreference",
+        "readConcern",
+        "writeConcern",
+    }
+)
+# command parts holding user values
+SHAPE_KEYS = (
+    "filter",
+    "query",
+    "q",
+    "pipeline",
+    "sort",
+    "projection",
+    "updates",
+    "deletes",
+)
+REDACTED = "?"
+
+
+def redact(value):
+    """Gets shape of a query: keys and operators are kept, values are
+    replaced with "?" (lists of values are collapsed to a single "?").
+    :param value: query (filter, pipeline, ...)
+    :return: redacted query"""
+
+    if isinstance(value, dict):
+        return {key: redact(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        if any(isinstance(val, (dict, list, tuple)) for val in value):
+            return [redact(val) for val in value]
+        return REDACTED
+    return REDACTED
+
+
+def query_shape(command_name: str, command: dict) -> dict:
+    """Gets redacted shape of a command."""
+
+    shape = {command_name: command.get(command_name)}
+    for key in SHAPE_KEYS:
+        if key in command:
+            shape[key] = redact(command[key])
+    return shape
+
+
+def explain_summary(explain: dict) -> dict:
+    """Extracts the interesting parts of an explain result."""
+
+    stats = explain.get("executionStats", {})
+    planner = explain.get("queryPlanner", {})
+    winning_plan = planner.get("winningPlan", {})
+    stages = []
+    while winning_plan:
+        stages.append(winning_plan.get("stage"))
+        winning_plan = winning_plan.get("inputStage", {})
+    return {
+        "stages": stages,
+        "n_returned": stats.get("nReturned"),
+        "keys_examined": stats.get("totalKeysExamined"),
+        "docs_examined": stats.get("totalDocsExamined"),
+        "execution_time_ms": stats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """Command listener recording slow commands."""
+
+    def __init__(
+        self,
+        threshold_ms: float = None,
+        size: int = None,
+        explain: bool = None,
+    ):
+        """Constructor
+        :param threshold_ms: commands slower than this are recorded,
+        defaults to SLOW_QUERY_MS setting
+        :param size: number of recent entries kept
+        :param explain: capture explain of new query shapes"""
+
+        settings = get_config().MONITORING_INFO
+        self.threshold_ms = (
+            settings.slow_query_ms if threshold_ms is None else threshold_ms
+        )
+        self.explain = settings.slow_query_explain if explain is None else explain
+        self._entries = deque(
+            maxlen=settings.slow_query_log_size if size is None else size
+        )
+        self._explains: Dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self._pending: queue.SimpleQueue = queue.SimpleQueue()
+        self._worker: Optional[threading.Thread] = None
+        # (connection id, request id) -> started command info
+        self._started = {}
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        if event.command_name not in QUERY_COMMANDS:
+            return
+        self._started[self._key(event)] = (
+            event.command,
+            event.database_name,
+            current_route(),
+        )
+
+    def succeeded(self, event):
+        self._finished(event, None)
+
+    def failed(self, event):
+        self._finished(event, str(event.failure.get("errmsg", "")))
+
+    def _finished(self, event, error: Optional[str]):
+        started = self._started.pop(self._key(event), None)
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        command, database, route = started
+        shape = query_shape(event.command_name, command)
+        shape_key = json.dumps(shape, sort_keys=True, default=str)
+        entry = {
+            "timestamp": datetime.utcnow(),
+            "collection": str(command.get(event.command_name)),
+            "command": event.command_name,
+            "duration_ms": round(duration_ms, 3),
+            "route": route,
+            "shape": shape,
+            "shape_key": shape_key,
+            "error": error,
+        }
+        with self._lock:
+            self._entries.append(entry)
+            new_shape = shape_key not in self._explains
+            if new_shape:
+                self._explains[shape_key] = None
+        if new_shape and self.explain:
+            self._submit_explain(shape_key, command, database)
+
+    def _submit_explain(self, shape_key: str, command: dict, database: str):
+        query = {key: val for key, val in command.items() if key not in DRIVER_KEYS}
+        with self._lock:
+            if self._worker is None:
+                self._worker = threading.Thread(
+                    target=self._explain_loop, name="explain", daemon=True
+                )
+                self._worker.start()
+        self._pending.put((shape_key, query, database))
+
+    def _explain_loop(self):
+        while True:
+            self._run_explain(*self._pending.get())
+
+    def _run_explain(self, shape_key: str, query: dict, database: str):
+        """Runs explain (the explain command itself is not recorded)."""
+
+        try:
+            result = get_connection()[database].command(
+                {"explain": query, "verbosity": "executionStats"}
+            )
+            summary = explain_summary(result)
+        except Exception as exc:  # pylint: disable=broad-except
+            logging.warning("Explain of slow query failed: %s", exc)
+            summary = {"error": str(exc)}
+        with self._lock:
+            self._explains[shape_key] = summary
+
+    def entries(self, limit: int = None) -> List[dict]:
+        """Gets recent entries (newest first) with explain of their
+        query shapes (None until captured)."""
+
+        with self._lock:
+            entries = list(self._entries)[::-1][:limit]
+            return [
+                {**entry, "explain": self._explains.get(entry["shape_key"])}
+                for entry in entries
+            ]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._explains.clear()
+
+
+slow_query_log = SlowQueryLog()
@@ -1,8 +1,11 @@
 """Quiz builder api mongo db models."""
 
-from mongoengine import (BooleanField, Document, EmailField, EmbeddedDocument,
-                         EmbeddedDocumentField, FloatField, IntField,
-                         ListField, ReferenceField, SequenceField, StringField)
+from mongoengine import (BinaryField, BooleanField, DateTimeField, Document,
+                         EmailField, EmbeddedDocument, EmbeddedDocumentField,
+                         FloatField, IntField, ListField, MapField,
+                         ReferenceField, SequenceField, StringField)
+
+from core.config import get_config
 
 
 class User(Document):
@@ -13,6 +16,7 @@ class User(Document):
     last_name = StringField(required=True, min_length=3, max_length=30)
     password_hash = StringField(required=True)
     active = BooleanField(default=False)
+    is_admin = BooleanField(default=False)
 
 
 class Answer(EmbeddedDocument):
@@ -40,7 +44,24 @@ class Quiz(Document):
     description = StringField(required=False, max_length=255)
     questions = ListField(EmbeddedDocumentField(Question))
     is_published = BooleanField(default=False)
+    revision = IntField(default=1)
     owner = ReferenceField(User)
+    # seconds to solve a timed quiz, taken with an attempt
+    time_limit = IntField(min_value=1)
+
+
+class QuizSnapshot(Document):
+    """Pre-rendered snapshot of a published (immutable) quiz. Holds
+    encoded json of the full and the taker view plus their gzip variants,
+    so published quizzes can be served without re-encoding."""
+
+    quiz = IntField(primary_key=True)
+    revision = IntField(required=True)
+    digest = StringField(required=True)
+    body = BinaryField(required=True)
+    body_gzip = BinaryField(required=True)
+    taker_body = BinaryField(required=True)
+    taker_body_gzip = BinaryField(required=True)
 
 
 # Quiz solution
@@ -77,3 +98,107 @@ class QuizSolution(Document):
     owner = ReferenceField(User)
     total_points = IntField(default=0)
     scored_points = FloatField(default=0.0)
+    submitted_at = DateTimeField()
+
+    # one attempt per user, also for solutions flushed from the journal
+    meta = {
+        "indexes": [
+            {"fields": ["owner", "quiz"], "unique": True},
+            # best solutions of a quiz (leaderboards)
+            {"fields": ["quiz", "-scored_points", "submitted_at"]},
+        ]
+    }
+
+
+# Timed attempt
+ATTEMPT_RETENTION_SECONDS = get_config().ATTEMPT_INFO.attempt_retention_hours * 3600
+
+
+class QuizAttempt(Document):
+    """Open attempt of a timed quiz with the draft answers saved so far.
+    The key is quiz:owner. Submitted (or auto-submitted at the deadline)
+    attempts are removed; a TTL index removes abandoned attempts
+    ATTEMPT_RETENTION_HOURS after their deadline."""
+
+    key = StringField(primary_key=True)
+    quiz = IntField(required=True)
+    owner = StringField(required=True)
+    started_at = DateTimeField(required=True)
+    deadline = DateTimeField(required=True)
+    questions = ListField(EmbeddedDocumentField(QuestionSubmit))
+
+    meta = {
+        "indexes": [
+            {
+                "fields": ["deadline"],
+                "expireAfterSeconds": ATTEMPT_RETENTION_SECONDS,
+            }
+        ]
+    }
+
+
+# Quiz statistics
+class QuizStats(Document):
+    """Running score statistics of a quiz, updated with every submitted
+    solution. Scores are scored_points / total_points ratios; histogram
+    holds solution counts by bucket index (as string keys)."""
+
+    quiz = IntField(primary_key=True)
+    count = IntField(default=0)
+    score_sum = FloatField(default=0.0)
+    score_sum_sq = FloatField(default=0.0)
+    min_score = FloatField()
+    max_score = FloatField()
+    histogram = MapField(IntField())
+
+
+# Submission activity
+class ActivityRollup(Document):
+    """Submission count of a quiz (quiz 0: all quizzes) in a minute, hour
+    or day bucket starting at start (UTC). The key is
+    quiz:resolution:start."""
+
+    key = StringField(primary_key=True)
+    quiz = IntField(required=True)
+    resolution = StringField(required=True, choices=("minute", "hour", "day"))
+    start = DateTimeField(required=True)
+    count = IntField(default=0)
+
+    meta = {"indexes": [("resolution", "quiz", "start")]}
+
+
+# Re-grading
+class RegradeCheckpoint(Document):
+    """Progress of a quiz re-grade: solutions are re-graded in primary key
+    order, an interrupted re-grade of the same quiz revision resumes after
+    last_solution."""
+
+    quiz = IntField(primary_key=True)
+    revision = IntField(required=True)
+    last_solution = IntField()
+    processed = IntField(default=0)
+    changed = IntField(default=0)
+    finished = BooleanField(default=False)
+
+
+# Idempotency
+class IdempotencyRecord(Document):
+    """Stored response of a request made with an Idempotency-Key; the key
+    is a digest of user, method, path and the client key, fingerprint a
+    digest of the request. Expires IDEMPOTENCY_TTL_HOURS after creation."""
+
+    key = StringField(primary_key=True)
+    fingerprint = StringField(required=True)
+    status = IntField(required=True)
+    headers = ListField(ListField(StringField()))
+    body = BinaryField()
+    created_at = DateTimeField(required=True)
+
+    meta = {
+        "indexes": [
+            {
+                "fields": ["created_at"],
+                "expireAfterSeconds": get_config().IDEMPOTENCY_TTL_HOURS * 3600,
+            }
+        ]
+    }
@@ -4,7 +4,8 @@
 
 """Mock repository data for user, quiz."""
 
-from model import Answer, Question, Quiz, User
+from model import (Answer, AnswerSubmit, Question, QuestionSubmit, Quiz,
+                   QuizSolution, User)
 
 # password_hash is a hash of: _Hard_pass1
 
@@ -14,6 +15,7 @@ mock_user_data = {
         first_name="John",
         last_name="Wick",
         active=True,
+        is_admin=True,
         password_hash="$5$rounds=535000$6QxS6Vxn3C5uufw2$pMApAxokjLzhEDwaqY..eD/CF2PnYDXBomX5b35XmzD",
     ),
     "al.pacino@gmail.com": User(
@@ -105,7 +107,7 @@ mock_quiz_data = {
         ],
     ),
     5: Quiz(
-        identifier=4,
+        identifier=5,
         title="Sample Quiz Five.",
         description="Some quiz.",
         owner=mock_user_data["al.pacino@gmail.com"],
@@ -124,3 +126,27 @@ mock_quiz_data = {
         ],
     ),
 }
+
+mock_quiz_solution_data = {
+    1: QuizSolution(
+        identifier=1,
+        title="Sample Quiz Four.",
+        description="Some quiz.",
+        quiz=4,
+        owner="john@wick.com",
+        total_points=1,
+        scored_points=1.0,
+        questions=[
+            QuestionSubmit(
+                identifier=1,
+                answers=[
+                    AnswerSubmit(identifier=331, is_correct=True),
+                    AnswerSubmit(identifier=332, is_correct=False),
+                    AnswerSubmit(identifier=333, is_correct=False),
+                    AnswerSubmit(identifier=334, is_correct=True),
+                    AnswerSubmit(identifier=334, is_correct=True),
+                ],
+            )
+        ],
+    ),
+}
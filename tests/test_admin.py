@@ -0,0 +1,121 @@
+"""Admin api testing module."""
+
+import asyncio
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from api.quiz.router import read_quizzes
+from core.context import request_scope
+from core.looplag import LoopMonitor, loop_monitor
+from database.slowlog import SlowQueryLog, redact
+from tests.mock_client import app, get_auth_client
+
+
+async def blocking_endpoint():
+    """Async endpoint blocking the event loop."""
+
+    time.sleep(0.3)
+
+
+async def run_blocking(monitor: LoopMonitor):
+    """Runs blocking endpoint under the loop monitor."""
+
+    monitor.start({blocking_endpoint.__code__: "/blocking"})
+    try:
+        await asyncio.sleep(0.05)
+        await blocking_endpoint()
+        await asyncio.sleep(0.05)
+    finally:
+        await monitor.stop()
+
+
+def run_command(log: SlowQueryLog, command: dict, duration_micros: int):
+    """Feeds started and succeeded events of a command to the log."""
+
+    event = {"connection_id": ("localhost", 27017), "request_id": id(command)}
+    name = next(iter(command))
+    log.started(
+        SimpleNamespace(
+            command_name=name, command=command, database_name="quizdb", **event
+        )
+    )
+    log.succeeded(
+        SimpleNamespace(command_name=name, duration_micros=duration_micros, **event)
+    )
+
+
+class TestAdmin(unittest.TestCase):
+    """Admin api testing class."""
+
+    def test_redact(self):
+        """Test query values are redacted, keys and operators kept."""
+
+        query = {
+            "title": {"$regex": "capital", "$options": "i"},
+            "_id": {"$in": [1, 2]},
+        }
+        shape = {"title": {"$regex": "?", "$options": "?"}, "_id": {"$in": "?"}}
+        assert redact(query) == shape
+
+    def test_slow_query_log(self):
+        """Test slow commands are recorded with route and shape."""
+
+        log = SlowQueryLog(threshold_ms=10, size=2, explain=False)
+        token = request_scope.set({"endpoint": read_quizzes, "app": app})
+        try:
+            run_command(
+                log, {"find": "quiz", "filter": {"owner": "john@wick.com"}}, 20000
+            )
+            run_command(log, {"find": "quiz", "filter": {"owner": "al"}}, 5000)
+            run_command(log, {"insert": "quiz", "documents": []}, 50000)
+        finally:
+            request_scope.reset(token)
+
+        entries = log.entries()
+        assert len(entries) == 1
+        assert entries[0]["route"] == "/quiz/"
+        assert entries[0]["shape"] == {"find": "quiz", "filter": {"owner": "?"}}
+
+    @parameterized.expand([["john@wick.com", 200], ["al.pacino@gmail.com", 403]])
+    def test_read_slow_queries(self, username: str, status_code: int):
+        """Test slow query log endpoint is available to admins only."""
+
+        log = SlowQueryLog(explain=False)
+        run_command(log, {"count": "quiz_solution", "query": {}}, 10**6)
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        with patch("api.admin.router.slow_query_log", log):
+            response = auth_client.get("/admin/slow-queries")
+        assert response.status_code == status_code
+        if status_code == 200:
+            assert response.json()[0]["collection"] == "quiz_solution"
+
+    @parameterized.expand([[True], [False]])
+    def test_loop_stalls(self, capture: bool):
+        """Test event loop stall is attributed to the blocking route."""
+
+        monitor = LoopMonitor(interval_ms=10, threshold_ms=100, capture=capture)
+        asyncio.run(run_blocking(monitor))
+
+        stalls = monitor.stalls()
+        assert len(stalls) == 1
+        assert stalls[0]["route"] == "/blocking"
+        assert stalls[0]["duration_ms"] >= 200
+        assert (
+            any("blocking_endpoint" in frame for frame in stalls[0]["stack"]) is capture
+        )
+
+    def test_read_loop_stalls(self):
+        """Test event loop stalls endpoint."""
+
+        loop_monitor.clear()
+        asyncio.run(run_blocking(loop_monitor))
+
+        auth_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        response = auth_client.get("/admin/loop-stalls")
+        assert response.status_code == 200
+        assert response.json()[0]["route"] == "/blocking"
@@ -0,0 +1,184 @@
+"""Timed quiz attempt testing module."""
+
+import asyncio
+import math
+import random
+import time
+import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
+
+import pytest
+from parameterized import parameterized
+
+from api.quiz.attempt import (AttemptScheduler, attempt_key, draft_questions,
+                              store_solution)
+from api.quiz.main import validate
+from api.quiz.model import AttemptAnswers
+from benchmarks.generators import make_quiz, make_submission
+from core.timingwheel import TimingWheel
+from database.memory import MemoryRepositoryFactory
+from tests.mock_client import get_auth_client
+from tests.mock_repository import get_mock_repository
+
+
+class TestTimingWheel(unittest.TestCase):
+    """Hierarchical timing wheel testing class."""
+
+    @parameterized.expand([[1.0, 4, 3], [0.5, 8, 2]])
+    def test_fires_at_deadline(self, tick: float, slots: int, levels: int):
+        """Test timers fire on the first advance past their deadline,
+        across levels and overflow, and cancelled timers never fire."""
+
+        rng = random.Random(7)
+        start = 1000.0
+        wheel = TimingWheel(tick, slots, levels, start=start)
+        horizon = tick * slots**levels * 3
+        deadlines = {key: start + rng.uniform(-5, horizon) for key in range(500)}
+        for key, deadline in deadlines.items():
+            wheel.schedule(key, deadline)
+        cancelled = set(rng.sample(sorted(deadlines), 50))
+        for key in cancelled:
+            assert wheel.cancel(key)
+        assert len(wheel) == 450
+
+        now, fired = start, {}
+        while now < start + horizon + 10:
+            now += rng.uniform(0, tick * 20)
+            for key in wheel.advance(now):
+                fired[key] = now
+        assert set(fired) == set(deadlines) - cancelled and len(wheel) == 0
+        for key, fired_at in fired.items():
+            due = max(math.ceil(deadlines[key] / tick), math.floor(start / tick) + 1)
+            assert math.floor(fired_at / tick) >= due
+            # it did not wait for a later advance
+            assert fired_at - tick * 20 < due * tick
+
+
+class TestAttempt(unittest.TestCase):
+    """Timed quiz attempt testing class."""
+
+    def test_attempt_endpoints(self):
+        """Test attempt start, draft and submit of a timed quiz."""
+
+        repo = get_mock_repository()
+        quiz = make_quiz(900, questions=3, answers=3, seed=5)
+        quiz.owner, quiz.time_limit = repo.user.get("al.pacino@gmail.com"), 60
+        repo.quiz.persist(quiz)
+        auth_client = get_auth_client("john@wick.com", "_Hard_pass1")
+
+        response = auth_client.post("/quiz/validate", json={"identifier": 900})
+        assert response.status_code == 400
+
+        started = auth_client.post("/quiz/900/attempt").json()
+        assert 59 <= started["remaining_seconds"] <= 60
+        assert auth_client.post("/quiz/900/attempt").json()["deadline"] == (
+            started["deadline"]
+        )
+
+        submission = make_submission(quiz, correct_ratio=1.0)
+        draft = {"questions": [submission.questions[0].dict()]}
+        response = auth_client.put("/quiz/900/attempt", json=draft)
+        assert response.status_code == 200
+        saved = auth_client.get("/quiz/900/attempt").json()
+        assert saved["questions"] == draft["questions"]
+
+        answers = {"questions": [item.dict() for item in submission.questions[:2]]}
+        result = auth_client.post("/quiz/900/attempt/submit", json=answers).json()
+        assert result == {"total_points": 3, "points": 2.0}
+        assert auth_client.get("/quiz/900/attempt").status_code == 404
+        assert auth_client.post("/quiz/900/attempt").status_code == 401
+
+    def test_attempt_submit_failure(self):
+        """Test an attempt whose solution fails to store stays open."""
+
+        repo = get_mock_repository()
+        quiz = make_quiz(904, questions=2, answers=3, seed=3)
+        quiz.owner, quiz.time_limit = repo.user.get("al.pacino@gmail.com"), 60
+        repo.quiz.persist(quiz)
+        auth_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        assert auth_client.post("/quiz/904/attempt").status_code == 200
+
+        answers = {"questions": []}
+        with patch("api.quiz.router.store_solution", side_effect=RuntimeError):
+            with pytest.raises(RuntimeError):
+                auth_client.post("/quiz/904/attempt/submit", json=answers)
+        assert auth_client.get("/quiz/904/attempt").status_code == 200
+        response = auth_client.post("/quiz/904/attempt/submit", json=answers)
+        assert response.json() == {"total_points": 2, "points": 0.0}
+
+    def test_attempt_expiry_failure(self):
+        """Test a failing auto-submit does not stop the other attempts of
+        the batch."""
+
+        repo = MemoryRepositoryFactory()
+        quiz = make_quiz(1, questions=2, answers=3, seed=2)
+        quiz.time_limit = 60
+        repo.quiz.bulk_insert([quiz.to_mongo()])
+        started = datetime.utcnow()
+        for owner in ("failing@example.com", "stored@example.com"):
+            repo.quiz_attempt.update(
+                attempt_key(1, owner),
+                upsert=True,
+                set__quiz=1,
+                set__owner=owner,
+                set__started_at=started,
+                set__deadline=started,
+            )
+
+        async def store(repo, quiz, owner, *args):
+            if owner == "failing@example.com":
+                raise RuntimeError("storage failed")
+            return await store_solution(repo, quiz, owner, *args)
+
+        scheduler = AttemptScheduler(tick_ms=1000, grace_seconds=0)
+        scheduler.load(repo)
+        with patch("api.quiz.attempt.store_solution", side_effect=store):
+            assert asyncio.run(scheduler.expire_due(repo, time.time() + 5)) == 1
+        owners = [
+            doc["owner"] for doc in repo.quiz_solution.filter(quiz=1, as_dict=True)
+        ]
+        assert owners == ["stored@example.com"]
+
+    def test_attempt_expiry(self):
+        """Test expired attempts are auto-submitted once with their draft
+        and attempts of deleted quizzes are dropped."""
+
+        repo = MemoryRepositoryFactory()
+        quiz = make_quiz(1, questions=4, answers=3, seed=2)
+        quiz.time_limit = 60
+        repo.quiz.bulk_insert([quiz.to_mongo()])
+        started = datetime.utcnow()
+        submission = make_submission(quiz, correct_ratio=1.0)
+        drafts = {
+            (1, "drafted@example.com"): AttemptAnswers(questions=submission.questions),
+            (1, "blank@example.com"): AttemptAnswers(),
+            (2, "deleted@example.com"): AttemptAnswers(),
+        }
+        for (quiz_id, owner), answers in drafts.items():
+            repo.quiz_attempt.update(
+                attempt_key(quiz_id, owner),
+                upsert=True,
+                set__quiz=quiz_id,
+                set__owner=owner,
+                set__started_at=started,
+                set__deadline=started + timedelta(seconds=60),
+                set__questions=draft_questions(answers),
+            )
+
+        scheduler = AttemptScheduler(tick_ms=1000, grace_seconds=5)
+        assert scheduler.load(repo) == 3
+        now = time.time()
+        assert asyncio.run(scheduler.expire_due(repo, now + 30)) == 0
+        assert asyncio.run(scheduler.expire_due(repo, now + 70)) == 2
+        assert len(scheduler.wheel) == 0
+        assert not repo.quiz_attempt.filter(quiz__in=[1, 2], limit=10)
+
+        solutions = {
+            solution["owner"]: solution["scored_points"]
+            for solution in repo.quiz_solution.filter(quiz=1, limit=10, as_dict=True)
+        }
+        expected = validate(quiz, submission).points
+        assert solutions["drafted@example.com"] == pytest.approx(expected)
+        assert solutions["blank@example.com"] == 0.0
+        assert repo.quiz_stats.get(1).count == 2
@@ -0,0 +1,55 @@
+"""Benchmark suite testing module."""
+
+import unittest
+
+import pytest
+from parameterized import parameterized
+
+from api.quiz.main import validate
+from benchmarks.generators import make_quiz, make_submission
+from benchmarks.suite import CALIBRATION, compare, run_suite
+from core.config import get_config
+
+
+class TestBenchmarks(unittest.TestCase):
+    """Benchmark suite testing class."""
+
+    @parameterized.expand([[1, 2], [None, None]])
+    def test_generators(self, questions, answers):
+        """Test generated quizzes honour configured limits and perfect
+        submissions score all points."""
+
+        quiz = make_quiz(7, questions, answers)
+        config = get_config()
+        assert len(quiz.questions) == (questions or config.MAX_QUESTIONS)
+        for question in quiz.questions:
+            assert len(question.answers) == (answers or config.MAX_ANSWERS_PER_QUESTION)
+
+        result = validate(quiz, make_submission(quiz, correct_ratio=1.0))
+        assert result.points == result.total_points == len(quiz.questions)
+
+    def test_generators_limits(self):
+        """Test generators reject quizzes above configured limits."""
+
+        with pytest.raises(ValueError):
+            make_quiz(1, questions=get_config().MAX_QUESTIONS + 1)
+
+    def test_compare(self):
+        """Test regressions above threshold are reported."""
+
+        results = run_suite("score_multi[2]")
+        baseline = {"score_multi[2]": results["score_multi[2]"] / 2}
+        assert [r.case for r in compare(results, baseline, 0.25)] == ["score_multi[2]"]
+        assert not compare(results, baseline, 1.5)
+        assert not compare(results, {}, 0.25)
+
+    def test_compare_calibrated(self):
+        """Test the baseline is scaled by the calibration case, so a
+        slower machine is not a regression."""
+
+        baseline = {CALIBRATION: 10.0, "validate[1]": 20.0}
+        results = {CALIBRATION: 30.0, "validate[1]": 70.0}
+        assert not compare(results, baseline, 0.25)
+        results["validate[1]"] = 80.0
+        regressions = compare(results, baseline, 0.25)
+        assert [(r.case, r.baseline_us) for r in regressions] == [("validate[1]", 60.0)]
@@ -0,0 +1,83 @@
+"""Bulk operations testing module."""
+
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import pytest
+
+from api.quiz.bulk import import_quizzes
+from database.memory import MemoryRepositoryFactory
+from tests.helper import TEST_DATA_DIR, TEST_QUIZ_DATA_DIR
+from tests.mock_repository import get_mock_repository
+
+QUIZ_IMPORT_FILES = [
+    os.path.join(TEST_DATA_DIR, "quiz_import", "quizzes.ndjson"),
+    os.path.join(TEST_QUIZ_DATA_DIR, "quiz_countries.json"),
+]
+
+
+class TestBulkImport(unittest.TestCase):
+    """Bulk quiz import testing class."""
+
+    def test_import_quizzes(self):
+        """Test quizzes are imported and invalid records reported."""
+
+        repo = get_mock_repository()
+        report = import_quizzes(QUIZ_IMPORT_FILES, "john@wick.com", repo, 2, 3)
+        assert (report.read, report.imported, report.rejected) == (8, 6, 2)
+        assert [error.row for error in report.errors] == [6, 7]
+
+        quiz = find_quiz(repo, "Imported quiz 4")
+        assert quiz["owner"] == "john@wick.com"
+        assert len(quiz["questions"][0]["answers"]) == 5
+        assert repo.quiz.get(quiz["_id"]) is not None
+
+    def test_import_quizzes_resume(self):
+        """Test import resumes from checkpoint."""
+
+        repo = get_mock_repository()
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "import.checkpoint")
+            args = (QUIZ_IMPORT_FILES, "john@wick.com", repo, 1, 4, checkpoint)
+            first = import_quizzes(*args)
+            second = import_quizzes(*args)
+
+        assert first.read == 8
+        assert (second.read, second.skipped, second.imported) == (0, 8, 0)
+
+    def test_import_quizzes_interrupted(self):
+        """Test a batch inserted before the import crashed is not imported
+        again when the import is resumed."""
+
+        repo = MemoryRepositoryFactory()
+        bulk_insert = repo.quiz.bulk_insert
+
+        def crash_after_second_batch(documents):
+            inserted = bulk_insert(documents)
+            if bulk_insert_mock.call_count == 2:
+                raise RuntimeError("Worker died")
+            return inserted
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            checkpoint = os.path.join(tmp_dir, "import.checkpoint")
+            args = (QUIZ_IMPORT_FILES, "john@wick.com", repo, 1, 3, checkpoint)
+            with patch.object(
+                repo.quiz, "bulk_insert", side_effect=crash_after_second_batch
+            ) as bulk_insert_mock:
+                with pytest.raises(RuntimeError):
+                    import_quizzes(*args)
+            resumed = import_quizzes(*args)
+
+        assert (resumed.skipped, resumed.read, resumed.imported) == (3, 5, 1)
+        titles = [quiz["title"] for batch in repo.quiz.stream() for quiz in batch]
+        assert len(titles) == len(set(titles)) == 6
+
+
+def find_quiz(repo, title: str) -> dict:
+    """Finds raw document of an imported quiz by title."""
+
+    for batch in repo.quiz.stream(title=title):
+        return batch[0]
+    return None
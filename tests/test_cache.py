@@ -0,0 +1,44 @@
+"""Cache testing module."""
+
+import unittest
+
+from parameterized import parameterized
+
+from core.cache import LRUCache
+
+
+class FakeClock:
+    """Clock advanced by the test."""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class TestLRUCache(unittest.TestCase):
+    """LRU cache testing class."""
+
+    def test_eviction(self):
+        """Test the least recently used entry is evicted when full."""
+
+        cache = LRUCache(2)
+        cache.put(1, "one")
+        cache.put(2, "two")
+        assert cache.get(1) == "one"
+        cache.put(3, "three")
+        assert cache.get(2) is None and len(cache) == 2
+        assert cache.get(1) == "one" and cache.get(3) == "three"
+
+    @parameterized.expand([[0, 1000.0, "value"], [5, 4.9, "value"], [5, 5.0, None]])
+    def test_ttl(self, ttl: float, elapsed: float, expected):
+        """Test entries expire once their time to live passed (0 never
+        expires) and expired entries are dropped."""
+
+        clock = FakeClock()
+        cache = LRUCache(2, ttl=ttl, clock=clock)
+        cache.put("key", "value")
+        clock.now += elapsed
+        assert cache.get("key") == expected
+        assert len(cache) == (0 if expected is None else 1)
@@ -0,0 +1,99 @@
+"""Traffic capture and replay testing module."""
+
+import asyncio
+import json
+import os
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+from app.capture import (REDACTED_PASSWORD, CaptureWriter, redact_body,
+                         set_capture_writer)
+from benchmarks.loadtest import create_client
+from benchmarks.replay import read_capture, replay, replay_report
+from core.config import get_config
+from tests.mock_client import app, get_auth_client, test_client
+
+
+class TestCapture(unittest.TestCase):
+    """Traffic capture and replay testing class."""
+
+    def setUp(self):
+        """Captures go to a temporary directory."""
+
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.writer = CaptureWriter(self.tmp_dir.name)
+        self.previous = set_capture_writer(self.writer)
+        self.settings = get_config().MONITORING_INFO
+
+    def tearDown(self):
+        self.settings.capture_sample_rate = 0.0
+        self.writer.close()
+        set_capture_writer(self.previous)
+        self.tmp_dir.cleanup()
+
+    @parameterized.expand(
+        [
+            [
+                "application/x-www-form-urlencoded",
+                b"username=al&password=secret",
+                f"username=al&password={REDACTED_PASSWORD}",
+            ],
+            [
+                "application/json",
+                b'{"email": "al", "password": "secret"}',
+                json.dumps({"email": "al", "password": REDACTED_PASSWORD}),
+            ],
+            ["multipart/form-data; boundary=x", b"--x\r\n", None],
+        ]
+    )
+    def test_redact_body(self, content_type: str, body: bytes, expected):
+        """Test passwords are redacted and uploads omitted."""
+
+        assert redact_body(content_type, body)[0] == expected
+
+    def test_capture_and_replay(self):
+        """Test sampled requests are captured with redacted credentials
+        and replay matches the capture."""
+
+        auth_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        self.settings.capture_sample_rate = 1.0
+        for _ in range(3):
+            assert auth_client.get("/user/me").status_code == 200
+        assert test_client.get("/quiz/2").status_code == 200
+        self.writer.close()
+
+        records = list(read_capture([self.tmp_dir.name]))
+        assert [record["route"] for record in records] == ["/user/me"] * 3 + [
+            "/quiz/{quiz_id}"
+        ]
+        assert records[0]["user"] == "john@wick.com"
+        assert "authorization" not in records[0]["headers"]
+        assert "Bearer" not in json.dumps(records)
+
+        self.settings.capture_sample_rate = 0.0
+
+        async def run():
+            async with create_client(app) as client:
+                return await replay(client, records, speed=0)
+
+        report = replay_report(asyncio.run(run()), speed=0, duration=1.0)
+        routes = {route.route: route for route in report.routes}
+        assert report.requests == 4 and report.skipped == 0
+        assert routes["/user/me"].requests == 3
+        assert sum(route.status_mismatches for route in report.routes) == 0
+        assert sum(route.body_mismatches for route in report.routes) == 0
+
+    def test_disk_limit(self):
+        """Test oldest segments are deleted beyond the disk limit."""
+
+        writer = CaptureWriter(self.tmp_dir.name, segment_mb=0.001, max_mb=0.004)
+        for index in range(2000):
+            writer.write({"ts": index, "payload": os.urandom(16).hex()})
+        writer.close()
+
+        sizes = [os.path.getsize(path) for path in writer.segments()]
+        assert len(sizes) > 1
+        assert sum(sizes) <= writer.max_bytes
+        assert next(read_capture(writer.segments()))["ts"] > 0
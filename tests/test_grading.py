@@ -0,0 +1,81 @@
+"""Quiz grading testing module."""
+
+import unittest
+
+import pytest
+from parameterized import parameterized
+
+from api.quiz import model
+from api.quiz.main import is_single, score_multi, validate
+from model import Answer, Question, Quiz
+
+
+def make_question(identifier: int, flags: list) -> Question:
+    return Question(
+        identifier=identifier,
+        title=f"Question {identifier}",
+        answers=[
+            Answer(identifier=identifier * 10 + index, answer_text="A", is_correct=flag)
+            for index, flag in enumerate(flags)
+        ],
+    )
+
+
+def make_submit(identifier: int, flags: list) -> model.QuestionSubmit:
+    return model.QuestionSubmit(
+        identifier=identifier,
+        answers=[
+            model.AnswerSubmit(identifier=identifier * 10 + index, is_correct=flag)
+            for index, flag in enumerate(flags)
+        ],
+    )
+
+
+class TestGrading(unittest.TestCase):
+    """Quiz grading rules testing class."""
+
+    def test_validate_pairs_questions(self):
+        """Test each submitted question is scored against the quiz question
+        with the same id, whatever the submission order."""
+
+        quiz = Quiz(
+            identifier=1,
+            questions=[
+                make_question(2, [False, True, False]),
+                make_question(1, [True, True, False]),
+            ],
+        )
+        submit = model.QuizSubmit(
+            identifier=1,
+            questions=[
+                make_submit(1, [True, True, False]),
+                make_submit(2, [False, True, False]),
+            ],
+        )
+        result = validate(quiz, submit)
+        assert result == model.QuizValidationResult(total_points=2, points=2.0)
+
+    @parameterized.expand(
+        [
+            ["one_correct", [False, True, False], True],
+            ["two_correct", [True, True, False], False],
+            ["all_correct", [True, True, True], False],
+        ]
+    )
+    def test_is_single(self, _, flags: list, single: bool):
+        """Test a question is single answer when one answer is correct."""
+
+        assert is_single(make_question(1, flags)) == single
+
+    @parameterized.expand(
+        [
+            ["all_selected", [True, True, True], [True, True, True], 1.0],
+            ["one_wrong", [True, True, False], [True, False, True], -0.5],
+            ["none_selected", [True, True, False], [False, False, False], 0],
+        ]
+    )
+    def test_score_multi(self, _, correct: list, submitted: list, score: float):
+        """Test multiple answer scoring, also when no selected answer is
+        wrong."""
+
+        assert score_multi(correct, submitted) == pytest.approx(score)
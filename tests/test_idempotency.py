@@ -0,0 +1,150 @@
+"""Idempotency key testing module."""
+
+import asyncio
+import unittest
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI
+from parameterized import parameterized
+
+from api.auth.main import create_access_token
+from api.quiz.model import NewQuiz
+from app.idempotency import IN_PROGRESS, IdempotencyMiddleware, digest
+from benchmarks.loadtest import create_client
+from core.config import get_config
+from database.memory import MemoryRepositoryFactory
+from database.repository import get_repository
+from tests.helper import get_entity
+from tests.mock_client import get_auth_client
+
+
+def create_slow_app(repo: MemoryRepositoryFactory, calls: list) -> FastAPI:
+    """Creates app whose submission endpoint yields to the event loop,
+    so duplicate requests overlap."""
+
+    slow_app = FastAPI()
+    slow_app.dependency_overrides[get_repository] = lambda: repo
+    slow_app.add_middleware(IdempotencyMiddleware)
+
+    @slow_app.post("/quiz/validate")
+    async def slow_validate():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"calls": len(calls)}
+
+    return slow_app
+
+
+class TestIdempotency(unittest.TestCase):
+    """Idempotency key testing class."""
+
+    def setUp(self):
+        self.auth_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        self.new_quiz = get_entity("quiz_countries.json", NewQuiz).dict()
+
+    def post_quiz(self, key: str, payload: dict = None):
+        headers = {**self.auth_client.headers, "Idempotency-Key": key}
+        return self.auth_client.post(
+            "/quiz/", json=payload or self.new_quiz, headers=headers
+        )
+
+    def test_replay(self):
+        """Test retried quiz creation returns the stored response and
+        creates the quiz once."""
+
+        response = self.post_quiz("create-countries-1")
+        assert response.status_code == 200
+        assert "idempotent-replayed" not in response.headers
+
+        retried = self.post_quiz("create-countries-1")
+        assert retried.status_code == 200
+        assert retried.headers["idempotent-replayed"] == "true"
+        assert retried.json()["identifier"] == response.json()["identifier"]
+
+        other = self.post_quiz("create-countries-2")
+        assert other.json()["identifier"] != response.json()["identifier"]
+
+    @parameterized.expand(
+        [["too_long", "x" * 256, 400], ["reused", "create-countries-3", 422]]
+    )
+    def test_rejected_key(self, _: str, key: str, status_code: int):
+        """Test too long key and key reused for another request."""
+
+        self.post_quiz("create-countries-3")
+        response = self.post_quiz(key, {**self.new_quiz, "title": "Capitals"})
+        assert response.status_code == status_code
+        assert response.json()["error_code"] == "IDEMPOTENCY_KEY_ERROR"
+
+    def test_concurrent_duplicates(self):
+        """Test duplicates arriving while the first request runs share its
+        execution, and expired records are ignored."""
+
+        repo, calls = MemoryRepositoryFactory(), []
+        token_info = get_config().TOKEN_INFO
+        token = create_access_token(
+            data={"sub": "taker@example.com"},
+            secret_key=token_info.jwt_signature,
+            algorithm=token_info.jwt_algorithm,
+        )
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "submit-1"}
+
+        async def submit(count: int):
+            async with create_client(create_slow_app(repo, calls)) as client:
+                return await asyncio.gather(
+                    *(
+                        client.post("/quiz/validate", json={}, headers=headers)
+                        for _ in range(count)
+                    )
+                )
+
+        responses = asyncio.run(submit(5))
+        assert len(calls) == 1
+        assert [response.json() for response in responses] == [{"calls": 1}] * 5
+        replayed = [
+            response.headers.get("idempotent-replayed") for response in responses
+        ]
+        assert replayed.count("true") == 4
+
+        key = digest("taker@example.com", "POST", "/quiz/validate", "submit-1")
+        expired = datetime.utcnow() - timedelta(
+            hours=get_config().IDEMPOTENCY_TTL_HOURS
+        )
+        repo.idempotency_record.update(key, set__created_at=expired)
+        asyncio.run(submit(1))
+        assert len(calls) == 2
+
+    def test_cross_worker_duplicates(self):
+        """Test duplicates arriving at other workers wait for the request
+        that claimed the key, and an abandoned claim is taken over."""
+
+        repo, calls = MemoryRepositoryFactory(), []
+        token_info = get_config().TOKEN_INFO
+        token = create_access_token(
+            data={"sub": "taker@example.com"},
+            secret_key=token_info.jwt_signature,
+            algorithm=token_info.jwt_algorithm,
+        )
+        headers = {"Authorization": f"Bearer {token}", "Idempotency-Key": "submit-2"}
+        workers = [create_slow_app(repo, calls) for _ in range(3)]
+
+        async def submit(worker):
+            async with create_client(worker) as client:
+                return await client.post("/quiz/validate", json={}, headers=headers)
+
+        async def submit_all():
+            return await asyncio.gather(*(submit(worker) for worker in workers))
+
+        responses = asyncio.run(submit_all())
+        assert len(calls) == 1
+        assert [response.json() for response in responses] == [{"calls": 1}] * 3
+
+        # a claim of a stopped worker is replaced once its lease passed
+        key = digest("taker@example.com", "POST", "/quiz/validate", "submit-2")
+        lease = get_config().IDEMPOTENCY_LEASE_SECONDS
+        repo.idempotency_record.update(
+            key,
+            set__status=IN_PROGRESS,
+            set__created_at=datetime.utcnow() - timedelta(seconds=lease + 1),
+        )
+        assert asyncio.run(submit(workers[0])).json() == {"calls": 2}
+        assert repo.idempotency_record.get(key).status == 200
@@ -0,0 +1,189 @@
+"""Write-behind solution journal testing module."""
+
+import asyncio
+import tempfile
+import unittest
+from datetime import datetime
+from functools import partial
+from unittest.mock import patch
+
+from api.quiz.stats import record_journaled
+from benchmarks.loadtest import create_client, run_exam
+from database.journal import SubmissionJournal, set_journal
+from database.memory import MemoryRepositoryFactory
+from tests.mock_client import app
+from tests.mock_repository import get_mock_repository
+
+
+def solution(identifier: int, owner: str, quiz_id: int = 7) -> dict:
+    """Builds raw solution document."""
+
+    return {
+        "_id": identifier,
+        "quiz": quiz_id,
+        "owner": owner,
+        "questions": [],
+        "total_points": 2,
+        "scored_points": 1.0,
+        "submitted_at": datetime(2026, 1, 1, 10, 0),
+    }
+
+
+def crash(journal: SubmissionJournal):
+    """Stops journal threads without flushing."""
+
+    journal._stopped.set()
+    with journal._lock:
+        journal._appended.notify_all()
+    for thread in journal._threads:
+        thread.join()
+    journal._file.close()
+
+
+async def append_all(journal: SubmissionJournal, solutions) -> list:
+    return await asyncio.gather(*(journal.append(item) for item in solutions))
+
+
+class TestJournal(unittest.TestCase):
+    """Write-behind solution journal testing class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.repo = MemoryRepositoryFactory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def create_journal(self, flush_ms: float = 60000) -> SubmissionJournal:
+        return SubmissionJournal(
+            self.repo,
+            partial(record_journaled, self.repo),
+            directory=self.tmp_dir.name,
+            fsync_ms=1,
+            flush_ms=flush_ms,
+            batch_size=3,
+        )
+
+    def test_append_and_flush(self):
+        """Test appends are acknowledged, flushed in batches and a
+        pending attempt of the same user is rejected."""
+
+        journal = self.create_journal()
+        journal.start()
+        solutions = [solution(index, f"taker{index}@example.com") for index in range(5)]
+        appended = asyncio.run(
+            append_all(journal, solutions + [solution(9, "taker0@example.com")])
+        )
+        assert appended == [True] * 5 + [False]
+        assert journal.is_pending("taker0@example.com", 7)
+        assert journal.lag_seconds() > 0
+
+        assert journal.flush() == 3
+        assert len(self.repo.quiz_solution.filter(quiz=7)) == 3
+        journal.close()
+        assert not journal.is_pending("taker0@example.com", 7)
+        assert len(self.repo.quiz_solution.filter(quiz=7)) == 5
+        assert self.repo.quiz_stats.get(7).count == 5
+        assert len(journal.segments()) == 1
+
+    def test_flush_skips_rejected(self):
+        """Test solutions rejected by the unique (owner, quiz) index are
+        not recorded in the statistics."""
+
+        # a solution stored by another worker, bypassing the journal
+        self.repo.quiz_solution.bulk_insert([solution(100, "taker1@example.com")])
+        bulk_insert = self.repo.quiz_solution.bulk_insert
+
+        def unique_insert(documents):
+            stored = {
+                (doc["owner"], doc["quiz"])
+                for batch in self.repo.quiz_solution.stream()
+                for doc in batch
+            }
+            return bulk_insert(
+                [doc for doc in documents if (doc["owner"], doc["quiz"]) not in stored]
+            )
+
+        flushed = []
+        journal = self.create_journal()
+        journal.on_flush = flushed.extend
+        journal.start()
+        solutions = [solution(index, f"taker{index}@example.com") for index in range(3)]
+        asyncio.run(append_all(journal, solutions))
+        with patch.object(self.repo.quiz_solution, "bulk_insert", unique_insert):
+            assert journal.flush() == 3
+        journal.close()
+        assert [doc["_id"] for doc in flushed] == [0, 2]
+
+    def test_segment_rotation(self):
+        """Test appends acknowledged while segments rotate are all
+        replayed after a crash."""
+
+        journal = SubmissionJournal(
+            self.repo, directory=self.tmp_dir.name, fsync_ms=1, segment_mb=0.001
+        )
+        journal.start()
+        solutions = [
+            solution(index, f"taker{index}@example.com") for index in range(40)
+        ]
+
+        async def append_in_waves():
+            for wave in range(0, len(solutions), 8):
+                await append_all(journal, solutions[wave:][:8])
+
+        asyncio.run(append_in_waves())
+        crash(journal)
+        assert len(journal.segments()) > 1
+
+        replayed = SubmissionJournal(self.repo, directory=self.tmp_dir.name)
+        replayed.start()
+        pending = [replayed.is_pending(item["owner"], 7) for item in solutions]
+        crash(replayed)
+        assert all(pending)
+
+    def test_replay(self):
+        """Test unflushed solutions are replayed once after a restart."""
+
+        journal = self.create_journal()
+        journal.start()
+        solutions = [solution(index, f"taker{index}@example.com") for index in range(4)]
+        asyncio.run(append_all(journal, solutions))
+        journal.flush()
+        # crash before the checkpoint of the flushed batch was written
+        journal._write_checkpoint(0)
+        crash(journal)
+
+        replayed = self.create_journal()
+        replayed.start()
+        assert replayed.is_pending("taker3@example.com", 7)
+        replayed.close()
+        assert len(self.repo.quiz_solution.filter(quiz=7)) == 4
+        assert self.repo.quiz_stats.get(7).count == 4
+
+    def test_exam_with_journal(self):
+        """Test exam submissions go through the journal."""
+
+        repo = get_mock_repository()
+        journal = SubmissionJournal(
+            repo,
+            partial(record_journaled, repo),
+            directory=self.tmp_dir.name,
+            fsync_ms=1,
+            flush_ms=10,
+        )
+        journal.start()
+        previous = set_journal(journal)
+
+        async def run():
+            async with create_client(app) as client:
+                return await run_exam(client, repo, 10, 5)
+
+        try:
+            report = asyncio.run(run())
+        finally:
+            set_journal(previous)
+            journal.close()
+        endpoints = {stats.endpoint: stats for stats in report.endpoints}
+        assert endpoints["POST /quiz/validate"].requests == 10
+        assert sum(stats.errors for stats in report.endpoints) == 0
+        assert journal.lag_seconds() == 0.0
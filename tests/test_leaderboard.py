@@ -0,0 +1,150 @@
+"""Quiz leaderboard stream testing module."""
+
+import asyncio
+import json
+import unittest
+from datetime import datetime, timedelta
+
+from parameterized import parameterized
+
+from api.quiz.leaderboard import (KEEPALIVE, LeaderboardHub, QuizBoard,
+                                  leaderboard_hub)
+from benchmarks.generators import make_quiz, make_submission
+from database.memory import MemoryRepositoryFactory
+from tests.mock_client import get_auth_client
+from tests.mock_repository import get_mock_repository
+
+
+def frame_data(frame: bytes) -> dict:
+    event, _, data = frame.decode().strip().split("\n")
+    assert event == "event: leaderboard"
+    return json.loads(data.partition(" ")[2])
+
+
+def players(frame: bytes) -> list:
+    return [entry["player"] for entry in frame_data(frame)["top"]]
+
+
+def stored_solutions(started: datetime) -> MemoryRepositoryFactory:
+    """Creates repository with solutions of quiz 1 scoring 1 to 7."""
+
+    repo = MemoryRepositoryFactory()
+    repo.quiz_solution.bulk_insert(
+        [
+            {
+                "_id": index,
+                "quiz": 1,
+                "owner": f"stored{index}@example.com",
+                "scored_points": float(index),
+                "submitted_at": started,
+            }
+            for index in range(1, 8)
+        ]
+    )
+    return repo
+
+
+class TestLeaderboardStream(unittest.TestCase):
+    """Quiz leaderboard stream testing class."""
+
+    @parameterized.expand([[2, 3], [50, 5]])
+    def test_coalesced_frames(self, subscribers: int, size: int):
+        """Test updates within an interval make one frame shared by all
+        subscribers and the board keeps the best solutions."""
+
+        started = datetime(2026, 1, 1)
+        repo = stored_solutions(started)
+
+        async def run():
+            hub = LeaderboardHub(
+                interval_ms=20, size=size, keepalive_seconds=5, refresh_seconds=0
+            )
+            queues = await asyncio.gather(
+                *(hub.subscribe(repo, 1) for _ in range(subscribers))
+            )
+            initial = [queue.get_nowait() for queue in queues]
+
+            for index in range(10):
+                submitted_at = started + timedelta(seconds=index + 1)
+                hub.record(1, f"new{index}@example.com", 7.0, submitted_at)
+            hub.record(2, "unwatched@example.com", 9.0, started)
+            await asyncio.sleep(0.1)
+            updated = [queue.get_nowait() for queue in queues]
+            board = hub._boards[1]  # pylint: disable=W0212
+            frames = board.frames
+
+            for queue in queues:
+                hub.unsubscribe(1, queue)
+            await asyncio.sleep(0)
+            return initial, updated, frames, board.task, hub.subscribers()
+
+        initial, updated, frames, task, remaining = asyncio.run(run())
+        assert all(frame is initial[0] for frame in initial)
+        assert all(frame is updated[0] for frame in updated)
+        assert frames == 2
+        assert players(initial[0]) == [
+            f"stored{index}@example.com" for index in range(7, 7 - size, -1)
+        ]
+        # equal scores rank by submission time
+        expected = ["stored7@example.com"] + [
+            f"new{index}@example.com" for index in range(size - 1)
+        ]
+        assert players(updated[0]) == expected
+        assert task.cancelled() and remaining == 0
+
+    def test_load_merges(self):
+        """Test a load queries only the best solutions and keeps solutions
+        recorded meanwhile."""
+
+        started = datetime(2026, 1, 1)
+        repo = stored_solutions(started)
+        board = QuizBoard(1, 3)
+        board.record("new@example.com", 6.5, started + timedelta(seconds=1))
+        asyncio.run(board.load(repo))
+
+        assert [doc["owner"] for doc in board.best_solutions(repo)] == [
+            "stored7@example.com",
+            "stored6@example.com",
+            "stored5@example.com",
+        ]
+        assert [entry["player"] for entry in board.leaderboard.top(3)] == [
+            "stored7@example.com",
+            "new@example.com",
+            "stored6@example.com",
+        ]
+
+    def test_stream_endpoint(self):
+        """Test only the quiz owner may watch its leaderboard and solutions
+        submitted with validate_quiz reach the stream."""
+
+        repo = get_mock_repository()
+        quiz = make_quiz(902, questions=3, answers=3, seed=8)
+        quiz.owner = repo.user.get("john@wick.com")
+        repo.quiz.persist(quiz)
+
+        owner_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        taker_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        response = taker_client.get("/quiz/902/leaderboard/stream")
+        assert response.status_code == 401
+        response = owner_client.get("/quiz/999999/leaderboard/stream")
+        assert response.status_code == 404
+
+        submission = make_submission(quiz, correct_ratio=1.0)
+
+        async def run():
+            stream = leaderboard_hub.stream(repo, 902)
+            first = await stream.__anext__()
+            response = await asyncio.to_thread(
+                taker_client.post, "/quiz/validate", json=submission.dict()
+            )
+            assert response.status_code == 200
+            second = await asyncio.wait_for(stream.__anext__(), 5)
+            await stream.aclose()
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first != KEEPALIVE and players(first) == []
+        top = frame_data(second)["top"]
+        assert [entry["player"] for entry in top] == ["al.pacino@gmail.com"]
+        assert top[0]["score"] == 3.0
+        assert leaderboard_hub.subscribers() == 0
@@ -0,0 +1,289 @@
+"""Live quiz testing module."""
+
+import asyncio
+import json
+import random
+import unittest
+from unittest.mock import patch
+
+import anyio
+import pytest
+from fastapi.testclient import TestClient
+from parameterized import parameterized
+from starlette.websockets import WebSocketDisconnect
+
+from api.live.router import CLOSE_UNAUTHORIZED
+from api.live.session import Connection, LiveSession, LiveSessions
+from api.quiz.main import validate
+from app.server import app
+from benchmarks.generators import make_quiz, make_submission
+from core.leaderboard import Leaderboard
+from database.memory import MemoryRepositoryFactory
+from tests.mock_client import get_auth_client
+from tests.mock_repository import get_mock_repository
+
+
+class FakeWebSocket:
+    """Websocket recording sent frames."""
+
+    def __init__(self):
+        self.frames = []
+        self.closed = None
+
+    async def send_bytes(self, frame: bytes):
+        self.frames.append(frame)
+
+    async def close(self, code: int = 1000):
+        self.closed = code
+
+
+def correct_ids(question) -> list:
+    return [answer.identifier for answer in question.answers if answer.is_correct]
+
+
+def receive(websocket, frame_type: str) -> dict:
+    """Receives frames until one of a given type (leaderboard ticks may
+    come in between)."""
+
+    while True:
+        frame = json.loads(websocket.receive_bytes())
+        if frame["type"] == frame_type:
+            return frame
+
+
+class TestLeaderboard(unittest.TestCase):
+    """Leaderboard testing class."""
+
+    @parameterized.expand([[1, 5], [200, 10], [50, 100]])
+    def test_ranking(self, players: int, size: int):
+        """Test ranks and top entries match a full sort after random
+        updates and removals."""
+
+        rng = random.Random(players)
+        board = Leaderboard()
+        scores = {}
+        for _ in range(players * 5):
+            name = f"player{rng.randrange(players)}"
+            if rng.random() < 0.1:
+                board.remove(name)
+                scores.pop(name, None)
+            else:
+                scores[name] = (rng.randint(-3, 10), rng.choice([1.0, 2.5]))
+                board.update(name, *scores[name])
+
+        expected = sorted(
+            scores, key=lambda name: (-scores[name][0], scores[name][1], name)
+        )
+        assert len(board) == len(scores)
+        assert [entry["player"] for entry in board.top(size)] == expected[:size]
+        for rank, name in enumerate(expected, start=1):
+            assert board.rank(name) == rank
+        assert board.rank("nobody") == 0
+
+
+class TestLiveSession(unittest.TestCase):
+    """Live quiz session testing class."""
+
+    def test_broadcast_backpressure(self):
+        """Test a broadcast is encoded once for all players and a slow
+        player keeps only its newest frames."""
+
+        async def run():
+            session = LiveSession("CODE", make_quiz(1, questions=2, answers=3), "host")
+            sockets = [FakeWebSocket() for _ in range(3)]
+            connections = [Connection(socket, 4) for socket in sockets]
+            for index, connection in enumerate(connections):
+                session.join(f"player{index}", connection)
+            fast = connections[0]
+            fast.start()
+
+            frames = []
+            for index in range(10):
+                frames.append(session.broadcast({"type": "tick", "index": index}))
+                await asyncio.sleep(0)
+            await asyncio.gather(*(connection.close() for connection in connections))
+            return frames, sockets, connections
+
+        frames, sockets, connections = asyncio.run(run())
+        assert sockets[0].frames == frames and connections[0].dropped == 0
+        for socket, connection in zip(sockets[1:], connections[1:]):
+            # slow players were not drained until close
+            assert socket.frames == [] and socket.closed == 1000
+            assert connection.dropped == 10 + 1 - 4
+        # every player got the very same buffer
+        queued = connections[1].queue._queue  # pylint: disable=W0212
+        assert list(queued)[:-1] == frames[-3:] and queued[0] is frames[-3]
+
+    def test_scoring_and_results(self):
+        """Test answers are scored like submissions, ranked and stored
+        with the quiz statistics once per player."""
+
+        async def run(repo, quiz):
+            session = LiveSession("CODE", quiz, "host")
+            players = {}
+            for name in ("fast@example.com", "slow@example.com", "idle@example.com"):
+                players[name], _ = session.join(name, Connection(FakeWebSocket(), 64))
+
+            for question in quiz.questions:
+                assert session.next_question()
+                answer = session.answer(
+                    players["fast@example.com"],
+                    question.identifier,
+                    correct_ids(question),
+                )
+                assert answer["type"] == "answered"
+                assert session.answer(
+                    players["fast@example.com"], question.identifier, []
+                ) == {"type": "error", "message": "Question already answered"}
+                await asyncio.sleep(0.01)
+                session.answer(players["slow@example.com"], question.identifier, [])
+            assert not session.next_question()
+            return session, await session.finish(repo)
+
+        repo = MemoryRepositoryFactory()
+        quiz = make_quiz(1, questions=3, answers=3, seed=4)
+        repo.quiz.bulk_insert([quiz.to_mongo()])
+        session, stored = asyncio.run(run(repo, quiz))
+        assert stored == 3
+
+        full = validate(quiz, make_submission(quiz, correct_ratio=1.0))
+        fast = session.players["fast@example.com"]
+        assert fast.alias == "Player 1" and session.leaderboard.rank(fast.alias) == 1
+        assert {entry["player"] for entry in session.leaderboard.top(10)} == {
+            "Player 1",
+            "Player 2",
+            "Player 3",
+        }
+        solutions = {
+            solution["owner"]: solution
+            for solution in repo.quiz_solution.filter(quiz=1, limit=10, as_dict=True)
+        }
+        assert solutions["fast@example.com"]["scored_points"] == pytest.approx(
+            full.points
+        )
+        assert solutions["fast@example.com"]["total_points"] == full.total_points
+        assert solutions["idle@example.com"]["scored_points"] == 0.0
+        assert repo.quiz_stats.get(1).count == 3
+
+        # players who already solved the quiz are not stored again
+        assert session.store_results(repo) == 0
+
+    def test_results_concurrent_solution(self):
+        """Test solutions skipped by the insert, i.e. of players who
+        submitted meanwhile, are not recorded in the statistics."""
+
+        repo = MemoryRepositoryFactory()
+        quiz = make_quiz(1, questions=2, answers=3, seed=7)
+        repo.quiz.bulk_insert([quiz.to_mongo()])
+        session = LiveSession("CODE", quiz, "host")
+        for name in ("first@example.com", "second@example.com"):
+            session.join(name, Connection(FakeWebSocket(), 4))
+
+        bulk_insert = repo.quiz_solution.bulk_insert
+        with patch.object(
+            repo.quiz_solution,
+            "bulk_insert",
+            side_effect=lambda documents: bulk_insert(documents[1:]),
+        ):
+            assert session.store_results(repo) == 1
+        assert repo.quiz_stats.get(1).count == 1
+
+    def test_nicknames(self):
+        """Test nicknames are unique in a session and a player joining
+        again keeps its alias."""
+
+        session = LiveSession("CODE", make_quiz(1, questions=1, answers=2), "host")
+        player, _ = session.join("a@example.com", Connection(FakeWebSocket(), 4), "Al")
+        with self.assertRaises(ValueError):
+            session.join("b@example.com", Connection(FakeWebSocket(), 4), " Al ")
+        session.join("c@example.com", Connection(FakeWebSocket(), 4), "Player 2")
+        other, _ = session.join("b@example.com", Connection(FakeWebSocket(), 4))
+        assert other.alias == "Player 3"
+        again, _ = session.join("a@example.com", Connection(FakeWebSocket(), 4), "X")
+        assert again is player and player.alias == "Al"
+
+    def test_idle_host(self):
+        """Test a session whose host is gone ends, stores its results and
+        is removed."""
+
+        async def run(repo, quiz):
+            sessions = LiveSessions()
+            session = sessions.create(quiz, "host", repo)
+            session.interval, session.idle_seconds = 0.01, 0.05
+            socket = FakeWebSocket()
+            connection = Connection(socket, 16)
+            connection.start()
+            session.join("idle@example.com", connection)
+            await asyncio.sleep(0.2)
+            return sessions, session, socket
+
+        repo = MemoryRepositoryFactory()
+        quiz = make_quiz(1, questions=2, answers=3, seed=5)
+        repo.quiz.bulk_insert([quiz.to_mongo()])
+        sessions, session, socket = asyncio.run(run(repo, quiz))
+        assert session.finished and sessions.get(session.code) is None
+        assert json.loads(socket.frames[-1])["type"] == "end"
+        assert socket.closed == 1000
+        assert repo.quiz_stats.get(1).count == 1
+
+    def test_live_endpoints(self):
+        """Test a host drives a live quiz over websockets and results of
+        its players are stored."""
+
+        repo = get_mock_repository()
+        quiz = make_quiz(901, questions=2, answers=3, seed=6)
+        quiz.owner = repo.user.get("john@wick.com")
+        repo.quiz.persist(quiz)
+
+        host_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        player_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        assert player_client.post("/live/901").status_code == 401
+        host_token = host_client.headers["Authorization"].split()[1]
+        player_token = player_client.headers["Authorization"].split()[1]
+
+        # requests of one worker share its event loop
+        with anyio.from_thread.start_blocking_portal() as portal:
+            client = TestClient(app)
+            client.portal = portal
+            code = client.post("/live/901", headers=host_client.headers).json()["code"]
+
+            with pytest.raises(WebSocketDisconnect) as exc:
+                with client.websocket_connect(f"/live/{code}/play?token=bad"):
+                    pass
+            assert exc.value.code == CLOSE_UNAUTHORIZED
+
+            with client.websocket_connect(
+                f"/live/{code}/host?token={host_token}"
+            ) as host, client.websocket_connect(
+                f"/live/{code}/play?token={player_token}&nickname=Al"
+            ) as player:
+                assert receive(host, "hosting")["code"] == code
+                assert receive(player, "joined")["player"] == "Al"
+
+                for question in quiz.questions:
+                    host.send_json({"action": "next"})
+                    asked = receive(player, "question")["question"]
+                    assert asked["identifier"] == question.identifier
+                    assert "is_correct" not in asked["answers"][0]
+                    player.send_json(
+                        {
+                            "question": question.identifier,
+                            "answers": correct_ids(question),
+                        }
+                    )
+                    assert (
+                        receive(player, "answered")["question"] == question.identifier
+                    )
+                    host.send_json({"action": "reveal"})
+                    assert receive(player, "reveal")["correct"] == correct_ids(question)
+                    assert receive(player, "score")["rank"] == 1
+
+                host.send_json({"action": "end"})
+                end = receive(player, "end")
+                assert end["stored"] == 1
+                assert end["top"][0]["player"] == "Al"
+
+        solution = repo.quiz_solution.filter(
+            quiz=901, owner="al.pacino@gmail.com", limit=1, as_dict=True
+        )[0]
+        assert solution["total_points"] == solution["scored_points"] == 2
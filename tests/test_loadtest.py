@@ -0,0 +1,34 @@
+"""Load test harness testing module."""
+
+import asyncio
+import unittest
+
+from parameterized import parameterized
+
+from benchmarks.loadtest import create_client, percentile, run_exam
+from tests.mock_client import app
+from tests.mock_repository import get_mock_repository
+
+
+class TestLoadTest(unittest.TestCase):
+    """Load test harness testing class."""
+
+    @parameterized.expand([[0.5, 5], [0.95, 10], [0.99, 10], [0.01, 1]])
+    def test_percentile(self, fraction: float, expected: int):
+        """Test nearest rank percentile."""
+
+        assert percentile(list(range(1, 11)), fraction) == expected
+
+    def test_run_exam(self):
+        """Test in-process exam run reports every endpoint without errors."""
+
+        async def run():
+            async with create_client(app) as client:
+                return await run_exam(client, get_mock_repository(), 20, 5, logins=1)
+
+        report = asyncio.run(run())
+        endpoints = {stats.endpoint: stats for stats in report.endpoints}
+        assert endpoints["GET /quiz/{quiz_id}"].requests == 20
+        assert endpoints["POST /quiz/validate"].requests == 20
+        assert endpoints["POST /token"].requests == 1
+        assert sum(stats.errors for stats in report.endpoints) == 0
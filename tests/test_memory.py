@@ -0,0 +1,136 @@
+"""In-memory repository testing module."""
+
+import os
+import tempfile
+import unittest
+
+import pytest
+from mongoengine.errors import InvalidQueryError
+from parameterized import parameterized
+
+from database.memory import MemoryRepositoryFactory
+from model import Answer, Question, Quiz, QuizSnapshot
+from tests.mock_repository_data import mock_quiz_data, mock_user_data
+
+
+def get_repository() -> MemoryRepositoryFactory:
+    """Creates in-memory repository factory seeded with mock data."""
+
+    repo = MemoryRepositoryFactory()
+    repo.user.bulk_insert([user.to_mongo() for user in mock_user_data.values()])
+    repo.quiz.bulk_insert([quiz.to_mongo() for quiz in mock_quiz_data.values()])
+    return repo
+
+
+class TestMemoryRepository(unittest.TestCase):
+    """In-memory repository testing class."""
+
+    @parameterized.expand(
+        [
+            [{"owner": "john@wick.com"}, [1, 2]],
+            [{"owner": mock_user_data["al.pacino@gmail.com"]}, [3, 4, 5]],
+            [{"title__icontains": "CAPITAL of"}, [1, 2]],
+            [{"title__icontains": "iv"}, [5]],
+            [{"title__istartswith": "sample quiz t"}, [2, 3]],
+            [{"pk__in": [5, 1, 100]}, [1, 5]],
+            [{"owner": "al.pacino@gmail.com", "is_published": False}, [3, 5]],
+            [{"description__icontains": "quiz", "skip": 1, "limit": 2}, [2, 3]],
+        ]
+    )
+    def test_filter(self, query: dict, expected: list):
+        """Test filters are answered from indexes in primary key order."""
+
+        result = get_repository().quiz.filter(**query, as_dict=True)
+        assert [quiz["_id"] for quiz in result] == expected
+
+    def test_filter_order(self):
+        """Test filters sort by fields before skip and limit, ties keep
+        primary key order."""
+
+        quizzes = get_repository().quiz
+        query = {"owner": "al.pacino@gmail.com", "as_dict": True}
+        result = quizzes.filter(**query, order_by=["is_published", "-pk"])
+        assert [quiz["_id"] for quiz in result] == [5, 3, 4]
+        result = quizzes.filter(**query, order_by=["-is_published"], limit=2)
+        assert [quiz["_id"] for quiz in result] == [4, 3]
+
+    def test_filter_only(self):
+        """Test filter projection."""
+
+        result = get_repository().quiz.filter(pk=1, only=["title"], as_dict=True)
+        assert result == [{"_id": 1, "title": "Sample Quiz Capital of USA."}]
+
+    def test_persist(self):
+        """Test sequences are assigned, references resolved and indexes
+        updated on persist."""
+
+        repo = get_repository()
+        quiz = Quiz(
+            title="New quiz",
+            owner=mock_user_data["john@wick.com"],
+            questions=[Question(title="Question", answers=[Answer(answer_text="A")])],
+        )
+        quiz = repo.quiz.persist(quiz)
+        assert quiz.identifier == 6
+        assert quiz.questions[0].identifier is not None
+        assert quiz.owner.last_name == "Wick"
+        owned = repo.quiz.filter(owner="john@wick.com")
+        assert [item.identifier for item in owned] == [1, 2, 6]
+
+        quiz.title = "Renamed quiz"
+        repo.quiz.persist(quiz)
+        assert not repo.quiz.filter(title__icontains="new quiz")
+        repo.quiz.delete(quiz)
+        assert repo.quiz.get(6) is None
+        assert repo.quiz.reserve_ids(2) == range(7, 9)
+
+    def test_update(self):
+        """Test in place updates with upsert and update operators."""
+
+        repo = get_repository()
+        assert repo.quiz_stats.update(1, inc__count=1) is None
+        for score in (0.5, 0.25, 0.75):
+            stats = repo.quiz_stats.update(
+                1,
+                upsert=True,
+                inc__count=1,
+                inc__score_sum=score,
+                min__min_score=score,
+                max__max_score=score,
+                inc__histogram__2=1,
+            )
+        assert (stats.count, stats.score_sum) == (3, 1.5)
+        assert (stats.min_score, stats.max_score) == (0.25, 0.75)
+        assert stats.histogram == {"2": 3}
+
+        quiz = repo.quiz.update(1, set__is_published=True)
+        assert quiz.is_published and quiz.owner.email == "john@wick.com"
+        published = repo.quiz.filter(is_published=True, as_dict=True)
+        assert [item["_id"] for item in published] == [1, 4]
+        with pytest.raises(InvalidQueryError):
+            repo.quiz.update(1, unset__description=True)
+
+    def test_snapshot(self):
+        """Test repositories are restored from snapshot file."""
+
+        repo = get_repository()
+        repo.quiz_snapshot.persist(
+            QuizSnapshot(
+                quiz=1,
+                revision=1,
+                digest="digest",
+                body=b"{}",
+                body_gzip=b"\x1f\x8b",
+                taker_body=b"{}",
+                taker_body_gzip=b"\x1f\x8b",
+            )
+        )
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "repository.snapshot")
+            repo.save_snapshot(path)
+            restored = MemoryRepositoryFactory(path)
+
+        assert restored.quiz_snapshot.get(1).body_gzip == b"\x1f\x8b"
+        assert restored.quiz.get(4).owner.email == "al.pacino@gmail.com"
+        assert restored.quiz.filter(title__icontains="five")[0].identifier == 5
+        assert restored.quiz.reserve_ids(1) == range(6, 7)
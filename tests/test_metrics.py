@@ -0,0 +1,67 @@
+"""Metrics testing module."""
+
+import unittest
+from types import SimpleNamespace
+
+from core.metrics import MetricsRegistry
+from database.monitoring import CommandMetricsListener
+from tests.mock_client import test_client
+
+
+class TestMetrics(unittest.TestCase):
+    """Metrics testing class."""
+
+    def test_histogram(self):
+        """Test histogram buckets are cumulative."""
+
+        registry = MetricsRegistry()
+        histogram = registry.histogram("latency", "Latency.", ("route",), (0.1, 1))
+        for value in (0.05, 0.1, 0.5, 2):
+            histogram.observe(value, ("/quiz",))
+
+        lines = registry.render().splitlines()
+        assert 'latency_bucket{route="/quiz",le="0.1"} 2' in lines
+        assert 'latency_bucket{route="/quiz",le="1"} 3' in lines
+        assert 'latency_bucket{route="/quiz",le="+Inf"} 4' in lines
+        assert 'latency_count{route="/quiz"} 4' in lines
+
+    def test_metrics_endpoint(self):
+        """Test requests are recorded per route template."""
+
+        test_client.get("/quiz/2")
+        test_client.get("/quiz/12345")
+        response = test_client.get("/metrics")
+        assert response.status_code == 200
+        assert response.headers["Content-Type"].startswith("text/plain")
+
+        text = response.text
+        assert (
+            'http_requests_total{method="GET",route="/quiz/{quiz_id}",status="200"}'
+            in text
+        )
+        assert (
+            'http_requests_total{method="GET",route="/quiz/{quiz_id}",status="404"}'
+            in text
+        )
+        assert (
+            'http_request_duration_seconds_bucket{method="GET",route="/quiz/{quiz_id}"'
+            in text
+        )
+        assert "http_requests_in_flight 1" in text
+
+    def test_command_listener(self):
+        """Test mongo commands are recorded by collection and command."""
+
+        listener = CommandMetricsListener()
+        event = {"connection_id": ("localhost", 27017), "request_id": 1}
+        command = {"find": "quiz", "filter": {}}
+        listener.started(SimpleNamespace(command_name="find", command=command, **event))
+        listener.succeeded(
+            SimpleNamespace(command_name="find", duration_micros=1500, **event)
+        )
+
+        text = test_client.get("/metrics").text
+        assert (
+            'mongo_command_duration_seconds_count{collection="quiz",command="find"}'
+            in text
+        )
@@ -0,0 +1,78 @@
+"""Request profiling testing module."""
+
+import json
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+
+from parameterized import parameterized
+
+from app import profiling
+from core.config import get_config
+from tests.mock_client import get_auth_client, test_client
+
+
+class TestProfiling(unittest.TestCase):
+    """Request profiling testing class."""
+
+    def setUp(self):
+        """Profiles go to a temporary directory."""
+
+        self.settings = get_config().MONITORING_INFO
+        self.profile_dir = self.settings.profile_dir
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.settings.profile_dir = self.tmp_dir.name
+
+    def tearDown(self):
+        self.settings.profile_dir = self.profile_dir
+        self.settings.profile_sample_rate = 0.0
+        self.tmp_dir.cleanup()
+
+    @parameterized.expand(
+        [
+            ["john@wick.com", {"X-Profile": "collapsed"}, "", "collapsed"],
+            ["john@wick.com", {}, "?profile=speedscope", "speedscope.json"],
+            ["al.pacino@gmail.com", {"X-Profile": "1"}, "", None],
+        ]
+    )
+    def test_profile_request(self, username, headers, query, suffix):
+        """Test admin users can profile a request."""
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.get(f"/quiz/2{query}", headers=headers)
+        assert response.status_code == 200
+
+        output = response.headers.get("X-Profile-Output")
+        if suffix is None:
+            assert output is None
+            assert not os.listdir(self.tmp_dir.name)
+            return
+
+        assert "-GET-quiz_quiz_id-" in output and output.endswith(suffix)
+        path = os.path.join(self.tmp_dir.name, output)
+        assert os.path.exists(path)
+        if suffix.endswith("json"):
+            with open(path, "r", encoding="utf-8") as file_handle:
+                assert json.load(file_handle)["exporter"] == "quizbuilder"
+
+    def test_sampled_request(self):
+        """Test requests are profiled by sample rate."""
+
+        self.settings.profile_sample_rate = 1.0
+        response = test_client.get("/quiz/2")
+        assert response.headers["X-Profile-Output"] in os.listdir(self.tmp_dir.name)
+
+    def test_admin_check_cached(self):
+        """Test the admin check of a token runs once for repeated profile
+        requests and not at all for requests without the header."""
+
+        profiling.admin_cache.clear()
+        auth_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        with patch(
+            "app.profiling.token_is_admin", wraps=profiling.token_is_admin
+        ) as token_is_admin:
+            for headers in ({}, {"X-Profile": "1"}, {"X-Profile": "1"}):
+                response = auth_client.get("/quiz/2", headers=headers)
+                assert "X-Profile-Output" not in response.headers
+            assert token_is_admin.call_count == 1
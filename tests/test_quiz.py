@@ -1,14 +1,25 @@
 """Quiz testing module."""
 
+import json
 import unittest
+from datetime import datetime, timedelta
+from unittest.mock import patch
 
 import pytest
+from mongoengine import NotUniqueError
 from parameterized import parameterized
 from pydantic import ValidationError
 
-from api.quiz.model import NewQuiz
+from api.quiz.activity import (GLOBAL_QUIZ, activity_series, compact_activity,
+                               record_submission)
+from api.quiz.analysis import ItemAnalyzer
+from api.quiz.main import validate
+from api.quiz.model import NewQuiz, Resolution
+from api.quiz.stats import rebuild_stats, record_solution, stats_summary
+from benchmarks.generators import make_quiz, make_submission
 from tests.helper import get_entity, get_quiz_json_data
 from tests.mock_client import get_auth_client, test_client
+from tests.mock_repository import MockRepositoryFactory, get_mock_repository
 
 
 class TestQuiz(unittest.TestCase):
@@ -27,6 +38,79 @@ class TestQuiz(unittest.TestCase):
         response = test_client.get(f"{self.endpoint}/{quiz_id}")
         assert response.status_code == status_code
 
+    @parameterized.expand([[2, "no-cache"], [4, "public"]])
+    def test_get_quiz_conditional(self, quiz_id: int, cache_control: str):
+        """Test get quiz endpoint ETag and conditional GET handling."""
+
+        response = test_client.get(f"{self.endpoint}/{quiz_id}")
+        assert response.status_code == 200
+        assert response.headers["Cache-Control"].startswith(cache_control)
+
+        etag = response.headers["ETag"]
+        headers = {"If-None-Match": etag}
+        response = test_client.get(f"{self.endpoint}/{quiz_id}", headers=headers)
+        assert response.status_code == 304
+        assert response.headers["ETag"] == etag
+
+        headers = {"If-None-Match": '"stale"'}
+        response = test_client.get(f"{self.endpoint}/{quiz_id}", headers=headers)
+        assert response.status_code == 200
+
+    @parameterized.expand([[2], [4]])
+    def test_get_quiz_taker_view(self, quiz_id: int):
+        """Test get quiz taker view does not reveal correct answers."""
+
+        response = test_client.get(f"{self.endpoint}/{quiz_id}?view=taker")
+        assert response.status_code == 200
+        assert response.headers["ETag"].endswith('-taker"')
+        for question in response.json()["questions"]:
+            for answer in question["answers"]:
+                assert "is_correct" not in answer
+
+    def test_get_published_quiz_snapshot(self):
+        """Test published quiz is served from snapshot, gzip encoded
+        if the client accepts it."""
+
+        headers = {"Accept-Encoding": "gzip"}
+        response = test_client.get(f"{self.endpoint}/4", headers=headers)
+        assert response.status_code == 200
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert response.json()["title"] == "Sample Quiz Four."
+
+        repo = get_mock_repository()
+        assert repo.quiz_snapshot.get(4) is not None
+
+    def test_validate_quiz_concurrent_duplicate(self):
+        """Test a solution rejected by the unique (owner, quiz) index,
+        i.e. stored concurrently by another worker, is not allowed."""
+
+        repo = get_mock_repository()
+        quiz = make_quiz(903, questions=2, answers=3, seed=9)
+        quiz.owner = repo.user.get("john@wick.com")
+        repo.quiz.persist(quiz)
+        submission = make_submission(quiz, correct_ratio=1.0)
+
+        auth_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        with patch.object(
+            repo.quiz_solution, "persist", side_effect=NotUniqueError("duplicate")
+        ):
+            response = auth_client.post(
+                f"{self.endpoint}/validate", json=submission.dict()
+            )
+        assert response.status_code == 401
+        assert repo.quiz_stats.get(903) is None
+
+    def test_get_quiz_snapshot_reads(self):
+        """Test unpublished quiz reads do not look up snapshots."""
+
+        repo = get_mock_repository()
+        with patch.object(
+            repo.quiz_snapshot, "get", wraps=repo.quiz_snapshot.get
+        ) as snapshot_get:
+            assert test_client.get(f"{self.endpoint}/2").status_code == 200
+            assert test_client.get(f"{self.endpoint}/2").status_code == 200
+            assert snapshot_get.call_count == 0
+
     @parameterized.expand(
         [
             ["john@wick.com", "_Hard_pass1", 200],
@@ -74,6 +158,155 @@ class TestQuiz(unittest.TestCase):
         )
         assert response.status_code == status_code
 
+    @parameterized.expand(
+        [
+            ["al.pacino@gmail.com", "ndjson", 200],
+            ["al.pacino@gmail.com", "csv", 200],
+            ["john@wick.com", "ndjson", 401],
+        ]
+    )
+    def test_export_solutions(self, username: str, export_format: str, status_code):
+        """Test quiz solutions export endpoint."""
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.get(
+            f"{self.endpoint}/4/solutions/export?format={export_format}"
+        )
+        assert response.status_code == status_code
+        if status_code != 200:
+            return
+
+        lines = response.text.strip().splitlines()
+        if export_format == "csv":
+            assert lines[0].startswith("identifier,quiz,owner")
+            assert lines[1].startswith("1,4,john@wick.com")
+        else:
+            solution = json.loads(lines[0])
+            assert solution["owner"] == "john@wick.com"
+            assert solution["scored_points"] == 1.0
+
+    @parameterized.expand([["al.pacino@gmail.com", 200], ["john@wick.com", 401]])
+    def test_read_quiz_stats(self, username: str, status_code: int):
+        """Test quiz statistics endpoint is available to the owner."""
+
+        rebuild_stats(get_mock_repository())
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.get(f"{self.endpoint}/4/stats")
+        assert response.status_code == status_code
+        if status_code == 200:
+            stats = response.json()
+            assert stats["count"] == 1
+            assert sum(bucket["count"] for bucket in stats["histogram"]) == 1
+
+    def test_rebuild_quiz_stats(self):
+        """Test rebuilt statistics match incrementally updated ones."""
+
+        repo = MockRepositoryFactory()
+        for scored_points in (1.0, 2.5, 0.0, 4.0):
+            record_solution(repo, 5, scored_points, 4)
+        incremental = stats_summary(5, repo.quiz_stats.get(5))
+        assert incremental.count == 4 and incremental.max_score == 1.0
+        assert [bucket.count for bucket in incremental.histogram][-1] == 1
+
+        report = rebuild_stats(repo)
+        assert (report.quizzes, report.solutions, report.removed) == (1, 1, 1)
+        assert repo.quiz_stats.get(5) is None
+        assert stats_summary(4, repo.quiz_stats.get(4)).count == 1
+
+    @parameterized.expand([["al.pacino@gmail.com", 200], ["john@wick.com", 401]])
+    def test_read_quiz_activity(self, username: str, status_code: int):
+        """Test quiz activity endpoint is available to the owner."""
+
+        record_submission(get_mock_repository(), 4, datetime.utcnow())
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.get(f"{self.endpoint}/4/activity?resolution=hour")
+        assert response.status_code == status_code
+        if status_code == 200:
+            activity = response.json()
+            assert len(activity["buckets"]) == 60 and activity["total"] >= 1
+
+        response = auth_client.get(
+            f"{self.endpoint}/4/activity?start=2020-01-01T00:00:00"
+        )
+        assert response.status_code == (400 if status_code == 200 else status_code)
+
+    @parameterized.expand(
+        [
+            ["2026-01-01T10:00:00Z", "2026-01-01T12:00:00Z"],
+            ["2026-01-01T12:00:00+02:00", "2026-01-01T14:00:00+02:00"],
+            ["2026-01-01T10:00:00", "2026-01-01T12:00:00"],
+        ]
+    )
+    def test_read_quiz_activity_offsets(self, start: str, end: str):
+        """Test activity range timestamps with a UTC offset read the same
+        buckets as naive UTC ones."""
+
+        auth_client = get_auth_client("al.pacino@gmail.com", "_Hard_pass1")
+        response = auth_client.get(
+            f"{self.endpoint}/4/activity",
+            params={"resolution": "hour", "start": start, "end": end},
+        )
+        assert response.status_code == 200
+        buckets = response.json()["buckets"]
+        assert [bucket["start"] for bucket in buckets] == [
+            "2026-01-01T10:00:00",
+            "2026-01-01T11:00:00",
+        ]
+
+    def test_activity_compaction(self):
+        """Test rollup counts and compaction of expired minute buckets."""
+
+        repo = MockRepositoryFactory()
+        started = datetime(2026, 1, 1, 10, 0)
+        for minute in (0, 0, 5, 59, 60):
+            record_submission(repo, 5, started + timedelta(minutes=minute))
+        record_submission(repo, 6, started)
+
+        end = started + timedelta(hours=2)
+        minutes = activity_series(repo, 5, Resolution.minute, started, end)
+        assert minutes.total == 5 and len(minutes.buckets) == 120
+        assert [bucket.count for bucket in minutes.buckets[:6]] == [2, 0, 0, 0, 0, 1]
+        hours = activity_series(repo, GLOBAL_QUIZ, Resolution.hour, started, end)
+        assert [bucket.count for bucket in hours.buckets] == [5, 1]
+
+        report = compact_activity(repo, now=started + timedelta(days=3))
+        assert (report.minute_buckets, report.hour_buckets) == (9, 0)
+        assert activity_series(repo, 5, Resolution.minute, started, end).total == 0
+        hours = activity_series(repo, 5, Resolution.hour, started, end)
+        assert [bucket.count for bucket in hours.buckets] == [4, 1]
+
+    @parameterized.expand([["al.pacino@gmail.com", 200], ["john@wick.com", 401]])
+    def test_read_quiz_analysis(self, username: str, status_code: int):
+        """Test quiz item analysis endpoint is available to the owner."""
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.get(f"{self.endpoint}/4/analysis")
+        assert response.status_code == status_code
+        if status_code == 200:
+            analysis = response.json()
+            assert analysis["solutions"] == 1
+            item = analysis["questions"][0]
+            assert item["responses"] == 1 and item["difficulty"] is not None
+            assert sum(option["chosen"] for option in item["options"]) >= 1
+
+    def test_item_scores(self):
+        """Test vectorized item scores add up to validation scores."""
+
+        quiz = make_quiz(1, questions=8, answers=5, seed=7)
+        submissions = [make_submission(quiz, seed=seed) for seed in range(50)]
+        analyzer = ItemAnalyzer(quiz)
+        chosen, _ = analyzer.response_matrix([item.dict() for item in submissions])
+        _, scores = analyzer.item_scores(chosen)
+        expected = [validate(quiz, item).points for item in submissions]
+        assert scores.sum(axis=1) == pytest.approx(expected)
+
+        analyzer.add([item.dict() for item in submissions])
+        analysis = analyzer.result(quiz.identifier)
+        assert analysis.solutions == 50
+        for item in analysis.questions:
+            assert 0.0 <= item.difficulty <= 1.0
+            assert item.discrimination is None or -1.0 <= item.discrimination <= 1.0
+
     @parameterized.expand(
         [
             ["john@wick.com", "_Hard_pass1", 1, 200],
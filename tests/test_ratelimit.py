@@ -0,0 +1,156 @@
+"""Rate limiting and load shedding testing module."""
+
+import asyncio
+import os
+import tempfile
+import unittest
+
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from parameterized import parameterized
+
+from api.auth.main import create_access_token
+from app.ratelimit import (Limit, MemoryBuckets, RateLimitMiddleware,
+                           SqliteBuckets, parse_limit, parse_routes)
+from benchmarks.loadtest import create_client
+from core.config import get_config
+from core.looplag import loop_monitor
+
+
+def create_limited_app(buckets, **kwargs) -> FastAPI:
+    """Creates app with a cheap and a slow endpoint behind the rate limit
+    middleware."""
+
+    limited_app = FastAPI()
+    limited_app.add_middleware(
+        RateLimitMiddleware,
+        buckets=buckets,
+        user_limit=kwargs.pop("user_limit", Limit(1000, 1000)),
+        ip_limit=kwargs.pop("ip_limit", Limit(1000, 1000)),
+        route_limits=kwargs.pop("route_limits", {}),
+        max_in_flight=kwargs.pop("max_in_flight", 0),
+        loop_lag_ms=kwargs.pop("loop_lag_ms", 0),
+    )
+
+    @limited_app.get("/quiz/")
+    async def read_quizzes():
+        return []
+
+    @limited_app.post("/quiz/validate")
+    async def slow_validate():
+        await asyncio.sleep(0.05)
+        return {}
+
+    return limited_app
+
+
+def auth_headers(username: str) -> dict:
+    token_info = get_config().TOKEN_INFO
+    token = create_access_token(
+        data={"sub": username},
+        secret_key=token_info.jwt_signature,
+        algorithm=token_info.jwt_algorithm,
+    )
+    return {"Authorization": f"Bearer {token}"}
+
+
+class TestRateLimit(unittest.TestCase):
+    """Rate limiting and load shedding testing class."""
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.sqlite_buckets = None
+
+    def tearDown(self):
+        loop_monitor.lag = 0.0
+        if self.sqlite_buckets is not None:
+            self.sqlite_buckets.close()
+        self.tmp_dir.cleanup()
+
+    def create_buckets(self, backend: str):
+        if backend == "sqlite":
+            path = os.path.join(self.tmp_dir.name, "buckets.sqlite3")
+            self.sqlite_buckets = SqliteBuckets(path)
+            return self.sqlite_buckets
+        return MemoryBuckets()
+
+    def test_parse_limits(self):
+        """Test limit settings parsing."""
+
+        assert parse_limit("10/40") == Limit(10, 40)
+        assert parse_limit("5") == Limit(5, 5)
+        assert parse_limit("0") is None
+        assert parse_routes("POST /token=1/5, get /quiz/=2") == {
+            ("POST", "/token"): Limit(1, 5),
+            ("GET", "/quiz/"): Limit(2, 2),
+        }
+
+    @parameterized.expand([["memory"], ["sqlite"]])
+    def test_user_limit(self, backend: str):
+        """Test user bucket allows the burst, then rejects with
+        Retry-After, and does not limit other users."""
+
+        client = TestClient(
+            create_limited_app(self.create_buckets(backend), user_limit=Limit(0.5, 3))
+        )
+        headers = auth_headers("taker@example.com")
+        statuses = [client.get("/quiz/", headers=headers).status_code for _ in range(4)]
+        assert statuses == [200, 200, 200, 429]
+
+        response = client.get("/quiz/", headers=headers)
+        assert response.json()["error_code"] == "TOO_MANY_REQUESTS"
+        assert int(response.headers["retry-after"]) == 2
+        other = client.get("/quiz/", headers=auth_headers("other@example.com"))
+        assert other.status_code == 200
+
+    @parameterized.expand([["memory"], ["sqlite"]])
+    def test_ip_and_route_limit(self, backend: str):
+        """Test anonymous requests share the address bucket and the route
+        bucket limits only its route."""
+
+        buckets = self.create_buckets(backend)
+        client = TestClient(
+            create_limited_app(
+                buckets,
+                ip_limit=Limit(0.1, 4),
+                route_limits={("POST", "/quiz/validate"): Limit(0.1, 1)},
+            )
+        )
+        assert client.post("/quiz/validate").status_code == 200
+        assert client.post("/quiz/validate").status_code == 429
+        statuses = [client.get("/quiz/").status_code for _ in range(3)]
+        # rejected request took no token of the address bucket
+        assert statuses == [200, 200, 200]
+        assert client.get("/quiz/").status_code == 429
+
+    def test_shed_in_flight(self):
+        """Test requests above the in-flight limit are shed."""
+
+        limited_app = create_limited_app(None, max_in_flight=2)
+
+        async def run():
+            async with create_client(limited_app) as client:
+                return await asyncio.gather(
+                    *(client.post("/quiz/validate") for _ in range(4))
+                )
+
+        responses = asyncio.run(run())
+        statuses = sorted(response.status_code for response in responses)
+        assert statuses == [200, 200, 503, 503]
+        assert all(
+            response.headers["retry-after"] == "1"
+            for response in responses
+            if response.status_code == 503
+        )
+
+    def test_shed_loop_lag(self):
+        """Test requests are shed while the event loop lags."""
+
+        client = TestClient(create_limited_app(None, loop_lag_ms=100))
+        loop_monitor.lag = 2.5
+        response = client.get("/quiz/")
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "3"
+
+        loop_monitor.lag = 0.0
+        assert client.get("/quiz/").status_code == 200
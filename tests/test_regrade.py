@@ -0,0 +1,101 @@
+"""Solution re-grading testing module."""
+
+import unittest
+
+import pytest
+from parameterized import parameterized
+
+from api.quiz import model
+from api.quiz.main import validate
+from api.quiz.regrade import regrade, regrade_job, regrade_quiz
+from benchmarks.generators import make_quiz, make_solutions
+from database.memory import MemoryRepositoryFactory
+from tests.mock_client import get_auth_client
+
+
+def submission(solution: dict) -> model.QuizSubmit:
+    """Converts raw solution into quiz submission."""
+
+    return model.QuizSubmit(
+        identifier=solution["quiz"],
+        questions=[
+            model.QuestionSubmit(
+                identifier=question["identifier"],
+                answers=[
+                    model.AnswerSubmit(**answer) for answer in question["answers"]
+                ],
+            )
+            for question in solution["questions"]
+        ],
+    )
+
+
+class TestRegrade(unittest.TestCase):
+    """Solution re-grading testing class."""
+
+    def setUp(self):
+        """Quiz 1 with solutions holding stale scores."""
+
+        self.repo = MemoryRepositoryFactory()
+        self.quiz = make_quiz(1, questions=6, answers=4, seed=3)
+        self.repo.quiz.bulk_insert([self.quiz.to_mongo()])
+        solutions = make_solutions(40, questions=6, answers=4, seed=3)
+        self.repo.quiz_solution.bulk_insert([item.to_mongo() for item in solutions])
+
+    def assert_scores(self):
+        quiz = self.repo.quiz.get(1)
+        for solution in self.repo.quiz_solution.filter(quiz=1, limit=100, as_dict=True):
+            expected = validate(quiz, submission(solution)).points
+            assert solution["scored_points"] == pytest.approx(expected)
+
+    def test_regrade(self):
+        """Test answer key fix is applied to all solutions."""
+
+        quiz = self.repo.quiz.get(1)
+        for answer in quiz.questions[0].answers:
+            answer.is_correct = not answer.is_correct
+        self.repo.quiz.persist(quiz)
+
+        progress = []
+        report = regrade(self.repo, workers=2, batch_size=7, progress=progress.append)
+        assert (report.quizzes, report.solutions) == (1, 40)
+        assert report.changed > 0 and report.progress[0].finished
+        assert [item.processed for item in progress] == [7, 14, 21, 28, 35, 40, 40]
+        assert self.repo.quiz_stats.get(1).count == 40
+        self.assert_scores()
+
+        assert regrade(self.repo, [1]).changed == 0
+
+    def test_regrade_resume(self):
+        """Test interrupted re-grade resumes after the last solution."""
+
+        self.repo.regrade_checkpoint.update(
+            1,
+            upsert=True,
+            set__revision=self.quiz.revision,
+            set__last_solution=19,
+            set__processed=20,
+            set__changed=3,
+        )
+        result = regrade_quiz(self.repo, 1, batch_size=100)
+        assert result.resumed and result.finished
+        assert result.processed == 40
+
+        result = regrade_quiz(self.repo, 1, batch_size=100, restart=True)
+        assert not result.resumed and result.processed == 40
+        self.assert_scores()
+
+    @parameterized.expand([["john@wick.com", 202], ["al.pacino@gmail.com", 403]])
+    def test_regrade_endpoint(self, username: str, status_code: int):
+        """Test re-grade endpoint is available to admins only."""
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        response = auth_client.post("/admin/regrade?quiz_id=4&restart=true")
+        assert response.status_code == status_code
+        if status_code != 202:
+            return
+
+        regrade_job.join()
+        report = auth_client.get("/admin/regrade").json()
+        assert not report["running"] and report["quizzes"] == 1
+        assert report["solutions"] == 1 and report["changed"] == 0
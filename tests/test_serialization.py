@@ -0,0 +1,46 @@
+"""Serialization testing module."""
+
+import copy
+import json
+import unittest
+
+from parameterized import parameterized
+
+from api.quiz import model
+from core.serialization import (JSON_BACKENDS, document_to_dict,
+                                documents_to_list, dumps, use_backend)
+from tests.mock_repository_data import mock_quiz_data
+
+# mock repository modifies mock data, keep a pristine copy
+quiz_data = copy.deepcopy(mock_quiz_data)
+
+
+class TestSerialization(unittest.TestCase):
+    """Compiled serializer testing class."""
+
+    @parameterized.expand([[1], [3], [4]])
+    def test_document_to_dict(self, quiz_id: int):
+        """Test compiled serializer matches pydantic response model."""
+
+        quiz = quiz_data[quiz_id]
+        json_quiz = json.loads(quiz.to_json(use_db_field=False))
+        expected = model.Quiz(**json_quiz).dict()
+        assert document_to_dict(quiz, model.Quiz) == expected
+
+    def test_raw_documents_to_list(self):
+        """Test raw mongo documents (with _id) are serialized."""
+
+        raw_quizzes = [quiz_data[quiz_id].to_mongo() for quiz_id in (1, 2, 3, 4)]
+        result = documents_to_list(raw_quizzes, model.TakerQuiz)
+        assert [quiz["identifier"] for quiz in result] == [1, 2, 3, 4]
+        answer = result[0]["questions"][0]["answers"][0]
+        assert answer == {"identifier": 111, "answer_text": "Paris"}
+
+    @parameterized.expand([[backend] for backend in JSON_BACKENDS])
+    def test_dumps(self, backend: str):
+        """Test json backends produce equivalent json."""
+
+        use_backend(backend)
+        data = documents_to_list(quiz_data.values(), model.Quiz)
+        assert json.loads(dumps(data)) == data
+        use_backend("orjson")
@@ -0,0 +1,121 @@
+"""Request tracing testing module."""
+
+import json
+import os
+import tempfile
+import unittest
+
+from parameterized import parameterized
+
+from api.quiz.main import validate
+from benchmarks.generators import make_quiz, make_submission
+from core.tracing import (FileExporter, MemoryExporter, parse_traceparent,
+                          set_exporter, span, start_trace, traced)
+from tests.mock_client import get_auth_client
+
+TRACE_ID = "4bf92f3577b34da6a3ce929d0e0e4736"
+PARENT_ID = "00f067aa0ba902b7"
+
+
+@traced("double")
+def double(value: int) -> int:
+    return value * 2
+
+
+class TestTracing(unittest.TestCase):
+    """Request tracing testing class."""
+
+    def setUp(self):
+        self.exporter = MemoryExporter()
+        self.previous = set_exporter(self.exporter)
+
+    def tearDown(self):
+        set_exporter(self.previous)
+
+    @parameterized.expand(
+        [
+            [f"00-{TRACE_ID}-{PARENT_ID}-01", (TRACE_ID, PARENT_ID, True)],
+            [f"00-{TRACE_ID}-{PARENT_ID}-00", (TRACE_ID, PARENT_ID, False)],
+            [f"00-{'0' * 32}-{PARENT_ID}-01", None],
+            [f"ff-{TRACE_ID}-{PARENT_ID}-01", None],
+            [f"00-{TRACE_ID}-xyz-01", None],
+            ["", None],
+        ]
+    )
+    def test_parse_traceparent(self, header: str, expected):
+        """Test W3C traceparent header parsing."""
+
+        assert parse_traceparent(header) == expected
+
+    def test_traced(self):
+        """Test traced functions are children of the current span and
+        no-op outside of sampled traces."""
+
+        assert double(2) == 4
+        assert not self.exporter.spans()
+
+        with start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-01") as root:
+            with span("block", {"size": 1}):
+                double(3)
+
+        spans = {item["name"]: item for item in self.exporter.spans()}
+        assert spans["root"]["parent_id"] == PARENT_ID
+        assert spans["block"]["parent_id"] == root.span_id
+        assert spans["double"]["parent_id"] == spans["block"]["span_id"]
+        assert {item["trace_id"] for item in spans.values()} == {TRACE_ID}
+
+    def test_validate_traced(self):
+        """Test quiz validation span."""
+
+        quiz = make_quiz(1)
+        with start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-01"):
+            validate(quiz, make_submission(quiz))
+
+        assert [item["name"] for item in self.exporter.spans()] == [
+            "root",
+            "quiz.validate",
+        ]
+
+    def test_file_exporter(self):
+        """Test spans are appended to NDJSON file."""
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "traces", "spans.ndjson")
+            set_exporter(FileExporter(path))
+            for _ in range(2):
+                with start_trace("root", f"00-{TRACE_ID}-{PARENT_ID}-01"):
+                    double(1)
+            with open(path, encoding="utf-8") as file_handle:
+                names = [json.loads(line)["name"] for line in file_handle]
+        assert names == ["double", "root", "double", "root"]
+
+    @parameterized.expand([["01", True], ["00", False]])
+    def test_request_trace(self, flags: str, sampled: bool):
+        """Test request spans: token decode, user lookup and
+        rendering are in the request trace."""
+
+        auth_client = get_auth_client("john@wick.com", "_Hard_pass1")
+        headers = {
+            **auth_client.headers,
+            "traceparent": f"00-{TRACE_ID}-{PARENT_ID}-{flags}",
+        }
+        response = auth_client.get("/user/me", headers=headers)
+        assert response.status_code == 200
+
+        spans = self.exporter.spans(TRACE_ID)
+        if not sampled:
+            assert not spans
+            assert "traceparent" not in response.headers
+            return
+
+        names = {item["name"] for item in spans}
+        assert {
+            "GET /user/me",
+            "auth.get_user_from_token",
+            "auth.decode_token",
+            "repository.get",
+            "render",
+        } <= names
+        root = next(item for item in spans if item["parent_id"] == PARENT_ID)
+        assert root["attributes"]["http.status_code"] == response.status_code
+        assert response.headers["traceparent"].startswith(f"00-{TRACE_ID}-")
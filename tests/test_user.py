@@ -1,10 +1,14 @@
 """Test user api module."""
 
+import io
 import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
 
 from parameterized import parameterized
 
-from api.user.model import BaseUser
+from api.user.bulk import provision_users, read_user_rows
+from api.user.model import BaseUser, UserListFormat
 from tests.mock_client import get_auth_client, test_client
 from tests.mock_repository import get_mock_repository
 
@@ -106,3 +110,59 @@ class TestUsersApi(unittest.TestCase):
             assert current_user.email == data.get("email")
             assert current_user.first_name == data.get("first_name")
             assert current_user.last_name == data.get("last_name")
+
+    @parameterized.expand(
+        [
+            ["john@wick.com", 200],
+            ["al.pacino@gmail.com", 403],
+        ]
+    )
+    def test_user_bulk(self, username: str, status_code: int):
+        """Test bulk user provisioning functionality."""
+
+        self.del_user("bulk.one@gmail.com")
+        self.del_user("bulk.two@gmail.com")
+        users = (
+            "email,first_name,last_name,password\n"
+            "bulk.one@gmail.com,Bulk,One,ValidPass_8\n"
+            "bulk.two@gmail.com,Bulk,Two,ValidPass_8\n"
+            "bulk.one@gmail.com,Bulk,One,ValidPass_8\n"
+            "al.pacino@gmail.com,Alfredo,Pacino,ValidPass_8\n"
+            "bulk.three@gmail.com,Bu,Three,ValidPass_8\n"
+        )
+
+        auth_client = get_auth_client(username, "_Hard_pass1")
+        files = {"users_file": ("users.csv", users, "text/csv")}
+        response = auth_client.post(f"{self.endpoint}/bulk", files=files)
+        assert response.status_code == status_code
+
+        if status_code == 200:
+            report = response.json()
+            assert report["read"] == 5
+            assert report["created"] == 2
+            assert report["existing"] == 1
+            assert report["rejected"] == 3
+            assert [error["row"] for error in report["errors"]] == [3, 5, 4]
+            assert get_mock_repository().user.get("bulk.two@gmail.com").active
+
+    def test_user_bulk_concurrent(self):
+        """Test rows of users created concurrently after the existence
+        check are reported with their row."""
+
+        self.del_user("bulk.four@gmail.com")
+        users = (
+            "email,first_name,last_name,password\n"
+            "al.pacino@gmail.com,Alfredo,Pacino,ValidPass_8\n"
+            "bulk.four@gmail.com,Bulk,Four,ValidPass_8\n"
+        )
+        rows = read_user_rows(io.StringIO(users), UserListFormat.csv)
+        repo = get_mock_repository()
+        with patch("api.user.bulk.existing_emails", return_value=set()):
+            with ThreadPoolExecutor(1) as pool:
+                report = provision_users(rows, repo, pool=pool)
+
+        assert report.created == 1 and report.existing == 1
+        assert [(error.row, error.message) for error in report.errors] == [
+            (1, "User already exists")
+        ]
+        assert repo.user.get("al.pacino@gmail.com").first_name == "Al"
@@ -1,5 +1,8 @@
 """Simple utilities."""
 
+from itertools import islice
+from typing import Iterable, Iterator
+
 
 def first_item(iterable):
     """Given iterable get first element or None if
@@ -8,6 +11,15 @@ def first_item(iterable):
     return next(iter(iterable or []), None)
 
 
+def chunked(iterable: Iterable, size: int) -> Iterator[list]:
+    """Splits iterable into lists of a given size (the last one
+    may be shorter)."""
+
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
 def get_query_params(title: str, description: str, owner_email: str):
     query_params = {}
 